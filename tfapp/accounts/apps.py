@@ -12,6 +12,18 @@ class AccountsConfig(AppConfig):
         def _sync_user_session_on_session_delete(sender, instance, **kwargs):
             from .models import UserSession
 
-            UserSession.objects.filter(session_key=instance.session_key).delete()
+            # Key rotation (cycle_key on login or password change) deletes the old row too, so
+            # keep the tracking row; track_session records the new key on the next request.
+            UserSession.objects.filter(session_key=instance.session_key).update(session_key=None)
 
         post_delete.connect(_sync_user_session_on_session_delete, sender=Session)
+
+        from django.contrib.auth.signals import user_logged_out
+
+        def _forget_user_session_on_logout(sender, request, user, **kwargs):
+            from .session_utils import forget_user_session
+
+            if request is not None and hasattr(request, "session"):
+                forget_user_session(request.session)
+
+        user_logged_out.connect(_forget_user_session_on_logout)
@@ -1,11 +1,11 @@
-from .models import UserSession
-from .session_utils import register_user_session
+from .session_utils import track_session
 
 
 class UserSessionTrackingMiddleware:
     """
     Ensures authenticated requests have a UserSession row (covers admin login and
     legacy sessions) and enforces the concurrent session limit when a new row appears.
+    Known sessions are confirmed from the cache (see session_utils.track_session).
     """
 
     def __init__(self, get_response):
@@ -13,14 +13,6 @@ class UserSessionTrackingMiddleware:
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            sid = request.session.session_key
-            if sid:
-                existing = UserSession.objects.filter(session_key=sid).first()
-                if not existing:
-                    register_user_session(request.user, sid)
-                elif existing.user_id != request.user.id:
-                    # Session key reused across users (should not happen); reset mapping.
-                    existing.delete()
-                    register_user_session(request.user, sid)
+            track_session(request)
         response = self.get_response(request)
         return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_rename_accounts_pr_status_1d68ce_idx_accounts_pr_status_26777a_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='tracking_id',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='usersession',
+            name='session_key',
+            field=models.CharField(blank=True, db_index=True, max_length=40, null=True, unique=True),
+        ),
+    ]
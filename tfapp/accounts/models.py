@@ -9,8 +9,12 @@ CREDENTIAL_WEB_IMAGE_EXTENSIONS = frozenset({".png", ".jpg", ".jpeg", ".webp", "
 
 class UserSession(models.Model):
     """
-    Maps Django session keys to users so we can enforce a max concurrent
+    Maps browser sessions to users so we can enforce a max concurrent
     session count per user (oldest sessions are invalidated first).
+
+    ``tracking_id`` is stored in the session data itself, so it survives key rotation and
+    works with signed-cookie sessions; ``session_key`` is the server-side store key (blank
+    for cookie sessions) used to delete the session when it is trimmed.
     """
 
     user = models.ForeignKey(
@@ -18,7 +22,8 @@ class UserSession(models.Model):
         on_delete=models.CASCADE,
         related_name="browser_sessions",
     )
-    session_key = models.CharField(max_length=40, unique=True, db_index=True)
+    session_key = models.CharField(max_length=40, unique=True, db_index=True, null=True, blank=True)
+    tracking_id = models.CharField(max_length=32, unique=True, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -28,7 +33,7 @@ class UserSession(models.Model):
         ]
 
     def __str__(self):
-        return f"{self.user_id} / {self.session_key[:8]}…"
+        return f"{self.user_id} / {(self.session_key or self.tracking_id or '')[:8]}…"
 
 
 class CareerRole(models.Model):
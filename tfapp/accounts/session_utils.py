@@ -1,34 +1,122 @@
+from importlib import import_module
+from uuid import uuid4
+
 from django.conf import settings
-from django.contrib.sessions.backends.db import SessionStore
+from django.contrib import auth
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
 
 from .models import UserSession
 
+# Session data key holding the UserSession.tracking_id of this browser session.
+TRACKING_ID_SESSION_KEY = "_user_session_tracking_id"
+
 
 def max_sessions_per_user() -> int:
     return int(getattr(settings, "MAX_SESSIONS_PER_USER", 3))
 
 
-def register_user_session(user, session_key: str) -> None:
-    """Record this browser session for the user and trim excess sessions."""
-    if not session_key:
+def _cache_key(tracking_id: str) -> str:
+    return f"accounts:user_session:{tracking_id}"
+
+
+def _cache_seconds() -> int:
+    return int(getattr(settings, "SESSION_TRACKING_CACHE_SECONDS", 300))
+
+
+def _session_store_class():
+    return import_module(settings.SESSION_ENGINE).SessionStore
+
+
+def _server_side_sessions() -> bool:
+    """False for signed-cookie sessions, whose key is the cookie payload and cannot be deleted."""
+    return not settings.SESSION_ENGINE.endswith("signed_cookies")
+
+
+def _store_key(session):
+    return session.session_key if _server_side_sessions() else None
+
+
+def register_user_session(user, session) -> None:
+    """
+    Give this browser session a new tracking id, record it for the user and trim excess
+    sessions. Call after auth.login (the session key has been rotated by then).
+    """
+    previous = session.get(TRACKING_ID_SESSION_KEY)
+    tracking_id = uuid4().hex
+    session[TRACKING_ID_SESSION_KEY] = tracking_id
+    store_key = _store_key(session)
+    with transaction.atomic():
+        stale = Q(tracking_id=previous) if previous else Q()
+        if store_key:
+            stale |= Q(session_key=store_key)
+        if stale:
+            UserSession.objects.filter(stale).delete()
+        UserSession.objects.create(user=user, tracking_id=tracking_id, session_key=store_key)
+        _trim_oldest_sessions(user, keep_tracking_id=tracking_id)
+    if previous:
+        cache.delete(_cache_key(previous))
+    cache.set(_cache_key(tracking_id), (user.pk, store_key), _cache_seconds())
+
+
+def track_session(request) -> None:
+    """
+    Per-request check behind UserSessionTrackingMiddleware. A session already known to belong
+    to this user under its current store key is confirmed from the cache; otherwise the row is
+    read, and written only for a session seen for the first time or whose key was rotated
+    (login, password change). Rows are deleted only by _trim_oldest_sessions and
+    forget_user_session, so a session without one was trimmed and is logged out (the only way
+    to end a signed-cookie session).
+    """
+    session = request.session
+    tracking_id = session.get(TRACKING_ID_SESSION_KEY)
+    if not tracking_id:
+        register_user_session(request.user, session)
+        return
+    store_key = _store_key(session)
+    if cache.get(_cache_key(tracking_id)) == (request.user.pk, store_key):
+        return
+    row = UserSession.objects.filter(tracking_id=tracking_id).values_list("user_id", "session_key").first()
+    if row is None:
+        auth.logout(request)
+        return
+    owner_id, row_key = row
+    if owner_id != request.user.pk:
+        # Tracking id reused across users (should not happen); reset mapping.
+        register_user_session(request.user, session)
         return
-    UserSession.objects.update_or_create(
-        session_key=session_key,
-        defaults={"user": user},
+    if row_key != store_key:
+        with transaction.atomic():
+            if store_key:
+                UserSession.objects.filter(session_key=store_key).exclude(tracking_id=tracking_id).delete()
+            UserSession.objects.filter(tracking_id=tracking_id).update(session_key=store_key)
+    cache.set(_cache_key(tracking_id), (owner_id, store_key), _cache_seconds())
+
+
+def forget_user_session(session) -> None:
+    """Drop this session's row (logout), so it no longer counts toward the limit."""
+    tracking_id = session.get(TRACKING_ID_SESSION_KEY)
+    if tracking_id:
+        UserSession.objects.filter(tracking_id=tracking_id).delete()
+        cache.delete(_cache_key(tracking_id))
+
+
+def _trim_oldest_sessions(user, keep_tracking_id: str) -> None:
+    """Delete all but the newest MAX_SESSIONS_PER_USER sessions (``keep_tracking_id`` always stays)."""
+    keep_others = max(max_sessions_per_user() - 1, 0)
+    victims = list(
+        UserSession.objects.filter(user=user)
+        .exclude(tracking_id=keep_tracking_id)
+        .order_by("-created_at", "-pk")
+        .values_list("pk", "tracking_id", "session_key")[keep_others:]
     )
-    _trim_oldest_sessions(user, keep_session_key=session_key)
-
-
-def _trim_oldest_sessions(user, keep_session_key: str) -> None:
-    limit = max_sessions_per_user()
-    while UserSession.objects.filter(user=user).count() > limit:
-        victim = (
-            UserSession.objects.filter(user=user)
-            .exclude(session_key=keep_session_key)
-            .order_by("created_at")
-            .first()
-        )
-        if not victim:
-            break
-        # Deletes django_session row; accounts.apps removes matching UserSession via post_delete.
-        SessionStore(victim.session_key).delete()
+    if not victims:
+        return
+    UserSession.objects.filter(pk__in=[pk for pk, _, _ in victims]).delete()
+    cache.delete_many([_cache_key(t) for _, t, _ in victims if t])
+    # Server-side sessions end now; cookie sessions are logged out by track_session on next use.
+    store_class = _session_store_class() if _server_side_sessions() else None
+    for _, _, session_key in victims:
+        if session_key and store_class:
+            store_class(session_key).delete()
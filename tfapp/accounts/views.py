@@ -82,7 +82,7 @@ def login(request):
 
         if user is not None:
             auth.login(request, user)
-            register_user_session(user, request.session.session_key)
+            register_user_session(user, request.session)
             messages.success(request, "You are now logged in")
             return redirect(_safe_next_redirect_url(request))
         messages.error(request, "Invalid credentials")
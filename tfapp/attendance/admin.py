@@ -3,7 +3,6 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import path
 from django.contrib import messages
-from decimal import Decimal
 from .models import (
     CustomUser,
     DailyAttendanceSummary,
@@ -14,6 +13,8 @@ from .models import (
     PTOBalanceHistory,
     WorkThroughLunchRequest,
     AdjustPunchRequest,
+    TardySyncJob,
+    ReportJob,
 )
 
 
@@ -108,39 +109,23 @@ class CustomUserAdmin(BaseUserAdmin):
         return super().change_view(request, object_id, form_url, extra_context)
 
     def save_model(self, request, obj, form, change):
-        # Record manual balance edits made directly in admin user form.
-        old_pto = None
-        old_personal = None
-        if change and obj.pk:
-            original = CustomUser.objects.filter(pk=obj.pk).first()
-            if original:
-                old_pto = Decimal(str(original.pto_balance)).quantize(Decimal("0.01"))
-                old_personal = Decimal(str(original.personal_time_balance)).quantize(Decimal("0.01"))
-
+        # Manual balance edits made directly in the admin user form are ledgered by save().
+        obj.ledger_reason = f"Manual admin edit by {request.user.username}"
         super().save_model(request, obj, form, change)
 
-        if old_pto is not None:
-            new_pto = Decimal(str(obj.pto_balance)).quantize(Decimal("0.01"))
-            delta_pto = new_pto - old_pto
-            if delta_pto != 0:
-                PTOBalanceHistory.record(
-                    user=obj,
-                    change=float(delta_pto),
-                    reason=f"Manual admin edit by {request.user.username}",
-                    balance_after=float(new_pto),
-                    balance_type=PTOBalanceHistory.BALANCE_TYPE_PTO,
-                )
-
-            new_personal = Decimal(str(obj.personal_time_balance)).quantize(Decimal("0.01"))
-            delta_personal = new_personal - old_personal
-            if delta_personal != 0:
-                PTOBalanceHistory.record(
-                    user=obj,
-                    change=float(delta_personal),
-                    reason=f"Manual admin edit by {request.user.username}",
-                    balance_after=float(new_personal),
-                    balance_type=PTOBalanceHistory.BALANCE_TYPE_PERSONAL,
-                )
+        if change and "weekly_schedule" in form.changed_data:
+            # JSON schedule feeds stored entry hours and weekly totals for every week.
+            from .services.entry_hours import mark_entry_hours_stale
+            from .services.weekly_totals import invalidate_weekly_user_totals
+
+            mark_entry_hours_stale(user_ids=[obj.pk])
+            invalidate_weekly_user_totals(user_ids=[obj.pk])
+
+        if change and {"role", "department", "supervisor", "group_lead"} & set(form.changed_data):
+            # Approver scope changed; cached pending-approval counts would otherwise wait out their TTL.
+            from .services.approvals import invalidate_pending_approval_counts
+
+            invalidate_pending_approval_counts()
 
     fieldsets = (
         (None, {
@@ -208,20 +193,40 @@ class OccurrenceAdmin(admin.ModelAdmin):
 
 @admin.register(DailyAttendanceSummary)
 class DailyAttendanceSummaryAdmin(admin.ModelAdmin):
-    list_display = ("user", "work_date", "status", "scheduled_hours", "worked_hours", "exchange_eligible")
-    list_filter = ("status", "work_date")
-    search_fields = ("user__username", "user__payroll_lastname")
-    raw_id_fields = ("user", "payroll_period")
+    list_display = (
+        "user",
+        "work_date",
+        "status",
+        "scheduled_hours",
+        "worked_hours",
+        "tardy_minutes",
+        "unplanned_hours",
+        "exchange_eligible",
+        "is_stale",
+    )
+    list_filter = ("status", "is_stale", "work_date")
+    search_fields = ("user__username", "user__payroll_lastname", "department")
+    raw_id_fields = ("user", "payroll_period", "supervisor", "group_lead")
 
 
 @admin.register(PTOBalanceHistory)
 class PTOBalanceHistoryAdmin(admin.ModelAdmin):
     list_display = ("user", "balance_type", "change", "balance_after", "reason", "timestamp")
-    list_filter = ("balance_type", "timestamp")
+    list_filter = ("balance_type", "is_checkpoint", "timestamp")
     search_fields = ("user__username", "reason")
-    readonly_fields = ("user", "change", "reason", "balance_after", "balance_type", "timestamp")
+    readonly_fields = ("user", "change", "reason", "balance_after", "balance_type", "is_checkpoint", "timestamp")
     ordering = ("-timestamp",)
 
+    # Append-only ledger: corrections are new rows (reconcile_pto_ledger --fix or a balance edit).
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(WorkThroughLunchRequest)
 class WorkThroughLunchRequestAdmin(admin.ModelAdmin):
@@ -243,4 +248,43 @@ class AdjustPunchRequestAdmin(admin.ModelAdmin):
 class PayrollPeriodAdmin(admin.ModelAdmin):
     list_display = ("week_ending", "is_finalized", "finalized_at", "finalized_by")
     list_filter = ("is_finalized",)
-    ordering = ("-week_ending",)
\ No newline at end of file
+    ordering = ("-week_ending",)
+
+
+@admin.register(TardySyncJob)
+class TardySyncJobAdmin(admin.ModelAdmin):
+    list_display = ("user", "date", "first_requested_at", "available_at", "attempts")
+    list_filter = ("date",)
+    search_fields = ("user__username", "user__last_name", "last_error")
+    readonly_fields = ("user", "date", "requested_at", "first_requested_at", "available_at", "attempts", "last_error")
+    ordering = ("available_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "requested_by", "status", "requested_at", "finished_at", "attempts")
+    list_filter = ("status", "kind")
+    search_fields = ("requested_by__username", "requested_by__last_name", "last_error")
+    readonly_fields = (
+        "slug",
+        "kind",
+        "params",
+        "params_hash",
+        "data_version",
+        "requested_by",
+        "status",
+        "pdf",
+        "filename",
+        "requested_at",
+        "started_at",
+        "finished_at",
+        "attempts",
+        "last_error",
+    )
+    ordering = ("-requested_at",)
+
+    def has_add_permission(self, request):
+        return False
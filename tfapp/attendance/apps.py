@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
+
+    def ready(self):
+        from .payroll_utils import connect_finalized_weeks_signals
+        from .services.approvals import connect_pending_approval_signals
+        from .services.daily_summaries import connect_daily_summary_signals
+        from .services.entry_hours import connect_entry_hours_signals
+        from .services.weekly_totals import connect_weekly_totals_signals
+
+        connect_entry_hours_signals()
+        connect_finalized_weeks_signals()
+        connect_pending_approval_signals()
+        connect_daily_summary_signals()
+        connect_weekly_totals_signals()
@@ -1,14 +1,22 @@
 """
 Group absence analytics for dashboard preview and PDF reports.
+
+Scheduled hours come from current rows of the daily fact table (DailyAttendanceSummary), or
+from the compiled schedule for users whose rows are missing or stale; nothing is built here,
+so a report request never writes rows. Absence hours come from the occurrences the caller
+passes, so report filters still apply. The figures are computed
+with NumPy on users x days arrays.
 """
 from __future__ import annotations
 
-from collections import defaultdict
 from dataclasses import dataclass
-from datetime import date, timedelta
+from datetime import date
+
+import numpy as np
 
 from .models import CustomUser, Occurrence, OccurrenceSubtype, OccurrenceType
-from .services.time_processing import build_daily_scheduled_hours_map
+from .services.daily_summaries import current_summaries
+from .services.time_processing import compiled_schedule_for_user
 
 TARDY_SUBTYPES = frozenset(
     {
@@ -48,41 +56,9 @@ def _employment_band(avg_weekly_hours: float) -> str:
     return "between"
 
 
-def _week_windows(start: date, end: date) -> list[tuple[int, int]]:
-    """Inclusive date-index ranges (into shared date list) per calendar week."""
-    if start > end:
-        return []
-    dates: list[date] = []
-    d = start
-    while d <= end:
-        dates.append(d)
-        d += timedelta(days=1)
-    date_to_i = {day: i for i, day in enumerate(dates)}
-    windows: list[tuple[int, int]] = []
-    cur = start
-    while cur <= end:
-        week_end = min(cur + timedelta(days=6), end)
-        windows.append((date_to_i[cur], date_to_i[week_end]))
-        cur = week_end + timedelta(days=1)
-    return windows
-
-
 def _extrapolate_next(values: list[float]) -> float:
-    n = len(values)
-    if n == 0:
-        return 0.0
-    if n == 1:
-        return round(values[0], 2)
-    xs = list(range(n))
-    mx = (n - 1) / 2.0
-    my = sum(values) / n
-    var_x = sum((x - mx) ** 2 for x in xs)
-    if var_x <= 0:
-        return round(my, 2)
-    cov_xy = sum((xs[i] - mx) * (values[i] - my) for i in range(n))
-    beta = cov_xy / var_x
-    alpha = my - beta * mx
-    return round(max(0.0, alpha + beta * n), 2)
+    """Least-squares line through (i, values[i]), evaluated one step past the end (floored at 0)."""
+    return _extrapolate_next_rows(np.array(values, dtype=float).reshape(1, -1))[0]
 
 
 def _absence_rate_pct(absence_hours: float, scheduled_hours: float) -> float:
@@ -92,88 +68,155 @@ def _absence_rate_pct(absence_hours: float, scheduled_hours: float) -> float:
 
 
 @dataclass
-class _ScheduleIndex:
-    dates: list[date]
-    daily_by_user: dict[int, list[float]]
-    prefix_by_user: dict[int, list[float]]
-    week_windows: list[tuple[int, int]]
-    period_days: int
-
-    @classmethod
-    def build(cls, users: list[CustomUser], start: date, end: date) -> _ScheduleIndex:
-        dates, daily_by_user = build_daily_scheduled_hours_map(users, start, end)
-        prefix_by_user = {
-            uid: _prefix(daily) for uid, daily in daily_by_user.items()
-        }
-        return cls(
-            dates=dates,
-            daily_by_user=daily_by_user,
-            prefix_by_user=prefix_by_user,
-            week_windows=_week_windows(start, end),
-            period_days=len(dates),
-        )
+class _Totals:
+    """Unrounded figures for the company or one group, before formatting."""
+
+    scheduled: float = 0.0
+    absence: float = 0.0
+    tardy: float = 0.0
+    early: float = 0.0
+    planned: float = 0.0
+    unplanned: float = 0.0
+    full_time: int = 0
+    part_time: int = 0
+    between: int = 0
+    predicted_unplanned_pct: float = 0.0
+
+
+def _extrapolate_next_rows(rates) -> list[float]:
+    """_extrapolate_next for each row of a 2-D array (one least-squares fit per row)."""
+    rows, n = rates.shape
+    if n == 0:
+        return [0.0] * rows
+    if n == 1:
+        return [round(v, 2) for v in rates[:, 0].tolist()]
+    dx = np.arange(n, dtype=float) - (n - 1) / 2.0
+    my = rates.sum(axis=1) / n
+    beta = (dx * (rates - my[:, None])).sum(axis=1) / float((dx**2).sum())
+    alpha = my - beta * ((n - 1) / 2.0)
+    return [round(max(0.0, v), 2) for v in (alpha + beta * n).tolist()]
 
-    def scheduled_sum(self, user_ids: set[int], i0: int, i1: int) -> float:
-        total = 0.0
-        for uid in user_ids:
-            prefix = self.prefix_by_user.get(uid)
-            if prefix:
-                total += prefix[i1 + 1] - prefix[i0]
-        return total
-
-    def avg_weekly_hours(self, user_id: int) -> float:
-        prefix = self.prefix_by_user.get(user_id)
-        if not prefix or self.period_days <= 0:
-            return 0.0
-        total = prefix[-1]
-        return total / (self.period_days / 7.0)
-
-
-def _prefix(values: list[float]) -> list[float]:
-    out = [0.0]
-    for v in values:
-        out.append(out[-1] + v)
-    return out
-
-
-def _index_occurrences(occurrences: list[Occurrence]) -> dict[int, list[Occurrence]]:
-    by_user: dict[int, list[Occurrence]] = defaultdict(list)
-    for o in occurrences:
-        by_user[o.user_id].append(o)
-    return by_user
-
-
-def _sum_occ_hours(occs: list[Occurrence], pred) -> float:
-    return sum(float(o.duration_hours or 0) for o in occs if pred(o))
-
-
-def _weekly_unplanned_rates(
-    schedule: _ScheduleIndex,
-    occs_by_user: dict[int, list[Occurrence]],
-    user_ids: set[int],
-) -> list[float]:
-    rates: list[float] = []
-    for i0, i1 in schedule.week_windows:
-        sched = schedule.scheduled_sum(user_ids, i0, i1)
-        unpl = 0.0
-        for uid in user_ids:
-            for o in occs_by_user.get(uid, ()):
-                if (
-                    o.occurrence_type == OccurrenceType.UNPLANNED
-                    and schedule.dates[i0] <= o.date <= schedule.dates[i1]
-                ):
-                    unpl += float(o.duration_hours or 0)
-        rates.append(_absence_rate_pct(unpl, sched))
-    return rates
-
-
-def _group_occurrences(
-    occs_by_user: dict[int, list[Occurrence]], user_ids: set[int]
-) -> list[Occurrence]:
-    out: list[Occurrence] = []
-    for uid in user_ids:
-        out.extend(occs_by_user.get(uid, ()))
-    return out
+
+def _numpy_totals(
+    occurrences: list[Occurrence],
+    ne_users: list[CustomUser],
+    label_by_user: dict[int, str],
+    labels: list[str],
+    start_date: date,
+    end_date: date,
+) -> tuple[_Totals, dict[str, _Totals]]:
+    """
+    Users x days arrays of scheduled and unplanned hours, 7-day windows via np.add.reduceat,
+    group roll-ups via group-index masks, and one batched trend fit.
+    """
+    period_days = max(0, (end_date - start_date).days + 1)
+    user_index = {u.id: i for i, u in enumerate(ne_users)}
+    label_index = {label: g for g, label in enumerate(labels)}
+    group_of_user = np.array([label_index[label_by_user[u.id]] for u in ne_users], dtype=np.intp)
+    n_users, n_groups = len(ne_users), len(labels)
+    group_mask = (group_of_user[None, :] == np.arange(n_groups)[:, None]).astype(float)
+
+    scheduled = np.zeros((n_users, period_days))
+    covered = set()
+    if period_days:
+        covered, rows = current_summaries(ne_users, start_date, end_date)
+        facts = list(
+            rows.filter(base_scheduled_hours__gt=0)
+            .order_by()
+            .values_list("user_id", "work_date", "base_scheduled_hours")
+        )
+        if facts:
+            uids, days, hours = zip(*facts)
+            scheduled[
+                [user_index[uid] for uid in uids], [(d - start_date).days for d in days]
+            ] = hours
+    # Users without current rows: their compiled weekly schedule, tiled over the period.
+    weekday_of_day = (start_date.weekday() + np.arange(period_days)) % 7
+    for user in ne_users:
+        if user.id not in covered:
+            weekly = [shift.duration_hours for shift in compiled_schedule_for_user(user).days]
+            scheduled[user_index[user.id]] = np.array(weekly, dtype=float)[weekday_of_day]
+
+    n_occ = len(occurrences)
+    occ_hours = np.fromiter((float(o.duration_hours or 0) for o in occurrences), float, n_occ)
+    is_tardy = np.fromiter((o.subtype in TARDY_SUBTYPES for o in occurrences), bool, n_occ)
+    is_early = ~is_tardy & np.fromiter(
+        (bool(o.is_variance_to_schedule) for o in occurrences), bool, n_occ
+    )
+    is_planned = np.fromiter(
+        (o.occurrence_type == OccurrenceType.PLANNED for o in occurrences), bool, n_occ
+    )
+    is_unplanned = np.fromiter(
+        (o.occurrence_type == OccurrenceType.UNPLANNED for o in occurrences), bool, n_occ
+    )
+    occ_user = np.fromiter((user_index.get(o.user_id, -1) for o in occurrences), np.intp, n_occ)
+    occ_day = np.fromiter(((o.date - start_date).days for o in occurrences), np.intp, n_occ)
+    in_group = occ_user >= 0
+    occ_group = group_of_user[occ_user[in_group]]
+
+    unplanned = np.zeros((n_users, period_days))
+    in_window = in_group & is_unplanned & (occ_day >= 0) & (occ_day < period_days)
+    np.add.at(unplanned, (occ_user[in_window], occ_day[in_window]), occ_hours[in_window])
+
+    if period_days:
+        week_starts = np.arange(0, period_days, 7)
+        weekly_scheduled = np.add.reduceat(scheduled, week_starts, axis=1)
+        weekly_unplanned = np.add.reduceat(unplanned, week_starts, axis=1)
+    else:
+        weekly_scheduled = weekly_unplanned = np.zeros((n_users, 0))
+    # Row 0 is the company, then one row per group.
+    rows_scheduled = np.vstack([weekly_scheduled.sum(axis=0), group_mask @ weekly_scheduled])
+    rows_unplanned = np.vstack([weekly_unplanned.sum(axis=0), group_mask @ weekly_unplanned])
+    raw_rates = np.divide(
+        100.0 * rows_unplanned,
+        rows_scheduled,
+        out=np.zeros_like(rows_scheduled),
+        where=rows_scheduled > 0,
+    )
+    rates = np.array([[round(v, 2) for v in row] for row in raw_rates.tolist()]).reshape(raw_rates.shape)
+    predicted = _extrapolate_next_rows(rates)
+
+    user_scheduled = scheduled.sum(axis=1)
+    avg_weekly = user_scheduled / (period_days / 7.0) if period_days else np.zeros(n_users)
+    part_time = avg_weekly <= PT_WEEKLY_MAX
+    full_time = ~part_time & (avg_weekly >= FT_WEEKLY_MIN)
+    between = ~part_time & ~full_time
+
+    def by_group(weights) -> list[float]:
+        return np.bincount(occ_group, weights=weights[in_group], minlength=n_groups).tolist()
+
+    def by_group_users(weights) -> list[float]:
+        return np.bincount(group_of_user, weights=weights, minlength=n_groups).tolist()
+
+    company = _Totals(
+        scheduled=float(user_scheduled.sum()),
+        absence=float(occ_hours.sum()),
+        tardy=float(occ_hours[is_tardy].sum()),
+        early=float(occ_hours[is_early].sum()),
+        planned=float(occ_hours[is_planned].sum()),
+        unplanned=float(occ_hours[is_unplanned].sum()),
+        full_time=int(full_time.sum()),
+        part_time=int(part_time.sum()),
+        between=int(between.sum()),
+        predicted_unplanned_pct=predicted[0],
+    )
+    columns = zip(
+        by_group_users(user_scheduled),
+        by_group(occ_hours),
+        by_group(occ_hours * is_tardy),
+        by_group(occ_hours * is_early),
+        by_group(occ_hours * is_planned),
+        by_group(occ_hours * is_unplanned),
+        by_group_users(full_time.astype(float)),
+        by_group_users(part_time.astype(float)),
+        by_group_users(between.astype(float)),
+        predicted[1:],
+    )
+    groups = {
+        label: _Totals(sched, absence, tardy, early, planned, unpl, int(ft), int(pt), int(mid), pred)
+        for label, (sched, absence, tardy, early, planned, unpl, ft, pt, mid, pred) in zip(labels, columns)
+    }
+    return company, groups
 
 
 def compute_group_analytics(
@@ -185,104 +228,45 @@ def compute_group_analytics(
     group_by: str,
 ) -> dict:
     ne_users = [u for u in visible_users if not u.is_exempt]
-    ne_ids = {u.id for u in ne_users}
-    schedule = _ScheduleIndex.build(ne_users, start_date, end_date)
-    occs_by_user = _index_occurrences(occurrences)
-
-    users_by_group: dict[str, list[CustomUser]] = defaultdict(list)
-    group_user_ids: dict[str, set[int]] = defaultdict(set)
-    for u in ne_users:
-        label = _group_label(u, group_by)
-        users_by_group[label].append(u)
-        group_user_ids[label].add(u.id)
-
-    total_scheduled = schedule.scheduled_sum(ne_ids, 0, schedule.period_days - 1)
-    total_absence = _sum_occ_hours(occurrences, lambda o: True)
-    tardy_h = _sum_occ_hours(occurrences, lambda o: o.subtype in TARDY_SUBTYPES)
-    early_h = _sum_occ_hours(
-        occurrences,
-        lambda o: o.is_variance_to_schedule and o.subtype not in TARDY_SUBTYPES,
-    )
-    planned_h = _sum_occ_hours(
-        occurrences, lambda o: o.occurrence_type == OccurrenceType.PLANNED
-    )
-    unplanned_h = _sum_occ_hours(
-        occurrences, lambda o: o.occurrence_type == OccurrenceType.UNPLANNED
-    )
-    other_h = max(0.0, total_absence - tardy_h - early_h)
-
-    ft_count = pt_count = between_count = 0
-    for u in ne_users:
-        band = _employment_band(schedule.avg_weekly_hours(u.id))
-        if band == "full_time":
-            ft_count += 1
-        elif band == "part_time":
-            pt_count += 1
-        else:
-            between_count += 1
-
-    company = {
-        "scheduled_hours": round(total_scheduled, 2),
-        "absence_hours": round(total_absence, 2),
-        "absence_rate_pct": _absence_rate_pct(total_absence, total_scheduled),
-        "tardy_hours": round(tardy_h, 2),
-        "early_departure_hours": round(early_h, 2),
-        "other_absence_hours": round(other_h, 2),
-        "planned_hours": round(planned_h, 2),
-        "unplanned_hours": round(unplanned_h, 2),
-        "planned_pct": round(100.0 * planned_h / total_absence, 1) if total_absence > 0 else 0.0,
-        "unplanned_pct": round(100.0 * unplanned_h / total_absence, 1) if total_absence > 0 else 0.0,
-        "full_time_count": ft_count,
-        "part_time_count": pt_count,
-        "between_count": between_count,
-        "non_exempt_count": len(ne_users),
-        "predicted_unplanned_pct": _extrapolate_next(
-            _weekly_unplanned_rates(schedule, occs_by_user, ne_ids)
-        ),
-    }
-
-    by_group: list[dict] = []
-    for label in sorted(users_by_group.keys(), key=lambda s: s.lower()):
-        uids = group_user_ids[label]
-        group_occs = _group_occurrences(occs_by_user, uids)
-        g_sched = schedule.scheduled_sum(uids, 0, schedule.period_days - 1)
-        g_absence = _sum_occ_hours(group_occs, lambda o: True)
-        g_tardy = _sum_occ_hours(group_occs, lambda o: o.subtype in TARDY_SUBTYPES)
-        g_early = _sum_occ_hours(
-            group_occs,
-            lambda o: o.is_variance_to_schedule and o.subtype not in TARDY_SUBTYPES,
-        )
-        g_planned = _sum_occ_hours(
-            group_occs, lambda o: o.occurrence_type == OccurrenceType.PLANNED
-        )
-        g_unplanned = _sum_occ_hours(
-            group_occs, lambda o: o.occurrence_type == OccurrenceType.UNPLANNED
-        )
-        g_ft = g_pt = 0
-        for uid in uids:
-            band = _employment_band(schedule.avg_weekly_hours(uid))
-            if band == "full_time":
-                g_ft += 1
-            elif band == "part_time":
-                g_pt += 1
-
-        by_group.append(
+    label_by_user = {u.id: _group_label(u, group_by) for u in ne_users}
+    labels = sorted(set(label_by_user.values()), key=lambda s: s.lower())
+
+    company, groups = _numpy_totals(occurrences, ne_users, label_by_user, labels, start_date, end_date)
+
+    total_absence = company.absence
+    return {
+        "company": {
+            "scheduled_hours": round(company.scheduled, 2),
+            "absence_hours": round(total_absence, 2),
+            "absence_rate_pct": _absence_rate_pct(total_absence, company.scheduled),
+            "tardy_hours": round(company.tardy, 2),
+            "early_departure_hours": round(company.early, 2),
+            "other_absence_hours": round(max(0.0, total_absence - company.tardy - company.early), 2),
+            "planned_hours": round(company.planned, 2),
+            "unplanned_hours": round(company.unplanned, 2),
+            "planned_pct": round(100.0 * company.planned / total_absence, 1) if total_absence > 0 else 0.0,
+            "unplanned_pct": round(100.0 * company.unplanned / total_absence, 1) if total_absence > 0 else 0.0,
+            "full_time_count": company.full_time,
+            "part_time_count": company.part_time,
+            "between_count": company.between,
+            "non_exempt_count": len(ne_users),
+            "predicted_unplanned_pct": company.predicted_unplanned_pct,
+        },
+        "by_group": [
             {
                 "group_label": label,
-                "scheduled_hours": round(g_sched, 2),
-                "absence_hours": round(g_absence, 2),
-                "absence_rate_pct": _absence_rate_pct(g_absence, g_sched),
-                "tardy_hours": round(g_tardy, 2),
-                "early_departure_hours": round(g_early, 2),
-                "other_absence_hours": round(max(0.0, g_absence - g_tardy - g_early), 2),
-                "planned_hours": round(g_planned, 2),
-                "unplanned_hours": round(g_unplanned, 2),
-                "full_time_count": g_ft,
-                "part_time_count": g_pt,
-                "predicted_unplanned_pct": _extrapolate_next(
-                    _weekly_unplanned_rates(schedule, occs_by_user, uids)
-                ),
+                "scheduled_hours": round(g.scheduled, 2),
+                "absence_hours": round(g.absence, 2),
+                "absence_rate_pct": _absence_rate_pct(g.absence, g.scheduled),
+                "tardy_hours": round(g.tardy, 2),
+                "early_departure_hours": round(g.early, 2),
+                "other_absence_hours": round(max(0.0, g.absence - g.tardy - g.early), 2),
+                "planned_hours": round(g.planned, 2),
+                "unplanned_hours": round(g.unplanned, 2),
+                "full_time_count": g.full_time,
+                "part_time_count": g.part_time,
+                "predicted_unplanned_pct": g.predicted_unplanned_pct,
             }
-        )
-
-    return {"company": company, "by_group": by_group}
+            for label, g in groups.items()
+        ],
+    }
@@ -2,11 +2,32 @@
 PNG charts for group absence reports (dashboard preview + PDF).
 
 xhtml2pdf does not reliably render CSS bars or SVG; embedded PNG data URIs print in PDFs.
+
+Charts are content-addressed: the public chart functions hash (chart kind, arguments) and keep
+the result in a bounded per-process LRU, backed by PNG files in CHART_CACHE_DIR shared between
+processes (at most CHART_CACHE_MAX_FILES; the least recently used go first). Unchanged analytics are served without drawing; ``manage.py benchmark_charts``
+compares cold and warm builds.
 """
 from __future__ import annotations
 
 import base64
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
 from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Part of every cache key: bump when drawing code changes so older cached PNGs are not served.
+CHART_RENDER_VERSION = 1
 
 # Navy, gray, red, black palette (RGB)
 _NAVY = (28, 45, 92)
@@ -58,28 +79,189 @@ _PROFILES = {
 }
 
 
-def _load_chart_font(size: int):
+_FONT_CANDIDATES = (
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/System/Library/Fonts/Supplemental/Helvetica.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "C:/Windows/Fonts/arial.ttf",
+)
+# Logical font sizes the charts draw with (scaled by _SUPERSAMPLE).
+_FONT_SIZES = (11, 12, 13)
+
+
+@functools.lru_cache(maxsize=None)
+def _chart_font_path() -> str | None:
     from PIL import ImageFont
 
-    candidates = (
-        "/System/Library/Fonts/Supplemental/Arial.ttf",
-        "/System/Library/Fonts/Supplemental/Helvetica.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
-        "C:/Windows/Fonts/arial.ttf",
-    )
-    for path in candidates:
+    for path in _FONT_CANDIDATES:
         try:
-            return ImageFont.truetype(path, size)
+            ImageFont.truetype(path, 12)
         except OSError:
             continue
-    return ImageFont.load_default()
+        return path
+    return None
 
 
-def _png_data_uri(img) -> str:
+@functools.lru_cache(maxsize=16)
+def _load_chart_font(size: int):
+    """Font for ``size`` (device pixels), probed and loaded once per process."""
+    from PIL import ImageFont
+
+    path = _chart_font_path()
+    if path is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(path, size)
+
+
+def preload_chart_fonts() -> None:
+    """Load every chart font now (e.g. at worker start) instead of on the first chart."""
+    for size in _FONT_SIZES:
+        _load_chart_font(size * _SUPERSAMPLE)
+
+
+def _png_bytes(img) -> bytes:
     buf = BytesIO()
     img.save(buf, format="PNG", optimize=True)
-    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+    return buf.getvalue()
+
+
+def _png_data_uri(png: bytes) -> str:
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+_memory_cache: OrderedDict[str, str | None] = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+
+def chart_cache_dir() -> Path | None:
+    """On-disk PNG cache directory; CHART_CACHE_DIR = "" disables it (default: MEDIA_ROOT/chart_cache)."""
+    configured = getattr(settings, "CHART_CACHE_DIR", None)
+    if configured == "":
+        return None
+    return Path(configured) if configured else Path(settings.MEDIA_ROOT) / "chart_cache"
+
+
+def chart_cache_key(kind: str, args: tuple, kwargs: dict) -> str:
+    payload = json.dumps(
+        [CHART_RENDER_VERSION, kind, args, kwargs], sort_keys=True, default=str, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _disk_path(key: str) -> Path | None:
+    root = chart_cache_dir()
+    return root / key[:2] / f"{key}.png" if root else None
+
+
+def _read_disk(key: str) -> bytes | None:
+    path = _disk_path(key)
+    if path is None:
+        return None
+    try:
+        png = path.read_bytes()
+        # mtime is the last use: pruning and the file limit drop unused charts first.
+        os.utime(path)
+    except OSError:
+        return None
+    return png
+
+
+def _write_disk(key: str, png: bytes) -> None:
+    path = _disk_path(key)
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(png)
+        os.replace(tmp, path)
+    except OSError:
+        logger.warning("Could not write chart cache file %s", path, exc_info=True)
+        return
+    _trim_disk_cache(path.parent.parent)
+
+
+def _trim_disk_cache(root: Path) -> None:
+    """Keep at most CHART_CACHE_MAX_FILES PNGs under ``root``, deleting the least recently used."""
+    limit = getattr(settings, "CHART_CACHE_MAX_FILES", 2000)
+    files = []
+    for path in root.glob("*/*.png"):
+        try:
+            files.append((path.stat().st_mtime_ns, path))
+        except OSError:
+            continue
+    if len(files) <= limit:
+        return
+    files.sort()
+    for _, path in files[: len(files) - limit]:
+        path.unlink(missing_ok=True)
+
+
+def _remember(key: str, uri: str | None) -> None:
+    limit = getattr(settings, "CHART_CACHE_MAX_ENTRIES", 256)
+    with _memory_cache_lock:
+        _memory_cache[key] = uri
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > limit:
+            _memory_cache.popitem(last=False)
+
+
+def _cached_chart(kind: str):
+    """
+    Serve a chart function (returning PNG bytes or None) as a data URI, from the per-process
+    LRU, then the disk cache, and only then by drawing it. The drawing function stays
+    reachable as ``.render``.
+    """
+
+    def decorator(render):
+        @functools.wraps(render)
+        def wrapper(*args, **kwargs):
+            key = chart_cache_key(kind, args, kwargs)
+            with _memory_cache_lock:
+                if key in _memory_cache:
+                    _memory_cache.move_to_end(key)
+                    return _memory_cache[key]
+            png = _read_disk(key)
+            if png is None:
+                png = render(*args, **kwargs)
+                if png is not None:
+                    _write_disk(key, png)
+            uri = _png_data_uri(png) if png is not None else None
+            _remember(key, uri)
+            return uri
+
+        wrapper.render = render
+        return wrapper
+
+    return decorator
+
+
+def clear_chart_cache(*, disk: bool = False) -> None:
+    """Empty this process's chart LRU, and with ``disk`` the shared PNG files too."""
+    with _memory_cache_lock:
+        _memory_cache.clear()
+    root = chart_cache_dir()
+    if disk and root and root.exists():
+        for path in root.glob("*/*.png"):
+            path.unlink(missing_ok=True)
+
+
+def prune_chart_disk_cache(max_age_seconds: float) -> int:
+    """Delete cached chart PNGs last used more than ``max_age_seconds`` ago; returns files removed."""
+    root = chart_cache_dir()
+    if not root or not root.exists():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for path in root.glob("*/*.png"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
 
 
 def _downscale(img, logical_w: int, logical_h: int, scale: int):
@@ -90,6 +272,7 @@ def _downscale(img, logical_w: int, logical_h: int, scale: int):
     return img
 
 
+@_cached_chart("group_pie")
 def group_pie_png_data_uri(
     segments: list[tuple[str, float]],
     *,
@@ -194,9 +377,10 @@ def group_pie_png_data_uri(
             font=font,
         )
 
-    return _png_data_uri(_downscale(img, logical_w, logical_h, scale))
+    return _png_bytes(_downscale(img, logical_w, logical_h, scale))
 
 
+@_cached_chart("donut")
 def donut_png_data_uri(
     segments: list[tuple[str, float]],
     *,
@@ -258,9 +442,10 @@ def donut_png_data_uri(
         )
         y += 22 * scale
 
-    return _png_data_uri(_downscale(img, logical_w, logical_h, scale))
+    return _png_bytes(_downscale(img, logical_w, logical_h, scale))
 
 
+@_cached_chart("horizontal_bar")
 def horizontal_bar_chart_png_data_uri(
     rows: list[tuple[str, float]],
     *,
@@ -304,9 +489,10 @@ def horizontal_bar_chart_png_data_uri(
         draw.text((bx + bw + 6 * scale, y + 4 * scale), val_txt, fill=_LEGEND_TEXT, font=font)
         y += row_h * scale
 
-    return _png_data_uri(_downscale(img, logical_w, logical_h, scale))
+    return _png_bytes(_downscale(img, logical_w, logical_h, scale))
 
 
+@_cached_chart("stacked_horizontal_bar")
 def stacked_horizontal_bar_png_data_uri(
     groups: list[str],
     series: list[tuple[str, list[float]]],
@@ -362,7 +548,7 @@ def stacked_horizontal_bar_png_data_uri(
         draw.text((lx + 14 * scale, ly - scale), key.replace("_", " ").title(), fill=_LEGEND_TEXT, font=font)
         lx += 100 * scale
 
-    return _png_data_uri(_downscale(img, logical_w, logical_h, scale))
+    return _png_bytes(_downscale(img, logical_w, logical_h, scale))
 
 
 def group_report_pie_pair_uris(
@@ -0,0 +1,41 @@
+"""
+Apply PTO / personal time for occurrences whose date has arrived (approved future time off,
+tardies) in one batched pass per chunk of employees. Dashboards and reports only read balances,
+so run this shortly after midnight.
+
+Usage:
+    python manage.py apply_due_pto
+    python manage.py apply_due_pto --user 42 --user 43
+Cron, e.g.:
+    5 0 * * * cd /path/to/project && python manage.py apply_due_pto
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.services.balance_service import apply_due_occurrence_pto
+
+
+class Command(BaseCommand):
+    help = "Apply PTO/personal balances for every due, not yet applied occurrence."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            help="Limit to this user id (repeatable). Default: every user.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=200, help="Users locked and written per transaction.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        started = time.perf_counter()
+        applied = apply_due_occurrence_pto(user_ids=options["user"], chunk_size=options["chunk_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Applied {applied} due occurrence{'' if applied == 1 else 's'} in {elapsed:.2f}s.")
+        )
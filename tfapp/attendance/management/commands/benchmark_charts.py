@@ -0,0 +1,102 @@
+"""
+Micro-benchmark for the group report chart cache (attendance.group_report_charts).
+
+Builds the dashboard analytics charts and the PDF pie pair from synthetic groups, for the
+``dashboard`` and ``pdf`` profiles. Each profile is timed three ways:
+
+    cold  - empty LRU and empty disk cache (every chart is drawn)
+    disk  - empty LRU, PNGs on disk (another process drew them)
+    warm  - charts in this process's LRU
+
+Uses a temporary CHART_CACHE_DIR; the configured cache is left alone.
+
+Usage:
+    python manage.py benchmark_charts
+    python manage.py benchmark_charts --groups 25 --repeat 10
+"""
+from __future__ import annotations
+
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from attendance.group_report_charts import (
+    build_group_analytics_chart_uris,
+    clear_chart_cache,
+    group_report_pie_pair_uris,
+    preload_chart_fonts,
+)
+
+
+def _synthetic_analytics(groups: int) -> tuple[dict, list]:
+    by_group = []
+    group_rows = []
+    for i in range(groups):
+        label = f"Department {i + 1:02d}"
+        hours = 12.0 + 7.5 * i
+        by_group.append(
+            {
+                "group_label": label,
+                "absence_rate_pct": 1.5 + (i % 7) * 0.8,
+                "predicted_unplanned_pct": 0.9 + (i % 5) * 0.6,
+                "absence_hours": hours,
+                "tardy_hours": hours * 0.2,
+                "early_departure_hours": hours * 0.1,
+                "other_absence_hours": hours * 0.7,
+            }
+        )
+        group_rows.append({"group_label": label, "total_hours": hours, "occurrence_count": 3 + i})
+    company = {
+        "absence_rate_pct": 3.2,
+        "predicted_unplanned_pct": 2.1,
+        "planned_hours": 410.0,
+        "unplanned_hours": 265.5,
+        "full_time_count": 6 * groups,
+        "part_time_count": groups,
+    }
+    return {"company": company, "by_group": by_group}, group_rows
+
+
+class Command(BaseCommand):
+    help = "Time cold vs warm group chart builds for the dashboard and pdf profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--groups", type=int, default=12, help="Synthetic groups per chart.")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (median is reported).")
+
+    def handle(self, *args, **options):
+        if options["groups"] < 1 or options["repeat"] < 1:
+            raise CommandError("--groups and --repeat must be at least 1.")
+        analytics, group_rows = _synthetic_analytics(options["groups"])
+        preload_chart_fonts()
+
+        def build(profile):
+            build_group_analytics_chart_uris(analytics, profile=profile)
+            group_report_pie_pair_uris(group_rows, profile=profile)
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(CHART_CACHE_DIR=cache_dir):
+            for profile in ("dashboard", "pdf"):
+                timings = {"cold": [], "disk": [], "warm": []}
+                for _ in range(options["repeat"]):
+                    clear_chart_cache(disk=True)
+                    timings["cold"].append(self._time(build, profile))
+                    clear_chart_cache()
+                    timings["disk"].append(self._time(build, profile))
+                    timings["warm"].append(self._time(build, profile))
+                cold = statistics.median(timings["cold"])
+                disk = statistics.median(timings["disk"])
+                warm = statistics.median(timings["warm"])
+                self.stdout.write(
+                    f"{profile:<9} cold={cold:8.2f}ms  disk={disk:7.2f}ms  warm={warm:6.3f}ms  "
+                    f"speedup={cold / warm if warm else float('inf'):,.0f}x"
+                )
+            clear_chart_cache(disk=True)
+
+    @staticmethod
+    def _time(fn, *args) -> float:
+        start = time.perf_counter()
+        fn(*args)
+        return (time.perf_counter() - start) * 1000
@@ -0,0 +1,52 @@
+"""
+Recompute the DailyAttendanceSummary fact rows for every day in a date range.
+
+Rows are normally built on read and marked stale on write; use this to warm a range before
+heavy reporting, or after bulk data fixes, restores, or policy changes. Finalized rows keep
+their status, payroll period and payroll columns.
+
+Usage:
+    python manage.py rebuild_daily_summaries --start 2026-01-01 --end 2026-06-30
+    python manage.py rebuild_daily_summaries --start 2026-06-01 --end 2026-06-30 --user 42
+"""
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from attendance.models import CustomUser
+from attendance.services.daily_summaries import rebuild_daily_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily attendance fact rows for a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="First date (YYYY-MM-DD).")
+        parser.add_argument("--end", required=True, help="Last date (YYYY-MM-DD).")
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Limit to this user id (repeatable). Default: all non-exempt users.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"])
+            end = date.fromisoformat(options["end"])
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}")
+        if start > end:
+            raise CommandError("--start must be on or before --end.")
+
+        users = None
+        if options["user_ids"]:
+            users = CustomUser.objects.filter(pk__in=options["user_ids"])
+
+        with transaction.atomic():
+            written = rebuild_daily_summaries(start, end, users=users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily summary row(s)."))
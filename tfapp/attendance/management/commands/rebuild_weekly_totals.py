@@ -0,0 +1,51 @@
+"""
+Recompute the WeeklyUserTotals rollup for every payroll week in a date range.
+
+Rows are normally maintained on write; use this after bulk data fixes, restores, or
+policy changes that alter how hours are credited.
+
+Usage:
+    python manage.py rebuild_weekly_totals --start 2026-01-01 --end 2026-06-30
+    python manage.py rebuild_weekly_totals --start 2026-06-01 --end 2026-06-30 --user 42
+"""
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from attendance.models import CustomUser
+from attendance.services.weekly_totals import rebuild_weekly_user_totals
+
+
+class Command(BaseCommand):
+    help = "Rebuild persisted weekly user totals for payroll weeks overlapping a date range."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", required=True, help="First date (YYYY-MM-DD).")
+        parser.add_argument("--end", required=True, help="Last date (YYYY-MM-DD).")
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Limit to this user id (repeatable). Default: all non-exempt users.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"])
+            end = date.fromisoformat(options["end"])
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}")
+        if start > end:
+            raise CommandError("--start must be on or before --end.")
+
+        users = None
+        if options["user_ids"]:
+            users = CustomUser.objects.filter(pk__in=options["user_ids"])
+
+        with transaction.atomic():
+            written = rebuild_weekly_user_totals(start, end, users=users)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} weekly total row(s)."))
@@ -0,0 +1,70 @@
+"""
+Replay the PTO ledger (PTOBalanceHistory) and report where it drifts from the stored balances.
+
+By default each employee is replayed from their latest checkpoint; --full replays the whole
+history and also checks every row and checkpoint against the rows before it. --fix books a
+"Reconciliation adjustment" row for each drift, and --checkpoint then restates the balances of
+every employee that reconciles, so the next run starts there.
+
+Usage:
+    python manage.py reconcile_pto_ledger
+    python manage.py reconcile_pto_ledger --full --user 42
+    python manage.py reconcile_pto_ledger --fix --checkpoint
+Cron (monthly checkpoint), e.g.:
+    30 1 1 * * cd /path/to/project && python manage.py reconcile_pto_ledger --checkpoint
+"""
+from __future__ import annotations
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance.models import CustomUser
+from attendance.services.pto_ledger import book_corrections, reconcile_ledger, write_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Replay the PTO ledger, report drift from stored balances, optionally correct and checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            help="Limit to this user id (repeatable). Default: every user.",
+        )
+        parser.add_argument("--full", action="store_true", help="Replay from the first row, not the last checkpoint.")
+        parser.add_argument("--fix", action="store_true", help="Book an adjustment row for each drift.")
+        parser.add_argument(
+            "--checkpoint",
+            action="store_true",
+            help="Write checkpoint rows for every employee whose ledger reconciles.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        user_ids = options["user"]
+        if options["fix"]:
+            drifts = book_corrections(user_ids, full=options["full"])
+        else:
+            drifts = reconcile_ledger(user_ids, full=options["full"])
+
+        usernames = CustomUser.objects.in_bulk({d.user_id for d in drifts})
+        for d in drifts:
+            line = (
+                f"{usernames[d.user_id].username} {d.balance_type}: ledger {d.ledger_balance}, "
+                f"stored {d.stored_balance} ({d.difference:+})"
+            )
+            if d.breaks:
+                line += f"; {len(d.breaks)} row(s) out of sequence, first #{d.breaks[0][0]}"
+            if options["fix"] and d.difference:
+                line += " - adjusted"
+            self.stdout.write(self.style.WARNING(line))
+
+        if options["checkpoint"]:
+            written = write_checkpoints(user_ids)
+            self.stdout.write(f"Wrote {written} checkpoint row{'' if written == 1 else 's'}.")
+
+        elapsed = time.perf_counter() - started
+        summary = f"{len(drifts)} drift{'' if len(drifts) == 1 else 's'} found in {elapsed:.2f}s."
+        self.stdout.write(self.style.SUCCESS(summary) if not drifts else self.style.WARNING(summary))
@@ -0,0 +1,80 @@
+"""
+Render queued PDF reports (attendance.services.report_jobs).
+
+Runs until stopped (SIGINT / SIGTERM finish the current report first), polling when the queue
+is empty. Several workers can run at once: each claims its next job with SKIP LOCKED.
+
+Usage:
+    python manage.py report_worker
+    python manage.py report_worker --once          # render what is queued, then exit
+    python manage.py report_worker --stats         # print queue depth and lag, then exit
+    python manage.py report_worker --purge         # delete jobs, PDFs and cached charts past REPORT_JOB_RETENTION_DAYS, then exit
+"""
+from __future__ import annotations
+
+import signal
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from attendance.group_report_charts import preload_chart_fonts, prune_chart_disk_cache
+from attendance.report_assets import preload_report_assets
+from attendance.services.report_jobs import process_report_jobs, purge_report_jobs, report_queue_stats
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF reports (ReportJob rows)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to sleep when nothing is queued.")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty.")
+        parser.add_argument("--stats", action="store_true", help="Print queue depth and lag, then exit.")
+        parser.add_argument(
+            "--purge", action="store_true", help="Delete old finished jobs, their PDFs and cached charts, then exit."
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            stats = report_queue_stats()
+            self.stdout.write(
+                f"pending={stats['pending']} running={stats['running']} failed={stats['failed']} "
+                f"lag={stats['lag_seconds']:.0f}s"
+            )
+            return
+        if options["purge"]:
+            days = getattr(settings, "REPORT_JOB_RETENTION_DAYS", 7)
+            jobs, files = purge_report_jobs(timedelta(days=days))
+            charts = prune_chart_disk_cache(timedelta(days=days).total_seconds())
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Purged {jobs} job(s), {files} PDF(s) and {charts} cached chart(s) older than {days} day(s)."
+                )
+            )
+            return
+
+        preload_chart_fonts()
+        preload_report_assets()
+        self._stopping = False
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        total_done = total_failed = 0
+        while not self._stopping:
+            close_old_connections()
+            done, failed = process_report_jobs()
+            total_done += done
+            total_failed += failed
+            if failed:
+                self.stdout.write(f"Report job failed ({total_failed} so far).")
+            if not (done or failed):
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_done} rendered, {total_failed} failed."))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
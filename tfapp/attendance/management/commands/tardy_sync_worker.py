@@ -0,0 +1,63 @@
+"""
+Drain the tardy re-sync queue (attendance.services.tardy_sync_queue).
+
+Runs until stopped (SIGINT / SIGTERM finish the current batch first), polling when the queue
+is empty. Several workers can run at once: each claims its batch with SKIP LOCKED.
+
+Usage:
+    python manage.py tardy_sync_worker
+    python manage.py tardy_sync_worker --once          # drain what is due, then exit
+    python manage.py tardy_sync_worker --stats         # print queue depth and lag, then exit
+"""
+from __future__ import annotations
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from attendance.services.tardy_sync_queue import process_tardy_sync_jobs, tardy_sync_queue_stats
+
+
+class Command(BaseCommand):
+    help = "Process queued tardy re-syncs (TardySyncJob rows)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200, help="Jobs claimed per transaction.")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due.")
+        parser.add_argument("--stats", action="store_true", help="Print queue depth and lag, then exit.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options["stats"]:
+            stats = tardy_sync_queue_stats()
+            self.stdout.write(
+                f"depth={stats['depth']} due={stats['due']} failing={stats['failing']} "
+                f"lag={stats['lag_seconds']:.0f}s"
+            )
+            return
+
+        self._stopping = False
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        total_synced = total_failed = 0
+        while not self._stopping:
+            close_old_connections()
+            synced, failed = process_tardy_sync_jobs(batch_size=options["batch_size"])
+            total_synced += synced
+            total_failed += failed
+            if synced or failed:
+                self.stdout.write(f"Synced {synced} tardy job(s), {failed} failed.")
+            if synced + failed < options["batch_size"]:
+                if options["once"]:
+                    break
+                time.sleep(options["poll"])
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_synced} synced, {total_failed} failed."))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0019_holiday_week_plan'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='holidayweekplanday',
+            name='holiday_pay_hours',
+            field=models.DecimalField(decimal_places=2, help_text="Mark a paid holiday when > 0; actual pay hours come from each employee's schedule.", max_digits=6),
+        ),
+        migrations.CreateModel(
+            name='WeeklyUserTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_ending', models.DateField()),
+                ('actual_hours', models.FloatField(default=0.0)),
+                ('reported_hours', models.FloatField(default=0.0)),
+                ('scheduled_hours', models.FloatField(default=0.0)),
+                ('pto_hours', models.FloatField(default=0.0)),
+                ('personal_hours', models.FloatField(default=0.0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='weekly_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['week_ending', 'user_id'],
+                'constraints': [models.UniqueConstraint(fields=('week_ending', 'user'), name='unique_weekly_user_totals_week_user')],
+            },
+        ),
+    ]
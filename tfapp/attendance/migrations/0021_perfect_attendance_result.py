@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0020_weekly_user_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerfectAttendanceResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('period_end', models.DateField(help_text='Last day covered (month to date while the month is open).')),
+                ('qualifies', models.BooleanField(default=False)),
+                ('total_hours', models.FloatField(default=0.0)),
+                ('is_finalized', models.BooleanField(default=False)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='perfect_attendance_results', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['month', 'user_id'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'user'), name='unique_perfect_attendance_month_user')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0021_perfect_attendance_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TardySyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('requested_at', models.DateTimeField(help_text='Latest request; the first is kept in first_requested_at.')),
+                ('first_requested_at', models.DateTimeField()),
+                ('available_at', models.DateTimeField(help_text='Not claimed before this time (retry backoff).')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['available_at'], name='attendance__availab_7d5a14_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_tardy_sync_job_user_date')],
+            },
+        ),
+    ]
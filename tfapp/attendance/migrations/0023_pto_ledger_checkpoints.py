@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:17
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def forwards_opening_checkpoints(apps, schema_editor):
+    # Balances before this migration were not fully ledgered; start every ledger from what is stored.
+    CustomUser = apps.get_model("attendance", "CustomUser")
+    PTOBalanceHistory = apps.get_model("attendance", "PTOBalanceHistory")
+    rows = []
+    for pk, pto, personal in CustomUser.objects.values_list("pk", "pto_balance", "personal_time_balance"):
+        for balance_type, value in (("pto", pto), ("personal", personal)):
+            rows.append(
+                PTOBalanceHistory(
+                    user_id=pk,
+                    change=Decimal("0.00"),
+                    reason="Opening balance (ledger start)",
+                    balance_after=Decimal(str(value or 0)).quantize(Decimal("0.01")),
+                    balance_type=balance_type,
+                    is_checkpoint=True,
+                )
+            )
+    PTOBalanceHistory.objects.bulk_create(rows, batch_size=500)
+
+
+def backwards_noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0022_tardy_sync_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ptobalancehistory',
+            name='is_checkpoint',
+            field=models.BooleanField(default=False, help_text='Verified balance restated by reconciliation (change is 0).'),
+        ),
+        migrations.AddIndex(
+            model_name='ptobalancehistory',
+            index=models.Index(fields=['user', 'balance_type', 'timestamp'], name='attendance__user_id_fa59ce_idx'),
+        ),
+        migrations.RunPython(forwards_opening_checkpoints, backwards_noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-18 16:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0023_pto_ledger_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(editable=False, max_length=48, unique=True)),
+                ('kind', models.CharField(choices=[('absence', 'Absence report'), ('group_absence', 'Group absence report'), ('perfect_attendance', 'Perfect Attendance')], max_length=32)),
+                ('params', models.JSONField(help_text='Report inputs, fixed at request time (ids and ISO dates).')),
+                ('params_hash', models.CharField(help_text='Keyed hash of kind and params.', max_length=64)),
+                ('data_version', models.CharField(blank=True, help_text='Fingerprint of the data rendered.', max_length=32)),
+                ('status', models.CharField(choices=[('pending', 'Queued'), ('running', 'Rendering'), ('done', 'Ready'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('pdf', models.FileField(blank=True, max_length=255, upload_to='reports/')),
+                ('filename', models.CharField(blank=True, help_text='Download name.', max_length=255)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-requested_at'],
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='attendance__status_9e8a10_idx'), models.Index(fields=['params_hash', 'data_version'], name='attendance__params__3a874b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def forwards_mark_existing_stale(apps, schema_editor):
+    # Finalize-only rows predate the fact columns; rebuild them on first read.
+    DailyAttendanceSummary = apps.get_model("attendance", "DailyAttendanceSummary")
+    DailyAttendanceSummary.objects.update(is_stale=True)
+
+
+def backwards_noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0024_report_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='dailyattendancesummary',
+            name='attendance__user_id_8530a8_idx',
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='absence_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='actual_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='base_scheduled_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='computed_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='department',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='early_out_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='group_lead',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='is_stale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='planned_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='supervisor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='tardy_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='dailyattendancesummary',
+            name='unplanned_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='dailyattendancesummary',
+            index=models.Index(fields=['work_date', 'user'], name='attendance__work_da_860900_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyattendancesummary',
+            index=models.Index(fields=['department', 'work_date'], name='attendance__departm_6d3033_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyattendancesummary',
+            index=models.Index(fields=['supervisor', 'work_date'], name='attendance__supervi_08580a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyattendancesummary',
+            index=models.Index(fields=['group_lead', 'work_date'], name='attendance__group_l_a41eda_idx'),
+        ),
+        migrations.RunPython(forwards_mark_existing_stale, backwards_noop),
+    ]
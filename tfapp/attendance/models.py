@@ -7,7 +7,7 @@ from django.contrib.auth.models import AbstractUser
 from datetime import date, timedelta, datetime
 
 from .slug_utils import ensure_unique_slug
-from .services.balance_service import floor_hours_to_quarter_increment
+from .services.balance_service import adjust_balances, floor_hours_to_quarter_increment
 
 DAYS_OF_WEEK = [
     (0, "Monday"), (1, "Tuesday"), (2, "Wednesday"), (3, "Thursday"),
@@ -40,6 +40,20 @@ class WorkSchedule(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {DAYS_OF_WEEK[self.day][1]}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._invalidate_compiled_schedules()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self._invalidate_compiled_schedules()
+        return result
+
+    def _invalidate_compiled_schedules(self):
+        from attendance.services.time_processing import invalidate_compiled_schedules
+
+        invalidate_compiled_schedules(self._state.fields_cache.get("user"))
     
 class RoleChoices(models.TextChoices):
     EXECUTIVE = "executive", "Executive"
@@ -50,6 +64,16 @@ class RoleChoices(models.TextChoices):
     USER = "user", "User"
 
 
+# Balances kept in the PTO ledger (PTOBalanceHistory.balance_type -> CustomUser field).
+# final_pto_balance is a reporting mirror of pto_balance and is not ledgered.
+PTO_LEDGER_FIELDS = {"pto": "pto_balance", "personal": "personal_time_balance"}
+
+
+def ledger_amount(value) -> Decimal:
+    """Balance or change as stored in the ledger (Decimal, hundredths)."""
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
 class CustomUser(AbstractUser):
     role = models.CharField(max_length=20, choices=RoleChoices.choices, default=RoleChoices.USER)
     department = models.CharField(max_length=100, blank=True, null=True)
@@ -78,10 +102,66 @@ class CustomUser(AbstractUser):
     )
     public_slug = models.SlugField(max_length=48, unique=True, editable=False, db_index=True)
 
+    # Reason for the ledger row save() writes when a balance changed without an explicit
+    # PTOBalanceHistory row (accruals, resets, refunds, caps). Cleared after each save.
+    ledger_reason = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._reset_ledger_baseline()
+        return user
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._reset_ledger_baseline()
+
+    def _reset_ledger_baseline(self):
+        """Remember the balances as stored, so save() can ledger whatever changed since."""
+        self._ledger_balances = {
+            balance_type: ledger_amount(self.__dict__[field])
+            for balance_type, field in PTO_LEDGER_FIELDS.items()
+            if field in self.__dict__
+        }
+
+    def record_balance_changes(self, reason=None, fields=None, adding=False):
+        """
+        Ledger each balance that differs from its last recorded value. save() calls this; call it
+        directly to ledger the steps of a multi-step change under their own reasons.
+        """
+        baseline = getattr(self, "_ledger_balances", None)
+        if baseline is None:
+            if not adding:
+                return
+            baseline = {balance_type: Decimal("0.00") for balance_type in PTO_LEDGER_FIELDS}
+        reason = reason or self.ledger_reason or ("Opening balance" if adding else "Balance adjustment")
+        rows = []
+        for balance_type, field in PTO_LEDGER_FIELDS.items():
+            if fields is not None and field not in fields:
+                continue
+            if balance_type not in baseline:
+                continue
+            current = ledger_amount(getattr(self, field))
+            if current != baseline[balance_type]:
+                rows.append(
+                    PTOBalanceHistory(
+                        user=self,
+                        change=current - baseline[balance_type],
+                        reason=reason[:255],
+                        balance_after=current,
+                        balance_type=balance_type,
+                    )
+                )
+        self._ledger_balances = baseline
+        self.ledger_reason = None
+        PTOBalanceHistory.append(rows)
+
     def accrue_pto(self, hours):
         """
         Accrue PTO for years 0-2 or part-time: 1 hour PTO per 30 hours worked (fractional).
         Accrual is rounded down to the hundredth so add/subtract on unfinalize cancels exactly.
+        The balance is updated in the database (adjust_balances; part-time capped at 72) and
+        this instance refreshed from the result.
         Returns the number of hours added to pto_balance for this call (rounded down to 2 decimals).
         """
         if not (self.is_part_time or self.years_of_service() <= 2):
@@ -91,11 +171,11 @@ class CustomUser(AbstractUser):
         # Round down to hundredth so unfinalize subtracts the exact same amount
         raw = hours / 30.0
         earned = math.floor(raw * 100) / 100
-        if self.is_part_time:
-            self.pto_balance = round(min(self.pto_balance + earned, 72.0), 2)
-        else:
-            self.pto_balance = round(self.pto_balance + earned, 2)
-        self.save()
+        self.pto_balance, self.personal_time_balance = adjust_balances(
+            self.pk, f"PTO accrual ({hours:.2f} hours worked)", pto=earned
+        )
+        self.final_pto_balance = self.pto_balance
+        self._reset_ledger_baseline()
         return earned
 
     def years_of_service(self):
@@ -181,6 +261,7 @@ class CustomUser(AbstractUser):
         self.final_pto_balance = self.pto_balance
         self.pto_balance = pto_alloc
         self.personal_time_balance = 0
+        self.ledger_reason = f"Service anniversary reset (service year {starting_service_year})"
         self.save()
 
     def set_pto_to_tenure_baseline(self, clear_personal=True):
@@ -200,6 +281,7 @@ class CustomUser(AbstractUser):
             self.final_pto_balance = 0.0
             if clear_personal:
                 self.personal_time_balance = 0.0
+            self.ledger_reason = "Set to tenure baseline (accrual years / part-time)"
             self.save()
             return
 
@@ -222,6 +304,7 @@ class CustomUser(AbstractUser):
         self.final_pto_balance = pto_alloc
         if clear_personal:
             self.personal_time_balance = 0
+        self.ledger_reason = f"Set to tenure baseline (service year {starting_service_year})"
         self.save()
 
     def recalculate_balances(self):
@@ -249,7 +332,9 @@ class CustomUser(AbstractUser):
         # Auto-adjust balances whenever a user is saved,
         # based on service date, tenure, and employment type.
         self.recalculate_balances()
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        self.record_balance_changes(fields=kwargs.get("update_fields"), adding=adding)
 
 
 class OccurrenceType(models.TextChoices):
@@ -363,7 +448,12 @@ def user_eligible_for_perfect_attendance_new_hire_month(anchor: date | None, per
 
 class PTOBalanceHistory(models.Model):
     """
-    Audit trail for PTO/personal balance changes. Use for reconciliation and debugging.
+    Append-only ledger of PTO/personal balance changes: each row is a signed change and the
+    balance after it, so the latest row at or before a moment is the balance then
+    (services.pto_ledger.balance_as_of). Code that changes a balance either records its own row
+    (record / append) or lets CustomUser.save() ledger the difference it finds. Checkpoint rows
+    (change 0) restate a verified balance so reconciliation only replays what came after.
+    Rows are never edited or deleted; corrections are new rows.
     """
     BALANCE_TYPE_PTO = "pto"
     BALANCE_TYPE_PERSONAL = "personal"
@@ -377,24 +467,58 @@ class PTOBalanceHistory(models.Model):
         max_length=20, choices=BALANCE_TYPE_CHOICES, default=BALANCE_TYPE_PTO
     )
     timestamp = models.DateTimeField(auto_now_add=True)
+    is_checkpoint = models.BooleanField(
+        default=False, help_text="Verified balance restated by reconciliation (change is 0)."
+    )
 
     class Meta:
         ordering = ["-timestamp"]
-        indexes = [models.Index(fields=["user", "timestamp"])]
+        indexes = [
+            models.Index(fields=["user", "timestamp"]),
+            models.Index(fields=["user", "balance_type", "timestamp"]),
+        ]
 
     def __str__(self):
         return f"{self.user.username} {self.balance_type} {self.change} @ {self.timestamp}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("PTO ledger rows are append-only; record a correcting row instead.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("PTO ledger rows are append-only; record a correcting row instead.")
+
     @classmethod
     def record(cls, user, change, reason, balance_after, balance_type=BALANCE_TYPE_PTO):
-        cls.objects.create(
-            user=user,
-            change=change,
-            reason=reason,
-            balance_after=balance_after,
-            balance_type=balance_type,
+        cls.append(
+            [
+                cls(
+                    user=user,
+                    change=change,
+                    reason=reason,
+                    balance_after=balance_after,
+                    balance_type=balance_type,
+                )
+            ]
         )
 
+    @classmethod
+    def append(cls, rows):
+        """
+        Write ledger rows and mark them as recorded on their (in-memory) users, so the users'
+        next save() does not ledger the same change again.
+        """
+        if not rows:
+            return
+        cls.objects.bulk_create(rows)
+        for row in rows:
+            if not cls.user.is_cached(row):
+                continue
+            baseline = getattr(row.user, "_ledger_balances", None)
+            if baseline is not None:
+                baseline[row.balance_type] = ledger_amount(row.balance_after)
+
 
 class Occurrence(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
@@ -501,17 +625,6 @@ def revert_tardy_occurrences_for_adjust_punch(user, occ_date):
     return _revert_tardy(user, occ_date)
 
 
-def apply_past_due_occurrences(user):
-    """
-    Apply PTO/personal for any occurrences that are due (date <= today) but not yet applied.
-    Call from dashboard or when loading user balance so that when a future approved date passes,
-    the balance is updated on next view.
-    """
-    from attendance.services.attendance_engine import apply_past_due_occurrences as _apply_past_due
-
-    return _apply_past_due(user)
-
-
 class TimeOffRequestStatus(models.TextChoices):
     PENDING = "pending", "Pending"
     APPROVED = "approved", "Approved"
@@ -644,7 +757,8 @@ class TimeOffRequest(models.Model):
         """
         Cancel this request. When PENDING: just set status. When APPROVED: reverse
         PTO (credit user), delete linked occurrences, then set status to CANCELLED.
-        Runs in a transaction with row lock on user for safety.
+        The refund is one delta update of the user's balances (adjust_balances), in the same
+        transaction as the deletes.
         """
         from django.db import transaction
 
@@ -655,19 +769,18 @@ class TimeOffRequest(models.Model):
         if self.status != TimeOffRequestStatus.APPROVED:
             return
         with transaction.atomic():
-            u = CustomUser.objects.select_for_update().get(pk=self.user_id)
+            pto_refund = personal_refund = 0.0
             for occ in self.occurrences.all():
                 if occ.pto_applied:
-                    u.pto_balance += occ.pto_hours_applied
-                    u.personal_time_balance = max(0, u.personal_time_balance - occ.personal_hours_applied)
-                    PTOBalanceHistory.record(
-                        user=u,
-                        change=occ.pto_hours_applied,
-                        reason=f"Time off request cancelled (refund): {self.start_date}–{self.end_date}",
-                        balance_after=u.pto_balance,
-                    )
+                    pto_refund += occ.pto_hours_applied
+                    personal_refund += occ.personal_hours_applied
                 occ.delete()
-            u.save()
+            adjust_balances(
+                self.user_id,
+                f"Time off request cancelled (refund): {self.start_date}–{self.end_date}",
+                pto=pto_refund,
+                personal=-personal_refund,
+            )
         self.status = TimeOffRequestStatus.CANCELLED
         self.save()
 
@@ -928,8 +1041,14 @@ class HolidayWeekPlanDay(models.Model):
 
 class DailyAttendanceSummary(models.Model):
     """
-    Interpreted workday state (provisional or finalized). Populated at payroll finalize;
-    may be extended for live projection workflows.
+    Daily attendance fact row: one per user per calendar day, for open and finalized weeks.
+    Built on read for the requested range (attendance.services.daily_summaries) and marked
+    stale whenever its inputs change; payroll finalize also writes the payroll columns.
+
+    ``scheduled_hours`` is holiday-plan adjusted; ``base_scheduled_hours`` is the plain weekly
+    schedule (the basis of absence rates). ``worked_hours`` is credited time, ``actual_hours``
+    punched time. Occurrence hours are split the way group analytics reports them.
+    ``department`` / ``supervisor`` / ``group_lead`` copy the user's current values for roll-ups.
     """
 
     class Status(models.TextChoices):
@@ -945,7 +1064,9 @@ class DailyAttendanceSummary(models.Model):
     )
     work_date = models.DateField(db_index=True)
     scheduled_hours = models.FloatField(default=0.0)
+    base_scheduled_hours = models.FloatField(default=0.0)
     worked_hours = models.FloatField(default=0.0)
+    actual_hours = models.FloatField(default=0.0)
     rounded_hours = models.FloatField(default=0.0)
     lunch_deducted_hours = models.FloatField(default=0.0)
     tardy_minutes = models.IntegerField(default=0)
@@ -953,6 +1074,28 @@ class DailyAttendanceSummary(models.Model):
     regular_hours = models.FloatField(default=0.0)
     overtime_hours = models.FloatField(default=0.0)
     exchange_eligible = models.BooleanField(default=False)
+    absence_hours = models.FloatField(default=0.0)
+    planned_hours = models.FloatField(default=0.0)
+    unplanned_hours = models.FloatField(default=0.0)
+    tardy_hours = models.FloatField(default=0.0)
+    early_out_hours = models.FloatField(default=0.0)
+    department = models.CharField(max_length=100, blank=True, default="")
+    supervisor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    group_lead = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    is_stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(auto_now=True)
     status = models.CharField(
         max_length=20,
         choices=Status.choices,
@@ -974,7 +1117,10 @@ class DailyAttendanceSummary(models.Model):
             ),
         ]
         indexes = [
-            models.Index(fields=["user", "work_date"]),
+            models.Index(fields=["work_date", "user"]),
+            models.Index(fields=["department", "work_date"]),
+            models.Index(fields=["supervisor", "work_date"]),
+            models.Index(fields=["group_lead", "work_date"]),
         ]
         ordering = ["work_date", "user_id"]
 
@@ -982,6 +1128,39 @@ class DailyAttendanceSummary(models.Model):
         return f"{self.user_id} {self.work_date} ({self.status})"
 
 
+class WeeklyUserTotals(models.Model):
+    """
+    Per-user payroll week rollup shown on the dashboard and payroll tables.
+    A row is deleted when any of its inputs change and rebuilt on the next read
+    (see attendance.services.weekly_totals).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="weekly_totals",
+    )
+    week_ending = models.DateField()
+    actual_hours = models.FloatField(default=0.0)
+    reported_hours = models.FloatField(default=0.0)
+    scheduled_hours = models.FloatField(default=0.0)
+    pto_hours = models.FloatField(default=0.0)
+    personal_hours = models.FloatField(default=0.0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["week_ending", "user"],
+                name="unique_weekly_user_totals_week_user",
+            ),
+        ]
+        ordering = ["week_ending", "user_id"]
+
+    def __str__(self):
+        return f"{self.user_id} week ending {self.week_ending}"
+
+
 def observed_company_holiday_date(actual: date) -> date:
     """
     Payroll observed date for a calendar holiday.
@@ -1042,14 +1221,16 @@ def get_company_holidays(year: int) -> dict[date, str]:
     return get_company_holidays_in_range(date(year, 1, 1), date(year, 12, 31))
 
 
-def _scheduled_bookend_days_for_holiday(user: CustomUser, holiday_pay_date: date) -> tuple[date | None, date | None]:
+def _scheduled_bookend_days_for_holiday(
+    user: CustomUser, holiday_pay_date: date, *, calendar=None
+) -> tuple[date | None, date | None]:
     """Last effective workday before and next effective workday after the paid holiday date (7-day window)."""
     from .services.holiday_plan_service import effective_work_hours_for_day
 
     day = holiday_pay_date - timedelta(days=1)
     last_before = None
     while (holiday_pay_date - day).days <= 7 and day < holiday_pay_date:
-        if effective_work_hours_for_day(user, day) > 0:
+        if effective_work_hours_for_day(user, day, calendar=calendar) > 0:
             last_before = day
             break
         day -= timedelta(days=1)
@@ -1057,7 +1238,7 @@ def _scheduled_bookend_days_for_holiday(user: CustomUser, holiday_pay_date: date
     day = holiday_pay_date + timedelta(days=1)
     next_after = None
     while (day - holiday_pay_date).days <= 7 and day > holiday_pay_date:
-        if effective_work_hours_for_day(user, day) > 0:
+        if effective_work_hours_for_day(user, day, calendar=calendar) > 0:
             next_after = day
             break
         day += timedelta(days=1)
@@ -1065,7 +1246,7 @@ def _scheduled_bookend_days_for_holiday(user: CustomUser, holiday_pay_date: date
     return last_before, next_after
 
 
-def _bookend_day_attendance_status(user: CustomUser, the_date: date, *, as_of: date) -> str:
+def _bookend_day_attendance_status(user: CustomUser, the_date: date, *, as_of: date, calendar=None) -> str:
     """
     Attendance on a bookend day: ``eligible``, ``ineligible``, or ``pending``.
     Pending when the day has not occurred yet (as_of < the_date).
@@ -1076,7 +1257,7 @@ def _bookend_day_attendance_status(user: CustomUser, the_date: date, *, as_of: d
     from .services.holiday_plan_service import effective_work_hours_for_day
     from timeclock.models import TimeEntry
 
-    scheduled = effective_work_hours_for_day(user, the_date)
+    scheduled = effective_work_hours_for_day(user, the_date, calendar=calendar)
     if scheduled <= 0:
         return "eligible"
 
@@ -1114,7 +1295,9 @@ def _bookend_day_attendance_status(user: CustomUser, the_date: date, *, as_of: d
     return "eligible"
 
 
-def holiday_attendance_status(user: CustomUser, holiday_date: date, *, as_of: date | None = None) -> str:
+def holiday_attendance_status(
+    user: CustomUser, holiday_date: date, *, as_of: date | None = None, calendar=None
+) -> str:
     """
     Whether a full-time employee qualifies for holiday pay based on bookend shifts.
     Returns ``eligible``, ``ineligible``, or ``pending`` (trailing/leading day not yet passed).
@@ -1124,12 +1307,12 @@ def holiday_attendance_status(user: CustomUser, holiday_date: date, *, as_of: da
     as_of = as_of or date.today()
     if not user_eligible_for_holiday_pay(user, holiday_date):
         return "ineligible"
-    last_before, next_after = _scheduled_bookend_days_for_holiday(user, holiday_date)
+    last_before, next_after = _scheduled_bookend_days_for_holiday(user, holiday_date, calendar=calendar)
     if not last_before or not next_after:
         return "eligible"
 
-    before_status = _bookend_day_attendance_status(user, last_before, as_of=as_of)
-    after_status = _bookend_day_attendance_status(user, next_after, as_of=as_of)
+    before_status = _bookend_day_attendance_status(user, last_before, as_of=as_of, calendar=calendar)
+    after_status = _bookend_day_attendance_status(user, next_after, as_of=as_of, calendar=calendar)
     if before_status == "pending" or after_status == "pending":
         return "pending"
     if before_status == "ineligible" or after_status == "ineligible":
@@ -1148,100 +1331,132 @@ def ensure_holiday_occurrences_for_range(start_date: date, end_date: date, *, as
     occurrences from complete holiday week plans when bookend attendance is satisfied.
     Paid hours follow each employee's prevailing shift length, not the plan grid amount.
     No complete plan for a holiday week means no holiday pay for that week.
+    Returns a HolidayPayDiff of the rows created, updated and deleted.
     """
-    if start_date > end_date:
-        return
+    from .services.holiday_pay_service import apply_holiday_pay_for_range
 
-    as_of = as_of or date.today()
-    from .services.holiday_plan_service import (
-        get_complete_plans_overlapping_range,
-        holiday_pay_hours_for_user_on_date,
-        list_company_holidays_for_year,
-        user_eligible_for_holiday_pay,
+    return apply_holiday_pay_for_range(start_date, end_date, as_of=as_of or date.today())
+
+
+class PerfectAttendanceResult(models.Model):
+    """
+    One employee's Perfect Attendance outcome for a calendar month (``month`` is the 1st).
+    Open months are recomputed on read once older than PERFECT_ATTENDANCE_CACHE_SECONDS or when
+    the covered period moves; a month is finalized when the payroll week containing its last day
+    closes and is then read as stored (see attendance.services.perfect_attendance).
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="perfect_attendance_results",
     )
+    month = models.DateField()
+    period_end = models.DateField(help_text="Last day covered (month to date while the month is open).")
+    qualifies = models.BooleanField(default=False)
+    total_hours = models.FloatField(default=0.0)
+    is_finalized = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(auto_now=True)
 
-    Occurrence.objects.filter(
-        date__range=[start_date, end_date],
-        subtype=OccurrenceSubtype.HOLIDAY_PAID,
-    ).filter(
-        Q(user__is_part_time=True) | Q(user__is_exempt=True) | Q(user__is_active=False)
-    ).delete()
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["month", "user"],
+                name="unique_perfect_attendance_month_user",
+            ),
+        ]
+        ordering = ["month", "user_id"]
 
-    for occ in Occurrence.objects.filter(
-        date__range=[start_date, end_date],
-        subtype=OccurrenceSubtype.HOLIDAY_PAID,
-    ).select_related("user"):
-        if not user_eligible_for_holiday_pay(occ.user, occ.date):
-            occ.delete()
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} ({'qualifies' if self.qualifies else 'does not qualify'})"
 
-    users = list(CustomUser.objects.filter(is_active=True, is_exempt=False, is_part_time=False))
 
-    plans = get_complete_plans_overlapping_range(start_date, end_date)
-    plan_keys_with_complete = {(p.year, p.holiday_key) for p in plans}
+class TardySyncJob(models.Model):
+    """
+    Pending tardy re-sync for one employee-day (revert tardy occurrences, re-run check_tardy
+    from the saved punches). Repeated requests for the same day coalesce into this one row;
+    ``manage.py tardy_sync_worker`` claims rows with SKIP LOCKED and deletes them once synced
+    (see attendance.services.tardy_sync_queue).
+    """
 
-    for year in range(start_date.year - 1, end_date.year + 2):
-        for holiday in list_company_holidays_for_year(year):
-            week_start = holiday["week_start"]
-            week_ending = holiday["week_ending"]
-            if week_ending < start_date or week_start > end_date:
-                continue
-            if (holiday["year"], holiday["key"]) in plan_keys_with_complete:
-                continue
-            Occurrence.objects.filter(
-                date__range=[max(week_start, start_date), min(week_ending, end_date)],
-                subtype=OccurrenceSubtype.HOLIDAY_PAID,
-            ).delete()
-
-    for plan in plans:
-        plan_start = max(plan.week_start, start_date)
-        plan_end = min(plan.week_ending, end_date)
-        for user in users:
-            current = plan_start
-            while current <= plan_end:
-                if not user_eligible_for_holiday_pay(user, current):
-                    Occurrence.objects.filter(
-                        user=user,
-                        date=current,
-                        subtype=OccurrenceSubtype.HOLIDAY_PAID,
-                    ).delete()
-                    current += timedelta(days=1)
-                    continue
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    date = models.DateField()
+    requested_at = models.DateTimeField(help_text="Latest request; the first is kept in first_requested_at.")
+    first_requested_at = models.DateTimeField()
+    available_at = models.DateTimeField(help_text="Not claimed before this time (retry backoff).")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
 
-                pay_hours = holiday_pay_hours_for_user_on_date(user, current, plan=plan)
-                if pay_hours <= 0:
-                    Occurrence.objects.filter(
-                        user=user,
-                        date=current,
-                        subtype=OccurrenceSubtype.HOLIDAY_PAID,
-                    ).delete()
-                    current += timedelta(days=1)
-                    continue
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "date"], name="unique_tardy_sync_job_user_date"),
+        ]
+        indexes = [models.Index(fields=["available_at"])]
+        ordering = ["available_at"]
 
-                status = holiday_attendance_status(user, current, as_of=as_of)
-                if status == "pending":
-                    current += timedelta(days=1)
-                    continue
+    def __str__(self):
+        return f"Tardy sync {self.user_id} {self.date}"
 
-                if status == "ineligible":
-                    Occurrence.objects.filter(
-                        user=user,
-                        date=current,
-                        subtype=OccurrenceSubtype.HOLIDAY_PAID,
-                    ).delete()
-                    current += timedelta(days=1)
-                    continue
 
-                occ, created = Occurrence.objects.get_or_create(
-                    user=user,
-                    date=current,
-                    subtype=OccurrenceSubtype.HOLIDAY_PAID,
-                    defaults={
-                        "occurrence_type": OccurrenceType.PLANNED,
-                        "duration_hours": pay_hours,
-                    },
-                )
-                if not created and float(occ.duration_hours) != pay_hours:
-                    occ.duration_hours = pay_hours
-                    occ.save(update_fields=["duration_hours"])
+class ReportJobStatus(models.TextChoices):
+    PENDING = "pending", "Queued"
+    RUNNING = "running", "Rendering"
+    DONE = "done", "Ready"
+    FAILED = "failed", "Failed"
+
+
+class ReportJobKind(models.TextChoices):
+    ABSENCE = "absence", "Absence report"
+    GROUP_ABSENCE = "group_absence", "Group absence report"
+    PERFECT_ATTENDANCE = "perfect_attendance", "Perfect Attendance"
+
+
+class ReportJob(models.Model):
+    """
+    One requested PDF report. ``manage.py report_worker`` renders pending rows outside the web
+    request (see attendance.services.report_jobs). The PDF is stored under
+    reports/<kind>/<params_hash>-<data_version>.pdf, so a repeat request for unchanged data
+    reuses the stored file instead of rendering again.
+    """
+
+    slug = models.SlugField(max_length=48, unique=True, editable=False, db_index=True)
+    kind = models.CharField(max_length=32, choices=ReportJobKind.choices)
+    params = models.JSONField(help_text="Report inputs, fixed at request time (ids and ISO dates).")
+    params_hash = models.CharField(max_length=64, help_text="Keyed hash of kind and params.")
+    data_version = models.CharField(max_length=32, blank=True, help_text="Fingerprint of the data rendered.")
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    status = models.CharField(max_length=16, choices=ReportJobStatus.choices, default=ReportJobStatus.PENDING)
+    pdf = models.FileField(upload_to="reports/", max_length=255, blank=True)
+    filename = models.CharField(max_length=255, blank=True, help_text="Download name.")
+    requested_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "requested_at"]),
+            models.Index(fields=["params_hash", "data_version"]),
+        ]
+        ordering = ["-requested_at"]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.get_status_display()})"
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            ensure_unique_slug(self, "slug", max_length=48)
+        super().save(*args, **kwargs)
 
-                current += timedelta(days=1)
\ No newline at end of file
+    @property
+    def is_finished(self):
+        return self.status in (ReportJobStatus.DONE, ReportJobStatus.FAILED)
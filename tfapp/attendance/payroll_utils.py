@@ -2,8 +2,24 @@
 
 from datetime import date, timedelta
 
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
 from .models import PayrollPeriod
 
+_FINALIZED_WEEKS_KEY = "finalized_week_endings_v1"
+
+
+def payroll_sort_key(user):
+    """Payroll last name, first name, then username (account names when payroll names are blank)."""
+    return (
+        (user.payroll_lastname or user.last_name or user.username or "").strip().lower(),
+        (user.payroll_firstname or user.first_name or "").strip().lower(),
+        (user.username or "").strip().lower(),
+    )
+
 
 def week_ending_for_date(d: date) -> date:
     """Saturday of the payroll week containing date ``d``."""
@@ -19,6 +35,37 @@ def is_payroll_week_finalized(week_ending_date: date) -> bool:
     ).exists()
 
 
+def finalized_week_endings() -> frozenset[date]:
+    """
+    Week-ending Saturdays of every finalized payroll period, cached for hot paths (kiosk
+    punches). PayrollPeriod saves/deletes clear it; FINALIZED_WEEKS_CACHE_SECONDS bounds
+    staleness for per-process caches.
+    """
+    weeks = cache.get(_FINALIZED_WEEKS_KEY)
+    if weeks is None:
+        weeks = frozenset(
+            PayrollPeriod.objects.filter(is_finalized=True).values_list("week_ending", flat=True)
+        )
+        cache.set(_FINALIZED_WEEKS_KEY, weeks, getattr(settings, "FINALIZED_WEEKS_CACHE_SECONDS", 60))
+    return weeks
+
+
+def invalidate_finalized_week_endings() -> None:
+    """Clear now and again on commit so a read mid-transaction is not kept."""
+    cache.delete(_FINALIZED_WEEKS_KEY)
+    transaction.on_commit(lambda: cache.delete(_FINALIZED_WEEKS_KEY))
+
+
+def _on_payroll_period_change(sender, instance, **kwargs):
+    invalidate_finalized_week_endings()
+
+
+def connect_finalized_weeks_signals() -> None:
+    """Called from AttendanceConfig.ready()."""
+    post_save.connect(_on_payroll_period_change, sender=PayrollPeriod, dispatch_uid="finalized_weeks_save")
+    post_delete.connect(_on_payroll_period_change, sender=PayrollPeriod, dispatch_uid="finalized_weeks_delete")
+
+
 def is_payroll_week_finalized_for_calendar_date(d: date) -> bool:
     """True if the payroll week containing calendar date ``d`` is finalized."""
     return is_payroll_week_finalized(week_ending_for_date(d))
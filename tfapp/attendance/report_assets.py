@@ -0,0 +1,159 @@
+"""
+Static images embedded in PDF reports, resolved and encoded once per process.
+
+xhtml2pdf reports embed images as data URIs. Each asset lists candidate files under the first
+STATICFILES_DIRS entry (or BASE_DIR/static), in preference order. The first readable
+candidate is encoded on first use; WebP is transcoded to PNG, since xhtml2pdf does not read
+WebP. Later lookups cost one stat per candidate: the encoded URI is reused while every
+candidate's mtime and size (or absence) are unchanged. A change to a preferred candidate (one
+added, edited or removed) resolves the asset again; a change to the file in use re-reads it
+and re-encodes only if its sha256 checksum differs.
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, replace
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REPORT_ASSETS = {
+    "logo": ("img/pdfimage.jpg", "img/logo.webp", "img/logo.png"),
+}
+
+_MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+@dataclass(frozen=True)
+class ReportAsset:
+    name: str
+    path: Path | None
+    stamp: tuple  # per candidate: (mtime_ns, size), or None when missing
+    checksum: str | None  # sha256 of the source file
+    data_uri: str | None
+
+
+_registry: dict[str, ReportAsset] = {}
+_registry_lock = threading.Lock()
+
+
+def _static_root() -> Path:
+    static_dirs = getattr(settings, "STATICFILES_DIRS", []) or []
+    return Path(static_dirs[0]) if static_dirs else Path(settings.BASE_DIR) / "static"
+
+
+def _encode(path: Path, raw: bytes) -> str:
+    if path.suffix.lower() == ".webp":
+        from PIL import Image
+
+        buf = BytesIO()
+        Image.open(BytesIO(raw)).save(buf, format="PNG")
+        raw, mime = buf.getvalue(), "image/png"
+    else:
+        mime = _MIME_TYPES.get(path.suffix.lower(), "image/png")
+    return f"data:{mime};base64,{base64.b64encode(raw).decode('ascii')}"
+
+
+def _candidates(name: str) -> list[Path]:
+    root = _static_root()
+    return [root / relative for relative in REPORT_ASSETS[name]]
+
+
+def _stamps(paths: list[Path]) -> tuple:
+    stamps = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except OSError:
+            stamps.append(None)
+            continue
+        stamps.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def _resolve(name: str) -> ReportAsset:
+    paths = _candidates(name)
+    stamps = _stamps(paths)
+    for path, stamp in zip(paths, stamps):
+        if stamp is None:
+            continue
+        try:
+            raw = path.read_bytes()
+            data_uri = _encode(path, raw)
+        except FileNotFoundError:
+            continue
+        except Exception:
+            logger.warning("Could not embed report asset %s", path, exc_info=True)
+            continue
+        return ReportAsset(
+            name=name,
+            path=path,
+            stamp=stamps,
+            checksum=hashlib.sha256(raw).hexdigest(),
+            data_uri=data_uri,
+        )
+    return ReportAsset(name=name, path=None, stamp=stamps, checksum=None, data_uri=None)
+
+
+def _refresh(asset: ReportAsset) -> ReportAsset:
+    """
+    ``asset`` if the file in use is unchanged (same stamp, or same checksum) and no preferred
+    candidate changed, else re-resolved.
+    """
+    paths = _candidates(asset.name)
+    stamps = _stamps(paths)
+    if stamps == asset.stamp:
+        return asset
+    if asset.path not in paths:
+        return _resolve(asset.name)
+    i = paths.index(asset.path)
+    if stamps[:i] != asset.stamp[:i] or stamps[i] is None:
+        return _resolve(asset.name)
+    if stamps[i] == asset.stamp[i]:
+        return replace(asset, stamp=stamps)
+    try:
+        raw = asset.path.read_bytes()
+    except OSError:
+        return _resolve(asset.name)
+    if hashlib.sha256(raw).hexdigest() == asset.checksum:
+        return replace(asset, stamp=stamps)
+    return _resolve(asset.name)
+
+
+def report_asset(name: str) -> ReportAsset:
+    """Registry entry for ``name`` (a key of REPORT_ASSETS), encoded on first use."""
+    with _registry_lock:
+        cached = _registry.get(name)
+        asset = _refresh(cached) if cached else _resolve(name)
+        if asset is not cached:
+            _registry[name] = asset
+        return asset
+
+
+def report_asset_data_uri(name: str) -> str | None:
+    """Data URI for a report asset, or None when no candidate file is usable."""
+    return report_asset(name).data_uri
+
+
+def report_assets_checksum() -> str:
+    """Combined checksum of all report assets (part of stored-PDF fingerprints)."""
+    return hashlib.sha256(
+        "|".join(f"{name}:{report_asset(name).checksum or ''}" for name in sorted(REPORT_ASSETS)).encode()
+    ).hexdigest()[:16]
+
+
+def preload_report_assets() -> None:
+    """Encode every report asset now (e.g. at worker start) instead of on the first PDF."""
+    for name in REPORT_ASSETS:
+        report_asset(name)
+
+
+def clear_report_assets() -> None:
+    with _registry_lock:
+        _registry.clear()
@@ -0,0 +1,427 @@
+"""
+PDF reports (absence, group absence, Perfect Attendance): the shared report helpers and, per
+report kind, a builder that renders the HTML from job parameters and a fingerprint of the data
+it reads. attendance.services.report_jobs renders these in a background worker and stores the
+PDF under the parameters plus that fingerprint, so unchanged reports are served from disk.
+
+Parameters are plain JSON (ids, ISO dates) fixed when the report is requested, including the
+requester's visible employees and role-dependent options.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from collections import defaultdict
+from datetime import date
+from io import BytesIO
+
+from django.db.models import Sum
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from .forms import ReportFilterForm
+from .group_report_charts import group_report_pie_pair_uris
+from .models import (
+    ABSENCE_REPORT_FMLA_SUBTYPE,
+    ABSENCE_REPORT_LEAVE_AND_NO_PERSONAL_SUBTYPES,
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+)
+from .report_assets import report_asset_data_uri, report_assets_checksum
+from .services import perfect_attendance
+
+# Part of every data fingerprint (with the report asset checksums): bump when report templates
+# or builders change output.
+REPORT_FORMAT_VERSION = 1
+
+KIND_ABSENCE = "absence"
+KIND_GROUP_ABSENCE = "group_absence"
+KIND_PERFECT_ATTENDANCE = "perfect_attendance"
+
+
+def _user_row_sort_key(u: CustomUser | None) -> tuple:
+    if not u:
+        return ("", "", "")
+    return (
+        (u.payroll_lastname or u.last_name or u.username or "").lower(),
+        (u.payroll_firstname or u.first_name or "").lower(),
+        (u.username or "").lower(),
+    )
+
+
+def planned_filter_label(planned_filter: str) -> str:
+    return dict(ReportFilterForm.PLANNED_FILTER_CHOICES).get(
+        planned_filter or ReportFilterForm.PLANNED_FILTER_ALL,
+        "All (planned and unplanned)",
+    )
+
+
+def report_filter_note(subtype_filters, subtype_filter_label: str, planned_filter: str) -> str | None:
+    parts = []
+    if subtype_filters:
+        parts.append(f"Filtered to subtype(s): {subtype_filter_label}")
+    if planned_filter and planned_filter != ReportFilterForm.PLANNED_FILTER_ALL:
+        parts.append(f"Filtered to: {planned_filter_label(planned_filter)}")
+    return "; ".join(parts) if parts else None
+
+
+def filter_occurrences_for_report(qs, *, subtype_filters, planned_filter):
+    if subtype_filters:
+        qs = qs.filter(subtype__in=subtype_filters)
+    if planned_filter == ReportFilterForm.PLANNED_FILTER_PLANNED:
+        qs = qs.filter(occurrence_type=OccurrenceType.PLANNED)
+    elif planned_filter == ReportFilterForm.PLANNED_FILTER_UNPLANNED:
+        qs = qs.filter(occurrence_type=OccurrenceType.UNPLANNED)
+    return qs
+
+
+def aggregate_group_absence_report_rows(occurrences, group_by: str) -> list:
+    """Summarize occurrences by department, supervisor, or group lead, with per-user detail rows."""
+    groups = defaultdict(
+        lambda: {
+            "user_ids": set(),
+            "occurrence_count": 0,
+            "total_hours": 0.0,
+            "pto_applied": 0.0,
+            "personal_applied": 0.0,
+            "by_subtype": defaultdict(lambda: {"count": 0, "hours": 0.0}),
+            "by_user": defaultdict(
+                lambda: {
+                    "occurrence_count": 0,
+                    "total_hours": 0.0,
+                    "pto_applied": 0.0,
+                    "personal_applied": 0.0,
+                    "_user": None,
+                }
+            ),
+        }
+    )
+    for o in occurrences:
+        u = o.user
+        if group_by == "department":
+            key = (u.department or "").strip() or "(No department)"
+        elif group_by == "supervisor":
+            key = (
+                u.supervisor.payroll_display_name()
+                if getattr(u, "supervisor_id", None)
+                else "(No supervisor)"
+            )
+        elif group_by == "group_lead":
+            key = (
+                u.group_lead.payroll_display_name()
+                if getattr(u, "group_lead_id", None)
+                else "(No group lead)"
+            )
+        else:
+            key = (u.department or "").strip() or "(No department)"
+        row = groups[key]
+        row["user_ids"].add(u.pk)
+        row["occurrence_count"] += 1
+        row["total_hours"] += float(o.duration_hours or 0)
+        row["pto_applied"] += float(o.pto_hours_applied or 0)
+        row["personal_applied"] += float(o.personal_hours_applied or 0)
+        sub_label = o.get_subtype_display()
+        row["by_subtype"][sub_label]["count"] += 1
+        row["by_subtype"][sub_label]["hours"] += float(o.duration_hours or 0)
+
+        bu = row["by_user"][u.pk]
+        bu["_user"] = u
+        bu["occurrence_count"] += 1
+        bu["total_hours"] += float(o.duration_hours or 0)
+        bu["pto_applied"] += float(o.pto_hours_applied or 0)
+        bu["personal_applied"] += float(o.personal_hours_applied or 0)
+
+    result = []
+    for label in sorted(groups.keys(), key=lambda s: (s or "").lower()):
+        g = groups[label]
+        by_sub = sorted(
+            (
+                {"subtype": k, "count": v["count"], "hours": v["hours"]}
+                for k, v in g["by_subtype"].items()
+            ),
+            key=lambda r: (-r["hours"], r["subtype"].lower()),
+        )
+        users_detail = []
+        for _uid, stat in sorted(
+            g["by_user"].items(),
+            key=lambda item: _user_row_sort_key(item[1].get("_user")),
+        ):
+            u = stat["_user"]
+            users_detail.append(
+                {
+                    "payroll_name": u.payroll_display_name() if u else "",
+                    "username": u.username if u else "",
+                    "department": (u.department or "—") if u else "—",
+                    "supervisor": (
+                        u.supervisor.payroll_display_name()
+                        if u and getattr(u, "supervisor_id", None)
+                        else "—"
+                    ),
+                    "group_lead": (
+                        u.group_lead.payroll_display_name()
+                        if u and getattr(u, "group_lead_id", None)
+                        else "—"
+                    ),
+                    "occurrence_count": stat["occurrence_count"],
+                    "total_hours": stat["total_hours"],
+                    "pto_applied": stat["pto_applied"],
+                    "personal_applied": stat["personal_applied"],
+                }
+            )
+        result.append(
+            {
+                "group_label": label,
+                "unique_employees": len(g["user_ids"]),
+                "occurrence_count": g["occurrence_count"],
+                "total_hours": g["total_hours"],
+                "pto_applied": g["pto_applied"],
+                "personal_applied": g["personal_applied"],
+                "by_subtype": by_sub,
+                "users_detail": users_detail,
+            }
+        )
+    return result
+
+
+def report_logo_data_uri():
+    """Branded header image for PDF reports (attendance.report_assets, encoded once per process)."""
+    return report_asset_data_uri("logo")
+
+
+# Fields that change what a report shows about an employee (names, grouping, balance line).
+_USER_FINGERPRINT_FIELDS = (
+    "pk",
+    "username",
+    "first_name",
+    "last_name",
+    "payroll_firstname",
+    "payroll_lastname",
+    "department",
+    "supervisor_id",
+    "group_lead_id",
+    "pto_balance",
+)
+
+
+def _digest(payload) -> str:
+    raw = json.dumps([REPORT_FORMAT_VERSION, report_assets_checksum(), payload], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _subtype_filter_label(subtype_filters) -> str:
+    if not subtype_filters:
+        return "All absence types"
+    labels = dict(OccurrenceSubtype.choices)
+    return ", ".join(labels.get(s, s) for s in subtype_filters)
+
+
+def _report_occurrences(params, user_ids):
+    qs = Occurrence.objects.filter(
+        user_id__in=user_ids,
+        date__range=(date.fromisoformat(params["start"]), date.fromisoformat(params["end"])),
+    )
+    return filter_occurrences_for_report(
+        qs,
+        subtype_filters=params.get("subtype_filters") or [],
+        planned_filter=params.get("planned_filter") or ReportFilterForm.PLANNED_FILTER_ALL,
+    )
+
+
+def _occurrence_data_version(params, user_ids) -> str:
+    """Every stored column of the matching occurrences plus the employees they name."""
+    field_names = [f.attname for f in Occurrence._meta.concrete_fields]
+    occ_rows = list(
+        Occurrence.objects.filter(
+            user_id__in=user_ids,
+            date__range=(date.fromisoformat(params["start"]), date.fromisoformat(params["end"])),
+        )
+        .order_by("pk")
+        .values_list(*field_names)
+    )
+    users = list(CustomUser.objects.filter(pk__in=user_ids).order_by("pk").values_list(*_USER_FINGERPRINT_FIELDS))
+    managers = {u[7] for u in users} | {u[8] for u in users}
+    managers.discard(None)
+    manager_rows = list(
+        CustomUser.objects.filter(pk__in=managers).order_by("pk").values_list(*_USER_FINGERPRINT_FIELDS[:6])
+    )
+    return _digest([occ_rows, users, manager_rows])
+
+
+def _absence_data_version(params) -> str:
+    return _occurrence_data_version(params, [params["user_id"]])
+
+
+def _group_absence_data_version(params) -> str:
+    return _occurrence_data_version(params, params["user_ids"])
+
+
+def _perfect_attendance_rows(params):
+    month_first = date(params["year"], params["month"], 1)
+    return perfect_attendance.perfect_attendance_rows(month_first, date.fromisoformat(params["period_end"]))
+
+
+def _perfect_attendance_data_version(params) -> str:
+    rows = [
+        (r["user"].pk, r["user"].payroll_display_name(), r["total_hours"])
+        for r in _perfect_attendance_rows(params)
+    ]
+    return _digest(rows)
+
+
+def _build_absence(params):
+    user = CustomUser.objects.get(pk=params["user_id"])
+    start_date = date.fromisoformat(params["start"])
+    end_date = date.fromisoformat(params["end"])
+    subtype_filters = params.get("subtype_filters") or []
+    planned_filter = params.get("planned_filter") or ReportFilterForm.PLANNED_FILTER_ALL
+    occurrences = _report_occurrences(params, [user.pk]).order_by("date")
+
+    fmla_st = ABSENCE_REPORT_FMLA_SUBTYPE
+    leave_no_personal = ABSENCE_REPORT_LEAVE_AND_NO_PERSONAL_SUBTYPES
+
+    occurrences_fmla = occurrences.filter(subtype=fmla_st)
+    occurrences_leave_group = occurrences.filter(subtype__in=leave_no_personal)
+    occurrences_main = occurrences.exclude(subtype=fmla_st).exclude(subtype__in=leave_no_personal)
+
+    # PTO/Personal used (headline): main bucket only — excludes FMLA and leave/no-personal subtypes
+    pto_using_main = (
+        occurrences.filter(pto_applied=True)
+        .exclude(subtype=OccurrenceSubtype.HOLIDAY_PAID)
+        .exclude(subtype=fmla_st)
+        .exclude(subtype__in=leave_no_personal)
+    )
+    pto_used = sum(o.pto_hours_applied for o in pto_using_main)
+    personal_used = sum(o.personal_hours_applied for o in pto_using_main)
+    legacy_hours = sum(
+        o.duration_hours
+        for o in pto_using_main
+        if o.pto_hours_applied == 0 and o.personal_hours_applied == 0 and o.duration_hours
+    )
+    if legacy_hours and pto_used == 0 and personal_used == 0:
+        pto_used = legacy_hours
+
+    grace_pg = occurrences_main.aggregate(t=Sum("probation_grace_hours_applied"))["t"] or 0
+    if grace_pg:
+        grace_time_used = float(grace_pg)
+    else:
+        grace_time_used = float(
+            occurrences_main.filter(subtype=OccurrenceSubtype.GRACE_TIME).aggregate(
+                t=Sum("duration_hours")
+            )["t"]
+            or 0
+        )
+
+    fmla_used_hours = float(occurrences_fmla.aggregate(t=Sum("duration_hours"))["t"] or 0)
+    fmla_pto_applied_total = float(
+        occurrences_fmla.filter(pto_applied=True).aggregate(t=Sum("pto_hours_applied"))["t"] or 0
+    )
+    leave_group_total_hours = float(occurrences_leave_group.aggregate(t=Sum("duration_hours"))["t"] or 0)
+    leave_group_pto_applied_total = float(
+        occurrences_leave_group.filter(pto_applied=True).aggregate(t=Sum("pto_hours_applied"))["t"] or 0
+    )
+
+    html = get_template("attendance/report_pdf_template.html").render(
+        {
+            "user": user,
+            "occurrences_main": occurrences_main,
+            "occurrences_fmla": occurrences_fmla,
+            "occurrences_leave_group": occurrences_leave_group,
+            "start": start_date,
+            "end": end_date,
+            "logo_uri": report_logo_data_uri(),
+            "pto_used": pto_used,
+            "personal_used": personal_used,
+            "pto_remaining": user.pto_balance,
+            "fmla_used_hours": fmla_used_hours,
+            "fmla_pto_applied_total": fmla_pto_applied_total,
+            "grace_time_used": grace_time_used,
+            "leave_group_total_hours": leave_group_total_hours,
+            "leave_group_pto_applied_total": leave_group_pto_applied_total,
+            "has_fmla_rows": occurrences_fmla.exists(),
+            "has_leave_group_rows": occurrences_leave_group.exists(),
+            "subtype_filter_note": report_filter_note(
+                subtype_filters, _subtype_filter_label(subtype_filters), planned_filter
+            ),
+        }
+    )
+    return html, f"{user.username}_report.pdf"
+
+
+def _build_group_absence(params):
+    start_date = date.fromisoformat(params["start"])
+    end_date = date.fromisoformat(params["end"])
+    group_by = params.get("group_by") or "department"
+    occurrences = list(
+        _report_occurrences(params, params["user_ids"]).select_related(
+            "user", "user__supervisor", "user__group_lead"
+        )
+    )
+    group_rows = aggregate_group_absence_report_rows(occurrences, group_by)
+    pie_hours_uri, pie_records_uri = group_report_pie_pair_uris(group_rows, profile="pdf")
+    grand = {
+        "occurrence_count": sum(r["occurrence_count"] for r in group_rows),
+        "unique_employees": len({o.user_id for o in occurrences}),
+        "total_hours": sum(r["total_hours"] for r in group_rows),
+        "pto_applied": sum(r["pto_applied"] for r in group_rows),
+        "personal_applied": sum(r["personal_applied"] for r in group_rows),
+    }
+    html = get_template("attendance/report_group_pdf_template.html").render(
+        {
+            "start": start_date,
+            "end": end_date,
+            "logo_uri": report_logo_data_uri(),
+            "group_by_label": dict(ReportFilterForm.REPORT_GROUP_BY_CHOICES).get(group_by, group_by),
+            "subtype_filter_label": _subtype_filter_label(params.get("subtype_filters")),
+            "planned_filter_label": planned_filter_label(params.get("planned_filter")),
+            "group_rows": group_rows,
+            "grand": grand,
+            "pie_hours_uri": pie_hours_uri,
+            "pie_records_uri": pie_records_uri,
+        }
+    )
+    return html, f"group_absence_{start_date.isoformat()}_{end_date.isoformat()}.pdf"
+
+
+def _build_perfect_attendance(params):
+    pa_first = date(params["year"], params["month"], 1)
+    pa_period_end = date.fromisoformat(params["period_end"])
+    if params.get("month_to_date"):
+        period_description = f"{pa_first:%B %d} – {pa_period_end:%B %d, %Y} (month to date)"
+    else:
+        period_description = f"{pa_first:%B %Y}"
+    rows = _perfect_attendance_rows(params)
+    html = get_template("attendance/perfect_attendance_pdf.html").render(
+        {
+            "logo_uri": report_logo_data_uri(),
+            "period_description": period_description,
+            "rows": rows,
+            "pa_hours_total": sum(r["total_hours"] for r in rows),
+            "generated_at": date.fromisoformat(params["generated_on"]),
+            "show_perfect_attendance_hours": bool(params.get("show_hours")),
+        }
+    )
+    return html, f"perfect_attendance_{params['year']}_{params['month']:02d}.pdf"
+
+
+REPORT_KINDS = {
+    KIND_ABSENCE: (_build_absence, _absence_data_version),
+    KIND_GROUP_ABSENCE: (_build_group_absence, _group_absence_data_version),
+    KIND_PERFECT_ATTENDANCE: (_build_perfect_attendance, _perfect_attendance_data_version),
+}
+
+
+def report_data_version(kind: str, params: dict) -> str:
+    """Fingerprint of everything the report reads; equal versions render identical PDFs."""
+    return REPORT_KINDS[kind][1](params)
+
+
+def render_report_pdf(kind: str, params: dict) -> tuple[bytes, str]:
+    """Render one report to PDF bytes; returns (pdf, download filename)."""
+    html, filename = REPORT_KINDS[kind][0](params)
+    buf = BytesIO()
+    result = pisa.CreatePDF(html, dest=buf)
+    if result.err:
+        raise RuntimeError(f"xhtml2pdf reported {result.err} error(s) rendering {kind}")
+    return buf.getvalue(), filename
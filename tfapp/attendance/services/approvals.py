@@ -0,0 +1,134 @@
+"""
+Approver-scoped pending requests (time off, work-through-lunch, adjust punch).
+
+The approval rule (executive; the employee's group lead or supervisor; a manager in the same
+department) is one Q over the request's user, so counts and the team queue are plain filtered
+querysets. Counts are cached per approver under a version that any request save or delete
+bumps; PENDING_APPROVAL_COUNTS_CACHE_SECONDS bounds staleness from org-chart edits.
+"""
+from __future__ import annotations
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from attendance.models import (
+    AdjustPunchRequest,
+    RoleChoices,
+    TimeOffRequest,
+    TimeOffRequestStatus,
+    WorkThroughLunchRequest,
+)
+
+APPROVER_ROLES = (
+    RoleChoices.GROUP_LEAD,
+    RoleChoices.SUPERVISOR,
+    RoleChoices.MANAGER,
+    RoleChoices.EXECUTIVE,
+)
+
+_VERSION_KEY = "pending_approvals_version"
+
+_EMPTY_COUNTS = {"time_off": 0, "work_through_lunch": 0, "adjust_punch": 0, "total": 0}
+
+
+def can_approve_time_off(approver, target) -> bool:
+    """
+    Only allow approvals by the user's own group lead, supervisor,
+    manager (same department), or any executive.
+    """
+    if not approver.is_authenticated:
+        return False
+
+    if approver.role == RoleChoices.EXECUTIVE:
+        return True
+
+    if target.group_lead_id and approver.id == target.group_lead_id:
+        return True
+    if target.supervisor_id and approver.id == target.supervisor_id:
+        return True
+
+    if (
+        approver.role == RoleChoices.MANAGER
+        and approver.department
+        and approver.department == target.department
+    ):
+        return True
+
+    return False
+
+
+def approvable_users_q(approver, prefix: str = "user__") -> Q | None:
+    """
+    Q over ``<prefix>`` matching employees ``approver`` may approve for (same rules as
+    can_approve_time_off); None when they may approve for nobody.
+    """
+    if not approver.is_authenticated:
+        return None
+    if approver.role == RoleChoices.EXECUTIVE:
+        return Q()
+    q = Q(**{f"{prefix}group_lead_id": approver.id}) | Q(**{f"{prefix}supervisor_id": approver.id})
+    if approver.role == RoleChoices.MANAGER and approver.department:
+        q |= Q(**{f"{prefix}department": approver.department})
+    return q
+
+
+def pending_for_approver(model, approver):
+    """PENDING rows of ``model`` (a request model with a ``user`` FK) that ``approver`` may act on."""
+    q = approvable_users_q(approver)
+    if q is None:
+        return model.objects.none()
+    return model.objects.filter(q, status=TimeOffRequestStatus.PENDING)
+
+
+def get_pending_approval_counts(approver) -> dict[str, int]:
+    """Counts of PENDING requests ``approver`` may act on; three COUNT queries when not cached."""
+    if approver.role not in APPROVER_ROLES:
+        return dict(_EMPTY_COUNTS)
+    version = cache.get(_VERSION_KEY, 0)
+    key = f"pending_approvals_v1:{version}:{approver.id}"
+    counts = cache.get(key)
+    if counts is None:
+        n_to = pending_for_approver(TimeOffRequest, approver).count()
+        n_wtl = pending_for_approver(WorkThroughLunchRequest, approver).count()
+        n_adj = pending_for_approver(AdjustPunchRequest, approver).count()
+        counts = {
+            "time_off": n_to,
+            "work_through_lunch": n_wtl,
+            "adjust_punch": n_adj,
+            "total": n_to + n_wtl + n_adj,
+        }
+        ttl = getattr(settings, "PENDING_APPROVAL_COUNTS_CACHE_SECONDS", 300)
+        cache.set(key, counts, ttl)
+    return dict(counts)
+
+
+def _bump_pending_approvals_version() -> None:
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, None)
+
+
+def invalidate_pending_approval_counts() -> None:
+    """
+    Drop every approver's cached counts. Bumps again on commit so counts recomputed
+    mid-transaction (before the write is visible) are not kept.
+    """
+    _bump_pending_approvals_version()
+    transaction.on_commit(_bump_pending_approvals_version)
+
+
+def _on_request_change(sender, instance, **kwargs):
+    invalidate_pending_approval_counts()
+
+
+def connect_pending_approval_signals() -> None:
+    """Called from AttendanceConfig.ready()."""
+    for model in (TimeOffRequest, WorkThroughLunchRequest, AdjustPunchRequest):
+        post_save.connect(_on_request_change, sender=model, dispatch_uid=f"pending_approvals_save_{model.__name__}")
+        post_delete.connect(
+            _on_request_change, sender=model, dispatch_uid=f"pending_approvals_delete_{model.__name__}"
+        )
@@ -9,13 +9,13 @@ from django.db import transaction
 from django.utils import timezone as django_tz
 
 from attendance.models import (
-    OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
     CustomUser,
     Occurrence,
     OccurrenceSubtype,
     OccurrenceType,
     PTOBalanceHistory,
 )
+from attendance.services.balance_service import adjust_balances
 from attendance.services.time_processing import (
     clock_in_requires_approver_for_entry,
     effective_schedule_reference_date,
@@ -88,31 +88,38 @@ def revert_and_delete_orphan_time_off_for_exchange_week(
     if not exchange_days:
         return
 
-    for user_id, occ_date in exchange_days:
-        orphan_rows = Occurrence.objects.filter(
-            user_id=user_id,
-            date=occ_date,
+    orphan_rows = [
+        occ
+        for occ in Occurrence.objects.filter(
+            user_id__in={user_id for user_id, _ in exchange_days},
+            date__range=[week_start, week_ending],
             subtype=OccurrenceSubtype.TIME_OFF,
             is_variance_to_schedule=False,
             time_off_request__isnull=True,
         )
-        if not orphan_rows.exists():
-            continue
-        user = CustomUser.objects.get(pk=user_id)
-        pto_refund = 0.0
-        personal_refund = 0.0
-        for occ in orphan_rows:
-            if occ.pto_applied:
-                pto_refund += float(occ.pto_hours_applied or 0.0)
-                personal_refund += float(occ.personal_hours_applied or 0.0)
-            occ.delete()
-        if pto_refund or personal_refund:
-            user.pto_balance = round(user.pto_balance + pto_refund, 2)
-            user.personal_time_balance = round(
-                max(0.0, user.personal_time_balance - personal_refund),
-                2,
-            )
-            user.save(update_fields=["pto_balance", "personal_time_balance"])
+        if (occ.user_id, occ.date) in exchange_days
+    ]
+    if not orphan_rows:
+        return
+
+    # Refund per (user, date) like the per-day cleanup did, so balance rounding is unchanged.
+    refunds: dict[int, dict[date, list[float]]] = {}
+    for occ in orphan_rows:
+        refund = refunds.setdefault(occ.user_id, {}).setdefault(occ.date, [0.0, 0.0])
+        if occ.pto_applied:
+            refund[0] += float(occ.pto_hours_applied or 0.0)
+            refund[1] += float(occ.personal_hours_applied or 0.0)
+    Occurrence.objects.filter(pk__in=[occ.pk for occ in orphan_rows]).delete()
+
+    for user_id in sorted(refunds):
+        for occ_date, (pto_refund, personal_refund) in sorted(refunds[user_id].items()):
+            if pto_refund or personal_refund:
+                adjust_balances(
+                    user_id,
+                    f"Exchange week cleanup: refund orphan time off ({occ_date})",
+                    pto=pto_refund,
+                    personal=-personal_refund,
+                )
 
 
 def create_tardy_occurrences_for_week(week_start, week_ending, period=None):
@@ -191,17 +198,24 @@ def revert_tardy_occurrences_for_adjust_punch(user, occ_date):
     refunding any PTO/personal that was applied for them (same idea as cancelling time off).
     Call inside transaction.atomic(); ``user`` must be the locked CustomUser instance (select_for_update).
     """
-    qs = Occurrence.objects.filter(
-        user=user,
-        date=occ_date,
-        subtype__in=[
-            OccurrenceSubtype.TARDY_IN_GRACE,
-            OccurrenceSubtype.TARDY_OUT_OF_GRACE,
-        ],
+    revert_tardy_occurrences_for_dates(user, [occ_date])
+
+
+def revert_tardy_occurrences_for_dates(user, dates) -> None:
+    """revert_tardy_occurrences_for_adjust_punch for several days, saving ``user`` once."""
+    occurrences = list(
+        Occurrence.objects.filter(
+            user=user,
+            date__in=list(dates),
+            subtype__in=[
+                OccurrenceSubtype.TARDY_IN_GRACE,
+                OccurrenceSubtype.TARDY_OUT_OF_GRACE,
+            ],
+        ).order_by("date", "pk")
     )
-    if not qs.exists():
+    if not occurrences:
         return
-    for occ in qs:
+    for occ in occurrences:
         if occ.pto_applied:
             user.pto_balance = round(user.pto_balance + occ.pto_hours_applied, 2)
             user.personal_time_balance = round(
@@ -213,27 +227,11 @@ def revert_tardy_occurrences_for_adjust_punch(user, occ_date):
                 reason=f"Adjust punch: revert {occ.get_subtype_display()} ({occ.date})",
                 balance_after=user.pto_balance,
             )
+            user.ledger_reason = f"Adjust punch: revert {occ.get_subtype_display()} ({occ.date})"
         occ.delete()
     user.save()
 
 
-def apply_past_due_occurrences(user):
-    """
-    Apply PTO/personal for any occurrences that are due (date <= today) but not yet applied.
-    Call from dashboard or when loading user balance so that when a future approved date passes,
-    the balance is updated on next view.
-    """
-    today = date.today()
-    past_due = Occurrence.objects.filter(
-        user=user,
-        date__lte=today,
-        pto_applied=False,
-        subtype__in=OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
-    )
-    for occ in past_due:
-        occ.apply_pto()
-
-
 def entries_requiring_work_through_lunch_signoff(week_start: date, week_ending: date):
     """
     Time entries where a scheduled lunch exists, work-through-lunch is not approved, and the
@@ -303,3 +301,18 @@ def sync_tardy_occurrences_for_time_entry(entry):
     entry.refresh_from_db()
     if entry.clock_in:
         entry.check_tardy()
+
+
+def sync_tardy_occurrences_for_user_entries(user_id: int, entries, cleared_dates=()) -> None:
+    """
+    sync_tardy_occurrences_for_time_entry for one user's saved ``entries`` in one pass: lock
+    the user once, revert tardies for those days and ``cleared_dates`` (days whose entry was
+    removed), then re-apply tardy rules from each entry's in-memory punches.
+    """
+    entries = list(entries)
+    with transaction.atomic():
+        u = CustomUser.objects.select_for_update().get(pk=user_id)
+        revert_tardy_occurrences_for_dates(u, {e.date for e in entries} | set(cleared_dates))
+    for entry in entries:
+        if entry.clock_in:
+            entry.check_tardy()
@@ -1,16 +1,24 @@
 """
 Centralized PTO / personal balance application for occurrences.
+
+apply_occurrence_pto applies one occurrence under a user lock; apply_due_occurrence_pto
+applies every due occurrence for many users in one locked pass per chunk (run nightly by
+``manage.py apply_due_pto`` so page views do not write). adjust_balances adds a delta (refunds,
+accruals and their reversal) with one UPDATE of F() expressions instead of read-modify-save.
 """
 from __future__ import annotations
 
+from collections import defaultdict
 from datetime import date, timedelta
 from decimal import ROUND_DOWN, Decimal
 
 from django.db import transaction
-from django.db.models import Q, Sum
+from django.db.models import Case, DecimalField, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Greatest, Least, Round
 
 
 QUARTER_HOUR = Decimal("0.25")
+PART_TIME_PTO_CAP = 72.0
 
 
 def floor_hours_to_quarter_increment(hours: Decimal) -> Decimal:
@@ -54,8 +62,7 @@ def apply_occurrence_pto(occ, max_pto_to_apply=None, max_occurrence_hours=None):
     Returns the number of PTO hours deducted (0.0 for subtypes that skip PTO draw).
     """
     from attendance.models import (
-        PROBATION_GRACE_ELIGIBLE_SUBTYPES,
-        PROBATION_GRACE_HOURS_CAP,
+        OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
         CustomUser,
         OccurrenceSubtype,
         PTOBalanceHistory,
@@ -69,13 +76,6 @@ def apply_occurrence_pto(occ, max_pto_to_apply=None, max_occurrence_hours=None):
     if occ.date > date.today():
         return 0.0
 
-    used = Decimal(str(occ.duration_hours))
-    if max_occurrence_hours is not None:
-        cap_h = Decimal(str(max_occurrence_hours))
-        if cap_h < 0:
-            cap_h = Decimal("0")
-        used = min(used, cap_h)
-
     # Subtypes that do NOT affect balances (company-paid or fully unpaid/ excused)
     if occ.subtype in [
         OccurrenceSubtype.LAYOFF,
@@ -91,125 +91,309 @@ def apply_occurrence_pto(occ, max_pto_to_apply=None, max_occurrence_hours=None):
         return 0.0
 
     # Subtypes that affect PTO and possibly personal time
-    if occ.subtype not in [
-        OccurrenceSubtype.TIME_OFF,
-        OccurrenceSubtype.TARDY_OUT_OF_GRACE,
-        OccurrenceSubtype.EXCHANGE,
-        OccurrenceSubtype.FMLA,
-        OccurrenceSubtype.LEAVE_OF_ABSENCE,
-        OccurrenceSubtype.WEATHER_PAID,
-        OccurrenceSubtype.BEREAVEMENT_PAID,
-        OccurrenceSubtype.JURY_DUTY_PAID,
-        OccurrenceSubtype.GRACE_TIME,
-    ]:
+    if occ.subtype not in OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL:
         return 0.0
 
     with transaction.atomic():
         u = CustomUser.objects.select_for_update().get(pk=occ.user_id)
-        pto_bal = Decimal(str(u.pto_balance)).quantize(Decimal("0.01"))
-        personal_bal = Decimal(str(u.personal_time_balance)).quantize(Decimal("0.01"))
-
-        # For FMLA and Leave of Absence: use PTO when available, but do NOT
-        # convert any remaining hours into personal/unpaid time. Remaining
-        # hours are treated as leave for tracking only.
-        if occ.subtype in [OccurrenceSubtype.FMLA, OccurrenceSubtype.LEAVE_OF_ABSENCE]:
-            pto_usable = floor_hours_to_quarter_increment(pto_bal)
-            pto_deducted = min(used, pto_usable)
-            if max_pto_to_apply is not None:
-                cap = floor_hours_to_quarter_increment(Decimal(str(max_pto_to_apply)))
-                pto_deducted = min(pto_deducted, cap)
-            new_pto = max(Decimal("0"), pto_bal - pto_deducted)
-            u.pto_balance = float(new_pto.quantize(Decimal("0.01")))
-            u.save()
-            if pto_deducted > 0:
-                PTOBalanceHistory.record(
-                    user=u,
-                    change=float(-pto_deducted.quantize(Decimal("0.01"))),
-                    reason=f"Occurrence apply_pto: {occ.get_subtype_display()} ({occ.date})",
-                    balance_after=u.pto_balance,
-                )
-            occ.pto_hours_applied = float(pto_deducted.quantize(Decimal("0.01")))
-            occ.personal_hours_applied = 0.0
-            occ.pto_applied = True
-            if max_occurrence_hours is not None:
-                occ.duration_hours = float(used.quantize(Decimal("0.01")))
-            occ.save()
-            return float(pto_deducted.quantize(Decimal("0.01")))
-
-        anchor = u.employment_anchor_date()
-        probation_end = anchor + timedelta(days=90) if anchor else None
-        uses_probation_grace = (
-            anchor
-            and probation_end
-            and u.is_date_in_probation_period(occ.date)
-            and (
-                occ.subtype in PROBATION_GRACE_ELIGIBLE_SUBTYPES
-                or occ.subtype == OccurrenceSubtype.GRACE_TIME
-            )
+        pto_deducted, history = _apply_occurrence_in_memory(
+            occ,
+            u,
+            lambda anchor, probation_end: probation_grace_hours_used_before(occ, anchor, probation_end),
+            max_pto_to_apply=max_pto_to_apply,
+            max_occurrence_hours=max_occurrence_hours,
         )
-        if uses_probation_grace:
-            grace_used_prior = probation_grace_hours_used_before(occ, anchor, probation_end)
-            grace_remaining = max(Decimal("0"), PROBATION_GRACE_HOURS_CAP - grace_used_prior)
-            grace_portion = min(used, grace_remaining)
-            personal_portion = used - grace_portion
-            new_personal = personal_bal + personal_portion
-            u.personal_time_balance = float(new_personal.quantize(Decimal("0.01")))
-            u.save()
-            if personal_portion > 0:
-                PTOBalanceHistory.record(
-                    user=u,
-                    change=float(personal_portion.quantize(Decimal("0.01"))),
-                    reason=f"Personal time (probation): {occ.get_subtype_display()} ({occ.date})",
-                    balance_after=u.personal_time_balance,
-                    balance_type=PTOBalanceHistory.BALANCE_TYPE_PERSONAL,
-                )
-            occ.pto_hours_applied = 0.0
-            occ.personal_hours_applied = float(personal_portion.quantize(Decimal("0.01")))
-            occ.probation_grace_hours_applied = float(grace_portion.quantize(Decimal("0.01")))
-            occ.pto_applied = True
-            if (
-                grace_portion == used
-                and used > 0
-                and personal_portion == 0
-                and occ.subtype != OccurrenceSubtype.GRACE_TIME
-            ):
-                occ.subtype = OccurrenceSubtype.GRACE_TIME
-            if max_occurrence_hours is not None:
-                occ.duration_hours = float(used.quantize(Decimal("0.01")))
-            occ.save()
-            return 0.0
-
-        # Default behavior: PTO first (quarter-hour increments from balance only), then
-        # remaining hours to personal time.
+        PTOBalanceHistory.append(history)
+        u.save(update_fields=["pto_balance", "personal_time_balance", "final_pto_balance"])
+        occ.save()
+    return pto_deducted
+
+
+def _apply_occurrence_in_memory(occ, u, grace_used_prior, max_pto_to_apply=None, max_occurrence_hours=None):
+    """
+    The balance step of apply_occurrence_pto without any writes: split ``occ`` across the
+    balances on ``u`` (locked by the caller), update ``u`` (including recalculate_balances, as
+    save() would) and ``occ`` in place, and return (PTO hours deducted, unsaved
+    PTOBalanceHistory rows). ``grace_used_prior(anchor, probation_end)`` returns the probation
+    grace hours already used before ``occ``.
+    """
+    from attendance.models import (
+        PROBATION_GRACE_ELIGIBLE_SUBTYPES,
+        PROBATION_GRACE_HOURS_CAP,
+        OccurrenceSubtype,
+        PTOBalanceHistory,
+    )
+
+    def history_row(change, reason, balance_after, balance_type=PTOBalanceHistory.BALANCE_TYPE_PTO):
+        return PTOBalanceHistory(
+            user=u, change=change, reason=reason, balance_after=balance_after, balance_type=balance_type
+        )
+
+    used = Decimal(str(occ.duration_hours))
+    if max_occurrence_hours is not None:
+        cap_h = Decimal(str(max_occurrence_hours))
+        if cap_h < 0:
+            cap_h = Decimal("0")
+        used = min(used, cap_h)
+
+    pto_bal = Decimal(str(u.pto_balance)).quantize(Decimal("0.01"))
+    personal_bal = Decimal(str(u.personal_time_balance)).quantize(Decimal("0.01"))
+    history = []
+
+    # For FMLA and Leave of Absence: use PTO when available, but do NOT
+    # convert any remaining hours into personal/unpaid time. Remaining
+    # hours are treated as leave for tracking only.
+    if occ.subtype in [OccurrenceSubtype.FMLA, OccurrenceSubtype.LEAVE_OF_ABSENCE]:
         pto_usable = floor_hours_to_quarter_increment(pto_bal)
         pto_deducted = min(used, pto_usable)
         if max_pto_to_apply is not None:
             cap = floor_hours_to_quarter_increment(Decimal(str(max_pto_to_apply)))
             pto_deducted = min(pto_deducted, cap)
-        personal_deducted = used - pto_deducted
         new_pto = max(Decimal("0"), pto_bal - pto_deducted)
-        new_personal = personal_bal + personal_deducted
         u.pto_balance = float(new_pto.quantize(Decimal("0.01")))
-        u.personal_time_balance = float(new_personal.quantize(Decimal("0.01")))
-        u.save()
-        PTOBalanceHistory.record(
-            user=u,
-            change=float(-pto_deducted.quantize(Decimal("0.01"))),
-            reason=f"Occurrence apply_pto: {occ.get_subtype_display()} ({occ.date})",
-            balance_after=u.pto_balance,
-        )
-        if personal_deducted > 0:
-            PTOBalanceHistory.record(
-                user=u,
-                change=float(personal_deducted.quantize(Decimal("0.01"))),
-                reason=f"Personal time: {occ.get_subtype_display()} ({occ.date})",
-                balance_after=u.personal_time_balance,
-                balance_type=PTOBalanceHistory.BALANCE_TYPE_PERSONAL,
+        u.recalculate_balances()
+        if pto_deducted > 0:
+            history.append(
+                history_row(
+                    float(-pto_deducted.quantize(Decimal("0.01"))),
+                    f"Occurrence apply_pto: {occ.get_subtype_display()} ({occ.date})",
+                    u.pto_balance,
+                )
             )
         occ.pto_hours_applied = float(pto_deducted.quantize(Decimal("0.01")))
-        occ.personal_hours_applied = float(personal_deducted.quantize(Decimal("0.01")))
+        occ.personal_hours_applied = 0.0
         occ.pto_applied = True
         if max_occurrence_hours is not None:
             occ.duration_hours = float(used.quantize(Decimal("0.01")))
-        occ.save()
-    return float(pto_deducted.quantize(Decimal("0.01")))
+        return float(pto_deducted.quantize(Decimal("0.01"))), history
+
+    anchor = u.employment_anchor_date()
+    probation_end = anchor + timedelta(days=90) if anchor else None
+    uses_probation_grace = (
+        anchor
+        and probation_end
+        and u.is_date_in_probation_period(occ.date)
+        and (
+            occ.subtype in PROBATION_GRACE_ELIGIBLE_SUBTYPES
+            or occ.subtype == OccurrenceSubtype.GRACE_TIME
+        )
+    )
+    if uses_probation_grace:
+        grace_remaining = max(Decimal("0"), PROBATION_GRACE_HOURS_CAP - grace_used_prior(anchor, probation_end))
+        grace_portion = min(used, grace_remaining)
+        personal_portion = used - grace_portion
+        new_personal = personal_bal + personal_portion
+        u.personal_time_balance = float(new_personal.quantize(Decimal("0.01")))
+        u.recalculate_balances()
+        if personal_portion > 0:
+            history.append(
+                history_row(
+                    float(personal_portion.quantize(Decimal("0.01"))),
+                    f"Personal time (probation): {occ.get_subtype_display()} ({occ.date})",
+                    u.personal_time_balance,
+                    PTOBalanceHistory.BALANCE_TYPE_PERSONAL,
+                )
+            )
+        occ.pto_hours_applied = 0.0
+        occ.personal_hours_applied = float(personal_portion.quantize(Decimal("0.01")))
+        occ.probation_grace_hours_applied = float(grace_portion.quantize(Decimal("0.01")))
+        occ.pto_applied = True
+        if (
+            grace_portion == used
+            and used > 0
+            and personal_portion == 0
+            and occ.subtype != OccurrenceSubtype.GRACE_TIME
+        ):
+            occ.subtype = OccurrenceSubtype.GRACE_TIME
+        if max_occurrence_hours is not None:
+            occ.duration_hours = float(used.quantize(Decimal("0.01")))
+        return 0.0, history
+
+    # Default behavior: PTO first (quarter-hour increments from balance only), then
+    # remaining hours to personal time.
+    pto_usable = floor_hours_to_quarter_increment(pto_bal)
+    pto_deducted = min(used, pto_usable)
+    if max_pto_to_apply is not None:
+        cap = floor_hours_to_quarter_increment(Decimal(str(max_pto_to_apply)))
+        pto_deducted = min(pto_deducted, cap)
+    personal_deducted = used - pto_deducted
+    new_pto = max(Decimal("0"), pto_bal - pto_deducted)
+    new_personal = personal_bal + personal_deducted
+    u.pto_balance = float(new_pto.quantize(Decimal("0.01")))
+    u.personal_time_balance = float(new_personal.quantize(Decimal("0.01")))
+    u.recalculate_balances()
+    history.append(
+        history_row(
+            float(-pto_deducted.quantize(Decimal("0.01"))),
+            f"Occurrence apply_pto: {occ.get_subtype_display()} ({occ.date})",
+            u.pto_balance,
+        )
+    )
+    if personal_deducted > 0:
+        history.append(
+            history_row(
+                float(personal_deducted.quantize(Decimal("0.01"))),
+                f"Personal time: {occ.get_subtype_display()} ({occ.date})",
+                u.personal_time_balance,
+                PTOBalanceHistory.BALANCE_TYPE_PERSONAL,
+            )
+        )
+    occ.pto_hours_applied = float(pto_deducted.quantize(Decimal("0.01")))
+    occ.personal_hours_applied = float(personal_deducted.quantize(Decimal("0.01")))
+    occ.pto_applied = True
+    if max_occurrence_hours is not None:
+        occ.duration_hours = float(used.quantize(Decimal("0.01")))
+    return float(pto_deducted.quantize(Decimal("0.01"))), history
+
+
+_APPLIED_OCCURRENCE_FIELDS = [
+    "pto_applied",
+    "pto_hours_applied",
+    "personal_hours_applied",
+    "probation_grace_hours_applied",
+    "subtype",
+]
+
+
+def apply_due_occurrence_pto(user_ids=None, today=None, chunk_size=200) -> int:
+    """
+    Batched apply_occurrence_pto for every due (date <= today), unapplied PTO-drawing occurrence
+    of ``user_ids`` (every user when None). Each chunk of users is locked once and its
+    occurrences applied in memory per user in (date, pk) order, each seeing the balances the
+    previous one left, then written with bulk_update / bulk_create. Returns the number applied.
+    """
+    from attendance.models import OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL, Occurrence
+
+    today = today or date.today()
+    due = Occurrence.objects.filter(
+        date__lte=today, pto_applied=False, subtype__in=OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL
+    )
+    if user_ids is not None:
+        due = due.filter(user_id__in=list(user_ids))
+    pending_user_ids = sorted(set(due.values_list("user_id", flat=True)))
+    applied = 0
+    for start in range(0, len(pending_user_ids), chunk_size):
+        applied += _apply_due_for_users(pending_user_ids[start : start + chunk_size], today)
+    return applied
+
+
+def _apply_due_for_users(user_ids, today) -> int:
+    from attendance.models import OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL, CustomUser, Occurrence, PTOBalanceHistory
+    from attendance.payroll_utils import week_ending_for_date
+    from attendance.services.weekly_totals import invalidate_weekly_user_totals
+
+    with transaction.atomic():
+        users = CustomUser.objects.select_for_update().order_by("pk").in_bulk(user_ids)
+        # Read after the lock: a concurrent applier may have just applied some of them.
+        occurrences = list(
+            Occurrence.objects.filter(
+                user_id__in=list(users),
+                date__lte=today,
+                pto_applied=False,
+                subtype__in=OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
+            ).order_by("user_id", "date", "pk")
+        )
+        if not occurrences:
+            return 0
+        # Probation grace already allocated, as (date, pk, hours); extended as the batch applies.
+        grace_rows = defaultdict(list)
+        for user_id, d, pk, hours in Occurrence.objects.filter(
+            user_id__in=list(users), pto_applied=True, probation_grace_hours_applied__gt=0
+        ).values_list("user_id", "date", "pk", "probation_grace_hours_applied"):
+            grace_rows[user_id].append((d, pk, hours))
+
+        history = []
+        for occ in occurrences:
+            rows = grace_rows[occ.user_id]
+
+            def grace_used_prior(anchor, probation_end, occ=occ, rows=rows):
+                total = sum(
+                    hours
+                    for d, pk, hours in rows
+                    if anchor <= d < probation_end and (d, pk) < (occ.date, occ.pk)
+                )
+                return Decimal(str(total or 0)).quantize(Decimal("0.01"))
+
+            _, occ_history = _apply_occurrence_in_memory(occ, users[occ.user_id], grace_used_prior)
+            history.extend(occ_history)
+            if occ.probation_grace_hours_applied > 0:
+                rows.append((occ.date, occ.pk, occ.probation_grace_hours_applied))
+
+        touched_user_ids = {occ.user_id for occ in occurrences}
+        CustomUser.objects.bulk_update(
+            [users[pk] for pk in sorted(touched_user_ids)],
+            ["pto_balance", "personal_time_balance", "final_pto_balance"],
+        )
+        PTOBalanceHistory.append(history)
+        Occurrence.objects.bulk_update(occurrences, _APPLIED_OCCURRENCE_FIELDS, batch_size=500)
+        # Bulk writes skip the Occurrence signals that keep the weekly rollups current.
+        invalidate_weekly_user_totals(
+            user_ids=touched_user_ids,
+            week_endings={week_ending_for_date(occ.date) for occ in occurrences},
+        )
+    return len(occurrences)
+
+
+def _hundredths(expression):
+    # Round as numeric: Postgres has no ROUND(double precision, integer).
+    return Cast(Round(Cast(expression, DecimalField(max_digits=14, decimal_places=6)), 2), FloatField())
+
+
+def adjust_balances(user_id, reason, pto=0.0, personal=0.0) -> tuple[float, float]:
+    """
+    Add signed ``pto`` / ``personal`` hours to one user's balances in a single UPDATE of F()
+    expressions, so concurrent adjustments compose instead of overwriting each other, and
+    ledger the resulting changes. Results are rounded to hundredths, a decrease stops at zero,
+    and recalculate_balances' rules are applied in the same statement (part-time PTO cap,
+    exempt personal time, final_pto_balance mirror); CustomUser.save() is not called, so
+    in-memory instances of the user are stale afterwards.
+    Returns (pto_balance, personal_time_balance) after the change.
+    """
+    from attendance.models import PTO_LEDGER_FIELDS, CustomUser, PTOBalanceHistory, ledger_amount
+
+    pto = float(pto or 0.0)
+    personal = float(personal or 0.0)
+    users = CustomUser.objects.filter(pk=user_id)
+    balance_fields = list(PTO_LEDGER_FIELDS.values())
+    with transaction.atomic():
+        # Row lock for the before/after pair the ledger needs; the UPDATE below would take it anyway.
+        before = users.select_for_update().values_list(*balance_fields).get()
+        updates = {}
+        if pto:
+            new_pto = F("pto_balance") + Value(pto)
+            if pto < 0:
+                new_pto = Greatest(new_pto, Value(0.0))
+            new_pto = _hundredths(new_pto)
+            new_pto = Case(
+                When(is_exempt=False, is_part_time=True, then=Least(new_pto, Value(PART_TIME_PTO_CAP))),
+                default=new_pto,
+                output_field=FloatField(),
+            )
+            updates["pto_balance"] = updates["final_pto_balance"] = new_pto
+        if personal:
+            new_personal = F("personal_time_balance") + Value(personal)
+            if personal < 0:
+                new_personal = Greatest(new_personal, Value(0.0))
+            updates["personal_time_balance"] = Case(
+                When(is_exempt=True, then=Value(0.0)),
+                default=_hundredths(new_personal),
+                output_field=FloatField(),
+            )
+        if not updates:
+            return before
+        users.update(**updates)
+        after = users.values_list(*balance_fields).get()
+        PTOBalanceHistory.append(
+            [
+                PTOBalanceHistory(
+                    user_id=user_id,
+                    change=ledger_amount(new) - ledger_amount(old),
+                    reason=reason[:255],
+                    balance_after=ledger_amount(new),
+                    balance_type=balance_type,
+                )
+                for balance_type, old, new in zip(PTO_LEDGER_FIELDS, before, after)
+                if ledger_amount(new) != ledger_amount(old)
+            ]
+        )
+    return after
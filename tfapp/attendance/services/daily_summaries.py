@@ -0,0 +1,336 @@
+"""
+Daily attendance fact table (DailyAttendanceSummary): one row per user per calendar day.
+
+Readers call ensure_daily_summaries for the users and dates they are about to aggregate; rows
+that are missing or stale are rebuilt in one batch, so warm ranges cost one GROUP BY count.
+scheduled_hours_by_day and group analytics read long spans without building rows (web
+requests), falling back to the compiled schedule for users whose rows are missing or stale.
+Writes that touch a row's inputs mark it stale (update, never delete), so finalized rows keep
+their status, payroll period and payroll columns while the fact columns are refreshed.
+Staleness follows WeeklyUserTotals: invalidate_weekly_user_totals marks the same user-weeks.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count, Max, Min, Q, Sum, prefetch_related_objects
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from attendance.models import CustomUser, DailyAttendanceSummary, Occurrence, OccurrenceSubtype, OccurrenceType
+from attendance.services.entry_hours import refresh_stale_entry_hours
+from attendance.services.holiday_plan_service import HolidayPlanCalendar, effective_work_hours_for_day
+from attendance.services.time_processing import compiled_schedule_for_user
+from timeclock.models import TimeEntry
+
+TARDY_SUBTYPES = (OccurrenceSubtype.TARDY_IN_GRACE, OccurrenceSubtype.TARDY_OUT_OF_GRACE)
+
+# Written by payroll finalize; a refresh leaves them alone on finalized rows.
+PAYROLL_FIELDS = (
+    "scheduled_hours",
+    "worked_hours",
+    "rounded_hours",
+    "lunch_deducted_hours",
+    "regular_hours",
+    "overtime_hours",
+    "exchange_eligible",
+)
+
+FACT_FIELDS = (
+    "base_scheduled_hours",
+    "actual_hours",
+    "tardy_minutes",
+    "early_out_minutes",
+    "absence_hours",
+    "planned_hours",
+    "unplanned_hours",
+    "tardy_hours",
+    "early_out_hours",
+    "department",
+    "supervisor",
+    "group_lead",
+    "is_stale",
+)
+
+_GROUP_USER_FIELDS = frozenset(
+    {"department", "supervisor", "supervisor_id", "group_lead", "group_lead_id"}
+)
+
+_USER_BATCH = 100
+
+
+def _dates(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _local(d: date, t) -> datetime:
+    return timezone.make_aware(datetime.combine(d, t), timezone.get_current_timezone())
+
+
+def _minutes_between(earlier: datetime, later: datetime) -> int:
+    return max(0, int((later - earlier).total_seconds() // 60))
+
+
+def group_values(user) -> dict:
+    """Denormalized roll-up columns for ``user``."""
+    return {
+        "department": user.department or "",
+        "supervisor_id": user.supervisor_id,
+        "group_lead_id": user.group_lead_id,
+    }
+
+
+def compute_daily_summary_values(users, start: date, end: date) -> dict[tuple[int, date], dict]:
+    """
+    {(user_id, day): field values} for every user and day in ``start``..``end``.
+    Payroll columns use the same rules as finalize (holiday-adjusted scheduled hours, credited
+    hours of completed entries); tardy / early-out minutes compare first clock-in and last
+    clock-out with the scheduled shift.
+    """
+    users = list(users)
+    if not users or start > end:
+        return {}
+    user_ids = [u.id for u in users]
+    prefetch_related_objects(users, "schedules")
+
+    entries = TimeEntry.objects.filter(
+        user_id__in=user_ids,
+        date__range=[start, end],
+        clock_in__isnull=False,
+        clock_out__isnull=False,
+    )
+    refresh_stale_entry_hours(entries)
+    punches = {
+        (row["user_id"], row["date"]): row
+        for row in entries.values("user_id", "date")
+        .annotate(
+            actual=Sum("actual_hours"),
+            credited=Sum("credited_hours"),
+            first_in=Min("clock_in"),
+            last_out=Max("clock_out"),
+        )
+        .order_by()
+    }
+
+    tardy = Q(subtype__in=TARDY_SUBTYPES)
+    occurrences = {
+        (row["user_id"], row["date"]): row
+        for row in Occurrence.objects.filter(user_id__in=user_ids, date__range=[start, end])
+        .values("user_id", "date")
+        .annotate(
+            absence=Sum("duration_hours"),
+            planned=Sum("duration_hours", filter=Q(occurrence_type=OccurrenceType.PLANNED)),
+            unplanned=Sum("duration_hours", filter=Q(occurrence_type=OccurrenceType.UNPLANNED)),
+            tardy=Sum("duration_hours", filter=tardy),
+            early_out=Sum("duration_hours", filter=Q(is_variance_to_schedule=True) & ~tardy),
+        )
+        .order_by()
+    }
+
+    first_exchange_by_day = {}
+    for occ in Occurrence.objects.filter(
+        user_id__in=user_ids,
+        date__range=[start, end],
+        is_variance_to_schedule=True,
+        subtype=OccurrenceSubtype.EXCHANGE,
+    ).order_by("id"):
+        first_exchange_by_day.setdefault((occ.user_id, occ.date), occ)
+
+    calendar = HolidayPlanCalendar.load(start, end)
+    days = _dates(start, end)
+    values = {}
+    for user in users:
+        compiled = compiled_schedule_for_user(user)
+        grouping = group_values(user)
+        for d in days:
+            key = (user.id, d)
+            shift = compiled.day(d)
+            punch = punches.get(key)
+            occ = occurrences.get(key) or {}
+            worked = round(float(punch["credited"] or 0), 2) if punch else 0.0
+            tardy_minutes = early_out_minutes = 0
+            if punch and shift.start is not None and shift.end is not None:
+                tardy_minutes = _minutes_between(_local(d, shift.start), punch["first_in"])
+                end_day = d + timedelta(days=1) if shift.crosses_midnight else d
+                early_out_minutes = _minutes_between(punch["last_out"], _local(end_day, shift.end))
+            exchange_occ = first_exchange_by_day.get(key)
+            values[key] = {
+                "scheduled_hours": effective_work_hours_for_day(user, d, calendar=calendar),
+                "base_scheduled_hours": shift.duration_hours,
+                "worked_hours": worked,
+                "actual_hours": round(float(punch["actual"] or 0), 2) if punch else 0.0,
+                "rounded_hours": worked,
+                "lunch_deducted_hours": 0.0,
+                "regular_hours": worked,
+                "overtime_hours": 0.0,
+                "exchange_eligible": bool(exchange_occ and exchange_occ.duration_hours > 0),
+                "tardy_minutes": tardy_minutes,
+                "early_out_minutes": early_out_minutes,
+                "absence_hours": float(occ.get("absence") or 0),
+                "planned_hours": float(occ.get("planned") or 0),
+                "unplanned_hours": float(occ.get("unplanned") or 0),
+                "tardy_hours": float(occ.get("tardy") or 0),
+                "early_out_hours": float(occ.get("early_out") or 0),
+                "is_stale": False,
+                **grouping,
+            }
+    return values
+
+
+def _write_daily_summaries(users, start: date, end: date, *, force: bool = False) -> int:
+    """Store computed rows that are missing or stale (every row when ``force``). Returns rows written."""
+    values = compute_daily_summary_values(users, start, end)
+    if not values:
+        return 0
+    existing = DailyAttendanceSummary.objects.filter(
+        user_id__in=[u.id for u in users],
+        work_date__range=[start, end],
+    )
+    fresh = set()
+    if not force:
+        fresh = set(existing.filter(is_stale=False).values_list("user_id", "work_date"))
+        existing = existing.filter(is_stale=True)
+    rows = {(s.user_id, s.work_date): s for s in existing}
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for key, row_values in values.items():
+        if key in fresh:
+            continue
+        summary = rows.get(key)
+        if summary is None:
+            to_create.append(DailyAttendanceSummary(user_id=key[0], work_date=key[1], **row_values))
+            continue
+        finalized = summary.status == DailyAttendanceSummary.Status.FINALIZED
+        for field, value in row_values.items():
+            if finalized and field in PAYROLL_FIELDS:
+                continue
+            setattr(summary, field, value)
+        summary.computed_at = now
+        to_update.append(summary)
+    # A concurrent reader may have stored the same rows; either copy is current.
+    DailyAttendanceSummary.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    DailyAttendanceSummary.objects.bulk_update(
+        to_update, PAYROLL_FIELDS + FACT_FIELDS + ("computed_at",), batch_size=500
+    )
+    return len(to_create) + len(to_update)
+
+
+def ensure_daily_summaries(users, start: date, end: date) -> int:
+    """
+    Make sure every (user, day) in the range has a current row before it is aggregated.
+    One counting query when the range is warm. Returns rows written.
+    """
+    users = list(users)
+    if not users or start > end:
+        return 0
+    expected = (end - start).days + 1
+    current = dict(
+        DailyAttendanceSummary.objects.filter(
+            user_id__in=[u.id for u in users],
+            work_date__range=[start, end],
+            is_stale=False,
+        )
+        .values("user_id")
+        .annotate(n=Count("id"))
+        .order_by()
+        .values_list("user_id", "n")
+    )
+    pending = [u for u in users if current.get(u.id, 0) < expected]
+    written = 0
+    for i in range(0, len(pending), _USER_BATCH):
+        written += _write_daily_summaries(pending[i : i + _USER_BATCH], start, end)
+    return written
+
+
+def current_summaries(users, start: date, end: date):
+    """
+    (ids of ``users`` whose rows cover ``start``..``end`` and are all current, queryset of those
+    rows). Read-only: nothing is built, so callers fall back to the compiled schedule for the rest.
+    """
+    expected = (end - start).days + 1
+    current = DailyAttendanceSummary.objects.filter(
+        user_id__in=[u.id for u in users],
+        work_date__range=[start, end],
+        is_stale=False,
+    )
+    covered = set(
+        current.values("user_id")
+        .annotate(n=Count("id"))
+        .filter(n=expected)
+        .order_by()
+        .values_list("user_id", flat=True)
+    )
+    return covered, current.filter(user_id__in=covered)
+
+
+def scheduled_hours_by_day(users, start: date, end: date) -> dict[date, float]:
+    """
+    {day: base scheduled hours summed over ``users``} without building any rows, for web
+    requests over long spans. Users whose rows cover the range and are current are summed in SQL;
+    the rest come from their compiled weekly schedule (what their rows would hold). Fill the
+    table with ``manage.py rebuild_daily_summaries`` to move everyone onto the SQL path.
+    """
+    users = list(users)
+    if not users or start > end:
+        return {}
+    covered, rows = current_summaries(users, start, end)
+    totals = dict.fromkeys(_dates(start, end), 0.0)
+    if covered:
+        for work_date, hours in (
+            rows.values("work_date")
+            .annotate(total=Sum("base_scheduled_hours"))
+            .order_by()
+            .values_list("work_date", "total")
+        ):
+            totals[work_date] += float(hours or 0.0)
+    by_weekday = [0.0] * 7
+    for user in users:
+        if user.id not in covered:
+            for weekday, shift in enumerate(compiled_schedule_for_user(user).days):
+                by_weekday[weekday] += shift.duration_hours
+    if any(by_weekday):
+        for d in totals:
+            totals[d] += by_weekday[d.weekday()]
+    return totals
+
+
+def rebuild_daily_summaries(start: date, end: date, *, users=None) -> int:
+    """Recompute and store every row in ``start``..``end`` (status and payroll period are kept)."""
+    if users is None:
+        users = CustomUser.objects.filter(is_exempt=False)
+    users = list(users)
+    written = 0
+    for i in range(0, len(users), _USER_BATCH):
+        written += _write_daily_summaries(users[i : i + _USER_BATCH], start, end, force=True)
+    return written
+
+
+def mark_daily_summaries_stale(*, user_ids=None, week_endings=None) -> int:
+    """Flag rows for rebuild on next read; ``None`` means every user / every week."""
+    qs = DailyAttendanceSummary.objects.filter(is_stale=False)
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=list(user_ids))
+    if week_endings is not None:
+        weeks = Q()
+        for week_ending in week_endings:
+            weeks |= Q(work_date__range=[week_ending - timedelta(days=6), week_ending])
+        if not weeks:
+            return 0
+        qs = qs.filter(weeks)
+    return qs.update(is_stale=True)
+
+
+def _on_user_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not _GROUP_USER_FIELDS & set(update_fields):
+        return
+    grouping = group_values(instance)
+    DailyAttendanceSummary.objects.filter(user_id=instance.pk).exclude(**grouping).update(**grouping)
+
+
+def connect_daily_summary_signals() -> None:
+    """Called from AttendanceConfig.ready(); keeps the roll-up columns in step with the user."""
+    post_save.connect(_on_user_save, sender=CustomUser, dispatch_uid="daily_summaries_user_save")
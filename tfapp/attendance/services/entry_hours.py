@@ -0,0 +1,93 @@
+"""
+Stored TimeEntry hours (actual_hours / reported_hours / credited_hours).
+
+TimeEntry.save() writes them. Inputs that change outside a save (schedules, work-through-lunch
+approvals, queryset updates of override or lunch fields) mark the affected rows stale by zeroing
+calc_version; readers call refresh_stale_entry_hours on their queryset before trusting the
+columns, so SQL ``Sum()`` over them always matches the live rules.
+"""
+from __future__ import annotations
+
+from datetime import date
+
+from django.db.models import Sum
+from django.db.models.signals import post_delete, post_save
+
+from attendance.models import WorkSchedule, WorkThroughLunchRequest
+from timeclock.models import HOURS_CALC_VERSION, TimeEntry
+
+
+def refresh_stale_entry_hours(queryset=None) -> int:
+    """Recompute and store hours for rows in ``queryset`` whose calc_version is not current."""
+    queryset = TimeEntry.objects.all() if queryset is None else queryset
+    stale = list(
+        queryset.exclude(calc_version=HOURS_CALC_VERSION)
+        .select_related("user")
+        .prefetch_related("user__schedules")
+        .order_by()
+    )
+    for entry in stale:
+        entry.store_computed_hours()
+    if stale:
+        TimeEntry.objects.bulk_update(stale, TimeEntry.HOURS_FIELDS, batch_size=500)
+    return len(stale)
+
+
+def mark_entry_hours_stale(*, user_ids=None, entry_ids=None, dates=None) -> int:
+    """Zero calc_version so the next reader recomputes; ``None`` filters are not applied."""
+    qs = TimeEntry.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=list(user_ids))
+    if entry_ids is not None:
+        qs = qs.filter(pk__in=list(entry_ids))
+    if dates is not None:
+        qs = qs.filter(date__in=list(dates))
+    return qs.update(calc_version=0)
+
+
+def entry_hours_by_user(
+    user_ids, start: date, end: date, *, completed_only: bool = False
+) -> dict[int, dict[str, float]]:
+    """
+    {user_id: {"actual": .., "reported": .., "credited": ..}} summed in SQL over the date range;
+    ``completed_only`` skips entries missing clock_in or clock_out.
+    """
+    qs = TimeEntry.objects.filter(user_id__in=list(user_ids), date__range=[start, end])
+    if completed_only:
+        qs = qs.filter(clock_in__isnull=False, clock_out__isnull=False)
+    refresh_stale_entry_hours(qs)
+    totals = {}
+    for row in (
+        qs.values("user_id")
+        .annotate(
+            actual=Sum("actual_hours"),
+            reported=Sum("reported_hours"),
+            credited=Sum("credited_hours"),
+        )
+        .order_by()
+    ):
+        totals[row["user_id"]] = {
+            "actual": float(row["actual"] or 0.0),
+            "reported": float(row["reported"] or 0.0),
+            "credited": float(row["credited"] or 0.0),
+        }
+    return totals
+
+
+def _on_schedule_change(sender, instance, **kwargs):
+    # Weekday templates apply to every date, so all of the user's entries are affected.
+    mark_entry_hours_stale(user_ids=[instance.user_id])
+
+
+def _on_work_through_lunch_change(sender, instance, **kwargs):
+    mark_entry_hours_stale(user_ids=[instance.user_id], dates=[instance.work_date])
+
+
+def connect_entry_hours_signals() -> None:
+    """Called from AttendanceConfig.ready()."""
+    for model, handler in (
+        (WorkSchedule, _on_schedule_change),
+        (WorkThroughLunchRequest, _on_work_through_lunch_change),
+    ):
+        post_save.connect(handler, sender=model, dispatch_uid=f"entry_hours_save_{model.__name__}")
+        post_delete.connect(handler, sender=model, dispatch_uid=f"entry_hours_delete_{model.__name__}")
@@ -0,0 +1,279 @@
+"""
+Holiday pay occurrences for a date range: bookend attendance evaluated for every eligible user
+from one set of prefetched rows, then HOLIDAY_PAID rows created/updated/deleted in bulk.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from django.db.models import Q, Sum, prefetch_related_objects
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+)
+from attendance.payroll_utils import week_ending_for_date
+from attendance.services.entry_hours import refresh_stale_entry_hours
+from attendance.services.holiday_plan_service import (
+    HolidayPlanCalendar,
+    effective_work_hours_for_day,
+    holiday_pay_hours_for_user_on_date,
+    list_company_holidays_for_year,
+    user_eligible_for_holiday_pay,
+)
+from attendance.services.weekly_totals import invalidate_weekly_user_totals
+from timeclock.models import TimeEntry
+
+# Bookend probing looks up to 7 days either side of each holiday date.
+BOOKEND_WINDOW_DAYS = 7
+
+
+@dataclass
+class HolidayPayChange:
+    user_id: int
+    date: date
+    old_hours: float | None
+    new_hours: float | None
+
+
+@dataclass
+class HolidayPayDiff:
+    """What ensure_holiday_occurrences_for_range changed (or, for ``pending``, left alone)."""
+
+    created: list[HolidayPayChange] = field(default_factory=list)
+    updated: list[HolidayPayChange] = field(default_factory=list)
+    deleted: list[HolidayPayChange] = field(default_factory=list)
+    pending: list[tuple[int, date]] = field(default_factory=list)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.created or self.updated or self.deleted)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.created)} created, {len(self.updated)} updated, "
+            f"{len(self.deleted)} deleted, {len(self.pending)} pending"
+        )
+
+
+class HolidayBookendEvaluator:
+    """
+    Bookend attendance for ``users`` around holidays in ``start``..``end``.
+    Entries, occurrences and effective work hours for the range ±7 days are loaded once; statuses
+    match holiday_attendance_status for the same inputs.
+    """
+
+    def __init__(self, users, start: date, end: date, *, as_of: date, calendar: HolidayPlanCalendar):
+        self.users = list(users)
+        self.as_of = as_of
+        self.calendar = calendar
+        window_start = start - timedelta(days=BOOKEND_WINDOW_DAYS)
+        window_end = end + timedelta(days=BOOKEND_WINDOW_DAYS)
+        users_by_id = {u.id: u for u in self.users}
+
+        prefetch_related_objects(self.users, "schedules")
+
+        self.work_hours: dict[tuple[int, date], float] = {}
+        for user in self.users:
+            current = window_start
+            while current <= window_end:
+                self.work_hours[(user.id, current)] = effective_work_hours_for_day(
+                    user, current, calendar=calendar
+                )
+                current += timedelta(days=1)
+
+        self.worked: dict[tuple[int, date], float] = {}
+        entries = TimeEntry.objects.filter(
+            user_id__in=users_by_id.keys(),
+            date__range=[window_start, window_end],
+        )
+        refresh_stale_entry_hours(entries)
+        for e in entries.only("user_id", "date", "clock_in", "clock_out", "credited_hours"):
+            if not (e.clock_in and e.clock_out):
+                continue
+            key = (e.user_id, e.date)
+            self.worked[key] = self.worked.get(key, 0.0) + e.credited_hours
+
+        self.planned: dict[tuple[int, date], float] = {}
+        self.unplanned: dict[tuple[int, date], float] = {}
+        totals = (
+            Occurrence.objects.filter(
+                user_id__in=users_by_id.keys(),
+                date__range=[window_start, window_end],
+            )
+            .filter(
+                (
+                    Q(occurrence_type=OccurrenceType.PLANNED)
+                    & ~Q(subtype=OccurrenceSubtype.HOLIDAY_PAID)
+                )
+                | (
+                    Q(occurrence_type=OccurrenceType.UNPLANNED)
+                    & ~Q(subtype=OccurrenceSubtype.TARDY_IN_GRACE)
+                )
+            )
+            .values("user_id", "date", "occurrence_type")
+            .annotate(total=Sum("duration_hours"))
+            .order_by()
+        )
+        for row in totals:
+            bucket = self.planned if row["occurrence_type"] == OccurrenceType.PLANNED else self.unplanned
+            bucket[(row["user_id"], row["date"])] = float(row["total"] or 0.0)
+
+    def bookend_days(self, user_id: int, holiday_date: date) -> tuple[date | None, date | None]:
+        last_before = None
+        for offset in range(1, BOOKEND_WINDOW_DAYS + 1):
+            day = holiday_date - timedelta(days=offset)
+            if self.work_hours[(user_id, day)] > 0:
+                last_before = day
+                break
+        next_after = None
+        for offset in range(1, BOOKEND_WINDOW_DAYS + 1):
+            day = holiday_date + timedelta(days=offset)
+            if self.work_hours[(user_id, day)] > 0:
+                next_after = day
+                break
+        return last_before, next_after
+
+    def bookend_day_status(self, user_id: int, the_date: date) -> str:
+        if the_date > self.as_of:
+            return "pending"
+        key = (user_id, the_date)
+        scheduled = self.work_hours[key]
+        if scheduled <= 0:
+            return "eligible"
+        if self.unplanned.get(key, 0.0) > 0:
+            return "ineligible"
+        shortfall = round(scheduled - (self.worked.get(key, 0.0) + self.planned.get(key, 0.0)), 2)
+        if shortfall > 0:
+            return "ineligible"
+        return "eligible"
+
+    def status(self, user: CustomUser, holiday_date: date) -> str:
+        if not user_eligible_for_holiday_pay(user, holiday_date):
+            return "ineligible"
+        last_before, next_after = self.bookend_days(user.id, holiday_date)
+        if not last_before or not next_after:
+            return "eligible"
+        before_status = self.bookend_day_status(user.id, last_before)
+        after_status = self.bookend_day_status(user.id, next_after)
+        if before_status == "pending" or after_status == "pending":
+            return "pending"
+        if before_status == "ineligible" or after_status == "ineligible":
+            return "ineligible"
+        return "eligible"
+
+
+def apply_holiday_pay_for_range(start_date: date, end_date: date, *, as_of: date) -> HolidayPayDiff:
+    """
+    Work out the HOLIDAY_PAID row each (user, date) in the range should have, then write the
+    difference from what exists in three bulk statements. ``None`` marks a row to remove; dates
+    whose bookend status is still pending are left as they are.
+    """
+    diff = HolidayPayDiff()
+    if start_date > end_date:
+        return diff
+
+    existing: dict[tuple[int, date], list[Occurrence]] = {}
+    for occ in (
+        Occurrence.objects.filter(
+            date__range=[start_date, end_date],
+            subtype=OccurrenceSubtype.HOLIDAY_PAID,
+        )
+        .select_related("user")
+        .order_by("id")
+    ):
+        existing.setdefault((occ.user_id, occ.date), []).append(occ)
+
+    target: dict[tuple[int, date], float | None] = {}
+    for key, rows in existing.items():
+        if not user_eligible_for_holiday_pay(rows[0].user, key[1]):
+            target[key] = None
+
+    calendar = HolidayPlanCalendar.load(
+        start_date - timedelta(days=BOOKEND_WINDOW_DAYS),
+        end_date + timedelta(days=BOOKEND_WINDOW_DAYS),
+    )
+    plans = [p for p in calendar.plans if p.week_start <= end_date and p.week_ending >= start_date]
+    plan_keys_with_complete = {(p.year, p.holiday_key) for p in plans}
+
+    # No complete plan for a holiday week means no holiday pay for that week.
+    unplanned_weeks = []
+    for year in range(start_date.year - 1, end_date.year + 2):
+        for holiday in list_company_holidays_for_year(year):
+            if holiday["week_ending"] < start_date or holiday["week_start"] > end_date:
+                continue
+            if (holiday["year"], holiday["key"]) in plan_keys_with_complete:
+                continue
+            unplanned_weeks.append((holiday["week_start"], holiday["week_ending"]))
+    for key in existing:
+        if any(ws <= key[1] <= we for ws, we in unplanned_weeks):
+            target[key] = None
+
+    users = list(CustomUser.objects.filter(is_active=True, is_exempt=False, is_part_time=False))
+    evaluator = HolidayBookendEvaluator(users, start_date, end_date, as_of=as_of, calendar=calendar)
+    for plan in plans:
+        plan_end = min(plan.week_ending, end_date)
+        for user in users:
+            current = max(plan.week_start, start_date)
+            while current <= plan_end:
+                key = (user.id, current)
+                current += timedelta(days=1)
+                pay_hours = holiday_pay_hours_for_user_on_date(
+                    user, key[1], plan=plan, calendar=calendar
+                )
+                if pay_hours <= 0:
+                    target[key] = None
+                    continue
+                status = evaluator.status(user, key[1])
+                if status == "pending":
+                    diff.pending.append(key)
+                elif status == "ineligible":
+                    target[key] = None
+                else:
+                    target[key] = pay_hours
+
+    to_create: list[Occurrence] = []
+    to_update: list[Occurrence] = []
+    delete_ids: list[int] = []
+    for key, hours in target.items():
+        rows = existing.get(key, [])
+        if hours is None:
+            keep, extra = None, rows
+        elif rows:
+            keep, extra = rows[0], rows[1:]
+        else:
+            to_create.append(
+                Occurrence(
+                    user_id=key[0],
+                    date=key[1],
+                    subtype=OccurrenceSubtype.HOLIDAY_PAID,
+                    occurrence_type=OccurrenceType.PLANNED,
+                    duration_hours=hours,
+                )
+            )
+            diff.created.append(HolidayPayChange(key[0], key[1], None, hours))
+            continue
+        if keep is not None and float(keep.duration_hours) != hours:
+            diff.updated.append(HolidayPayChange(key[0], key[1], float(keep.duration_hours), hours))
+            keep.duration_hours = hours
+            to_update.append(keep)
+        for occ in extra:
+            delete_ids.append(occ.id)
+            diff.deleted.append(HolidayPayChange(key[0], key[1], float(occ.duration_hours), None))
+
+    if delete_ids:
+        Occurrence.objects.filter(pk__in=delete_ids).delete()
+    if to_update:
+        Occurrence.objects.bulk_update(to_update, ["duration_hours"])
+    if to_create:
+        Occurrence.objects.bulk_create(to_create)
+    changed = diff.created + diff.updated + diff.deleted
+    if changed:
+        invalidate_weekly_user_totals(
+            user_ids={c.user_id for c in changed},
+            week_endings={week_ending_for_date(c.date) for c in changed},
+        )
+    return diff
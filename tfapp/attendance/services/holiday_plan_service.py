@@ -76,7 +76,13 @@ def user_eligible_for_holiday_pay(user, holiday_date: date) -> bool:
     return True
 
 
-def plan_marks_paid_holiday_for_user_on_date(user, the_date: date, *, plan=None) -> bool:
+def plan_marks_paid_holiday_for_user_on_date(user, the_date: date, *, plan=None, calendar=None) -> bool:
+    if calendar is not None:
+        plan = plan or calendar.plan_for_date(the_date)
+        if not plan:
+            return False
+        template = user_holiday_schedule_template(user)
+        return calendar.holiday_pay_hours(the_date, template, plan=plan) > 0
     plan = plan or get_complete_plan_covering_date(the_date)
     if not plan:
         return False
@@ -146,6 +152,78 @@ def get_complete_plans_overlapping_range(start_date: date, end_date: date):
     )
 
 
+class HolidayPlanCalendar:
+    """
+    Complete holiday week plans for a date span, loaded with one query and indexed as
+    date -> template -> (work_hours, holiday_pay_hours). Each date maps to the plan
+    get_complete_plan_covering_date would return. Dates outside the span are loaded on demand.
+    """
+
+    def __init__(self, start: date, end: date, plans: list, rows_by_plan: dict):
+        self.start = start
+        self.end = end
+        self.plans = plans
+        self._rows_by_plan = rows_by_plan
+        self._plan_by_date = {}
+        current = start
+        while current <= end:
+            self._plan_by_date[current] = self._covering_plan(current)
+            current += timedelta(days=1)
+
+    @classmethod
+    def load(cls, start: date, end: date) -> HolidayPlanCalendar:
+        from attendance.models import HolidayWeekPlanDay
+
+        rows = HolidayWeekPlanDay.objects.filter(
+            plan__is_complete=True,
+            plan__week_start__lte=end,
+            plan__week_ending__gte=start,
+        ).select_related("plan")
+        plans_by_id = {}
+        rows_by_plan: dict[int, dict[date, dict[str, tuple[float, float]]]] = {}
+        for row in rows:
+            plans_by_id[row.plan_id] = row.plan
+            rows_by_plan.setdefault(row.plan_id, {}).setdefault(row.the_date, {})[row.template] = (
+                float(row.work_hours),
+                float(row.holiday_pay_hours),
+            )
+        # Same precedence as HolidayWeekPlan's default ordering (latest holiday first).
+        plans = sorted(plans_by_id.values(), key=lambda p: (p.actual_holiday_date, p.id), reverse=True)
+        return cls(start, end, plans, rows_by_plan)
+
+    def _covering_plan(self, the_date: date):
+        for plan in self.plans:
+            if plan.week_start <= the_date <= plan.week_ending:
+                return plan
+        return None
+
+    def plan_for_date(self, the_date: date):
+        if the_date not in self._plan_by_date:
+            extra = HolidayPlanCalendar.load(the_date, the_date)
+            for plan in extra.plans:
+                if plan.id not in self._rows_by_plan:
+                    self.plans.append(plan)
+                    self._rows_by_plan[plan.id] = extra._rows_by_plan.get(plan.id, {})
+            self.plans.sort(key=lambda p: (p.actual_holiday_date, p.id), reverse=True)
+            self._plan_by_date[the_date] = self._covering_plan(the_date)
+        return self._plan_by_date[the_date]
+
+    def _row(self, the_date: date, template: str, plan=None):
+        plan = plan or self.plan_for_date(the_date)
+        if not plan:
+            return None
+        return self._rows_by_plan.get(plan.id, {}).get(the_date, {}).get(template)
+
+    def work_hours(self, the_date: date, template: str, *, plan=None) -> float | None:
+        """Plan work hours for this date/template, or None when no plan row applies."""
+        row = self._row(the_date, template, plan)
+        return row[0] if row else None
+
+    def holiday_pay_hours(self, the_date: date, template: str, *, plan=None) -> float:
+        row = self._row(the_date, template, plan)
+        return row[1] if row else 0.0
+
+
 def _plan_day_row(plan, *, the_date: date, template: str):
     for day in plan.days.all():
         if day.the_date == the_date and day.template == template:
@@ -167,13 +245,13 @@ def plan_holiday_pay_hours(plan, *, the_date: date, template: str) -> float:
     return float(row.holiday_pay_hours)
 
 
-def effective_work_hours_for_day(user, the_date: date) -> float:
+def effective_work_hours_for_day(user, the_date: date, *, calendar: HolidayPlanCalendar | None = None) -> float:
     normal = scheduled_duration_hours_for_day(user, the_date)
-    plan = get_complete_plan_covering_date(the_date)
-    if not plan:
+    calendar = calendar or HolidayPlanCalendar.load(the_date, the_date)
+    if not calendar.plan_for_date(the_date):
         return normal
     template = user_holiday_schedule_template(user)
-    plan_hours = plan_work_hours(plan, the_date=the_date, template=template)
+    plan_hours = calendar.work_hours(the_date, template)
     if plan_hours is None:
         return normal
     if plan_hours <= 0 or normal <= 0:
@@ -181,19 +259,27 @@ def effective_work_hours_for_day(user, the_date: date) -> float:
     return min(plan_hours, normal)
 
 
-def holiday_pay_hours_for_user_on_date(user, the_date: date, *, plan=None) -> float:
+def holiday_pay_hours_for_user_on_date(user, the_date: date, *, plan=None, calendar=None) -> float:
     if not user_eligible_for_holiday_pay(user, the_date):
         return 0.0
-    if not plan_marks_paid_holiday_for_user_on_date(user, the_date, plan=plan):
+    if not plan_marks_paid_holiday_for_user_on_date(user, the_date, plan=plan, calendar=calendar):
         return 0.0
     return prevailing_schedule_shift_hours(user)
 
 
-def effective_scheduled_hours_for_range(user, week_start: date, week_ending: date) -> float:
+def effective_scheduled_hours_for_range(
+    user,
+    week_start: date,
+    week_ending: date,
+    *,
+    calendar: HolidayPlanCalendar | None = None,
+) -> float:
+    """Sum of effective_work_hours_for_day; pass ``calendar`` to share one plan load across users."""
+    calendar = calendar or HolidayPlanCalendar.load(week_start, week_ending)
     total = 0.0
     current = week_start
     while current <= week_ending:
-        total += effective_work_hours_for_day(user, current)
+        total += effective_work_hours_for_day(user, current, calendar=calendar)
         current += timedelta(days=1)
     return total
 
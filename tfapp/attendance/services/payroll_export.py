@@ -0,0 +1,128 @@
+"""
+Payroll close CSV: one row per employee (worked capped at 40, overtime, applied PTO, holiday)
+plus a totals row, built from one grouped query per data source. Worked hours of a finalized
+week come from the FINALIZED daily summaries written at close, so a later schedule or entry
+edit does not change a closed file.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import date, timedelta
+
+from django.db.models import Q, Sum
+
+from attendance.models import CustomUser, DailyAttendanceSummary, Occurrence, OccurrenceSubtype, PayrollPeriod
+from attendance.payroll_utils import payroll_sort_key
+from attendance.services.entry_hours import entry_hours_by_user
+from timeclock.models import TimeEntry
+
+
+def payroll_csv_filename(week_ending: date) -> str:
+    return f"payroll_week_ending_{week_ending.strftime('%Y-%m-%d')}.csv"
+
+
+def payroll_csv_users(week_ending: date) -> list:
+    """
+    Non-exempt employees for the week's CSV, in payroll order: everyone active now plus anyone
+    with entries, occurrences or daily summaries in the week, so re-downloading a closed week
+    still lists employees deactivated since.
+    """
+    week_start = week_ending - timedelta(days=6)
+    in_week = Q(date__range=[week_start, week_ending])
+    return sorted(
+        CustomUser.objects.filter(is_exempt=False).filter(
+            Q(is_active=True)
+            | Q(pk__in=TimeEntry.objects.filter(in_week).values("user_id"))
+            | Q(pk__in=Occurrence.objects.filter(in_week).values("user_id"))
+            | Q(
+                pk__in=DailyAttendanceSummary.objects.filter(
+                    work_date__range=[week_start, week_ending]
+                ).values("user_id")
+            )
+        ),
+        key=payroll_sort_key,
+    )
+
+
+def payroll_csv_rows(users, week_ending: date) -> Iterator[list]:
+    """
+    Rows for ``users`` (already in output order), then the totals row. Queries run here;
+    the returned iterator only formats, so it can be streamed after the view returns.
+    """
+    week_start = week_ending - timedelta(days=6)
+    user_ids = [u.id for u in users]
+
+    # Missing sums stay int 0 so the file reads "0" exactly as the per-user Python sums did.
+    period = PayrollPeriod.objects.filter(week_ending=week_ending, is_finalized=True).first()
+    if period is not None:
+        # Days with scheduled but no worked time have rows too; they leave the sum at int 0.
+        worked_by_uid = dict(
+            DailyAttendanceSummary.objects.filter(
+                payroll_period=period,
+                status=DailyAttendanceSummary.Status.FINALIZED,
+                user_id__in=user_ids,
+                worked_hours__gt=0,
+            )
+            .values("user_id")
+            .annotate(worked=Sum("worked_hours"))
+            .order_by()
+            .values_list("user_id", "worked")
+        )
+    else:
+        worked_by_uid = {
+            uid: hours["credited"] or 0
+            for uid, hours in entry_hours_by_user(user_ids, week_start, week_ending).items()
+        }
+    occ_by_uid = {}
+    for row in (
+        Occurrence.objects.filter(user_id__in=user_ids, date__range=[week_start, week_ending])
+        .values("user_id")
+        .annotate(
+            # "Applied PTO" only counts PTO deducted, not total occurrence hours.
+            pto=Sum(
+                "pto_hours_applied",
+                filter=Q(pto_applied=True) & ~Q(subtype=OccurrenceSubtype.HOLIDAY_PAID),
+            ),
+            holiday=Sum("duration_hours", filter=Q(subtype=OccurrenceSubtype.HOLIDAY_PAID)),
+        )
+        .order_by()
+    ):
+        occ_by_uid[row["user_id"]] = (
+            0 if row["pto"] is None else float(row["pto"]),
+            0 if row["holiday"] is None else float(row["holiday"]),
+        )
+
+    return _format_rows(users, worked_by_uid, occ_by_uid)
+
+
+def _format_rows(users, worked_by_uid, occ_by_uid) -> Iterator[list]:
+    total_worked_all = 0.0
+    total_overtime_all = 0.0
+    total_pto_all = 0.0
+    total_holiday_all = 0.0
+    for user in users:
+        total_worked_hours = worked_by_uid.get(user.id, 0)
+        pto_hours, holiday_hours = occ_by_uid.get(user.id, (0, 0))
+        worked_hours_capped = min(total_worked_hours, 40)
+        overtime = max(total_worked_hours - 40, 0)
+        total_worked_all += worked_hours_capped
+        total_overtime_all += overtime
+        total_pto_all += pto_hours
+        total_holiday_all += holiday_hours
+        yield [
+            user.payroll_last_name_for_display() or "",
+            user.payroll_first_name_for_display() or "",
+            round(worked_hours_capped, 2),
+            round(overtime, 2),
+            round(pto_hours, 2),
+            round(holiday_hours, 2),
+        ]
+
+    yield [
+        "",
+        "",
+        round(total_worked_all, 2),
+        round(total_overtime_all, 2),
+        round(total_pto_all, 2),
+        round(total_holiday_all, 2),
+    ]
@@ -0,0 +1,498 @@
+"""
+Payroll week CSV template export and import (the "Download template" / "Upload edited CSV"
+round trip).
+
+The template is built from one query for the range's entries; days without an entry are
+filled from each employee's compiled schedule.
+
+The file is parsed and validated as a whole before anything is written, names are matched
+through one index of active non-exempt employees, and each row is diffed against the entry
+already stored for that day. Only created / updated / cleared days are written (in bulk), and
+a tardy re-sync is queued for each affected employee-day (attendance.services.tardy_sync_queue). A plan can be rendered as a dry run
+before it is applied.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+from collections import defaultdict
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from django.db import transaction
+from django.utils import timezone as django_tz
+
+from attendance.models import CustomUser, TimeOffRequestStatus, WorkThroughLunchRequest
+from attendance.payroll_utils import is_payroll_week_finalized
+from attendance.services.tardy_sync_queue import enqueue_tardy_sync
+from attendance.services.time_processing import (
+    clock_in_at_or_after_scheduled_lunch_in,
+    get_scheduled_lunch_in_for_day,
+    get_scheduled_lunch_out_for_day,
+    suggested_punch_times_for_day,
+)
+from attendance.services.weekly_totals import invalidate_weekly_user_totals
+from attendance.slug_utils import assign_unique_slugs
+from timeclock.models import TimeEntry
+
+PAYROLL_CSV_HEADER = [
+    "week_ending",
+    "payroll_lastname",
+    "payroll_firstname",
+    "work_date",
+    "clock_in",
+    "lunch_out",
+    "lunch_in",
+    "clock_out",
+]
+
+# Fields the import sets on an entry (directly or through TimeEntry.apply_save_rules).
+_WRITTEN_FIELDS = (
+    "clock_in",
+    "lunch_out",
+    "lunch_in",
+    "clock_out",
+    "clock_in_override_denied",
+    "clock_in_early_override_denied",
+    "clock_in_authorized_by_id",
+    "clock_in_early_authorized_by_id",
+    "payroll_lunch_review_required",
+    "missing_punch_flagged",
+    "missing_punch_flagged_at",
+)
+_UPDATE_FIELDS = [f.removesuffix("_id") for f in _WRITTEN_FIELDS] + list(TimeEntry.HOURS_FIELDS)
+
+
+class PayrollImportError(Exception):
+    """Rejected file; ``week_ending`` is the week to return to when it is known."""
+
+    def __init__(self, message: str, week_ending: Optional[date] = None):
+        super().__init__(message)
+        self.message = message
+        self.week_ending = week_ending
+
+
+def normalize_csv_row(row, n=8):
+    """Pad with empty strings or trim so spreadsheets that drop trailing empty columns still parse."""
+    out = []
+    for c in row:
+        if c is None:
+            cell = ""
+        else:
+            cell = str(c).strip().strip("\ufeff").strip()
+        out.append(cell)
+    if len(out) < n:
+        out.extend([""] * (n - len(out)))
+    elif len(out) > n:
+        out = out[:n]
+    return out
+
+
+def parse_csv_date(value: str) -> Optional[date]:
+    """
+    Accept ISO YYYY-MM-DD (from our download) or US M/D/YYYY and M/D/YY (typical Excel CSV).
+    Strips Excel datetime suffix (e.g. '4/11/2026 12:00:00').
+    """
+    s = (value or "").strip().strip("\ufeff")
+    if not s:
+        return None
+    if " " in s:
+        s = s.split()[0]
+    try:
+        return date.fromisoformat(s)
+    except ValueError:
+        pass
+    m = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{4})$", s)
+    if m:
+        month, day, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        try:
+            return date(year, month, day)
+        except ValueError:
+            return None
+    m = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{2})$", s)
+    if m:
+        month, day, y2 = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        year = 2000 + y2 if y2 < 50 else 1900 + y2
+        try:
+            return date(year, month, day)
+        except ValueError:
+            return None
+    return None
+
+
+def parse_csv_time_cell(value: str):
+    if value is None or not str(value).strip():
+        return None
+    s = str(value).strip()
+    for fmt in ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M:%S %p"):
+        try:
+            return datetime.strptime(s, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def make_aware_on_date(d: date, t: time) -> datetime:
+    naive = datetime.combine(d, t)
+    return django_tz.make_aware(naive, django_tz.get_current_timezone())
+
+
+def clock_out_calendar_date(user, work_date: date, clock_in_t: Optional[time], clock_out_t: Optional[time]) -> date:
+    """
+    Calendar date for clock_out when importing HH:MM punches anchored on ``work_date``.
+
+    If the out time is at or before the in time on a 24h clock, the punch is the next calendar
+    morning (overnight shift). This must not depend on ``crosses_midnight`` being set correctly
+    on the user's schedule, or CSV imports store clock_out on the wrong day and both
+    ``actual_worked_hours`` and ``reported_worked_hours`` collapse to zero.
+    """
+    _ = user  # reserved for future schedule-aware import rules
+    if clock_out_t is None or clock_in_t is None:
+        return work_date
+    if clock_out_t <= clock_in_t:
+        return work_date + timedelta(days=1)
+    return work_date
+
+
+def format_csv_time(dt) -> str:
+    if not dt:
+        return ""
+    return django_tz.localtime(dt).strftime("%H:%M")
+
+
+def _format_time_only(t) -> str:
+    if not t:
+        return ""
+    return t.strftime("%H:%M")
+
+
+def payroll_template_filename(week_endings: list[date]) -> str:
+    if len(week_endings) == 1:
+        return f"payroll_time_entries_{week_endings[0].isoformat()}.csv"
+    return f"payroll_time_entries_{week_endings[0].isoformat()}_to_{week_endings[-1].isoformat()}.csv"
+
+
+def payroll_template_rows(users, week_endings: list[date]) -> Iterator[list]:
+    """
+    Header, then one row per employee per day of each week in ``week_endings`` (ascending):
+    existing punches, or the scheduled times when the day has no entry. ``users`` are in output
+    order and should have ``schedules`` prefetched. The entry query runs here; the returned
+    iterator only formats, so it can be streamed.
+    """
+    user_ids = [u.id for u in users]
+    entries = {}
+    if week_endings:
+        for e in TimeEntry.objects.filter(
+            user_id__in=user_ids,
+            date__range=[week_endings[0] - timedelta(days=6), week_endings[-1]],
+        ).only("user_id", "date", "clock_in", "lunch_out", "lunch_in", "clock_out"):
+            entries[(e.user_id, e.date)] = e
+    return _format_template_rows(users, week_endings, entries)
+
+
+def _format_template_rows(users, week_endings, entries) -> Iterator[list]:
+    yield PAYROLL_CSV_HEADER
+    for week_ending in week_endings:
+        dates = [week_ending - timedelta(days=6 - i) for i in range(7)]
+        for u in users:
+            for d in dates:
+                row = [week_ending.isoformat(), u.payroll_lastname, u.payroll_firstname, d.isoformat()]
+                e = entries.get((u.id, d))
+                if e:
+                    row += [
+                        format_csv_time(e.clock_in),
+                        format_csv_time(e.lunch_out),
+                        format_csv_time(e.lunch_in),
+                        format_csv_time(e.clock_out),
+                    ]
+                else:
+                    sug = suggested_punch_times_for_day(u, d)
+                    row += [
+                        _format_time_only(sug["clock_in"]),
+                        _format_time_only(sug["lunch_out"]),
+                        _format_time_only(sug["lunch_in"]),
+                        _format_time_only(sug["clock_out"]),
+                    ]
+                yield row
+
+
+def _name_key(last: str, first: str) -> tuple[str, str]:
+    return ((last or "").strip().casefold(), (first or "").strip().casefold())
+
+
+def payroll_name_index(users) -> dict[tuple[str, str], list]:
+    """(last, first) casefolded -> users; payroll names win over account names, as on the export."""
+    index = defaultdict(list)
+    for u in users:
+        index[_name_key(u.payroll_lastname or u.last_name, u.payroll_firstname or u.first_name)].append(u)
+    return index
+
+
+@dataclass
+class ImportRow:
+    """One validated CSV day. ``clock_in`` is None when the row clears the day."""
+
+    user: CustomUser
+    work_date: date
+    clock_in: Optional[datetime] = None
+    lunch_out: Optional[datetime] = None
+    lunch_in: Optional[datetime] = None
+    clock_out: Optional[datetime] = None
+    lunch_omitted: bool = False
+
+
+@dataclass
+class ParsedPayrollCsv:
+    week_ending: date
+    rows: list[ImportRow]
+
+
+@dataclass
+class ImportChange:
+    action: str  # "create", "update", "delete" or "unchanged"
+    user: CustomUser
+    work_date: date
+    before: tuple = ()
+    after: tuple = ()
+    entry: Optional[TimeEntry] = None
+
+
+@dataclass
+class PayrollImportPlan:
+    week_ending: date
+    changes: list[ImportChange] = field(default_factory=list)
+
+    def _with_action(self, action):
+        return [c for c in self.changes if c.action == action]
+
+    @property
+    def created(self):
+        return self._with_action("create")
+
+    @property
+    def updated(self):
+        return self._with_action("update")
+
+    @property
+    def deleted(self):
+        return self._with_action("delete")
+
+    @property
+    def unchanged(self):
+        return self._with_action("unchanged")
+
+    @property
+    def pending(self):
+        return [c for c in self.changes if c.action != "unchanged"]
+
+    @property
+    def has_changes(self) -> bool:
+        return any(c.action != "unchanged" for c in self.changes)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.created) + len(self.updated)} row(s) saved, {len(self.deleted)} day(s) cleared, "
+            f"{len(self.unchanged)} unchanged"
+        )
+
+
+def read_payroll_csv(raw: str) -> list[list[str]]:
+    return [r for r in csv.reader(io.StringIO(raw)) if any((c or "").strip() for c in r)]
+
+
+def parse_payroll_csv(raw: str) -> ParsedPayrollCsv:
+    """Validate the whole file; raises PayrollImportError with the first problem found."""
+    rows = read_payroll_csv(raw)
+    if len(rows) < 2:
+        raise PayrollImportError("CSV must include a header row and at least one data row.")
+    header = [c.strip().lower().strip("\ufeff") for c in normalize_csv_row(rows[0], 8)]
+    if header != PAYROLL_CSV_HEADER:
+        raise PayrollImportError(
+            "Header must be: week_ending, payroll_lastname, payroll_firstname, work_date, "
+            "clock_in, lunch_out, lunch_in, clock_out"
+        )
+
+    week_peek = None
+    for row in rows[1:]:
+        if len(row) >= 1:
+            week_peek = parse_csv_date(row[0])
+            if week_peek is not None:
+                break
+    if week_peek and is_payroll_week_finalized(week_peek):
+        raise PayrollImportError(
+            "That payroll week is finalized. Unfinalize before importing time entries.", week_peek
+        )
+
+    index = payroll_name_index(
+        CustomUser.objects.filter(is_active=True, is_exempt=False).prefetch_related("schedules")
+    )
+    week_ending = None
+    parsed = []
+    for row in rows[1:]:
+        row = normalize_csv_row(row, 8)
+        we = parse_csv_date(row[0])
+        wd = parse_csv_date(row[3])
+        if we is None or wd is None:
+            raise PayrollImportError(
+                "Invalid date in row; use YYYY-MM-DD or M/D/YYYY as exported from Excel. "
+                f"Got week_ending={row[0]!r}, work_date={row[3]!r}"
+            )
+        if week_ending is None:
+            week_ending = we
+        elif we != week_ending:
+            raise PayrollImportError("All rows must use the same week_ending.")
+        if wd < week_ending - timedelta(days=6) or wd > week_ending:
+            raise PayrollImportError(f"work_date {wd} is outside the week ending {week_ending}.")
+
+        matches = index.get(_name_key(row[1], row[2]), [])
+        if len(matches) != 1:
+            raise PayrollImportError(f"No unique active employee for payroll name {row[1]!r}, {row[2]!r}.")
+        u = matches[0]
+
+        ci = parse_csv_time_cell(row[4])
+        lo = parse_csv_time_cell(row[5])
+        li = parse_csv_time_cell(row[6])
+        co = parse_csv_time_cell(row[7])
+        if not any([ci, lo, li, co]):
+            parsed.append(ImportRow(user=u, work_date=wd))
+            continue
+        if not ci or not co:
+            raise PayrollImportError(
+                f"clock_in and clock_out are required when entering any punches on {wd} "
+                f"for {u.payroll_display_name()}."
+            )
+        cin = make_aware_on_date(wd, ci)
+        cout = make_aware_on_date(clock_out_calendar_date(u, wd, ci, co), co)
+        # Belt-and-suspenders: if out still not after in (DST / edge / stale schedule), bump one day.
+        if cout <= cin:
+            cout = cout + timedelta(days=1)
+        parsed.append(
+            ImportRow(
+                user=u,
+                work_date=wd,
+                clock_in=cin,
+                lunch_out=make_aware_on_date(wd, lo) if lo else None,
+                lunch_in=make_aware_on_date(wd, li) if li else None,
+                clock_out=cout,
+                lunch_omitted=lo is None and li is None,
+            )
+        )
+
+    if week_ending is None:
+        raise PayrollImportError("No data rows.")
+    return ParsedPayrollCsv(week_ending=week_ending, rows=parsed)
+
+
+def _punches(entry) -> tuple:
+    if entry is None:
+        return ()
+    return tuple(format_csv_time(v) for v in (entry.clock_in, entry.lunch_out, entry.lunch_in, entry.clock_out))
+
+
+def build_payroll_import_plan(parsed: ParsedPayrollCsv, *, lock: bool = False) -> PayrollImportPlan:
+    """
+    Diff ``parsed`` against stored entries (one query). A later row for the same employee and
+    day replaces an earlier one, as it did when rows were saved one by one. With ``lock``
+    (inside a transaction) the existing entries are selected for update.
+    """
+    week_start = parsed.week_ending - timedelta(days=6)
+    target = {}
+    for row in parsed.rows:
+        target[(row.user.pk, row.work_date)] = row
+    user_ids = {uid for uid, _ in target}
+
+    existing_qs = TimeEntry.objects.filter(user_id__in=user_ids, date__range=[week_start, parsed.week_ending])
+    if lock:
+        existing_qs = existing_qs.select_for_update()
+    existing = {(e.user_id, e.date): e for e in existing_qs}
+    work_through_lunch = set(
+        WorkThroughLunchRequest.objects.filter(
+            user_id__in=user_ids,
+            work_date__range=[week_start, parsed.week_ending],
+            status=TimeOffRequestStatus.APPROVED,
+        ).values_list("user_id", "work_date")
+    )
+
+    plan = PayrollImportPlan(week_ending=parsed.week_ending)
+    for key, row in target.items():
+        entry = existing.get(key)
+        if row.clock_in is None:
+            if entry is not None:
+                plan.changes.append(
+                    ImportChange("delete", row.user, row.work_date, before=_punches(entry), entry=entry)
+                )
+            continue
+
+        if entry is None:
+            entry = TimeEntry(user=row.user, date=row.work_date)
+            before_state = None
+        else:
+            entry.user = row.user
+            before_state = tuple(getattr(entry, f) for f in _WRITTEN_FIELDS)
+        before = _punches(entry) if before_state is not None else ()
+
+        entry.clock_in = row.clock_in
+        entry.lunch_out = row.lunch_out
+        entry.lunch_in = row.lunch_in
+        entry.clock_out = row.clock_out
+        entry.clock_in_override_denied = False
+        entry.clock_in_early_override_denied = False
+        entry.clock_in_authorized_by = None
+        entry.clock_in_early_authorized_by = None
+        entry.payroll_lunch_review_required = bool(
+            row.lunch_omitted
+            and get_scheduled_lunch_out_for_day(row.user, row.work_date)
+            and get_scheduled_lunch_in_for_day(row.user, row.work_date)
+            and not clock_in_at_or_after_scheduled_lunch_in(row.user, row.work_date, row.clock_in)
+        )
+        entry.apply_save_rules(work_through_lunch=key in work_through_lunch)
+
+        if before_state is None:
+            action = "create"
+        elif tuple(getattr(entry, f) for f in _WRITTEN_FIELDS) == before_state:
+            action = "unchanged"
+        else:
+            action = "update"
+        plan.changes.append(
+            ImportChange(action, row.user, row.work_date, before=before, after=_punches(entry), entry=entry)
+        )
+    return plan
+
+
+def apply_payroll_import(parsed: ParsedPayrollCsv) -> PayrollImportPlan:
+    """
+    Re-diff under row locks and write only the changes: bulk delete / update / create, then
+    tardy sync once per affected employee and one weekly totals invalidation.
+    """
+    with transaction.atomic():
+        plan = build_payroll_import_plan(parsed, lock=True)
+        if not plan.has_changes:
+            return plan
+
+        deleted = plan.deleted
+        if deleted:
+            TimeEntry.objects.filter(pk__in=[c.entry.pk for c in deleted]).delete()
+
+        saved = plan.created + plan.updated
+        for change in saved:
+            change.entry.store_computed_hours()
+        if plan.updated:
+            TimeEntry.objects.bulk_update([c.entry for c in plan.updated], _UPDATE_FIELDS, batch_size=500)
+        if plan.created:
+            new_entries = [c.entry for c in plan.created]
+            assign_unique_slugs(new_entries, "slug", max_length=48)
+            TimeEntry.objects.bulk_create(new_entries, batch_size=500)
+
+        dates_by_user = defaultdict(set)
+        for change in saved:
+            dates_by_user[change.user.pk].add(change.entry.date)
+        for change in deleted:
+            dates_by_user[change.user.pk].add(change.work_date)
+        for user_id in sorted(dates_by_user):
+            enqueue_tardy_sync(user_id, dates_by_user[user_id])
+
+        invalidate_weekly_user_totals(week_endings=[parsed.week_ending])
+    return plan
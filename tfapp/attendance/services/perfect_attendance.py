@@ -0,0 +1,147 @@
+"""
+Perfect Attendance by calendar month, stored in PerfectAttendanceResult.
+
+Qualification is one anti-join over Occurrence for the period and hours are one grouped sum
+over stored TimeEntry hours. Open months are recomputed on read when their rows are older than
+PERFECT_ATTENDANCE_CACHE_SECONDS or cover a shorter period; once the payroll week containing a
+month's last day is finalized the month is stored as final and read as-is.
+"""
+from __future__ import annotations
+
+from calendar import monthrange
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone as django_tz
+
+from attendance.models import (
+    PERFECT_ATTENDANCE_DISQUALIFYING_SUBTYPES,
+    CustomUser,
+    Occurrence,
+    OccurrenceType,
+    PerfectAttendanceResult,
+    user_eligible_for_perfect_attendance_new_hire_month,
+)
+from attendance.payroll_utils import is_payroll_week_finalized, payroll_sort_key, week_ending_for_date
+from attendance.services.entry_hours import entry_hours_by_user
+
+
+def _month_last_day(month_first: date) -> date:
+    return date(month_first.year, month_first.month, monthrange(month_first.year, month_first.month)[1])
+
+
+def perfect_attendance_candidate_users():
+    """
+    Active employees considered for Perfect Attendance lists. Same queryset for every role so
+    all users see the full qualifying list; only reported hours are restricted to executives.
+    """
+    return CustomUser.objects.filter(is_active=True).order_by(
+        "payroll_lastname",
+        "payroll_firstname",
+        "last_name",
+        "first_name",
+        "username",
+    )
+
+
+def perfect_attendance_with_hours(visible_users, first: date, period_end: date):
+    """
+    Non-exempt users only: zero UNPLANNED absences in [first, period_end]; no disqualifying
+    occurrence subtypes in that range; new hires (hire or service date) only from their first
+    full calendar month after hire onward.
+
+    total_hours is the sum of payroll_credited_hours on completed time entries in that range
+    (0.00 if none); PTO / absence hours are not included.
+    """
+    disqualifying = Occurrence.objects.filter(
+        user=OuterRef("pk"),
+        date__gte=first,
+        date__lte=period_end,
+    ).filter(
+        Q(occurrence_type=OccurrenceType.UNPLANNED)
+        | Q(subtype__in=PERFECT_ATTENDANCE_DISQUALIFYING_SUBTYPES)
+    )
+    users = [
+        u
+        for u in visible_users.filter(is_exempt=False).exclude(Exists(disqualifying))
+        if user_eligible_for_perfect_attendance_new_hire_month(u.hire_date or u.service_date, first)
+    ]
+    hours_by_uid = entry_hours_by_user([u.id for u in users], first, period_end, completed_only=True)
+    rows = [
+        {"user": u, "total_hours": round(hours_by_uid.get(u.id, {}).get("credited", 0.0), 2)}
+        for u in users
+    ]
+    rows.sort(key=lambda r: payroll_sort_key(r["user"]))
+    return rows
+
+
+def store_perfect_attendance_month(month_first: date, period_end: date, *, finalized: bool = False):
+    """Recompute the month for every candidate and replace its stored rows; returns qualifying rows."""
+    candidates = list(perfect_attendance_candidate_users().filter(is_exempt=False))
+    rows = perfect_attendance_with_hours(perfect_attendance_candidate_users(), month_first, period_end)
+    hours_by_uid = {r["user"].id: r["total_hours"] for r in rows}
+    with transaction.atomic():
+        PerfectAttendanceResult.objects.filter(month=month_first).delete()
+        PerfectAttendanceResult.objects.bulk_create(
+            [
+                PerfectAttendanceResult(
+                    user=u,
+                    month=month_first,
+                    period_end=period_end,
+                    qualifies=u.id in hours_by_uid,
+                    total_hours=hours_by_uid.get(u.id, 0.0),
+                    is_finalized=finalized,
+                )
+                for u in candidates
+            ],
+            ignore_conflicts=True,
+        )
+    return rows
+
+
+def perfect_attendance_rows(month_first: date, period_end: date):
+    """
+    Qualifying rows ({"user", "total_hours"}, payroll order) for the month through
+    ``period_end``, read from PerfectAttendanceResult and recomputed only when stale.
+    """
+    stored = list(
+        PerfectAttendanceResult.objects.filter(month=month_first).select_related("user")
+    )
+    max_age = timedelta(seconds=getattr(settings, "PERFECT_ATTENDANCE_CACHE_SECONDS", 10 * 60))
+    fresh = bool(stored) and (
+        stored[0].is_finalized
+        or (
+            all(r.period_end == period_end for r in stored)
+            and min(r.computed_at for r in stored) > django_tz.now() - max_age
+        )
+    )
+    if not fresh:
+        month_last = _month_last_day(month_first)
+        finalized = period_end == month_last and is_payroll_week_finalized(week_ending_for_date(month_last))
+        return store_perfect_attendance_month(month_first, period_end, finalized=finalized)
+    rows = [{"user": r.user, "total_hours": r.total_hours} for r in stored if r.qualifies]
+    rows.sort(key=lambda r: payroll_sort_key(r["user"]))
+    return rows
+
+
+def _months_in_week(week_start: date, week_ending: date) -> list[date]:
+    return sorted({week_start.replace(day=1), week_ending.replace(day=1)})
+
+
+def finalize_perfect_attendance_for_week(week_start: date, week_ending: date) -> None:
+    """
+    Called when a payroll week closes: store final results for every month overlapping it
+    whose last day falls in this week or in a week already finalized (a week reopened and
+    closed again after its month was final).
+    """
+    for month_first in _months_in_week(week_start, week_ending):
+        month_last = _month_last_day(month_first)
+        if month_last <= week_ending or is_payroll_week_finalized(week_ending_for_date(month_last)):
+            store_perfect_attendance_month(month_first, month_last, finalized=True)
+
+
+def reopen_perfect_attendance_for_week(week_start: date, week_ending: date) -> None:
+    """Called on unfinalize: drop stored results for every month overlapping the week."""
+    PerfectAttendanceResult.objects.filter(month__in=_months_in_week(week_start, week_ending)).delete()
@@ -0,0 +1,212 @@
+"""
+Reads and checks over the PTO ledger (PTOBalanceHistory).
+
+Every balance change is a ledger row carrying the balance after it, so the balance at any
+moment is the newest row at or before it: one descent of the (user, balance_type, timestamp)
+index, however long the history. ``reconcile_ledger`` replays the changes (from each user's
+latest checkpoint, or from the start) and compares the result with the stored balances;
+``manage.py reconcile_pto_ledger`` reports drift, can book corrections, and writes the
+periodic checkpoints that keep the next replay short.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from attendance.models import PTO_LEDGER_FIELDS, CustomUser, PTOBalanceHistory, ledger_amount
+
+
+def _moment(when) -> datetime:
+    """A date means the end of that day (local time); datetimes are used as given."""
+    if isinstance(when, datetime):
+        return when
+    if isinstance(when, date):
+        return timezone.make_aware(datetime.combine(when, time.max), timezone.get_current_timezone())
+    raise TypeError(f"Expected a date or datetime, got {type(when).__name__}")
+
+
+def balance_as_of(user, when, balance_type=PTOBalanceHistory.BALANCE_TYPE_PTO) -> float | None:
+    """
+    ``user``'s ``balance_type`` balance at ``when`` (a date means its end of day), or None
+    when the ledger has no row for them by then.
+    """
+    user_id = getattr(user, "pk", user)
+    balance = (
+        PTOBalanceHistory.objects.filter(user_id=user_id, balance_type=balance_type, timestamp__lte=_moment(when))
+        .order_by("-timestamp", "-pk")
+        .values_list("balance_after", flat=True)
+        .first()
+    )
+    return None if balance is None else float(balance)
+
+
+def balances_as_of(users, when) -> dict[int, dict[str, float | None]]:
+    """
+    PTO and personal balances at ``when`` for many users in one query:
+    ``{user_id: {"pto": ..., "personal": ...}}`` (None where the ledger has no row yet).
+    ``users`` is a queryset or an iterable of users / ids.
+    """
+    moment = _moment(when)
+    if hasattr(users, "values_list"):
+        user_qs = users
+    else:
+        user_qs = CustomUser.objects.filter(pk__in=[getattr(u, "pk", u) for u in users])
+
+    def latest(balance_type):
+        return Subquery(
+            PTOBalanceHistory.objects.filter(
+                user_id=OuterRef("pk"), balance_type=balance_type, timestamp__lte=moment
+            )
+            .order_by("-timestamp", "-pk")
+            .values("balance_after")[:1]
+        )
+
+    rows = user_qs.order_by().annotate(**{f"_ledger_{t}": latest(t) for t in PTO_LEDGER_FIELDS}).values_list(
+        "pk", *(f"_ledger_{t}" for t in PTO_LEDGER_FIELDS)
+    )
+    return {
+        row[0]: {t: None if value is None else float(value) for t, value in zip(PTO_LEDGER_FIELDS, row[1:])}
+        for row in rows
+    }
+
+
+@dataclass
+class LedgerDrift:
+    """A (user, balance type) whose replayed ledger disagrees with itself or with the stored balance."""
+
+    user_id: int
+    balance_type: str
+    ledger_balance: Decimal
+    stored_balance: Decimal
+    # (row pk, balance_after recorded, balance the replay reached) for rows whose stated
+    # balance does not follow from the rows before them.
+    breaks: list[tuple[int, Decimal, Decimal]] = field(default_factory=list)
+
+    @property
+    def difference(self) -> Decimal:
+        return self.stored_balance - self.ledger_balance
+
+
+def reconcile_ledger(user_ids=None, full=False) -> list[LedgerDrift]:
+    """
+    Replay the ledger for ``user_ids`` (default: everyone), starting at each (user, balance
+    type)'s latest checkpoint unless ``full``, and return the drifts found. A full replay also
+    checks each checkpoint against the changes before it, then continues from the checkpoint.
+    """
+    users = CustomUser.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=list(user_ids))
+    stored = {
+        pk: {t: ledger_amount(value) for t, value in zip(PTO_LEDGER_FIELDS, values)}
+        for pk, *values in users.values_list("pk", *PTO_LEDGER_FIELDS.values())
+    }
+
+    rows = PTOBalanceHistory.objects.filter(user_id__in=list(stored))
+    if not full:
+        rows = rows.annotate(
+            _checkpoint=Subquery(
+                PTOBalanceHistory.objects.filter(
+                    user_id=OuterRef("user_id"), balance_type=OuterRef("balance_type"), is_checkpoint=True
+                )
+                .order_by("-pk")
+                .values("pk")[:1]
+            )
+        ).filter(Q(_checkpoint__isnull=True) | Q(pk__gte=F("_checkpoint")))
+
+    # Rows replay in append (pk) order.
+    replayed: dict[tuple[int, str], Decimal] = {}
+    breaks: dict[tuple[int, str], list] = {}
+    for pk, user_id, balance_type, change, balance_after, is_checkpoint in rows.order_by(
+        "user_id", "balance_type", "pk"
+    ).values_list("pk", "user_id", "balance_type", "change", "balance_after", "is_checkpoint").iterator():
+        key = (user_id, balance_type)
+        if is_checkpoint and key not in replayed:
+            replayed[key] = balance_after
+            continue
+        running = replayed.get(key, Decimal("0.00")) + change
+        if running != balance_after:
+            breaks.setdefault(key, []).append((pk, balance_after, running))
+        replayed[key] = balance_after if is_checkpoint else running
+
+    drifts = []
+    for user_id in sorted(stored):
+        for balance_type in PTO_LEDGER_FIELDS:
+            key = (user_id, balance_type)
+            ledger_balance = replayed.get(key, Decimal("0.00"))
+            stored_balance = stored[user_id][balance_type]
+            if ledger_balance != stored_balance or key in breaks:
+                drifts.append(
+                    LedgerDrift(user_id, balance_type, ledger_balance, stored_balance, breaks.get(key, []))
+                )
+    return drifts
+
+
+def book_corrections(user_ids=None, full=False) -> list[LedgerDrift]:
+    """
+    Append a "Reconciliation adjustment" row wherever the replayed ledger ends away from the
+    stored balance (the stored balance is what payroll has used, so the ledger is brought to it).
+    Users are locked while they are checked. Returns the drifts found, corrected or not.
+    """
+    with transaction.atomic():
+        users = CustomUser.objects.select_for_update().order_by("pk")
+        if user_ids is not None:
+            users = users.filter(pk__in=list(user_ids))
+        drifts = reconcile_ledger(list(users.values_list("pk", flat=True)), full=full)
+        PTOBalanceHistory.append(
+            [
+                PTOBalanceHistory(
+                    user_id=d.user_id,
+                    change=d.difference,
+                    reason="Reconciliation adjustment",
+                    balance_after=d.stored_balance,
+                    balance_type=d.balance_type,
+                )
+                for d in drifts
+                if d.difference
+            ]
+        )
+    return drifts
+
+
+def write_checkpoints(user_ids=None, chunk_size=500) -> int:
+    """
+    Restate each user's current PTO and personal balances as checkpoint rows, so the next
+    reconciliation replays only what follows. Each chunk of users is locked and reconciled
+    first; users whose ledger ends away from the stored balance are skipped (book corrections
+    for them, then checkpoint). Returns the number of rows written.
+    """
+    users = CustomUser.objects.order_by("pk")
+    if user_ids is not None:
+        users = users.filter(pk__in=list(user_ids))
+    pks = list(users.values_list("pk", flat=True))
+    written = 0
+    for start in range(0, len(pks), chunk_size):
+        with transaction.atomic():
+            balances = list(
+                CustomUser.objects.select_for_update()
+                .filter(pk__in=pks[start : start + chunk_size])
+                .order_by("pk")
+                .values_list("pk", *PTO_LEDGER_FIELDS.values())
+            )
+            drifted = {d.user_id for d in reconcile_ledger([row[0] for row in balances]) if d.difference}
+            rows = [
+                PTOBalanceHistory(
+                    user_id=pk,
+                    change=Decimal("0.00"),
+                    reason="Checkpoint",
+                    balance_after=ledger_amount(value),
+                    balance_type=balance_type,
+                    is_checkpoint=True,
+                )
+                for pk, *values in balances
+                if pk not in drifted
+                for balance_type, value in zip(PTO_LEDGER_FIELDS, values)
+            ]
+            PTOBalanceHistory.append(rows)
+            written += len(rows)
+    return written
@@ -0,0 +1,199 @@
+"""
+Database-backed queue for PDF reports (no broker: one table, SELECT ... FOR UPDATE SKIP LOCKED).
+
+The report views call submit_report and redirect to a status page instead of running
+xhtml2pdf in the request. ``manage.py report_worker`` claims pending ReportJob rows one at a
+time, renders them (attendance.report_pdfs) outside any transaction, and stores the PDF in
+default storage (MEDIA_ROOT) as reports/<kind>/<params hash>-<data version>.pdf.
+
+The params hash is keyed with SECRET_KEY, so stored file names cannot be derived from report
+inputs. The data version fingerprints the rows the report reads. A request whose params and
+data match an already rendered report is marked done at once and points at the stored file.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from attendance.models import ReportJob, ReportJobStatus
+from attendance.report_pdfs import render_report_pdf, report_data_version
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+
+
+def report_params_hash(kind: str, params: dict) -> str:
+    payload = json.dumps([kind, params], sort_keys=True, separators=(",", ":"))
+    return salted_hmac("attendance.ReportJob", payload, algorithm="sha256").hexdigest()
+
+
+def report_storage_name(kind: str, params_hash: str, data_version: str) -> str:
+    return f"reports/{kind}/{params_hash[:32]}-{data_version}.pdf"
+
+
+def _stored_result(params_hash: str, data_version: str):
+    """(storage name, filename) of a finished render of the same report and data, if its file remains."""
+    done = (
+        ReportJob.objects.filter(params_hash=params_hash, data_version=data_version, status=ReportJobStatus.DONE)
+        .exclude(pdf="")
+        .order_by("-finished_at")
+        .values_list("pdf", "filename")
+        .first()
+    )
+    if done and default_storage.exists(done[0]):
+        return done
+    return None
+
+
+def submit_report(kind: str, params: dict, user) -> ReportJob:
+    """
+    Create a ReportJob for ``user``. Unchanged data already rendered for the same params is
+    done immediately. With REPORT_JOB_QUEUE off, renders in the caller instead of queueing.
+    """
+    params_hash = report_params_hash(kind, params)
+    data_version = report_data_version(kind, params)
+    job = ReportJob(
+        kind=kind,
+        params=params,
+        params_hash=params_hash,
+        data_version=data_version,
+        requested_by=user,
+    )
+    stored = _stored_result(params_hash, data_version)
+    if stored:
+        job.pdf.name, job.filename = stored
+        job.status = ReportJobStatus.DONE
+        job.finished_at = timezone.now()
+        job.save()
+        return job
+    job.save()
+    if not getattr(settings, "REPORT_JOB_QUEUE", True):
+        job.status = ReportJobStatus.RUNNING
+        job.started_at = timezone.now()
+        job.attempts = 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+        _run_claimed_job(job)
+    return job
+
+
+def _render_job(job: ReportJob) -> None:
+    """Render (or reuse) ``job``'s PDF for the data as it is now and mark the job done."""
+    job.data_version = report_data_version(job.kind, job.params)
+    stored = _stored_result(job.params_hash, job.data_version)
+    if stored:
+        job.pdf.name, job.filename = stored
+    else:
+        pdf, filename = render_report_pdf(job.kind, job.params)
+        name = report_storage_name(job.kind, job.params_hash, job.data_version)
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(pdf))
+        job.pdf.name = name
+        job.filename = filename
+    job.status = ReportJobStatus.DONE
+    job.finished_at = timezone.now()
+    job.last_error = ""
+    job.save(update_fields=["data_version", "pdf", "filename", "status", "finished_at", "last_error"])
+
+
+def _run_claimed_job(job: ReportJob) -> bool:
+    try:
+        _render_job(job)
+    except Exception as exc:
+        logger.exception("Report job %s (%s) failed", job.pk, job.kind)
+        job.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+        if job.attempts >= MAX_ATTEMPTS or not getattr(settings, "REPORT_JOB_QUEUE", True):
+            job.status = ReportJobStatus.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = ReportJobStatus.PENDING
+        job.save(update_fields=["status", "finished_at", "last_error"])
+        return False
+    return True
+
+
+def requeue_stale_report_jobs(now=None) -> int:
+    """
+    Return RUNNING jobs older than REPORT_JOB_TIMEOUT_SECONDS (worker killed mid-render) to the
+    queue, or fail them once they have used their attempts.
+    """
+    now = now or timezone.now()
+    timeout = timedelta(seconds=getattr(settings, "REPORT_JOB_TIMEOUT_SECONDS", 600))
+    stale = ReportJob.objects.filter(status=ReportJobStatus.RUNNING, started_at__lt=now - timeout)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=ReportJobStatus.FAILED, finished_at=now, last_error="Timed out while rendering."
+    )
+    return failed + stale.update(status=ReportJobStatus.PENDING)
+
+
+def process_report_jobs(limit: int = 1, now=None) -> tuple[int, int]:
+    """
+    Claim and render up to ``limit`` pending jobs, oldest first. Each claim is its own short
+    transaction (rows other workers hold are skipped); rendering happens after it commits.
+    Returns (done, failed) counts; a failed job is retried up to MAX_ATTEMPTS times.
+    """
+    requeue_stale_report_jobs(now)
+    done = failed = 0
+    for _ in range(limit):
+        with transaction.atomic():
+            job = (
+                ReportJob.objects.select_for_update(skip_locked=True)
+                .filter(status=ReportJobStatus.PENDING)
+                .order_by("requested_at", "pk")
+                .first()
+            )
+            if job is None:
+                break
+            job.status = ReportJobStatus.RUNNING
+            job.started_at = now or timezone.now()
+            job.attempts += 1
+            job.save(update_fields=["status", "started_at", "attempts"])
+        if _run_claimed_job(job):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def purge_report_jobs(older_than: timedelta, now=None) -> tuple[int, int]:
+    """
+    Delete finished jobs requested more than ``older_than`` ago and the stored PDFs no remaining
+    job points at. Returns (jobs deleted, files deleted).
+    """
+    now = now or timezone.now()
+    old = ReportJob.objects.filter(
+        status__in=[ReportJobStatus.DONE, ReportJobStatus.FAILED],
+        requested_at__lt=now - older_than,
+    )
+    names = set(old.exclude(pdf="").values_list("pdf", flat=True))
+    jobs_deleted, _ = old.delete()
+    names -= set(ReportJob.objects.filter(pdf__in=names).values_list("pdf", flat=True))
+    files_deleted = 0
+    for name in sorted(names):
+        if default_storage.exists(name):
+            default_storage.delete(name)
+            files_deleted += 1
+    return jobs_deleted, files_deleted
+
+
+def report_queue_stats(now=None) -> dict:
+    """Pending and running jobs, jobs that have failed for good, and wait of the oldest pending job."""
+    now = now or timezone.now()
+    stats = ReportJob.objects.aggregate(
+        pending=Count("pk", filter=Q(status=ReportJobStatus.PENDING)),
+        running=Count("pk", filter=Q(status=ReportJobStatus.RUNNING)),
+        failed=Count("pk", filter=Q(status=ReportJobStatus.FAILED)),
+        oldest=Min("requested_at", filter=Q(status=ReportJobStatus.PENDING)),
+    )
+    oldest = stats.pop("oldest")
+    stats["lag_seconds"] = (now - oldest).total_seconds() if oldest else 0.0
+    return stats
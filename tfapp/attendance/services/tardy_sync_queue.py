@@ -0,0 +1,150 @@
+"""
+Database-backed queue for tardy re-syncs (no broker: one table, SELECT ... FOR UPDATE SKIP LOCKED).
+
+Web paths that change punches (CSV import, admin and manager entry edits, adjust-punch
+approval, kiosk punches) call enqueue_tardy_sync instead of syncing inline. That is one upsert
+per employee-day, and repeated requests for a day coalesce into one TardySyncJob row.
+``manage.py tardy_sync_worker`` claims a batch in a short transaction, then locks each employee
+once for all of their queued days (attendance_engine.sync_tardy_occurrences_for_user_entries)
+and deletes the rows it synced in that employee's own transaction. A failed employee is retried
+with backoff without holding up the rest of the batch.
+
+Payroll close still syncs inline: it reads the occurrences it just fixed up.
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from attendance.models import TardySyncJob
+from attendance.payroll_utils import finalized_week_endings, week_ending_for_date
+from attendance.services.attendance_engine import sync_tardy_occurrences_for_user_entries
+from timeclock.models import TimeEntry
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = timedelta(hours=1)
+# How long claimed jobs stay hidden from other workers while one worker syncs them.
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def sync_tardy_for_user_days(user_id: int, dates) -> None:
+    """Re-sync tardies for ``user_id`` on ``dates`` from the saved entries (missing entry = cleared day)."""
+    dates = set(dates)
+    entries = list(TimeEntry.objects.select_related("user").filter(user_id=user_id, date__in=dates))
+    cleared = dates - {e.date for e in entries}
+    sync_tardy_occurrences_for_user_entries(user_id, entries, cleared_dates=cleared)
+
+
+def enqueue_tardy_sync(user_id: int, dates, now=None) -> None:
+    """
+    Queue a tardy re-sync for ``user_id`` on each of ``dates``. Call it in the transaction that
+    changes the punches so the worker never sees the job before the change. With
+    TARDY_SYNC_QUEUE off, syncs inline instead.
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    if not getattr(settings, "TARDY_SYNC_QUEUE", True):
+        sync_tardy_for_user_days(user_id, dates)
+        return
+    now = now or timezone.now()
+    TardySyncJob.objects.bulk_create(
+        [
+            TardySyncJob(user_id=user_id, date=d, requested_at=now, first_requested_at=now, available_at=now)
+            for d in dates
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "date"],
+        update_fields=["requested_at", "available_at"],
+    )
+
+
+def enqueue_tardy_sync_for_entry(entry) -> None:
+    enqueue_tardy_sync(entry.user_id, [entry.date])
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return min(timedelta(seconds=30 * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+def _claim_jobs(batch_size: int, now) -> list[TardySyncJob]:
+    """
+    Lock up to ``batch_size`` due jobs (skipping rows other workers hold) and push their
+    available_at out by CLAIM_LEASE, then commit at once. The lease keeps other workers off the
+    claimed rows without holding locks while they sync; a crashed worker's jobs come due again.
+    """
+    with transaction.atomic():
+        jobs = list(
+            TardySyncJob.objects.select_for_update(skip_locked=True)
+            .filter(available_at__lte=now)
+            .order_by("available_at", "pk")[:batch_size]
+        )
+        if jobs:
+            TardySyncJob.objects.filter(pk__in=[j.pk for j in jobs]).update(available_at=now + CLAIM_LEASE)
+    return jobs
+
+
+def _delete_unless_requested_again(jobs) -> None:
+    """Delete synced jobs; a row re-requested during the sync (newer requested_at) stays queued."""
+    match = Q()
+    for job in jobs:
+        match |= Q(pk=job.pk, requested_at=job.requested_at)
+    TardySyncJob.objects.filter(match).delete()
+
+
+def process_tardy_sync_jobs(batch_size: int = 200, now=None) -> tuple[int, int]:
+    """
+    Claim up to ``batch_size`` due jobs, then sync and delete each employee's jobs in their own
+    transaction, so only one employee row is locked at a time. Days in finalized payroll weeks
+    are dropped without syncing. Returns (synced, failed) job counts.
+    """
+    now = now or timezone.now()
+    jobs = _claim_jobs(batch_size, now)
+    if not jobs:
+        return 0, 0
+    jobs_by_user = defaultdict(list)
+    for job in jobs:
+        jobs_by_user[job.user_id].append(job)
+    finalized = finalized_week_endings()
+
+    synced = failed = 0
+    for user_id in sorted(jobs_by_user):
+        user_jobs = jobs_by_user[user_id]
+        dates = {j.date for j in user_jobs if week_ending_for_date(j.date) not in finalized}
+        try:
+            with transaction.atomic():
+                if dates:
+                    sync_tardy_for_user_days(user_id, dates)
+                _delete_unless_requested_again(user_jobs)
+        except Exception as exc:
+            logger.exception("Tardy sync failed for user %s on %s", user_id, sorted(dates))
+            for job in user_jobs:
+                job.attempts += 1
+                job.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+                job.available_at = now + _retry_delay(job.attempts)
+            TardySyncJob.objects.bulk_update(user_jobs, ["attempts", "last_error", "available_at"])
+            failed += len(user_jobs)
+        else:
+            synced += len(user_jobs)
+    return synced, failed
+
+
+def tardy_sync_queue_stats(now=None) -> dict:
+    """Queue depth, due jobs, jobs that have failed at least once, and lag of the oldest request."""
+    now = now or timezone.now()
+    stats = TardySyncJob.objects.aggregate(
+        depth=Count("pk"),
+        due=Count("pk", filter=Q(available_at__lte=now)),
+        failing=Count("pk", filter=Q(attempts__gt=0)),
+        oldest=Min("first_requested_at"),
+    )
+    oldest = stats.pop("oldest")
+    stats["lag_seconds"] = (now - oldest).total_seconds() if oldest else 0.0
+    return stats
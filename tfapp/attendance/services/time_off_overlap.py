@@ -0,0 +1,117 @@
+"""
+"Who else is out" for the approvals queue.
+
+One interval query loads every APPROVED/PENDING time off request touching the union of the
+pending windows; overlaps are then joined in memory against the start-sorted list (bisect on
+start_date, filter on end_date), and the same rows feed a per-day out-count heatmap for the
+approver's team.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from attendance.models import TimeOffRequest, TimeOffRequestStatus
+from attendance.services.approvals import can_approve_time_off
+
+OVERLAP_STATUSES = (TimeOffRequestStatus.APPROVED, TimeOffRequestStatus.PENDING)
+
+# Longest window the heatmap draws; a stray year-long request should not render 365 cells.
+COVERAGE_MAX_DAYS = 62
+
+
+@dataclass
+class CoverageDay:
+    day: date
+    approved: int
+    pending: int
+    level: int  # 0-4, relative to the busiest day in the window
+
+    @property
+    def total(self) -> int:
+        return self.approved + self.pending
+
+    @property
+    def is_weekend(self) -> bool:
+        return self.day.weekday() >= 5
+
+
+def overlapping_requests(start: date, end: date) -> list[TimeOffRequest]:
+    """APPROVED/PENDING requests intersecting [start, end], in display order."""
+    return list(
+        TimeOffRequest.objects.filter(
+            status__in=OVERLAP_STATUSES,
+            start_date__lte=end,
+            end_date__gte=start,
+        )
+        .select_related("user")
+        .order_by("start_date", "user__last_name", "user__first_name", "pk")
+    )
+
+
+def attach_overlaps(pending, candidates) -> None:
+    """
+    Set ``other_requests`` and ``other_requests_display`` on each of ``pending``: the
+    ``candidates`` (start-sorted) that intersect it, excluding the requester's own requests.
+    """
+    starts = [c.start_date for c in candidates]
+    for req in pending:
+        upto = bisect_right(starts, req.end_date)
+        req.other_requests = [
+            o
+            for o in candidates[:upto]
+            if o.end_date >= req.start_date and o.pk != req.pk and o.user_id != req.user_id
+        ]
+        req.other_requests_display = [
+            f"{o.user.payroll_display_name()} ({o.start_date} - {o.end_date}) [{o.status.upper()}]"
+            for o in req.other_requests
+        ]
+
+
+def team_coverage(approver, candidates, start: date, end: date) -> list[CoverageDay]:
+    """
+    Per-day count of distinct team members (users ``approver`` may approve for) with an
+    approved or pending request covering the day. Approved wins when a user has both.
+    """
+    end = min(end, start + timedelta(days=COVERAGE_MAX_DAYS - 1))
+    n_days = (end - start).days + 1
+    if n_days <= 0:
+        return []
+    approved = [set() for _ in range(n_days)]
+    pending = [set() for _ in range(n_days)]
+    for o in candidates:
+        if not can_approve_time_off(approver, o.user):
+            continue
+        buckets = approved if o.status == TimeOffRequestStatus.APPROVED else pending
+        first = max((o.start_date - start).days, 0)
+        last = min((o.end_date - start).days, n_days - 1)
+        for i in range(first, last + 1):
+            buckets[i].add(o.user_id)
+
+    counts = [(len(a), len(p - a)) for a, p in zip(approved, pending)]
+    busiest = max((a + p for a, p in counts), default=0)
+    return [
+        CoverageDay(
+            day=start + timedelta(days=i),
+            approved=a,
+            pending=p,
+            level=0 if not busiest or not a + p else max(1, round(4 * (a + p) / busiest)),
+        )
+        for i, (a, p) in enumerate(counts)
+    ]
+
+
+def pending_time_off_with_overlaps(approver, pending_qs):
+    """
+    Evaluate ``pending_qs`` with overlaps attached, plus the team heatmap over the union of
+    the pending windows. Two queries however many requests are pending.
+    """
+    pending = list(pending_qs)
+    if not pending:
+        return pending, []
+    start = min(r.start_date for r in pending)
+    end = max(r.end_date for r in pending)
+    candidates = overlapping_requests(start, end)
+    attach_overlaps(pending, candidates)
+    return pending, team_coverage(approver, candidates, start, end)
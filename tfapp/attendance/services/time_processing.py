@@ -4,6 +4,7 @@ Night shifts that end after midnight use crosses_midnight / "crosses_midnight" i
 """
 from __future__ import annotations
 
+import copy
 from datetime import date, datetime, timedelta
 
 from django.utils import timezone
@@ -25,6 +26,185 @@ def schedule_row_has_lunch(row: dict | None) -> bool:
     return True
 
 
+_WEEKDAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Sentinel for a JSON field that could not be parsed (falls back to the WorkSchedule row).
+_UNRESOLVED = object()
+
+# Bumped when a WorkSchedule row is saved or deleted; compiled schedules from an older
+# generation are rebuilt on next use.
+_work_schedule_generation = 0
+
+
+class ScheduleDay:
+    """One weekday of a CompiledSchedule (times are None when not scheduled)."""
+
+    __slots__ = ("start", "end", "lunch_out", "lunch_in", "crosses_midnight", "duration_hours")
+
+    def __init__(self, start, end, lunch_out, lunch_in, crosses_midnight: bool, duration_hours: float):
+        self.start = start
+        self.end = end
+        self.lunch_out = lunch_out
+        self.lunch_in = lunch_in
+        self.crosses_midnight = crosses_midnight
+        self.duration_hours = duration_hours
+
+
+class CompiledSchedule:
+    """
+    A user's weekday schedule parsed once: weekly_schedule JSON first, WorkSchedule rows
+    where JSON does not cover a weekday (or a field does not parse). ``days`` is indexed by
+    ``date.weekday()``. Same results as the per-call parsing the helpers below used to do.
+    """
+
+    __slots__ = ("days", "source", "generation")
+
+    def __init__(self, days: tuple[ScheduleDay, ...], source: dict, generation: int):
+        self.days = days
+        self.source = source
+        self.generation = generation
+
+    def day(self, d: date) -> ScheduleDay:
+        return self.days[d.weekday()]
+
+    @classmethod
+    def compile(cls, user) -> CompiledSchedule:
+        schedule = user.weekly_schedule or {}
+        rows_by_weekday = None
+
+        def work_schedule_row(weekday: int):
+            nonlocal rows_by_weekday
+            if rows_by_weekday is None:
+                rows_by_weekday = {s.day: s for s in user.schedules.all()}
+            return rows_by_weekday.get(weekday)
+
+        days = []
+        for weekday, name in enumerate(_WEEKDAY_NAMES):
+            has_json = bool(schedule) and name in schedule
+            json_row = schedule[name] if has_json else None
+            days.append(_compile_day(weekday, json_row, has_json, work_schedule_row))
+        return cls(tuple(days), copy.deepcopy(schedule), _work_schedule_generation)
+
+
+def _json_time(row, key):
+    try:
+        return datetime.strptime(row[key], TIME_FMT).time()
+    except (KeyError, ValueError, TypeError):
+        return _UNRESOLVED
+
+
+def _json_crosses_midnight(row):
+    try:
+        st = datetime.strptime(row["start"], TIME_FMT).time()
+        et = datetime.strptime(row["end"], TIME_FMT).time()
+        inferred = et <= st
+        if row.get("crosses_midnight") is True:
+            return True
+        if inferred:
+            return True
+        if row.get("crosses_midnight") is False:
+            return False
+        # JSON defines this weekday: same-calendar-day shift (no explicit flag)
+        return False
+    except (KeyError, ValueError, TypeError, AttributeError):
+        return _UNRESOLVED
+
+
+def _json_duration_hours(row, crosses_midnight: bool):
+    try:
+        start = datetime.strptime(row["start"], TIME_FMT)
+        end = datetime.strptime(row["end"], TIME_FMT)
+        lunch_out = lunch_in = None
+        if schedule_row_has_lunch(row):
+            lunch_out = datetime.strptime(row["lunch_out"], TIME_FMT)
+            lunch_in = datetime.strptime(row["lunch_in"], TIME_FMT)
+        return _duration_hours_from_parts(start, end, lunch_out, lunch_in, crosses_midnight)
+    except (KeyError, ValueError, TypeError):
+        return _UNRESOLVED
+
+
+def _compile_day(weekday: int, json_row, has_json: bool, work_schedule_row) -> ScheduleDay:
+    start = end = crosses_midnight = duration = _UNRESOLVED
+    lunch_out = lunch_in = _UNRESOLVED
+    if has_json:
+        # A JSON weekday without (parsable) lunch times means no lunch; never falls back.
+        lunch_out = lunch_in = None
+        if schedule_row_has_lunch(json_row):
+            lunch_out = _json_time(json_row, "lunch_out")
+            lunch_in = _json_time(json_row, "lunch_in")
+            lunch_out = None if lunch_out is _UNRESOLVED else lunch_out
+            lunch_in = None if lunch_in is _UNRESOLVED else lunch_in
+        start = _json_time(json_row, "start")
+        end = _json_time(json_row, "end")
+        crosses_midnight = _json_crosses_midnight(json_row)
+
+    sched = None
+    if not has_json or any(v is _UNRESOLVED for v in (start, end, crosses_midnight)):
+        sched = work_schedule_row(weekday)
+    if start is _UNRESOLVED:
+        start = sched.start_time if sched else None
+    if end is _UNRESOLVED:
+        end = sched.end_time if sched else None
+    if lunch_out is _UNRESOLVED:
+        has_lunch = bool(sched and sched.lunch_out is not None and sched.lunch_in is not None)
+        lunch_out = sched.lunch_out if has_lunch else None
+        lunch_in = sched.lunch_in if has_lunch else None
+    if crosses_midnight is _UNRESOLVED:
+        crosses_midnight = bool(
+            sched
+            and (getattr(sched, "crosses_midnight", False) or sched.end_time <= sched.start_time)
+        )
+
+    if has_json:
+        duration = _json_duration_hours(json_row, crosses_midnight)
+    if duration is _UNRESOLVED:
+        if sched is None:
+            sched = work_schedule_row(weekday)
+        duration = _work_schedule_duration_hours(sched, crosses_midnight)
+    return ScheduleDay(start, end, lunch_out, lunch_in, crosses_midnight, duration)
+
+
+def _work_schedule_duration_hours(sched, crosses_midnight: bool) -> float:
+    if not sched:
+        return 0.0
+    d0 = date(2000, 1, 3)
+    start = datetime.combine(d0, sched.start_time)
+    end = datetime.combine(d0, sched.end_time)
+    if sched.lunch_out is not None and sched.lunch_in is not None:
+        lunch_out_dt = datetime.combine(d0, sched.lunch_out)
+        lunch_in_dt = datetime.combine(d0, sched.lunch_in)
+        return _duration_hours_from_parts(start, end, lunch_out_dt, lunch_in_dt, crosses_midnight)
+    return _duration_hours_from_parts(start, end, None, None, crosses_midnight)
+
+
+def compiled_schedule_for_user(user) -> CompiledSchedule:
+    """
+    Memoized CompiledSchedule for this user instance. Rebuilt when weekly_schedule no longer
+    matches what was compiled (edited in memory or saved) or after any WorkSchedule change.
+    """
+    compiled = getattr(user, "_compiled_schedule", None)
+    if (
+        compiled is None
+        or compiled.generation != _work_schedule_generation
+        or compiled.source != (user.weekly_schedule or {})
+    ):
+        compiled = CompiledSchedule.compile(user)
+        user._compiled_schedule = compiled
+    return compiled
+
+
+def invalidate_compiled_schedules(user=None) -> None:
+    """
+    Called when WorkSchedule rows change: every compiled schedule in this process is stale.
+    When the affected user instance is known, also drop its prefetched ``schedules``.
+    """
+    global _work_schedule_generation
+    _work_schedule_generation += 1
+    if user is not None:
+        user.__dict__.pop("_compiled_schedule", None)
+        getattr(user, "_prefetched_objects_cache", {}).pop("schedules", None)
+
+
 def _combine_local(d: date, t) -> datetime:
     naive = datetime.combine(d, t)
     return timezone.make_aware(naive, timezone.get_current_timezone())
@@ -32,38 +212,12 @@ def _combine_local(d: date, t) -> datetime:
 
 def get_scheduled_lunch_out_for_day(user, d: date):
     """Scheduled lunch-out time for date d, or None if not in schedule or day has no lunch period."""
-    schedule = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if schedule and weekday_str in schedule:
-        row = schedule[weekday_str]
-        if not schedule_row_has_lunch(row):
-            return None
-        try:
-            return datetime.strptime(row["lunch_out"], TIME_FMT).time()
-        except (KeyError, ValueError, TypeError):
-            return None
-    sched = user.schedules.filter(day=d.weekday()).first()
-    if sched and sched.lunch_out is not None and sched.lunch_in is not None:
-        return sched.lunch_out
-    return None
+    return compiled_schedule_for_user(user).day(d).lunch_out
 
 
 def get_scheduled_lunch_in_for_day(user, d: date):
     """Scheduled lunch return time for date d, or None if not in schedule or day has no lunch period."""
-    schedule = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if schedule and weekday_str in schedule:
-        row = schedule[weekday_str]
-        if not schedule_row_has_lunch(row):
-            return None
-        try:
-            return datetime.strptime(row["lunch_in"], TIME_FMT).time()
-        except (KeyError, ValueError, TypeError):
-            return None
-    sched = user.schedules.filter(day=d.weekday()).first()
-    if sched and sched.lunch_out is not None and sched.lunch_in is not None:
-        return sched.lunch_in
-    return None
+    return compiled_schedule_for_user(user).day(d).lunch_in
 
 
 def scheduled_lunch_datetimes_for_entry(entry) -> tuple[datetime, datetime] | None:
@@ -132,15 +286,7 @@ def effective_schedule_reference_date(entry) -> date:
 
 def get_scheduled_start_for_day(user, d: date):
     """Return scheduled start time for date d, or None if not scheduled."""
-    schedule = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if schedule and weekday_str in schedule:
-        try:
-            return datetime.strptime(schedule[weekday_str]["start"], TIME_FMT).time()
-        except (KeyError, ValueError, TypeError):
-            pass
-    sched = user.schedules.filter(day=d.weekday()).first()
-    return sched.start_time if sched else None
+    return compiled_schedule_for_user(user).day(d).start
 
 
 def crosses_midnight_for_day(user, d: date) -> bool:
@@ -151,44 +297,12 @@ def crosses_midnight_for_day(user, d: date) -> bool:
     from start/end times: if end_time <= start_time as clock times (e.g. 02:00 vs 15:30),
     the shift crosses midnight. Without this, scheduled hours become negative.
     """
-    ws = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if ws and weekday_str in ws:
-        try:
-            row = ws[weekday_str]
-            st = datetime.strptime(row["start"], TIME_FMT).time()
-            et = datetime.strptime(row["end"], TIME_FMT).time()
-            inferred = et <= st
-            if row.get("crosses_midnight") is True:
-                return True
-            if inferred:
-                return True
-            if row.get("crosses_midnight") is False:
-                return False
-            # JSON defines this weekday: same-calendar-day shift (no explicit flag)
-            return False
-        except (KeyError, ValueError, TypeError, AttributeError):
-            pass
-    sched = user.schedules.filter(day=d.weekday()).first()
-    if sched:
-        if getattr(sched, "crosses_midnight", False):
-            return True
-        if sched.end_time <= sched.start_time:
-            return True
-    return False
+    return compiled_schedule_for_user(user).day(d).crosses_midnight
 
 
 def get_scheduled_end_time_for_day(user, d: date):
     """Scheduled end time for the shift on weekday d, or None if not in schedule / unparsable."""
-    schedule = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if schedule and weekday_str in schedule:
-        try:
-            return datetime.strptime(schedule[weekday_str]["end"], TIME_FMT).time()
-        except (KeyError, ValueError, TypeError):
-            pass
-    sched = user.schedules.filter(day=d.weekday()).first()
-    return sched.end_time if sched else None
+    return compiled_schedule_for_user(user).day(d).end
 
 
 def get_scheduled_shift_end_datetime(user, d: date) -> datetime | None:
@@ -221,33 +335,7 @@ def monday_typical_shift_label(user) -> str:
 
 def scheduled_duration_hours_for_day(user, d: date) -> float:
     """Scheduled paid hours for one calendar day (shift anchored on d), or 0 if none."""
-    schedule = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if schedule and weekday_str in schedule:
-        try:
-            sched = schedule[weekday_str]
-            start = datetime.strptime(sched["start"], TIME_FMT)
-            end = datetime.strptime(sched["end"], TIME_FMT)
-            cm = crosses_midnight_for_day(user, d)
-            lunch_out = lunch_in = None
-            if schedule_row_has_lunch(sched):
-                lunch_out = datetime.strptime(sched["lunch_out"], TIME_FMT)
-                lunch_in = datetime.strptime(sched["lunch_in"], TIME_FMT)
-            return _duration_hours_from_parts(start, end, lunch_out, lunch_in, cm)
-        except (KeyError, ValueError, TypeError):
-            pass
-    sched = user.schedules.filter(day=d.weekday()).first()
-    if not sched:
-        return 0.0
-    d0 = date(2000, 1, 3)
-    start = datetime.combine(d0, sched.start_time)
-    end = datetime.combine(d0, sched.end_time)
-    cm = crosses_midnight_for_day(user, d)
-    if sched.lunch_out is not None and sched.lunch_in is not None:
-        lunch_out_dt = datetime.combine(d0, sched.lunch_out)
-        lunch_in_dt = datetime.combine(d0, sched.lunch_in)
-        return _duration_hours_from_parts(start, end, lunch_out_dt, lunch_in_dt, cm)
-    return _duration_hours_from_parts(start, end, None, None, cm)
+    return compiled_schedule_for_user(user).day(d).duration_hours
 
 
 def _duration_hours_from_parts(
@@ -274,71 +362,6 @@ def scheduled_hours_for_range(user, week_start: date, week_ending: date) -> floa
     return total
 
 
-def scheduled_duration_hours_for_day_indexed(
-    user,
-    d: date,
-    schedules_by_weekday: dict[int, object],
-) -> float:
-    """Like scheduled_duration_hours_for_day but uses prefetched schedules (no per-day DB query)."""
-    schedule = user.weekly_schedule or {}
-    weekday_str = d.strftime("%A").lower()
-    if schedule and weekday_str in schedule:
-        try:
-            sched = schedule[weekday_str]
-            start = datetime.strptime(sched["start"], TIME_FMT)
-            end = datetime.strptime(sched["end"], TIME_FMT)
-            cm = crosses_midnight_for_day(user, d)
-            lunch_out = lunch_in = None
-            if schedule_row_has_lunch(sched):
-                lunch_out = datetime.strptime(sched["lunch_out"], TIME_FMT)
-                lunch_in = datetime.strptime(sched["lunch_in"], TIME_FMT)
-            return _duration_hours_from_parts(start, end, lunch_out, lunch_in, cm)
-        except (KeyError, ValueError, TypeError):
-            pass
-    sched = schedules_by_weekday.get(d.weekday())
-    if not sched:
-        return 0.0
-    d0 = date(2000, 1, 3)
-    start = datetime.combine(d0, sched.start_time)
-    end = datetime.combine(d0, sched.end_time)
-    cm = crosses_midnight_for_day(user, d)
-    if sched.lunch_out is not None and sched.lunch_in is not None:
-        lunch_out_dt = datetime.combine(d0, sched.lunch_out)
-        lunch_in_dt = datetime.combine(d0, sched.lunch_in)
-        return _duration_hours_from_parts(start, end, lunch_out_dt, lunch_in_dt, cm)
-    return _duration_hours_from_parts(start, end, None, None, cm)
-
-
-def build_daily_scheduled_hours_map(
-    users,
-    span_start: date,
-    span_end: date,
-) -> tuple[list[date], dict[int, list[float]]]:
-    """
-    One pass per user over [span_start, span_end]. Callers should prefetch_related('schedules').
-    Returns (date list, user_id -> daily hours aligned with dates). Skips exempt users.
-    """
-    dates: list[date] = []
-    d = span_start
-    while d <= span_end:
-        dates.append(d)
-        d += timedelta(days=1)
-
-    schedules_by_user: dict[int, dict[int, object]] = {}
-    daily_by_user: dict[int, list[float]] = {}
-    for user in users:
-        if getattr(user, "is_exempt", False):
-            continue
-        uid = user.id
-        if uid not in schedules_by_user:
-            schedules_by_user[uid] = {s.day: s for s in user.schedules.all()}
-        by_weekday = schedules_by_user[uid]
-        daily_by_user[uid] = [
-            scheduled_duration_hours_for_day_indexed(user, day, by_weekday) for day in dates
-        ]
-    return dates, daily_by_user
-
-
 def earliest_clock_in_allowed(user, d: date):
     """
     Earliest moment the user may clock in without manager approval (15 min before scheduled start).
@@ -5,7 +5,7 @@ from __future__ import annotations
 
 from datetime import date, timedelta
 
-from django.db.models import Q, Sum
+from django.db.models import F, Sum, prefetch_related_objects
 from django.utils import timezone as django_tz
 
 from attendance.models import (
@@ -18,15 +18,23 @@ from attendance.models import (
     PayrollPeriodUserSnapshot,
     TimeOffRequestStatus,
 )
-from attendance.schedule_utils import scheduled_duration_hours_for_day, scheduled_hours_for_range
+from attendance.schedule_utils import scheduled_hours_for_range
 from attendance.services.holiday_plan_service import (
-    effective_scheduled_hours_for_range,
+    HolidayPlanCalendar,
     effective_work_hours_for_day,
 )
 from attendance.services.attendance_engine import (
     create_tardy_occurrences_for_week,
     revert_and_delete_orphan_time_off_for_exchange_week,
 )
+from attendance.services.balance_service import adjust_balances
+from attendance.services.daily_summaries import FACT_FIELDS, compute_daily_summary_values
+from attendance.services.entry_hours import refresh_stale_entry_hours
+from attendance.services.perfect_attendance import (
+    finalize_perfect_attendance_for_week,
+    reopen_perfect_attendance_for_week,
+)
+from attendance.services.weekly_totals import invalidate_weekly_user_totals
 from timeclock.models import TimeEntry
 
 
@@ -44,11 +52,12 @@ def unfinalize_payroll_period(period):
     and delete occurrences created at finalize (variance + tardy).
     """
     # 1. Revert PTO accrued for this period (round so add/subtract cancel exactly)
-    for snapshot in period.user_snapshots.select_related("user"):
-        u = snapshot.user
-        accrued = round(snapshot.pto_accrued_hours, 2)
-        u.pto_balance = round(max(0.0, u.pto_balance - accrued), 2)
-        u.save()
+    for snapshot in period.user_snapshots.all():
+        adjust_balances(
+            snapshot.user_id,
+            f"Payroll unfinalized ({period.week_ending}): revert PTO accrual",
+            pto=-round(snapshot.pto_accrued_hours, 2),
+        )
     period.user_snapshots.all().delete()
 
     # 2. Refund PTO/personal only for occurrences created at finalize (this period), then delete them
@@ -65,10 +74,12 @@ def unfinalize_payroll_period(period):
         )
     )
     for r in refunds:
-        u = CustomUser.objects.get(pk=r["user"])
-        u.pto_balance = round(u.pto_balance + (r["pto_refund"] or 0), 2)
-        u.personal_time_balance = round(max(0.0, u.personal_time_balance - (r["personal_refund"] or 0)), 2)
-        u.save()
+        adjust_balances(
+            r["user"],
+            f"Payroll unfinalized ({period.week_ending}): refund applied absences",
+            pto=r["pto_refund"] or 0,
+            personal=-(r["personal_refund"] or 0),
+        )
     # Delete occurrences created at finalize so they can be re-created on refinalize
     Occurrence.objects.filter(payroll_period=period).delete()
 
@@ -78,166 +89,228 @@ def unfinalize_payroll_period(period):
         payroll_period=None,
     )
 
+    reopen_perfect_attendance_for_week(period.week_ending - timedelta(days=6), period.week_ending)
+
+
+_TARDY_SUBTYPES = (OccurrenceSubtype.TARDY_IN_GRACE, OccurrenceSubtype.TARDY_OUT_OF_GRACE)
+
+_DAILY_SUMMARY_FIELDS = (
+    "scheduled_hours",
+    "worked_hours",
+    "rounded_hours",
+    "lunch_deducted_hours",
+    "regular_hours",
+    "overtime_hours",
+    "exchange_eligible",
+    "status",
+    "payroll_period",
+)
+
+
+class _WeekRows:
+    """
+    Schedules, complete holiday plans and time entries for ``users`` over one payroll week.
+    Loaded in a fixed number of queries so finalize never goes back to the DB per user-day.
+    Hours match effective_work_hours_for_day / payroll_credited_hours (stored credited_hours).
+    """
+
+    def __init__(self, users, week_start: date, week_ending: date):
+        self.users = list(users)
+        self.dates = [
+            week_start + timedelta(days=i) for i in range((week_ending - week_start).days + 1)
+        ]
+        users_by_id = {u.id: u for u in self.users}
+
+        # Compiled schedules read the prefetched rows instead of querying per user.
+        prefetch_related_objects(self.users, "schedules")
+
+        calendar = HolidayPlanCalendar.load(week_start, week_ending)
+        self.work_hours: dict[tuple[int, date], float] = {}
+        for user in self.users:
+            for d in self.dates:
+                self.work_hours[(user.id, d)] = effective_work_hours_for_day(
+                    user, d, calendar=calendar
+                )
+
+        self.worked_day: dict[tuple[int, date], float] = {}
+        self.worked_week: dict[int, float] = {u.id: 0 for u in self.users}
+        entries = TimeEntry.objects.filter(
+            user_id__in=users_by_id.keys(),
+            date__range=[week_start, week_ending],
+        )
+        refresh_stale_entry_hours(entries)
+        for e in entries.only("user_id", "date", "clock_in", "clock_out", "credited_hours"):
+            if not (e.clock_in and e.clock_out):
+                continue
+            hours = e.credited_hours
+            key = (e.user_id, e.date)
+            self.worked_day[key] = self.worked_day.get(key, 0) + hours
+            self.worked_week[e.user_id] += hours
+
+    def scheduled_week(self, user_id: int) -> float:
+        total = 0.0
+        for d in self.dates:
+            total += self.work_hours[(user_id, d)]
+        return total
 
-def sync_finalized_daily_summaries(users, week_start: date, week_ending: date, payroll_period):
+
+def sync_finalized_daily_summaries(
+    users,
+    week_start: date,
+    week_ending: date,
+    payroll_period,
+    *,
+    week_rows: _WeekRows | None = None,
+):
     """
     Persist interpreted per-day state after payroll logic has created/adjusted occurrences.
-    Only writes rows where there is scheduled time or reported worked time for that date.
+    Only creates rows where there is scheduled time or reported worked time for that date;
+    exchange eligibility and the fact columns (tardy minutes, occurrence hours, roll-up keys)
+    come from the daily fact builder.
     """
-    for user in users:
-        current = week_start
-        while current <= week_ending:
-            scheduled = effective_work_hours_for_day(user, current)
-            entries_day = TimeEntry.objects.filter(user=user, date=current)
-            worked = 0.0
-            for e in entries_day:
-                if e.clock_in and e.clock_out:
-                    worked += e.payroll_credited_hours()
+    rows = week_rows or _WeekRows(users, week_start, week_ending)
+    user_ids = [u.id for u in rows.users]
+    facts = compute_daily_summary_values(rows.users, week_start, week_ending)
+
+    existing = {
+        (s.user_id, s.work_date): s
+        for s in DailyAttendanceSummary.objects.filter(
+            user_id__in=user_ids,
+            work_date__range=[week_start, week_ending],
+        )
+    }
+    to_create = []
+    to_update = []
+    for user in rows.users:
+        for current in rows.dates:
+            key = (user.id, current)
+            scheduled = rows.work_hours[key]
+            worked = rows.worked_day.get(key, 0.0)
             if scheduled <= 0 and worked <= 0:
-                current += timedelta(days=1)
                 continue
-            exchange_occ = (
-                Occurrence.objects.filter(
-                    user=user,
-                    date=current,
-                    is_variance_to_schedule=True,
-                    subtype=OccurrenceSubtype.EXCHANGE,
-                )
-                .order_by("id")
-                .first()
-            )
-            exchange_eligible = bool(exchange_occ and exchange_occ.duration_hours > 0)
-            DailyAttendanceSummary.objects.update_or_create(
-                user=user,
-                work_date=current,
-                defaults={
-                    "scheduled_hours": scheduled,
-                    "worked_hours": round(worked, 2),
-                    "rounded_hours": round(worked, 2),
-                    "lunch_deducted_hours": 0.0,
-                    "tardy_minutes": 0,
-                    "early_out_minutes": 0,
-                    "regular_hours": round(worked, 2),
-                    "overtime_hours": 0.0,
-                    "exchange_eligible": exchange_eligible,
-                    "status": DailyAttendanceSummary.Status.FINALIZED,
-                    "payroll_period": payroll_period,
-                },
-            )
-            current += timedelta(days=1)
+            values = {
+                **facts[key],
+                "scheduled_hours": scheduled,
+                "worked_hours": round(worked, 2),
+                "rounded_hours": round(worked, 2),
+                "lunch_deducted_hours": 0.0,
+                "regular_hours": round(worked, 2),
+                "overtime_hours": 0.0,
+                "status": DailyAttendanceSummary.Status.FINALIZED,
+                "payroll_period": payroll_period,
+            }
+            summary = existing.get(key)
+            if summary is None:
+                to_create.append(DailyAttendanceSummary(user=user, work_date=current, **values))
+                continue
+            for field, value in values.items():
+                setattr(summary, field, value)
+            to_update.append(summary)
+    DailyAttendanceSummary.objects.bulk_create(to_create)
+    DailyAttendanceSummary.objects.bulk_update(to_update, _DAILY_SUMMARY_FIELDS + FACT_FIELDS)
 
 
 def finalize_payroll_week(*, period, week_start: date, week_ending: date, finalized_by, users) -> None:
     """
     Core payroll close logic (occurrences, balances, accrual). Caller handles HTTP, overrides, holidays, CSV.
     ``users`` must be the same sorted list used elsewhere for payroll (e.g. exempt-filtered).
+
+    Week rows are loaded up front and variances, exchange trimming, tardy conversion and PTO caps
+    are worked out in memory; writes go out in bulk. Only PTO application and accrual touch
+    users one at a time (balance ledger rows and row locks).
     """
     if period.is_finalized:
         return
 
-    # Build total worked (time entries only) and total scheduled per user for the week
-    user_total_worked = {}
-    user_total_scheduled = {}
-    for user in users:
-        entries = TimeEntry.objects.filter(user=user, date__range=[week_start, week_ending])
-        total_worked_hours = 0
-        for e in entries:
-            if e.clock_in and e.clock_out:
-                total_worked_hours += e.payroll_credited_hours()
-        user_total_worked[user.id] = total_worked_hours
-        user_total_scheduled[user.id] = effective_scheduled_hours_for_range(user, week_start, week_ending)
+    rows = _WeekRows(users, week_start, week_ending)
+    users = rows.users
+    user_ids = [u.id for u in users]
+
+    # Total worked (time entries only) and total scheduled per user for the week
+    user_total_worked = rows.worked_week
+    user_total_scheduled = {u.id: rows.scheduled_week(u.id) for u in users}
 
     create_tardy_occurrences_for_week(week_start, week_ending, period=period)
 
-    # Variance occurrences: only when user has a schedule and reported total falls short.
-    approved_time_off_by_user_date = {}
-    for user in users:
-        approved_time_off_by_user_date[user.id] = {}
-        qs = Occurrence.objects.filter(
-            user=user,
-            date__range=[week_start, week_ending],
-            time_off_request__status=TimeOffRequestStatus.APPROVED,
-        )
-        for occ in qs.values("date", "duration_hours"):
-            d = occ["date"]
-            approved_time_off_by_user_date[user.id][d] = (
-                approved_time_off_by_user_date[user.id].get(d, 0) + occ["duration_hours"]
-            )
+    week_occurrences_by_day: dict[tuple[int, date], list] = {}
+    approved_time_off_by_user_date: dict[int, dict[date, float]] = {uid: {} for uid in user_ids}
+    week_rows_qs = Occurrence.objects.filter(
+        user_id__in=user_ids,
+        date__range=[week_start, week_ending],
+    ).annotate(request_status=F("time_off_request__status")).order_by("date", "id")
+    for occ in week_rows_qs:
+        week_occurrences_by_day.setdefault((occ.user_id, occ.date), []).append(occ)
+        if occ.request_status == TimeOffRequestStatus.APPROVED:
+            by_date = approved_time_off_by_user_date[occ.user_id]
+            by_date[occ.date] = by_date.get(occ.date, 0) + occ.duration_hours
 
+    # Variance occurrences: only when user has a schedule and reported total falls short.
+    new_variances = []
     for user in users:
-        total_worked_hours = user_total_worked.get(user.id, 0)
-        total_scheduled = effective_scheduled_hours_for_range(user, week_start, week_ending)
-        if total_scheduled <= 0:
+        if user_total_scheduled[user.id] <= 0:
             continue  # No schedule: do not create any variance
-        current = week_start
-        while current <= week_ending:
-            scheduled_day = effective_work_hours_for_day(user, current)
+        for current in rows.dates:
+            scheduled_day = rows.work_hours[(user.id, current)]
             if scheduled_day <= 0:
-                current += timedelta(days=1)
                 continue
-            entries_day = TimeEntry.objects.filter(user=user, date=current)
-            worked_day = 0
-            for e in entries_day:
-                if e.clock_in and e.clock_out:
-                    worked_day += e.payroll_credited_hours()
-            approved_day = approved_time_off_by_user_date.get(user.id, {}).get(current, 0)
+            day_occurrences = week_occurrences_by_day.get((user.id, current), [])
+            worked_day = rows.worked_day.get((user.id, current), 0)
+            approved_day = approved_time_off_by_user_date[user.id].get(current, 0)
             tardy_or_variance_hours = sum(
-                Occurrence.objects.filter(
-                    user=user,
-                    date=current,
-                )
-                .filter(
-                    Q(subtype__in=[OccurrenceSubtype.TARDY_IN_GRACE, OccurrenceSubtype.TARDY_OUT_OF_GRACE])
-                    | Q(is_variance_to_schedule=True)
-                )
-                .values_list("duration_hours", flat=True)
+                o.duration_hours
+                for o in day_occurrences
+                if o.subtype in _TARDY_SUBTYPES or o.is_variance_to_schedule
             )
             reported_day = worked_day + approved_day + tardy_or_variance_hours
             shortfall_day = max(0, round(scheduled_day - reported_day, 2))
-            if shortfall_day > 0:
-                has_variance = Occurrence.objects.filter(
+            if shortfall_day <= 0:
+                continue
+            if any(o.is_variance_to_schedule for o in day_occurrences):
+                continue
+            new_variances.append(
+                Occurrence(
                     user=user,
+                    occurrence_type=OccurrenceType.UNPLANNED,
+                    subtype=OccurrenceSubtype.EXCHANGE,
                     date=current,
+                    duration_hours=round(shortfall_day, 2),
+                    pto_applied=False,
                     is_variance_to_schedule=True,
-                ).exists()
-                if not has_variance:
-                    subtype = OccurrenceSubtype.EXCHANGE
-                    Occurrence.objects.create(
-                        user=user,
-                        occurrence_type=OccurrenceType.UNPLANNED,
-                        subtype=subtype,
-                        date=current,
-                        duration_hours=round(shortfall_day, 2),
-                        pto_applied=False,
-                        is_variance_to_schedule=True,
-                        payroll_period=period,
-                    )
-            current += timedelta(days=1)
+                    payroll_period=period,
+                )
+            )
+    # payroll_period is set, so Occurrence.save() would not apply PTO here either.
+    Occurrence.objects.bulk_create(new_variances)
+    for occ in new_variances:
+        week_occurrences_by_day.setdefault((occ.user_id, occ.date), []).append(occ)
 
     # Exchange occurrences should represent only the remaining weekly shortfall
+    exchange_variances_by_user: dict[int, list] = {}
+    for day_occurrences in week_occurrences_by_day.values():
+        for occ in day_occurrences:
+            if occ.is_variance_to_schedule and occ.subtype == OccurrenceSubtype.EXCHANGE:
+                exchange_variances_by_user.setdefault(occ.user_id, []).append(occ)
+    trimmed = []
     for user in users:
-        expected = user_total_scheduled.get(user.id, 0)
+        expected = user_total_scheduled[user.id]
         if expected <= 0:
             continue
         required_week_hours = required_week_hours_for_policy(expected)
-        worked = user_total_worked.get(user.id, 0)
-        approved_week = sum(approved_time_off_by_user_date.get(user.id, {}).values())
+        worked = user_total_worked[user.id]
+        approved_week = sum(approved_time_off_by_user_date[user.id].values())
         weekly_shortfall = max(0.0, round(required_week_hours - (worked + approved_week), 2))
         remaining = weekly_shortfall
-        exchange_variances = list(
-            Occurrence.objects.filter(
-                user=user,
-                date__range=[week_start, week_ending],
-                is_variance_to_schedule=True,
-                subtype=OccurrenceSubtype.EXCHANGE,
-            ).order_by("date", "id")
+        exchange_variances = sorted(
+            exchange_variances_by_user.get(user.id, []),
+            key=lambda o: (o.date, o.id),
         )
         for occ in exchange_variances:
             new_duration = min(occ.duration_hours, remaining)
             if round(occ.duration_hours, 2) != round(new_duration, 2):
                 occ.duration_hours = round(new_duration, 2)
-                occ.save(update_fields=["duration_hours"])
+                trimmed.append(occ)
             remaining = max(0.0, round(remaining - new_duration, 2))
+    Occurrence.objects.bulk_update(trimmed, ["duration_hours"])
 
     revert_and_delete_orphan_time_off_for_exchange_week(
         users,
@@ -247,37 +320,28 @@ def finalize_payroll_week(*, period, week_start: date, week_ending: date, finali
 
     # If the user met or exceeded weekly scheduled hours, convert out-of-grace tardies
     # to zero-hour Exchange rows so no PTO/personal is deducted.
+    met_user_ids = []
     for user in users:
-        expected = user_total_scheduled.get(user.id, 0)
+        expected = user_total_scheduled[user.id]
         if expected <= 0:
             continue
         required_week_hours = required_week_hours_for_policy(expected)
-        worked = user_total_worked.get(user.id, 0)
-        approved_week = sum(approved_time_off_by_user_date.get(user.id, {}).values())
-        if (worked + approved_week) < required_week_hours:
-            continue
-        tardy_out_rows = Occurrence.objects.filter(
-            user=user,
-            date__range=[week_start, week_ending],
-            subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE,
-        )
-        for occ in tardy_out_rows:
-            occ.subtype = OccurrenceSubtype.EXCHANGE
-            occ.duration_hours = 0.0
-            occ.is_variance_to_schedule = True
-            occ.pto_applied = False
-            occ.pto_hours_applied = 0.0
-            occ.personal_hours_applied = 0.0
-            occ.save(
-                update_fields=[
-                    "subtype",
-                    "duration_hours",
-                    "is_variance_to_schedule",
-                    "pto_applied",
-                    "pto_hours_applied",
-                    "personal_hours_applied",
-                ]
-            )
+        worked = user_total_worked[user.id]
+        approved_week = sum(approved_time_off_by_user_date[user.id].values())
+        if (worked + approved_week) >= required_week_hours:
+            met_user_ids.append(user.id)
+    Occurrence.objects.filter(
+        user_id__in=met_user_ids,
+        date__range=[week_start, week_ending],
+        subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE,
+    ).update(
+        subtype=OccurrenceSubtype.EXCHANGE,
+        duration_hours=0.0,
+        is_variance_to_schedule=True,
+        pto_applied=False,
+        pto_hours_applied=0.0,
+        personal_hours_applied=0.0,
+    )
 
     # Apply PTO before accrual (use current balance, not hours earned this week).
     week_occurrences = list(
@@ -316,6 +380,7 @@ def finalize_payroll_week(*, period, week_start: date, week_ending: date, finali
         required = required_week_hours_for_policy(expected)
         absence_cap_by_user[user.id] = max(0.0, round(required - worked, 2))
 
+    zeroed = []
     for occ in week_occurrences:
         uid = occ.user_id
         cap_remaining = absence_cap_by_user.get(uid, 0.0)
@@ -325,35 +390,61 @@ def finalize_payroll_week(*, period, week_start: date, week_ending: date, finali
             occ.pto_applied = True
             occ.pto_hours_applied = 0.0
             occ.personal_hours_applied = 0.0
-            occ.save(
-                update_fields=[
-                    "duration_hours",
-                    "pto_applied",
-                    "pto_hours_applied",
-                    "personal_hours_applied",
-                ]
-            )
+            zeroed.append(occ)
             continue
         occ.apply_pto(max_occurrence_hours=hours_to_charge)
         charged = float(occ.pto_hours_applied or 0.0) + float(occ.personal_hours_applied or 0.0)
         absence_cap_by_user[uid] = max(0.0, round(cap_remaining - charged, 2))
+    Occurrence.objects.bulk_update(
+        zeroed,
+        ["duration_hours", "pto_applied", "pto_hours_applied", "personal_hours_applied"],
+    )
 
-    sync_finalized_daily_summaries(users, week_start, week_ending, period)
+    sync_finalized_daily_summaries(users, week_start, week_ending, period, week_rows=rows)
 
     # Accrue PTO for the week (after applying so balance used is pre-accrual).
-    for user in users:
-        total_worked_hours = user_total_worked.get(user.id, 0)
-        if total_worked_hours and (user.years_of_service() <= 2 or user.is_part_time):
-            user.refresh_from_db()
-            accrued = user.accrue_pto(total_worked_hours)
-            if accrued:
-                PayrollPeriodUserSnapshot.objects.update_or_create(
+    accruing = [
+        user
+        for user in users
+        if user_total_worked[user.id] and (user.years_of_service() <= 2 or user.is_part_time)
+    ]
+    current_by_id = CustomUser.objects.in_bulk([u.id for u in accruing])
+    snapshots_by_user = {
+        s.user_id: s
+        for s in PayrollPeriodUserSnapshot.objects.filter(
+            period=period,
+            user_id__in=current_by_id.keys(),
+        )
+    }
+    new_snapshots = []
+    changed_snapshots = []
+    for user in accruing:
+        current = current_by_id[user.id]
+        accrued = current.accrue_pto(user_total_worked[user.id])
+        if not accrued:
+            continue
+        snapshot = snapshots_by_user.get(user.id)
+        if snapshot is None:
+            new_snapshots.append(
+                PayrollPeriodUserSnapshot(
                     period=period,
-                    user=user,
-                    defaults={"pto_accrued_hours": round(accrued, 2)},
+                    user=current,
+                    pto_accrued_hours=round(accrued, 2),
                 )
+            )
+        else:
+            snapshot.pto_accrued_hours = round(accrued, 2)
+            changed_snapshots.append(snapshot)
+    PayrollPeriodUserSnapshot.objects.bulk_create(new_snapshots)
+    PayrollPeriodUserSnapshot.objects.bulk_update(changed_snapshots, ["pto_accrued_hours"])
+
+    # Variances, tardy conversion and zero-charge rows above were bulk writes (no signals).
+    invalidate_weekly_user_totals(week_endings=[week_ending])
 
     period.is_finalized = True
     period.finalized_at = django_tz.now()
     period.finalized_by = finalized_by
     period.save()
+
+    # A month whose last day falls in this week is now closed for Perfect Attendance.
+    finalize_perfect_attendance_for_week(week_start, week_ending)
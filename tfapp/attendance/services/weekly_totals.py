@@ -0,0 +1,185 @@
+"""
+Persisted per-user payroll week totals (WeeklyUserTotals) for the dashboard and payroll tables.
+
+Writes that touch a row's inputs delete just that (user, week) row; readers rebuild whatever is
+missing in one batch and store it, so a warm week is a single indexed query. Inside a transaction
+the delete is repeated on commit: a reader that rebuilt the row from the writer's pre-commit
+data in the meantime would otherwise leave it stored for good.
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Sum, prefetch_related_objects
+from django.db.models.signals import post_delete, post_save
+
+from attendance.models import (
+    CustomUser,
+    HolidayWeekPlan,
+    HolidayWeekPlanDay,
+    Occurrence,
+    OccurrenceSubtype,
+    WeeklyUserTotals,
+    WorkSchedule,
+    WorkThroughLunchRequest,
+)
+from attendance.payroll_utils import week_ending_for_date
+from attendance.services.daily_summaries import mark_daily_summaries_stale
+from attendance.services.entry_hours import entry_hours_by_user
+from attendance.services.holiday_plan_service import (
+    HolidayPlanCalendar,
+    effective_scheduled_hours_for_range,
+)
+from timeclock.models import TimeEntry
+
+
+def compute_weekly_user_totals(users, week_ending: date) -> list[WeeklyUserTotals]:
+    """Unsaved rows for ``users``, computed from entries, occurrences, schedules and holiday plans."""
+    users = list(users)
+    if not users:
+        return []
+    week_start = week_ending - timedelta(days=6)
+    user_ids = [u.id for u in users]
+    prefetch_related_objects(users, "schedules")
+
+    hours_by_uid = entry_hours_by_user(user_ids, week_start, week_ending)
+
+    pto_by_uid = {}
+    for row in (
+        Occurrence.objects.filter(
+            user_id__in=user_ids,
+            date__range=[week_start, week_ending],
+            pto_applied=True,
+        )
+        .exclude(subtype=OccurrenceSubtype.HOLIDAY_PAID)
+        .values("user_id")
+        .annotate(
+            pto_sum=Sum("pto_hours_applied"),
+            per_sum=Sum("personal_hours_applied"),
+        )
+        .order_by()
+    ):
+        pto_by_uid[row["user_id"]] = (float(row["pto_sum"] or 0), float(row["per_sum"] or 0))
+
+    calendar = HolidayPlanCalendar.load(week_start, week_ending)
+    rows = []
+    for u in users:
+        hours = hours_by_uid.get(u.id, {})
+        pto_applied, personal_applied = pto_by_uid.get(u.id, (0.0, 0.0))
+        scheduled = effective_scheduled_hours_for_range(u, week_start, week_ending, calendar=calendar)
+        rows.append(
+            WeeklyUserTotals(
+                user=u,
+                week_ending=week_ending,
+                actual_hours=round(hours.get("actual", 0.0), 2),
+                reported_hours=round(hours.get("credited", 0.0), 2),
+                scheduled_hours=round(scheduled, 2),
+                pto_hours=round(pto_applied, 2),
+                personal_hours=round(personal_applied, 2),
+            )
+        )
+    return rows
+
+
+def weekly_user_totals(users, week_ending: date) -> dict[int, WeeklyUserTotals]:
+    """{user_id: WeeklyUserTotals} for ``users``; rows missing from the table are built and stored."""
+    users = list(users)
+    found = {
+        row.user_id: row
+        for row in WeeklyUserTotals.objects.filter(
+            week_ending=week_ending,
+            user_id__in=[u.id for u in users],
+        )
+    }
+    missing = [u for u in users if u.id not in found]
+    if missing:
+        built = compute_weekly_user_totals(missing, week_ending)
+        # A concurrent reader may have stored the same rows; either copy is current.
+        WeeklyUserTotals.objects.bulk_create(built, ignore_conflicts=True)
+        for row in built:
+            found[row.user_id] = row
+    return found
+
+
+def _drop_weekly_user_totals(user_ids, week_endings) -> None:
+    qs = WeeklyUserTotals.objects.all()
+    if user_ids is not None:
+        qs = qs.filter(user_id__in=user_ids)
+    if week_endings is not None:
+        qs = qs.filter(week_ending__in=week_endings)
+    qs.delete()
+    mark_daily_summaries_stale(user_ids=user_ids, week_endings=week_endings)
+
+
+def invalidate_weekly_user_totals(*, user_ids=None, week_endings=None) -> None:
+    """
+    Drop rollup rows so the next read rebuilds them; ``None`` means every user / every week.
+    The daily fact rows of the same user-weeks share these inputs and are marked stale too.
+    Rows rebuilt by concurrent readers before this transaction commits are dropped on commit.
+    """
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    if week_endings is not None:
+        week_endings = list(week_endings)
+    _drop_weekly_user_totals(user_ids, week_endings)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _drop_weekly_user_totals(user_ids, week_endings))
+
+
+def invalidate_weekly_user_totals_for_dates(user_id: int, dates) -> None:
+    invalidate_weekly_user_totals(
+        user_ids=[user_id],
+        week_endings={week_ending_for_date(d) for d in dates},
+    )
+
+
+def rebuild_weekly_user_totals(start_date: date, end_date: date, *, users=None) -> int:
+    """Recompute and store every payroll week ending in ``start_date``..``end_date``. Returns rows written."""
+    if users is None:
+        users = CustomUser.objects.filter(is_exempt=False)
+    users = list(users)
+    written = 0
+    week_ending = week_ending_for_date(start_date)
+    while week_ending <= week_ending_for_date(end_date):
+        _drop_weekly_user_totals([u.id for u in users], [week_ending])
+        rows = compute_weekly_user_totals(users, week_ending)
+        WeeklyUserTotals.objects.bulk_create(rows)
+        written += len(rows)
+        week_ending += timedelta(days=7)
+    return written
+
+
+def _on_dated_row_change(sender, instance, **kwargs):
+    invalidate_weekly_user_totals_for_dates(instance.user_id, [instance.date])
+
+
+def _on_work_through_lunch_change(sender, instance, **kwargs):
+    invalidate_weekly_user_totals_for_dates(instance.user_id, [instance.work_date])
+
+
+def _on_schedule_change(sender, instance, **kwargs):
+    # Schedules feed rounding and scheduled hours for every week, past and future.
+    invalidate_weekly_user_totals(user_ids=[instance.user_id])
+
+
+def _on_holiday_plan_change(sender, instance, **kwargs):
+    invalidate_weekly_user_totals(week_endings=[instance.week_ending])
+
+
+def _on_holiday_plan_day_change(sender, instance, **kwargs):
+    invalidate_weekly_user_totals(week_endings=[week_ending_for_date(instance.the_date)])
+
+
+def connect_weekly_totals_signals() -> None:
+    """Called from AttendanceConfig.ready(). Queryset update()/bulk writes must invalidate explicitly."""
+    for model, handler in (
+        (TimeEntry, _on_dated_row_change),
+        (Occurrence, _on_dated_row_change),
+        (WorkThroughLunchRequest, _on_work_through_lunch_change),
+        (WorkSchedule, _on_schedule_change),
+        (HolidayWeekPlan, _on_holiday_plan_change),
+        (HolidayWeekPlanDay, _on_holiday_plan_day_change),
+    ):
+        post_save.connect(handler, sender=model, dispatch_uid=f"weekly_totals_save_{model.__name__}")
+        post_delete.connect(handler, sender=model, dispatch_uid=f"weekly_totals_delete_{model.__name__}")
@@ -17,3 +17,29 @@ def ensure_unique_slug(instance, field_name: str, max_length: int = 48) -> None:
             setattr(instance, field_name, candidate)
             return
     setattr(instance, field_name, secrets.token_urlsafe(32)[:max_length])
+
+
+def assign_unique_slugs(instances, field_name: str, max_length: int = 48) -> None:
+    """Like ensure_unique_slug for a batch about to be bulk-created: one uniqueness query per round."""
+    pending = [obj for obj in instances if not getattr(obj, field_name, None)]
+    if not pending:
+        return
+    model_cls = pending[0].__class__
+    for _ in range(32):
+        candidates = [(secrets.token_urlsafe(18)[:max_length], obj) for obj in pending]
+        taken = set(
+            model_cls.objects.filter(**{f"{field_name}__in": [c for c, _ in candidates]}).values_list(
+                field_name, flat=True
+            )
+        )
+        pending = []
+        for candidate, obj in candidates:
+            if candidate in taken:
+                pending.append(obj)
+            else:
+                taken.add(candidate)
+                setattr(obj, field_name, candidate)
+        if not pending:
+            return
+    for obj in pending:
+        setattr(obj, field_name, secrets.token_urlsafe(32)[:max_length])
@@ -0,0 +1,149 @@
+"""
+Batched application of due occurrences (balance_service.apply_due_occurrence_pto).
+``_legacy_apply`` is the per-occurrence loop it replaced (one locked apply_pto per row, in date
+order), frozen as the oracle: identical scenarios for two sets of employees must end with the
+same balances, history and occurrence splits.
+"""
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance.models import (
+    OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    PTOBalanceHistory,
+)
+from attendance.services.balance_service import apply_due_occurrence_pto
+
+TODAY = date.today()
+
+
+def _legacy_apply(user):
+    for occ in Occurrence.objects.filter(
+        user=user,
+        date__lte=date.today(),
+        pto_applied=False,
+        subtype__in=OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
+    ).order_by("date", "pk"):
+        occ.apply_pto()
+
+
+def _snapshot(user):
+    user.refresh_from_db()
+    return {
+        "balances": (user.pto_balance, user.personal_time_balance, user.final_pto_balance),
+        "occurrences": list(
+            Occurrence.objects.filter(user=user)
+            .order_by("date", "pk")
+            .values_list(
+                "date",
+                "subtype",
+                "pto_applied",
+                "pto_hours_applied",
+                "personal_hours_applied",
+                "probation_grace_hours_applied",
+            )
+        ),
+        "history": [
+            (float(h.change), h.reason, float(h.balance_after), h.balance_type)
+            for h in PTOBalanceHistory.objects.filter(user=user).order_by("pk")
+        ],
+    }
+
+
+def _occurrence(user, days_ago, subtype, hours, **extra):
+    # bulk_create skips Occurrence.save(), which would apply the row immediately.
+    return Occurrence(
+        user=user,
+        date=TODAY - timedelta(days=days_ago),
+        occurrence_type=OccurrenceType.PLANNED,
+        subtype=subtype,
+        duration_hours=hours,
+        **extra,
+    )
+
+
+class TestApplyDueOccurrencePto(TestCase):
+    def _scenario(self, prefix):
+        """Full-time with a fractional PTO balance, a probationary hire, a part-time and an exempt employee."""
+        full_time = CustomUser.objects.create_user(
+            username=f"{prefix}_ft", password="x", hire_date=date(2015, 1, 5), pto_balance=10.33
+        )
+        probation = CustomUser.objects.create_user(
+            username=f"{prefix}_prob", password="x", hire_date=TODAY - timedelta(days=40)
+        )
+        part_time = CustomUser.objects.create_user(
+            username=f"{prefix}_pt", password="x", hire_date=date(2019, 3, 1), is_part_time=True, pto_balance=6.0
+        )
+        exempt = CustomUser.objects.create_user(
+            username=f"{prefix}_ex", password="x", hire_date=date(2018, 3, 1), is_exempt=True, pto_balance=3.0
+        )
+        Occurrence.objects.bulk_create(
+            [
+                _occurrence(full_time, 9, OccurrenceSubtype.TIME_OFF, 8.0),
+                _occurrence(full_time, 7, OccurrenceSubtype.TARDY_OUT_OF_GRACE, 0.5),
+                _occurrence(full_time, 5, OccurrenceSubtype.FMLA, 4.0),
+                _occurrence(full_time, 3, OccurrenceSubtype.TIME_OFF, 8.0),
+                _occurrence(full_time, -3, OccurrenceSubtype.TIME_OFF, 8.0),  # not due yet
+                _occurrence(full_time, 2, OccurrenceSubtype.LAYOFF, 8.0),  # never draws balances
+                _occurrence(
+                    probation,
+                    30,
+                    OccurrenceSubtype.GRACE_TIME,
+                    6.0,
+                    pto_applied=True,
+                    probation_grace_hours_applied=6.0,
+                ),
+                _occurrence(probation, 20, OccurrenceSubtype.TIME_OFF, 16.0),
+                _occurrence(probation, 10, OccurrenceSubtype.TARDY_OUT_OF_GRACE, 0.75),
+                _occurrence(probation, 6, OccurrenceSubtype.TIME_OFF, 12.0),
+                _occurrence(part_time, 4, OccurrenceSubtype.TIME_OFF, 8.0),
+                _occurrence(exempt, 4, OccurrenceSubtype.TIME_OFF, 8.0),
+            ]
+        )
+        return [full_time, probation, part_time, exempt]
+
+    def test_matches_legacy_per_occurrence_apply(self):
+        legacy_users = self._scenario("legacy")
+        batch_users = self._scenario("batch")
+        for user in legacy_users:
+            _legacy_apply(user)
+        applied = apply_due_occurrence_pto(user_ids=[u.pk for u in batch_users])
+        self.assertEqual(applied, 9)
+        for legacy, batch in zip(legacy_users, batch_users):
+            self.assertEqual(_snapshot(batch), _snapshot(legacy), batch.username)
+        self.assertEqual(apply_due_occurrence_pto(user_ids=[u.pk for u in batch_users]), 0)
+
+    def test_query_count_does_not_grow_with_users(self):
+        users = self._scenario("a") + self._scenario("b")
+        with CaptureQueriesContext(connection) as ctx:
+            apply_due_occurrence_pto()
+        queries = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        # Pending users, lock, occurrences, prior grace, user / history / occurrence writes, rollups.
+        self.assertLessEqual(len(queries), 9)
+        self.assertFalse(
+            Occurrence.objects.filter(user__in=users, pto_applied=False, date__lte=TODAY)
+            .exclude(subtype=OccurrenceSubtype.LAYOFF)
+            .exists()
+        )
+
+    def test_dashboard_only_reads_and_command_applies(self):
+        user = self._scenario("view")[0]
+        client = Client()
+        client.force_login(user)
+        self.assertEqual(client.get(reverse("attendance:dashboard")).status_code, 200)
+        self.assertTrue(Occurrence.objects.filter(user=user, pto_applied=False, date__lte=TODAY).exists())
+
+        out = StringIO()
+        call_command("apply_due_pto", "--user", str(user.pk), stdout=out)
+        self.assertIn("Applied 4 due occurrences", out.getvalue())
+        user.refresh_from_db()
+        self.assertEqual(user.pto_balance, 0.08)
@@ -0,0 +1,112 @@
+"""
+Pending approvals: approver-scoped querysets match can_approve_time_off, counts are cached per
+approver and invalidated by request changes, and the team queue uses the same scoping.
+"""
+from datetime import date, datetime, time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import (
+    AdjustPunchField,
+    AdjustPunchRequest,
+    CustomUser,
+    RoleChoices,
+    TimeOffRequest,
+    TimeOffRequestStatus,
+    WorkThroughLunchRequest,
+)
+from attendance.services.approvals import get_pending_approval_counts, pending_for_approver
+from attendance.views import can_approve_time_off
+from timeclock.models import TimeEntry
+
+
+class TestPendingApprovals(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.executive = CustomUser.objects.create_user(
+            username="ap_exec", password="x", role=RoleChoices.EXECUTIVE
+        )
+        self.manager = CustomUser.objects.create_user(
+            username="ap_mgr", password="x", role=RoleChoices.MANAGER, department="Ops"
+        )
+        self.supervisor = CustomUser.objects.create_user(
+            username="ap_sup", password="x", role=RoleChoices.SUPERVISOR, department="Sales"
+        )
+        self.lead = CustomUser.objects.create_user(username="ap_lead", password="x", role=RoleChoices.GROUP_LEAD)
+        self.approvers = [self.executive, self.manager, self.supervisor, self.lead]
+
+        self.employees = [
+            CustomUser.objects.create_user(username="ap_e0", password="x", department="Ops"),
+            CustomUser.objects.create_user(
+                username="ap_e1", password="x", department="Sales", supervisor=self.supervisor
+            ),
+            CustomUser.objects.create_user(username="ap_e2", password="x", group_lead=self.lead),
+            CustomUser.objects.create_user(username="ap_e3", password="x"),
+        ]
+        tz = timezone.get_current_timezone()
+        for i, u in enumerate(self.employees):
+            d = date(2025, 3, 3 + i)
+            TimeOffRequest.objects.create(user=u, start_date=d, end_date=d)
+            WorkThroughLunchRequest.objects.create(user=u, work_date=d)
+            entry = TimeEntry.objects.create(
+                user=u, date=d, clock_in=timezone.make_aware(datetime.combine(d, time(8, 0)), tz)
+            )
+            AdjustPunchRequest.objects.create(
+                user=u,
+                time_entry=entry,
+                punch_field=AdjustPunchField.CLOCK_OUT,
+                requested_at=timezone.make_aware(datetime.combine(d, time(16, 0)), tz),
+            )
+        TimeOffRequest.objects.create(
+            user=self.employees[0],
+            start_date=date(2025, 4, 1),
+            end_date=date(2025, 4, 1),
+            status=TimeOffRequestStatus.APPROVED,
+        )
+
+    def test_scoped_querysets_match_can_approve_time_off(self):
+        for approver in self.approvers:
+            for model in (TimeOffRequest, WorkThroughLunchRequest, AdjustPunchRequest):
+                expected = {
+                    r.pk
+                    for r in model.objects.filter(status=TimeOffRequestStatus.PENDING)
+                    if can_approve_time_off(approver, r.user)
+                }
+                actual = set(pending_for_approver(model, approver).values_list("pk", flat=True))
+                self.assertEqual(actual, expected, (approver.username, model.__name__))
+
+    def test_counts_are_cached_and_invalidated_by_request_changes(self):
+        self.assertEqual(get_pending_approval_counts(self.manager)["total"], 3)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(get_pending_approval_counts(self.manager)["total"], 3)
+        self.assertEqual(len(ctx), 0)
+
+        TimeOffRequest.objects.get(user=self.employees[0], status=TimeOffRequestStatus.PENDING).deny(
+            self.manager
+        )
+        counts = get_pending_approval_counts(self.manager)
+        self.assertEqual(counts["time_off"], 0)
+        self.assertEqual(counts["total"], 2)
+        self.assertEqual(get_pending_approval_counts(self.executive)["total"], 11)
+
+    def test_non_approver_gets_zero_without_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            counts = get_pending_approval_counts(self.employees[0])
+        self.assertEqual(counts["total"], 0)
+        self.assertEqual(len(ctx), 0)
+
+    def test_team_queue_lists_scoped_requests(self):
+        client = Client()
+        client.force_login(self.supervisor)
+        response = client.get(reverse("attendance:team_time_off_requests"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r.user_id for r in response.context["pending_requests"]], [self.employees[1].pk])
+        self.assertEqual(
+            [r.user_id for r in response.context["pending_work_through_lunch"]], [self.employees[1].pk]
+        )
+        self.assertEqual([r.user_id for r in response.context["pending_adjust_punch"]], [self.employees[1].pk])
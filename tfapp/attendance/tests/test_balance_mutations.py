@@ -0,0 +1,136 @@
+"""
+Balance deltas (balance_service.adjust_balances): refunds, accruals and their reversal are
+single F()-expression UPDATEs with ledger rows, so interleaved approvals, cancels and payroll
+accruals against one employee compose instead of overwriting each other.
+"""
+import threading
+import unittest
+from datetime import date, timedelta
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    PTOBalanceHistory,
+    TimeOffRequest,
+    TimeOffRequestStatus,
+)
+from attendance.services.balance_service import adjust_balances
+from attendance.services.pto_ledger import reconcile_ledger
+
+
+def _approved_time_off(user, days_ago, hours=8.0):
+    day = date.today() - timedelta(days=days_ago)
+    tor = TimeOffRequest.objects.create(
+        user=user, start_date=day, end_date=day, status=TimeOffRequestStatus.APPROVED
+    )
+    Occurrence.objects.create(
+        user=user,
+        date=day,
+        occurrence_type=OccurrenceType.PLANNED,
+        subtype=OccurrenceSubtype.TIME_OFF,
+        duration_hours=hours,
+        time_off_request=tor,
+    )
+    return tor
+
+
+def _balances(user):
+    user.refresh_from_db()
+    return user.pto_balance, user.personal_time_balance, user.final_pto_balance
+
+
+class TestAdjustBalances(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="delta_user", password="x", service_date=date.today() - timedelta(days=400), pto_balance=10.0
+        )
+
+    def test_applies_recalculate_rules_in_the_update(self):
+        self.assertEqual(adjust_balances(self.user.pk, "refund", pto=2.333, personal=1.5), (12.33, 1.5))
+        self.assertEqual(_balances(self.user), (12.33, 1.5, 12.33))
+        self.assertEqual(adjust_balances(self.user.pk, "revert", pto=-20.0, personal=-4.0), (0.0, 0.0))
+
+        part_time = CustomUser.objects.create_user(username="delta_pt", password="x", is_part_time=True, pto_balance=70)
+        self.assertEqual(adjust_balances(part_time.pk, "accrual", pto=5.0)[0], 72.0)
+        exempt = CustomUser.objects.create_user(username="delta_ex", password="x", is_exempt=True)
+        self.assertEqual(adjust_balances(exempt.pk, "refund", personal=3.0), (0.0, 0.0))
+
+        rows = list(
+            PTOBalanceHistory.objects.filter(user=self.user, reason__in=["refund", "revert"])
+            .order_by("pk")
+            .values_list("balance_type", "change", "balance_after")
+        )
+        self.assertEqual([(t, float(c), float(a)) for t, c, a in rows], [
+            ("pto", 2.33, 12.33), ("personal", 1.5, 1.5), ("pto", -12.33, 0.0), ("personal", -1.5, 0.0)
+        ])
+        self.assertEqual(reconcile_ledger(full=True), [])
+
+    def test_stale_instance_does_not_overwrite_a_refund(self):
+        tor = _approved_time_off(self.user, days_ago=3)
+        stale = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(stale.pto_balance, 2.0)
+        tor.cancel()
+        # Read-modify-save would have written 2.0 + 1.0 over the refund.
+        self.assertEqual(stale.accrue_pto(30.0), 1.0)
+        self.assertEqual(stale.pto_balance, 11.0)
+        self.assertEqual(_balances(self.user), (11.0, 0.0, 11.0))
+        self.assertEqual(reconcile_ledger(full=True), [])
+
+    def test_cancel_refunds_pto_and_personal_once(self):
+        tor = _approved_time_off(self.user, days_ago=2, hours=16.0)
+        self.assertEqual(_balances(self.user)[:2], (0.0, 6.0))
+        tor.cancel()
+        self.assertEqual(_balances(self.user), (10.0, 0.0, 10.0))
+        self.assertFalse(Occurrence.objects.filter(time_off_request=tor).exists())
+        tor.refresh_from_db()
+        self.assertEqual(tor.status, TimeOffRequestStatus.CANCELLED)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "needs row locks across connections")
+class TestConcurrentBalanceMutations(TransactionTestCase):
+    def test_parallel_approvals_cancels_and_accruals(self):
+        user = CustomUser.objects.create_user(
+            username="race_user", password="x", service_date=date.today() - timedelta(days=400), pto_balance=200.0
+        )
+        to_cancel = [_approved_time_off(user, days_ago=10 + i) for i in range(5)]
+        to_approve = []
+        for i in range(5):
+            day = date.today() - timedelta(days=20 + i)
+            to_approve.append(
+                TimeOffRequest.objects.create(
+                    user=user, start_date=day, end_date=day, partial_day=True, partial_hours=8.0
+                )
+            )
+        self.assertEqual(_balances(user)[0], 160.0)
+
+        approver = CustomUser.objects.create_user(username="race_manager", password="x", is_staff=True)
+        jobs = [tor.cancel for tor in to_cancel]
+        jobs += [lambda tor=tor: tor.approve(approver) for tor in to_approve]
+        jobs += [lambda: CustomUser.objects.get(pk=user.pk).accrue_pto(30.0) for _ in range(5)]
+        gate = threading.Barrier(len(jobs))
+        errors = []
+
+        def run(job):
+            try:
+                gate.wait()
+                job()
+            except Exception as exc:  # surfaced below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(job,)) for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        # 160 + 5 x 8 refunded - 5 x 8 approved + 5 x 1 accrued.
+        self.assertEqual(_balances(user), (165.0, 0.0, 165.0))
+        self.assertEqual(reconcile_ledger(full=True), [])
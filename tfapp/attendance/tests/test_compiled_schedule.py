@@ -0,0 +1,105 @@
+"""
+CompiledSchedule: schedule helpers parse weekly_schedule / query WorkSchedule once per user.
+"""
+from datetime import date, time
+
+from django.test import TestCase
+
+from attendance.models import CustomUser, WorkSchedule
+from attendance.services.time_processing import (
+    compiled_schedule_for_user,
+    crosses_midnight_for_day,
+    get_scheduled_end_time_for_day,
+    get_scheduled_lunch_in_for_day,
+    get_scheduled_lunch_out_for_day,
+    get_scheduled_start_for_day,
+    scheduled_duration_hours_for_day,
+)
+
+MONDAY = date(2025, 3, 3)
+FRIDAY = date(2025, 3, 7)
+
+
+def _work_schedule(user, day, start, end, lunch_out=None, lunch_in=None, **kwargs):
+    return WorkSchedule.objects.create(
+        user=user,
+        day=day,
+        start_time=start,
+        end_time=end,
+        lunch_out=lunch_out,
+        lunch_in=lunch_in,
+        **kwargs,
+    )
+
+
+class TestCompiledSchedule(TestCase):
+    """Helpers keep their results but stop re-parsing and re-querying per call."""
+
+    def test_work_schedule_rows_loaded_once(self):
+        """First helper call loads WorkSchedule rows; later calls on the instance are free."""
+        user = CustomUser.objects.create_user(username="compiled_ws", password="x")
+        _work_schedule(user, 0, time(5, 0), time(15, 30), time(11, 0), time(11, 30))
+        user = CustomUser.objects.get(pk=user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_scheduled_start_for_day(user, MONDAY), time(5, 0))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_scheduled_end_time_for_day(user, MONDAY), time(15, 30))
+            self.assertEqual(get_scheduled_lunch_out_for_day(user, MONDAY), time(11, 0))
+            self.assertEqual(get_scheduled_lunch_in_for_day(user, MONDAY), time(11, 30))
+            self.assertAlmostEqual(scheduled_duration_hours_for_day(user, MONDAY), 10.0)
+            self.assertFalse(crosses_midnight_for_day(user, MONDAY))
+            self.assertIsNone(get_scheduled_start_for_day(user, FRIDAY))
+            self.assertEqual(scheduled_duration_hours_for_day(user, FRIDAY), 0.0)
+
+    def test_json_schedule_needs_no_queries(self):
+        """A weekly_schedule covering every weekday never touches WorkSchedule."""
+        user = CustomUser.objects.create_user(
+            username="compiled_json",
+            password="x",
+            weekly_schedule={
+                name: {"start": "15:30", "end": "02:00", "lunch_out": "20:00", "lunch_in": "20:30"}
+                for name in ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+            },
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(crosses_midnight_for_day(user, MONDAY))
+            self.assertAlmostEqual(scheduled_duration_hours_for_day(user, MONDAY), 10.0)
+            self.assertEqual(get_scheduled_lunch_out_for_day(user, FRIDAY), time(20, 0))
+
+    def test_work_schedule_save_invalidates(self):
+        """Adding or deleting a WorkSchedule row is seen by an already-compiled user."""
+        user = CustomUser.objects.create_user(username="compiled_inval", password="x")
+        self.assertIsNone(get_scheduled_start_for_day(user, FRIDAY))
+        row = _work_schedule(CustomUser.objects.get(pk=user.pk), 4, time(6, 30), time(11, 0))
+        self.assertEqual(get_scheduled_start_for_day(user, FRIDAY), time(6, 30))
+        self.assertAlmostEqual(scheduled_duration_hours_for_day(user, FRIDAY), 4.5)
+        row.delete()
+        self.assertIsNone(get_scheduled_start_for_day(user, FRIDAY))
+
+    def test_weekly_schedule_change_recompiles(self):
+        """Editing weekly_schedule (even in place, unsaved) is picked up on the next call."""
+        user = CustomUser.objects.create_user(
+            username="compiled_json_edit",
+            password="x",
+            weekly_schedule={"monday": {"start": "08:00", "end": "12:00"}},
+        )
+        self.assertEqual(get_scheduled_start_for_day(user, MONDAY), time(8, 0))
+        first = compiled_schedule_for_user(user)
+        self.assertIs(compiled_schedule_for_user(user), first)
+        user.weekly_schedule["monday"]["start"] = "09:00"
+        self.assertEqual(get_scheduled_start_for_day(user, MONDAY), time(9, 0))
+        self.assertAlmostEqual(scheduled_duration_hours_for_day(user, MONDAY), 3.0)
+
+    def test_unparsable_json_falls_back_per_field(self):
+        """Bad JSON times fall back to WorkSchedule for start/end; lunch stays JSON-only."""
+        user = CustomUser.objects.create_user(
+            username="compiled_fallback",
+            password="x",
+            weekly_schedule={"monday": {"start": "bad", "end": "15:30", "lunch_out": "x", "lunch_in": "y"}},
+        )
+        _work_schedule(user, 0, time(5, 0), time(15, 30), time(11, 0), time(11, 30))
+        self.assertEqual(get_scheduled_start_for_day(user, MONDAY), time(5, 0))
+        self.assertEqual(get_scheduled_end_time_for_day(user, MONDAY), time(15, 30))
+        self.assertIsNone(get_scheduled_lunch_out_for_day(user, MONDAY))
+        self.assertIsNone(get_scheduled_lunch_in_for_day(user, MONDAY))
+        self.assertAlmostEqual(scheduled_duration_hours_for_day(user, MONDAY), 10.0)
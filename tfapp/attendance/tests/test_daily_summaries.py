@@ -0,0 +1,174 @@
+"""
+Daily attendance fact table: rows built on read, marked stale by writes to their inputs, and
+rolled up in SQL by group analytics and the absenteeism chart.
+"""
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from attendance.group_analytics import compute_group_analytics
+from attendance.models import (
+    CustomUser,
+    DailyAttendanceSummary,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    WorkSchedule,
+)
+from attendance.services.daily_summaries import ensure_daily_summaries, scheduled_hours_by_day
+from attendance.services.time_processing import scheduled_duration_hours_for_day
+from timeclock.models import TimeEntry
+
+WEEK_START = date(2025, 3, 2)
+WEEK_ENDING = date(2025, 3, 8)
+MONDAY = date(2025, 3, 3)
+TUESDAY = date(2025, 3, 4)
+
+
+def _entry(user, d, start=time(8, 0), end=time(16, 30)):
+    tz = timezone.get_current_timezone()
+    return TimeEntry.objects.create(
+        user=user,
+        date=d,
+        clock_in=timezone.make_aware(datetime.combine(d, start), tz),
+        lunch_out=timezone.make_aware(datetime.combine(d, time(12, 0)), tz),
+        lunch_in=timezone.make_aware(datetime.combine(d, time(12, 30)), tz),
+        clock_out=timezone.make_aware(datetime.combine(d, end), tz),
+    )
+
+
+def _scheduled_user(username, department, weekdays=range(5)):
+    user = CustomUser.objects.create_user(username=username, password="x", department=department)
+    for weekday in weekdays:
+        WorkSchedule.objects.create(
+            user=user,
+            day=weekday,
+            start_time=time(8, 0),
+            lunch_out=time(12, 0),
+            lunch_in=time(12, 30),
+            end_time=time(16, 30),
+        )
+    return user
+
+
+def _occurrence(user, d, occurrence_type, subtype, hours):
+    return Occurrence.objects.create(
+        user=user, date=d, occurrence_type=occurrence_type, subtype=subtype, duration_hours=hours
+    )
+
+
+class TestDailySummaries(TestCase):
+    def setUp(self):
+        self.user = _scheduled_user("daily_facts", "Plant")
+        _entry(self.user, MONDAY, start=time(8, 10), end=time(16, 0))
+        _occurrence(self.user, TUESDAY, OccurrenceType.PLANNED, OccurrenceSubtype.WEATHER_UNPAID, 2.0)
+
+    def _users(self):
+        return [CustomUser.objects.get(pk=self.user.pk)]
+
+    def _row(self, d):
+        return DailyAttendanceSummary.objects.get(user=self.user, work_date=d)
+
+    def test_read_builds_every_day_once(self):
+        users = self._users()
+        self.assertEqual(ensure_daily_summaries(users, WEEK_START, WEEK_ENDING), 7)
+        monday = self._row(MONDAY)
+        self.assertEqual((monday.tardy_minutes, monday.early_out_minutes), (10, 30))
+        self.assertAlmostEqual(monday.base_scheduled_hours, 8.0)
+        self.assertAlmostEqual(monday.actual_hours, 7.33, places=2)
+        self.assertEqual((monday.department, monday.status), ("Plant", DailyAttendanceSummary.Status.OPEN))
+        tuesday = self._row(TUESDAY)
+        self.assertEqual((tuesday.planned_hours, tuesday.absence_hours, tuesday.worked_hours), (2.0, 2.0, 0.0))
+        self.assertEqual(self._row(WEEK_START).base_scheduled_hours, 0.0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(ensure_daily_summaries(users, WEEK_START, WEEK_ENDING), 0)
+
+    def test_writes_mark_rows_stale_and_finalized_payroll_columns_are_kept(self):
+        ensure_daily_summaries(self._users(), WEEK_START, WEEK_ENDING + timedelta(days=7))
+        DailyAttendanceSummary.objects.filter(work_date=MONDAY).update(
+            status=DailyAttendanceSummary.Status.FINALIZED, worked_hours=6.5
+        )
+        _occurrence(self.user, MONDAY, OccurrenceType.UNPLANNED, OccurrenceSubtype.TARDY_OUT_OF_GRACE, 0.25)
+
+        stale = DailyAttendanceSummary.objects.filter(is_stale=True)
+        self.assertEqual(stale.count(), 7)
+        self.assertEqual({s.work_date for s in stale}, {WEEK_START + timedelta(days=i) for i in range(7)})
+        self.assertEqual(ensure_daily_summaries(self._users(), WEEK_START, WEEK_ENDING + timedelta(days=7)), 7)
+
+        monday = self._row(MONDAY)
+        self.assertEqual((monday.unplanned_hours, monday.tardy_hours, monday.is_stale), (0.25, 0.25, False))
+        self.assertEqual((monday.status, monday.worked_hours), (DailyAttendanceSummary.Status.FINALIZED, 6.5))
+
+    def test_user_group_change_updates_rollup_columns(self):
+        ensure_daily_summaries(self._users(), WEEK_START, WEEK_ENDING)
+        lead = CustomUser.objects.create_user(username="daily_lead", password="x")
+        self.user.department = "Office"
+        self.user.group_lead = lead
+        self.user.save()
+        self.assertEqual(
+            set(DailyAttendanceSummary.objects.values_list("department", "group_lead_id")),
+            {("Office", lead.pk)},
+        )
+        self.assertFalse(DailyAttendanceSummary.objects.filter(is_stale=True).exists())
+
+    def test_scheduled_hours_by_day_reads_without_building(self):
+        other = _scheduled_user("daily_facts_office", "Office", weekdays=range(3))
+        users = list(CustomUser.objects.filter(pk__in=[self.user.pk, other.pk]).order_by("pk"))
+        by_schedule = {WEEK_START + timedelta(days=i): h for i, h in enumerate([0, 16, 16, 16, 8, 8, 0])}
+        self.assertEqual(scheduled_hours_by_day(users, WEEK_START, WEEK_ENDING), by_schedule)
+        self.assertFalse(DailyAttendanceSummary.objects.exists())
+
+        # Users whose rows are current are summed from them; the rest still use the schedule.
+        ensure_daily_summaries([users[0]], WEEK_START, WEEK_ENDING)
+        DailyAttendanceSummary.objects.filter(work_date=MONDAY).update(base_scheduled_hours=5.0)
+        self.assertEqual(scheduled_hours_by_day(users, WEEK_START, WEEK_ENDING), {**by_schedule, MONDAY: 13.0})
+        self.assertEqual(DailyAttendanceSummary.objects.count(), 7)
+
+    def test_group_analytics_match_schedule_based_totals(self):
+        other = _scheduled_user("daily_facts_office", "Office", weekdays=range(3))
+        users = list(CustomUser.objects.filter(pk__in=[self.user.pk, other.pk]).order_by("pk"))
+        start, end = date(2025, 2, 3), date(2025, 3, 30)
+        unplanned = _occurrence(other, MONDAY, OccurrenceType.UNPLANNED, OccurrenceSubtype.WEATHER_UNPAID, 4.0)
+
+        result = compute_group_analytics(
+            occurrences=[unplanned], visible_users=users, start_date=start, end_date=end, group_by="department"
+        )
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        expected = {
+            u.department: round(sum(scheduled_duration_hours_for_day(u, d) for d in days), 2) for u in users
+        }
+        self.assertEqual({g["group_label"]: g["scheduled_hours"] for g in result["by_group"]}, expected)
+        self.assertEqual(result["company"]["scheduled_hours"], round(sum(expected.values()), 2))
+        self.assertEqual((result["company"]["full_time_count"], result["company"]["part_time_count"]), (1, 1))
+        self.assertFalse(DailyAttendanceSummary.objects.exists())
+
+        # Current rows are read as stored; users without them still use the schedule.
+        ensure_daily_summaries([self.user], start, end)
+        DailyAttendanceSummary.objects.filter(work_date=MONDAY).update(base_scheduled_hours=0)
+        result = compute_group_analytics(
+            occurrences=[unplanned], visible_users=users, start_date=start, end_date=end, group_by="department"
+        )
+        monday = scheduled_duration_hours_for_day(self.user, MONDAY)
+        self.assertEqual(result["company"]["scheduled_hours"], round(sum(expected.values()) - monday, 2))
+        self.assertEqual(DailyAttendanceSummary.objects.count(), len(days))
+
+    def test_rebuild_command_overwrites_rows(self):
+        ensure_daily_summaries(self._users(), WEEK_START, WEEK_ENDING)
+        DailyAttendanceSummary.objects.filter(work_date=MONDAY).update(tardy_minutes=99)
+        out = StringIO()
+        call_command(
+            "rebuild_daily_summaries",
+            "--start",
+            WEEK_START.isoformat(),
+            "--end",
+            WEEK_ENDING.isoformat(),
+            "--user",
+            str(self.user.pk),
+            stdout=out,
+        )
+        self.assertIn("Rebuilt 7", out.getvalue())
+        self.assertEqual(self._row(MONDAY).tardy_minutes, 10)
@@ -0,0 +1,102 @@
+"""
+Stored TimeEntry hours: written on save, marked stale by schedule / work-through-lunch changes,
+refreshed before SQL sums, and checked by backfill_entry_hours.
+"""
+from datetime import date, datetime, time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    TimeOffRequestStatus,
+    WorkSchedule,
+    WorkThroughLunchRequest,
+)
+from attendance.services.entry_hours import entry_hours_by_user, refresh_stale_entry_hours
+from timeclock.models import HOURS_CALC_VERSION, TimeEntry
+
+MONDAY = date(2025, 3, 3)
+
+
+def _aware(d, t):
+    return timezone.make_aware(datetime.combine(d, t), timezone.get_current_timezone())
+
+
+class TestStoredEntryHours(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="entry_hours", password="x")
+        self.schedule = WorkSchedule.objects.create(
+            user=self.user,
+            day=0,
+            start_time=time(8, 0),
+            lunch_out=time(12, 0),
+            lunch_in=time(12, 30),
+            end_time=time(16, 30),
+        )
+
+    def _entry(self, **kwargs):
+        return TimeEntry.objects.create(
+            user=self.user,
+            date=MONDAY,
+            clock_in=_aware(MONDAY, time(8, 0)),
+            clock_out=_aware(MONDAY, time(16, 30)),
+            **kwargs,
+        )
+
+    def test_save_stores_live_hours(self):
+        entry = self._entry()
+        entry.refresh_from_db()
+        self.assertEqual(entry.calc_version, HOURS_CALC_VERSION)
+        self.assertEqual(entry.actual_hours, entry.actual_worked_hours())
+        self.assertEqual(entry.reported_hours, entry.reported_worked_hours())
+        self.assertEqual(entry.credited_hours, entry.payroll_credited_hours())
+        self.assertAlmostEqual(entry.credited_hours, 8.0, places=2)
+
+    def test_update_fields_save_keeps_hours_in_sync(self):
+        entry = self._entry()
+        entry.clock_out = _aware(MONDAY, time(15, 30))
+        entry.save(update_fields=["clock_out"])
+        entry.refresh_from_db()
+        self.assertAlmostEqual(entry.credited_hours, 7.0, places=2)
+
+    def test_schedule_change_marks_entries_stale(self):
+        entry = self._entry()
+        self.schedule.start_time = time(9, 0)
+        self.schedule.save()
+        entry.refresh_from_db()
+        self.assertEqual(entry.calc_version, 0)
+        self.assertEqual(refresh_stale_entry_hours(TimeEntry.objects.filter(pk=entry.pk)), 1)
+        entry = TimeEntry.objects.get(pk=entry.pk)
+        self.assertEqual(entry.credited_hours, entry.payroll_credited_hours())
+
+    def test_work_through_lunch_change_refreshes_sum(self):
+        wtl = WorkThroughLunchRequest.objects.create(
+            user=self.user, work_date=MONDAY, status=TimeOffRequestStatus.APPROVED
+        )
+        self._entry()
+        totals = entry_hours_by_user([self.user.id], MONDAY, MONDAY)
+        self.assertAlmostEqual(totals[self.user.id]["credited"], 8.5, places=2)
+
+        wtl.status = TimeOffRequestStatus.CANCELLED
+        wtl.save()
+        totals = entry_hours_by_user([self.user.id], MONDAY, MONDAY)
+        self.assertAlmostEqual(totals[self.user.id]["credited"], 8.0, places=2)
+
+    def test_backfill_verify_reports_drift_and_backfill_fixes_it(self):
+        entry = self._entry()
+        TimeEntry.objects.filter(pk=entry.pk).update(credited_hours=3.0)
+        out = StringIO()
+        call_command("backfill_entry_hours", "--verify", stdout=out)
+        self.assertIn(f"Drift: entry {entry.pk}", out.getvalue())
+        self.assertIn("0 stale, 1 drifted", out.getvalue())
+        entry.refresh_from_db()
+        self.assertEqual(entry.credited_hours, 3.0)
+
+        out = StringIO()
+        call_command("backfill_entry_hours", stdout=out)
+        self.assertIn("Wrote 1", out.getvalue())
+        entry.refresh_from_db()
+        self.assertAlmostEqual(entry.credited_hours, 8.0, places=2)
@@ -0,0 +1,136 @@
+"""
+flag_missing_punches: scheduled lunch fill, incomplete flags and stale-flag clearing in one
+bulk pass, limited after the first run to entries changed since the watermark or in open weeks.
+"""
+from datetime import date, datetime, time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    PayrollPeriod,
+    TimeOffRequestStatus,
+    WorkSchedule,
+    WorkThroughLunchRequest,
+)
+from timeclock.models import JobWatermark, TimeEntry
+
+OLD_MONDAY = date(2025, 3, 3)
+OLD_WEEK_ENDING = date(2025, 3, 8)
+MONDAY = date(2025, 3, 10)
+TUESDAY = date(2025, 3, 11)
+
+
+def _aware(d, t):
+    return timezone.make_aware(datetime.combine(d, t), timezone.get_current_timezone())
+
+
+class TestFlagMissingPunches(TestCase):
+    def setUp(self):
+        self.users = []
+        for i in range(3):
+            user = CustomUser.objects.create_user(username=f"flag_user{i}", password="x", hire_date=date(2020, 1, 1))
+            for weekday in range(5):
+                WorkSchedule.objects.create(
+                    user=user,
+                    day=weekday,
+                    start_time=time(8, 0),
+                    lunch_out=time(12, 0),
+                    lunch_in=time(12, 30),
+                    end_time=time(16, 30),
+                )
+            self.users.append(user)
+        self.user = self.users[0]
+
+    def _entry(self, user, d, lunch=True, clock_out=True):
+        entry = TimeEntry.objects.create(
+            user=user,
+            date=d,
+            clock_in=_aware(d, time(8, 0)),
+            clock_out=_aware(d, time(16, 30)) if clock_out else None,
+        )
+        if not lunch:
+            # save() fills scheduled lunch itself; clear it to leave the nightly fill something to do.
+            TimeEntry.objects.filter(pk=entry.pk).update(lunch_out=None, lunch_in=None)
+        entry.refresh_from_db()
+        return entry
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("flag_missing_punches", "--no-email", *args, stdout=out)
+        return out.getvalue()
+
+    def test_first_run_fills_flags_and_clears_then_sets_watermark(self):
+        no_lunch = self._entry(self.user, MONDAY, lunch=False)
+        open_shift = self._entry(self.user, TUESDAY, clock_out=False)
+        stale = self._entry(self.users[1], MONDAY, lunch=False)
+        TimeEntry.objects.filter(pk=stale.pk).update(missing_punch_flagged=True)
+        WorkThroughLunchRequest.objects.create(
+            user=self.users[1], work_date=MONDAY, status=TimeOffRequestStatus.APPROVED
+        )
+
+        out = self._run()
+        self.assertIn("Examining all past entries.", out)
+        self.assertIn("Examined 3 entries", out)
+
+        no_lunch.refresh_from_db()
+        self.assertEqual(no_lunch.lunch_out, _aware(MONDAY, time(12, 0)))
+        self.assertEqual(no_lunch.credited_hours, no_lunch.payroll_credited_hours())
+        open_shift.refresh_from_db()
+        self.assertTrue(open_shift.missing_punch_flagged)
+        stale.refresh_from_db()
+        self.assertFalse(stale.missing_punch_flagged)
+        self.assertIsNone(stale.lunch_out)
+        self.assertTrue(JobWatermark.objects.filter(name="flag_missing_punches").exists())
+
+    def test_dry_run_writes_nothing(self):
+        open_shift = self._entry(self.user, MONDAY, clock_out=False)
+        out = self._run("--dry-run")
+        self.assertIn("Would flag", out)
+        open_shift.refresh_from_db()
+        self.assertFalse(open_shift.missing_punch_flagged)
+        self.assertFalse(JobWatermark.objects.exists())
+
+    def test_incremental_run_skips_weeks_finalized_before_watermark(self):
+        old = self._entry(self.user, OLD_MONDAY, clock_out=False)
+        recent = self._entry(self.user, MONDAY, clock_out=False)
+        PayrollPeriod.objects.create(
+            week_ending=OLD_WEEK_ENDING, is_finalized=True, finalized_at=_aware(date(2025, 3, 9), time(9, 0))
+        )
+        JobWatermark.objects.create(name="flag_missing_punches", last_run_at=_aware(date(2025, 3, 12), time(2, 30)))
+
+        out = self._run()
+        self.assertIn("Examined 1 entry", out)
+        old.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertFalse(old.missing_punch_flagged)
+        self.assertTrue(recent.missing_punch_flagged)
+
+        self._run("--since", "2025-03-01")
+        old.refresh_from_db()
+        self.assertTrue(old.missing_punch_flagged)
+
+    def test_full_run_reaches_finalized_history(self):
+        old = self._entry(self.user, OLD_MONDAY, clock_out=False)
+        PayrollPeriod.objects.create(week_ending=OLD_WEEK_ENDING, is_finalized=True, finalized_at=timezone.now())
+        JobWatermark.objects.create(name="flag_missing_punches", last_run_at=timezone.now())
+        self.assertIn("Examined 0 entries", self._run())
+        self._run("--full")
+        old.refresh_from_db()
+        self.assertTrue(old.missing_punch_flagged)
+
+    def test_query_count_does_not_grow_with_entries(self):
+        for user in self.users:
+            self._entry(user, MONDAY, lunch=False)
+            self._entry(user, TUESDAY, clock_out=False)
+        with CaptureQueriesContext(connection) as ctx:
+            self._run()
+        queries = [q["sql"] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        # Watermark, entries, users, schedules, approvals, two bulk updates, rollup delete,
+        # daily fact stale mark, watermark upsert.
+        self.assertLessEqual(len(queries), 11)
@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, time
 
 from django.test import TestCase
 
@@ -6,9 +6,11 @@ from attendance.group_analytics import (
     _absence_rate_pct,
     _employment_band,
     _extrapolate_next,
+    _numpy_totals,
+    _Totals,
     compute_group_analytics,
 )
-from attendance.models import CustomUser, Occurrence, OccurrenceSubtype, OccurrenceType
+from attendance.models import CustomUser, Occurrence, OccurrenceSubtype, OccurrenceType, WorkSchedule
 
 
 class GroupAnalyticsTests(TestCase):
@@ -56,3 +58,81 @@ class GroupAnalyticsTests(TestCase):
         )
         self.assertEqual(result["company"]["tardy_hours"], 2.0)
         self.assertEqual(result["company"]["unplanned_hours"], 2.0)
+
+
+class NumpyTotalsTests(TestCase):
+    """_numpy_totals against figures worked out by hand for two weeks (Mon 6 - Sun 19 Jan 2025)."""
+
+    def setUp(self):
+        self.start, self.end = date(2025, 1, 6), date(2025, 1, 19)
+        self.lead = CustomUser.objects.create_user(username="totals_lead", password="x", is_exempt=True)
+        # 42.5 h/week full time, 13.5 h/week part time, 32.5 h/week full time.
+        self.full, self.part, self.office = [
+            self._user(name, department, weekdays, end)
+            for name, department, weekdays, end in (
+                ("totals_full", "Plant", range(5), time(16, 30)),
+                ("totals_part", "Plant", range(3), time(12, 30)),
+                ("totals_office", "Office", range(5), time(14, 30)),
+            )
+        ]
+        self.occurrences = [
+            self._occ(self.full, date(2025, 1, 7), OccurrenceType.UNPLANNED, OccurrenceSubtype.TARDY_IN_GRACE, 0.5),
+            self._occ(self.part, date(2025, 1, 15), OccurrenceType.UNPLANNED, OccurrenceSubtype.TIME_OFF, 2.0, True),
+            self._occ(self.office, date(2025, 1, 13), OccurrenceType.PLANNED, OccurrenceSubtype.WEATHER_UNPAID, 6.5),
+            self._occ(self.full, date(2025, 1, 16), OccurrenceType.UNPLANNED, OccurrenceSubtype.WEATHER_UNPAID, 8.5),
+        ]
+
+    def _user(self, username, department, weekdays, end):
+        user = CustomUser.objects.create_user(username=username, password="x", department=department)
+        for weekday in weekdays:
+            WorkSchedule.objects.create(user=user, day=weekday, start_time=time(8, 0), end_time=end)
+        return user
+
+    def _occ(self, user, d, occurrence_type, subtype, hours, variance=False):
+        return Occurrence(
+            user=user,
+            date=d,
+            occurrence_type=occurrence_type,
+            subtype=subtype,
+            is_variance_to_schedule=variance,
+            duration_hours=hours,
+        )
+
+    def _totals(self, start, end):
+        users = [self.full, self.part, self.office]
+        label_by_user = {u.id: u.department for u in users}
+        return _numpy_totals(self.occurrences, users, label_by_user, ["Office", "Plant"], start, end)
+
+    def test_two_week_totals(self):
+        company, groups = self._totals(self.start, self.end)
+        # Weekly unplanned rates: company 0.5 / 88.5 then 10.5 / 88.5 (0.56%, 11.86%); Plant
+        # 0.5 / 56 then 10.5 / 56 (0.89%, 18.75%). The fit continues each line one week.
+        self.assertEqual(company, _Totals(177.0, 17.5, 0.5, 2.0, 6.5, 11.0, 2, 1, 0, 23.16))
+        self.assertEqual(
+            groups,
+            {
+                "Office": _Totals(65.0, 6.5, 0.0, 0.0, 6.5, 0.0, 1, 0, 0, 0.0),
+                "Plant": _Totals(112.0, 11.0, 0.5, 2.0, 0.0, 11.0, 1, 1, 0, 36.61),
+            },
+        )
+
+    def test_empty_period(self):
+        company, groups = self._totals(self.end, self.start)
+        self.assertEqual(company, _Totals(0.0, 17.5, 0.5, 2.0, 6.5, 11.0, 0, 3, 0, 0.0))
+        self.assertEqual(groups["Plant"], _Totals(0.0, 11.0, 0.5, 2.0, 0.0, 11.0, 0, 2, 0, 0.0))
+
+    def test_exempt_users_and_their_occurrences_are_left_out(self):
+        self.occurrences.append(
+            self._occ(self.lead, date(2025, 1, 8), OccurrenceType.UNPLANNED, OccurrenceSubtype.TIME_OFF, 4.0)
+        )
+        result = compute_group_analytics(
+            occurrences=self.occurrences,
+            visible_users=[self.full, self.part, self.office, self.lead],
+            start_date=self.start,
+            end_date=self.end,
+            group_by="department",
+        )
+        self.assertEqual(
+            [(g["group_label"], g["unplanned_hours"]) for g in result["by_group"]], [("Office", 0.0), ("Plant", 11.0)]
+        )
+        self.assertEqual(result["company"]["non_exempt_count"], 3)
@@ -0,0 +1,89 @@
+"""
+Chart cache (attendance.group_report_charts): identical chart input is drawn once, then served
+from the per-process LRU or the shared on-disk PNG cache.
+"""
+import base64
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from attendance import group_report_charts as charts
+
+SEGMENTS = [("Plant", 12.5), ("Office", 4.0), ("Warehouse", 7.25)]
+
+
+class TestChartCache(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        settings_override = override_settings(CHART_CACHE_DIR=cache_dir, CHART_CACHE_MAX_ENTRIES=3)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        charts.clear_chart_cache()
+        self.addCleanup(charts.clear_chart_cache)
+
+    def _draws(self):
+        return patch("PIL.Image.new", wraps=Image.new)
+
+    def test_identical_input_is_drawn_once(self):
+        with self._draws() as new_image:
+            first = charts.group_pie_png_data_uri(SEGMENTS, profile="pdf", layout="side")
+            again = charts.group_pie_png_data_uri(list(SEGMENTS), profile="pdf", layout="side")
+            self.assertEqual(new_image.call_count, 1)
+            self.assertEqual(first, again)
+            # Another profile or other data is a different chart.
+            charts.group_pie_png_data_uri(SEGMENTS, profile="dashboard", layout="side")
+            charts.group_pie_png_data_uri(SEGMENTS[:2], profile="pdf", layout="side")
+            self.assertEqual(new_image.call_count, 3)
+
+        png = charts.group_pie_png_data_uri.render(SEGMENTS, profile="pdf", layout="side")
+        self.assertEqual(first, "data:image/png;base64," + base64.b64encode(png).decode("ascii"))
+
+    def test_disk_cache_serves_other_processes(self):
+        uri = charts.donut_png_data_uri([("Planned", 3.0), ("Unplanned", 1.0)])
+        self.assertEqual(len(list(charts.chart_cache_dir().glob("*/*.png"))), 1)
+        charts.clear_chart_cache()
+        with self._draws() as new_image:
+            self.assertEqual(charts.donut_png_data_uri([("Planned", 3.0), ("Unplanned", 1.0)]), uri)
+            new_image.assert_not_called()
+
+        charts.clear_chart_cache(disk=True)
+        self.assertEqual(list(charts.chart_cache_dir().glob("*/*.png")), [])
+        with override_settings(CHART_CACHE_DIR=""):
+            self.assertIsNone(charts.chart_cache_dir())
+            self.assertEqual(charts.donut_png_data_uri([("Planned", 3.0), ("Unplanned", 1.0)]), uri)
+
+    def test_memory_cache_is_bounded(self):
+        for i in range(5):
+            charts.horizontal_bar_chart_png_data_uri([("Group", float(i + 1))], unit="%")
+        self.assertEqual(len(charts._memory_cache), 3)
+        self.assertIsNone(charts.stacked_horizontal_bar_png_data_uri([], []))
+        self.assertEqual(charts.prune_chart_disk_cache(max_age_seconds=-1), 5)
+
+    @override_settings(CHART_CACHE_MAX_FILES=2)
+    def test_disk_cache_keeps_the_most_recently_used_files(self):
+        bars = [[("Group", float(i + 1))] for i in range(3)]
+        charts.horizontal_bar_chart_png_data_uri(bars[0])
+        charts.horizontal_bar_chart_png_data_uri(bars[1])
+        charts.clear_chart_cache()
+        charts.horizontal_bar_chart_png_data_uri(bars[0])  # disk hit: now the most recent
+        charts.horizontal_bar_chart_png_data_uri(bars[2])
+        self.assertEqual(len(list(charts.chart_cache_dir().glob("*/*.png"))), 2)
+
+        charts.clear_chart_cache()
+        with self._draws() as new_image:
+            charts.horizontal_bar_chart_png_data_uri(bars[0])
+            charts.horizontal_bar_chart_png_data_uri(bars[2])
+            new_image.assert_not_called()
+            charts.horizontal_bar_chart_png_data_uri(bars[1])
+            self.assertEqual(new_image.call_count, 1)
+
+    def test_fonts_are_loaded_once(self):
+        charts.preload_chart_fonts()
+        with patch("PIL.ImageFont.truetype") as truetype, patch("PIL.ImageFont.load_default") as load_default:
+            charts.horizontal_bar_chart_png_data_uri([("Group", 2.0)], profile="pdf")
+            truetype.assert_not_called()
+            load_default.assert_not_called()
@@ -373,3 +373,105 @@ class TestHolidayPlanScheduleIntersection(TestCase):
             places=2,
         )
         self.assertAlmostEqual(prevailing_schedule_shift_hours(user), 9.0, places=2)
+
+
+class TestHolidayPayBatch(TestCase):
+    HOLIDAY = date(2026, 7, 2)
+    LEADING = date(2026, 7, 1)
+    TRAILING = date(2026, 7, 6)
+    WEEK_START = date(2026, 6, 28)
+    WEEK_END = date(2026, 7, 4)
+    AS_OF = date(2026, 7, 7)
+
+    def setUp(self):
+        _complete_independence_day_2026_plan()
+
+    def _user(self, username):
+        user = CustomUser.objects.create_user(
+            username=username,
+            password="test",
+            hire_date=date(2020, 1, 1),
+        )
+        _mon_thu_schedule(user)
+        return user
+
+    def _seed_mixed_users(self, prefix=""):
+        perfect = self._user(f"{prefix}perfect")
+        _full_shift_entry(perfect, self.LEADING)
+        _full_shift_entry(perfect, self.TRAILING)
+        missed = self._user(f"{prefix}missed")
+        _full_shift_entry(missed, self.TRAILING)
+        pto = self._user(f"{prefix}pto")
+        _full_shift_entry(pto, self.TRAILING)
+        Occurrence.objects.create(
+            user=pto,
+            date=self.LEADING,
+            occurrence_type=OccurrenceType.PLANNED,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            duration_hours=9.0,
+        )
+        tardy = self._user(f"{prefix}tardy")
+        _full_shift_entry(tardy, self.LEADING)
+        _full_shift_entry(tardy, self.TRAILING)
+        Occurrence.objects.create(
+            user=tardy,
+            date=self.TRAILING,
+            occurrence_type=OccurrenceType.UNPLANNED,
+            subtype=OccurrenceSubtype.TARDY_IN_GRACE,
+            duration_hours=0.25,
+        )
+        return [perfect, missed, pto, tardy]
+
+    def test_batch_statuses_match_per_user_rule(self):
+        from attendance.services.holiday_pay_service import HolidayBookendEvaluator
+        from attendance.services.holiday_plan_service import HolidayPlanCalendar
+
+        users = self._seed_mixed_users()
+        calendar = HolidayPlanCalendar.load(date(2026, 6, 21), date(2026, 7, 11))
+        for as_of in (date(2026, 7, 3), self.AS_OF):
+            evaluator = HolidayBookendEvaluator(
+                users, self.WEEK_START, self.WEEK_END, as_of=as_of, calendar=calendar
+            )
+            for user in users:
+                self.assertEqual(
+                    evaluator.status(user, self.HOLIDAY),
+                    holiday_attendance_status(user, self.HOLIDAY, as_of=as_of),
+                    user.username,
+                )
+
+    def test_diff_report_and_idempotent_rerun(self):
+        perfect, missed, _, _ = self._seed_mixed_users()
+        Occurrence.objects.create(
+            user=missed,
+            date=self.HOLIDAY,
+            occurrence_type=OccurrenceType.PLANNED,
+            subtype=OccurrenceSubtype.HOLIDAY_PAID,
+            duration_hours=9.0,
+        )
+        diff = ensure_holiday_occurrences_for_range(self.WEEK_START, self.WEEK_END, as_of=self.AS_OF)
+        self.assertIn((perfect.id, self.HOLIDAY), {(c.user_id, c.date) for c in diff.created})
+        self.assertEqual([(c.user_id, c.date) for c in diff.deleted], [(missed.id, self.HOLIDAY)])
+        self.assertFalse(diff.updated)
+
+        rerun = ensure_holiday_occurrences_for_range(self.WEEK_START, self.WEEK_END, as_of=self.AS_OF)
+        self.assertFalse(rerun.has_changes)
+        self.assertEqual(
+            Occurrence.objects.filter(
+                date=self.HOLIDAY, subtype=OccurrenceSubtype.HOLIDAY_PAID
+            ).count(),
+            len(diff.created),
+        )
+
+    def test_query_count_does_not_grow_with_users(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._seed_mixed_users("a_")
+        with CaptureQueriesContext(connection) as small:
+            ensure_holiday_occurrences_for_range(self.WEEK_START, self.WEEK_END, as_of=self.AS_OF)
+        Occurrence.objects.filter(subtype=OccurrenceSubtype.HOLIDAY_PAID, date=self.HOLIDAY).delete()
+        self._seed_mixed_users("b_")
+        self._seed_mixed_users("c_")
+        with CaptureQueriesContext(connection) as large:
+            ensure_holiday_occurrences_for_range(self.WEEK_START, self.WEEK_END, as_of=self.AS_OF)
+        self.assertEqual(len(large), len(small))
@@ -1,15 +1,18 @@
 """Tests for holiday week plan service."""
-from datetime import date, time
+from datetime import date, time, timedelta
 
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
 from attendance.models import HolidayWeekPlanTemplate, PayrollPeriod, WorkSchedule
 from attendance.services.holiday_plan_service import (
+    HolidayPlanCalendar,
+    effective_scheduled_hours_for_range,
     get_or_create_prefilled_plan,
     holidays_in_payroll_week,
     is_plan_editable,
     missing_holiday_plans_for_payroll_week,
+    save_plan_from_post,
     user_holiday_schedule_template,
 )
 
@@ -72,3 +75,48 @@ class TestHolidayPlanService(TestCase):
         rows = holidays_in_payroll_week(date(2026, 6, 28), date(2026, 7, 4))
         self.assertEqual(len(rows), 1)
         self.assertEqual(rows[0]["name"], "Independence Day")
+
+
+class TestHolidayPlanCalendar(TestCase):
+    def setUp(self):
+        self.plan, _ = get_or_create_prefilled_plan(year=2026, holiday_key="independence_day")
+        self.user = get_user_model().objects.create_user(username="calendar", password="x")
+        for weekday in range(4):
+            WorkSchedule.objects.create(
+                user=self.user,
+                day=weekday,
+                start_time=time(5, 0),
+                lunch_out=time(11, 0),
+                lunch_in=time(11, 30),
+                end_time=time(15, 30),
+            )
+
+    def test_load_indexes_plan_rows_in_one_query(self):
+        with self.assertNumQueries(1):
+            calendar = HolidayPlanCalendar.load(self.plan.week_start, self.plan.week_ending)
+        with self.assertNumQueries(0):
+            self.assertEqual(calendar.plan_for_date(date(2026, 6, 29)).id, self.plan.id)
+            self.assertEqual(
+                calendar.work_hours(date(2026, 6, 29), HolidayWeekPlanTemplate.FOUR_DAY), 10.0
+            )
+            self.assertEqual(
+                calendar.work_hours(date(2026, 7, 3), HolidayWeekPlanTemplate.FIVE_DAY), 4.0
+            )
+            self.assertEqual(
+                calendar.holiday_pay_hours(date(2026, 7, 3), HolidayWeekPlanTemplate.FIVE_DAY), 0.0
+            )
+
+    def test_shared_calendar_across_weeks(self):
+        save_plan_from_post(
+            self.plan,
+            posted_rows={("2026-07-02", HolidayWeekPlanTemplate.FOUR_DAY): {"work": "0", "holiday_pay": "10"}},
+            updated_by=None,
+        )
+        calendar = HolidayPlanCalendar.load(date(2026, 6, 21), date(2026, 7, 11))
+        totals = [
+            effective_scheduled_hours_for_range(
+                self.user, week_start, week_start + timedelta(days=6), calendar=calendar
+            )
+            for week_start in (date(2026, 6, 21), date(2026, 6, 28), date(2026, 7, 5))
+        ]
+        self.assertEqual(totals, [40.0, 30.0, 40.0])
@@ -0,0 +1,323 @@
+"""
+Kiosk punch API: badge-only JSON punches from registered kiosks, cached kiosk credentials and
+finalized weeks, clock-in tardy checks queued for the tardy worker, the shift-change load test, and
+idempotent batch ingest of buffered punches with the stand-in kiosk client.
+"""
+import importlib.util
+import json
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    PayrollPeriod,
+    RoleChoices,
+    TardySyncJob,
+    WorkSchedule,
+)
+from attendance.payroll_utils import week_ending_for_date
+from attendance.services.tardy_sync_queue import process_tardy_sync_jobs
+from timeclock.kiosk import invalidate_kiosk_credentials
+from timeclock.models import KioskPunchReceipt, TimeclockKioskIP, TimeclockKioskToken, TimeEntry
+
+
+class TestKioskPunchApi(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_kiosk_credentials()
+        self.addCleanup(invalidate_kiosk_credentials)
+        TimeclockKioskIP.objects.create(ip_address="10.0.0.5")
+        self.user = CustomUser.objects.create_user(
+            username="kiosk_emp", password="x", first_name="Kim", last_name="Osk", timeclock_login="4321"
+        )
+        self.today = timezone.now().date()
+        self.schedule = WorkSchedule.objects.create(
+            user=self.user,
+            day=self.today.weekday(),
+            start_time=time(0, 0),
+            lunch_out=time(11, 0),
+            lunch_in=time(11, 30),
+            end_time=time(23, 59),
+        )
+        self.client = Client(REMOTE_ADDR="10.0.0.5")
+        self.url = reverse("timeclock:kiosk_punch_api")
+
+    def _punch(self, action, login="4321", client=None, **extra):
+        return (client or self.client).post(
+            self.url, json.dumps({"login": login, "action": action, **extra}), content_type="application/json"
+        )
+
+    def test_full_punch_sequence(self):
+        for action in ("clock_in", "lunch_out", "lunch_in", "clock_out"):
+            response = self._punch(action)
+            self.assertEqual(response.status_code, 201, action)
+            self.assertEqual(response.json()["action"], action)
+        entry = TimeEntry.objects.get(user=self.user, date=self.today)
+        self.assertFalse(entry.is_incomplete())
+        self.assertEqual(response.json()["employee"], "Kim Osk")
+
+    def test_rejections(self):
+        self.assertEqual(self._punch("clock_in", client=Client(REMOTE_ADDR="10.9.9.9")).status_code, 403)
+        self.assertEqual(self._punch("clock_in", login="0000").status_code, 401)
+        self.assertEqual(self._punch("dance").json()["error"], "invalid_action")
+        self._punch("clock_in")
+        response = self._punch("clock_in")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], "already_recorded")
+
+    def test_unscheduled_clock_in_needs_approver(self):
+        self.schedule.delete()
+        response = self._punch("clock_in")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()["error"], "approver_required")
+        self.assertEqual(response.json()["reason"], "unscheduled")
+        self.assertFalse(TimeEntry.objects.filter(user=self.user).exists())
+
+        lead = CustomUser.objects.create_user(username="kiosk_lead", password="x", role=RoleChoices.GROUP_LEAD)
+        self.assertEqual(self._punch("clock_in", clock_in_approver=lead.pk).status_code, 201)
+        self.assertEqual(TimeEntry.objects.get(user=self.user).clock_in_authorized_by, lead)
+
+    def test_finalized_week_is_cached_and_invalidated(self):
+        period = PayrollPeriod.objects.create(week_ending=week_ending_for_date(self.today), is_finalized=True)
+        self.assertEqual(self._punch("clock_in").json()["error"], "week_finalized")
+        period.is_finalized = False
+        period.save()
+        self.assertEqual(self._punch("clock_in").status_code, 201)
+
+    def test_kiosk_token_cookie_and_deactivation(self):
+        token = TimeclockKioskToken.objects.create(label="remote")
+        remote = Client(REMOTE_ADDR="10.9.9.9")
+        remote.get(reverse("timeclock:timeclock_home"), {"kiosk": token.token})
+        self.assertEqual(self._punch("clock_in", client=remote).status_code, 201)
+        token.is_active = False
+        token.save()
+        self.assertEqual(self._punch("lunch_out", client=remote).status_code, 403)
+
+    def test_clock_in_queues_tardy_sync(self):
+        self.schedule.start_time = time(9, 0)
+        self.schedule.save()
+        punch_at = timezone.make_aware(datetime.combine(self.today, time(9, 20)))
+        with patch("timeclock.punch.timezone.now", return_value=punch_at):
+            self.assertEqual(self._punch("clock_in").status_code, 201)
+            self.assertFalse(Occurrence.objects.filter(user=self.user).exists())
+            self.assertTrue(TardySyncJob.objects.filter(user=self.user, date=self.today).exists())
+            self.assertEqual(process_tardy_sync_jobs(), (1, 0))
+        self.assertTrue(
+            Occurrence.objects.filter(user=self.user, subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE).exists()
+        )
+        self.assertFalse(TardySyncJob.objects.exists())
+
+    def test_kiosk_and_finalized_lookups_are_cached(self):
+        self._punch("clock_in")
+        with CaptureQueriesContext(connection) as ctx:
+            self._punch("lunch_out")
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("timeclock_timeclockkioskip", sql)
+        self.assertNotIn("timeclock_timeclockkiosktoken", sql)
+        self.assertNotIn("attendance_payrollperiod", sql)
+
+
+class TestKioskPunchLoadTest(LiveServerTestCase):
+    def setUp(self):
+        invalidate_kiosk_credentials()
+        self.addCleanup(invalidate_kiosk_credentials)
+        self.token = TimeclockKioskToken.objects.create(label="loadtest").token
+
+    def test_shift_change_records_every_punch(self):
+        out = StringIO()
+        call_command(
+            "kiosk_punch_loadtest",
+            "--setup",
+            "--teardown",
+            "--force",
+            f"--url={self.live_server_url}",
+            f"--token={self.token}",
+            "--employees=12",
+            "--kiosks=1",
+            stdout=out,
+        )
+        self.assertIn("12 of 12 punches recorded.", out.getvalue())
+        self.assertFalse(CustomUser.objects.filter(username__startswith="loadtest_").exists())
+
+
+class TestKioskPunchBatch(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_kiosk_credentials()
+        self.addCleanup(invalidate_kiosk_credentials)
+        TimeclockKioskIP.objects.create(ip_address="10.0.0.5")
+        self.client = Client(REMOTE_ADDR="10.0.0.5")
+        self.url = reverse("timeclock:kiosk_punch_batch_api")
+        self.day = timezone.localdate() - timedelta(days=1)
+        self.users = []
+        for i in range(3):
+            user = CustomUser.objects.create_user(
+                username=f"batch_emp{i}", password="x", timeclock_login=f"70{i:02d}"
+            )
+            WorkSchedule.objects.create(
+                user=user,
+                day=self.day.weekday(),
+                start_time=time(7, 0),
+                lunch_out=time(12, 0),
+                lunch_in=time(12, 30),
+                end_time=time(15, 30),
+            )
+            self.users.append(user)
+
+    def _at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, time(hour, minute))).isoformat()
+
+    def _post(self, punches):
+        response = self.client.post(self.url, json.dumps({"punches": punches}), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def _shift(self, prefix, login):
+        return [
+            {"key": f"{prefix}-in", "login": login, "action": "clock_in", "at": self._at(7, 2)},
+            {"key": f"{prefix}-lo", "login": login, "action": "lunch_out", "at": self._at(12, 0)},
+            {"key": f"{prefix}-li", "login": login, "action": "lunch_in", "at": self._at(12, 30)},
+            {"key": f"{prefix}-out", "login": login, "action": "clock_out", "at": self._at(15, 31)},
+        ]
+
+    def test_batch_applies_scan_times_and_replays_idempotently(self):
+        punches = [p for i, u in enumerate(self.users) for p in self._shift(f"u{i}", u.timeclock_login)]
+        with self.captureOnCommitCallbacks(execute=False):
+            results = self._post(punches)
+        self.assertEqual([r["status"] for r in results], ["recorded"] * 12)
+        self.assertEqual({r["entry_date"] for r in results}, {self.day.isoformat()})
+        entry = TimeEntry.objects.get(user=self.users[0])
+        self.assertEqual(timezone.localtime(entry.clock_in).time(), time(7, 2))
+        self.assertAlmostEqual(entry.credited_hours, entry.payroll_credited_hours(), places=2)
+        self.assertTrue(entry.slug)
+
+        before = list(TimeEntry.objects.order_by("pk").values())
+        replay = self._post(punches)
+        self.assertTrue(all(r["replayed"] and r["status"] == "recorded" for r in replay))
+        self.assertEqual(list(TimeEntry.objects.order_by("pk").values()), before)
+        self.assertEqual(KioskPunchReceipt.objects.count(), 12)
+
+    @override_settings(TIMECLOCK_KIOSK_MAX_SCAN_AGE_HOURS=14 * 24)
+    def test_per_punch_rejections(self):
+        login = self.users[0].timeclock_login
+        week_ago = self.day - timedelta(days=7)
+        stale = self.day - timedelta(days=15)
+        PayrollPeriod.objects.create(week_ending=week_ending_for_date(week_ago), is_finalized=True)
+        future = (timezone.now() + timedelta(hours=1)).isoformat()
+        results = self._post(
+            [
+                {"key": "a", "login": login, "action": "clock_in", "at": self._at(7, 0)},
+                {"key": "a", "login": login, "action": "clock_in", "at": self._at(7, 0)},
+                {"key": "b", "login": login, "action": "clock_in", "at": self._at(7, 5)},
+                {"key": "c", "login": "9999", "action": "clock_in"},
+                {"key": "d", "login": login, "action": "lunch_out", "at": future},
+                {"key": "e", "login": login, "action": "nap"},
+                {"key": "f", "login": login, "action": "clock_in", "at": self._at(7, 0, day=week_ago)},
+                {"key": "g", "login": login, "action": "clock_in", "at": self._at(7, 0, day=stale)},
+                {"login": login, "action": "clock_out"},
+            ]
+        )
+        self.assertEqual(
+            [(r["status"], r["error"], r["replayed"]) for r in results],
+            [
+                ("recorded", "", False),
+                ("recorded", "", True),
+                ("rejected", "already_recorded", False),
+                ("rejected", "invalid_credentials", False),
+                ("rejected", "future_timestamp", False),
+                ("rejected", "invalid_action", False),
+                ("rejected", "week_finalized", False),
+                ("rejected", "stale_timestamp", False),
+                ("rejected", "invalid_key", False),
+            ],
+        )
+        self.assertEqual(TimeEntry.objects.count(), 1)
+        self.assertEqual(KioskPunchReceipt.objects.count(), 7)
+
+    def test_scans_older_than_the_buffer_limit_are_refused(self):
+        login = self.users[0].timeclock_login
+        last_week = self.day - timedelta(days=7)
+        punch = {"login": login, "action": "clock_in", "at": self._at(7, 0, day=last_week)}
+        results = self._post([{**punch, "key": "old"}])
+        self.assertEqual(results[0]["error"], "stale_timestamp")
+        self.assertFalse(TimeEntry.objects.exists())
+        with override_settings(TIMECLOCK_KIOSK_MAX_SCAN_AGE_HOURS=14 * 24):
+            results = self._post([{**punch, "key": "old-ok"}])
+        self.assertEqual(results[0]["status"], "recorded")
+
+    def test_batch_continues_an_entry_recorded_live(self):
+        login = self.users[0].timeclock_login
+        self._post([{"key": "live-in", "login": login, "action": "clock_in", "at": self._at(7, 0)}])
+        results = self._post([{"key": "out", "login": login, "action": "clock_out", "at": self._at(15, 30)}])
+        self.assertEqual(results[0]["status"], "recorded")
+        entry = TimeEntry.objects.get(user=self.users[0])
+        self.assertIsNotNone(entry.clock_out)
+        self.assertIsNotNone(entry.lunch_out)  # scheduled lunch filled by the save rules
+
+    def test_rejects_malformed_batch_and_non_kiosk(self):
+        response = self.client.post(self.url, "not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, json.dumps({"punches": {}}), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        outsider = Client(REMOTE_ADDR="10.9.9.9")
+        response = outsider.post(self.url, json.dumps({"punches": []}), content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+
+class TestKioskPunchClient(LiveServerTestCase):
+    def setUp(self):
+        invalidate_kiosk_credentials()
+        self.addCleanup(invalidate_kiosk_credentials)
+        self.token = TimeclockKioskToken.objects.create(label="client").token
+        self.user = CustomUser.objects.create_user(username="client_emp", password="x", timeclock_login="6100")
+        for day in range(7):
+            WorkSchedule.objects.create(
+                user=self.user,
+                day=day,
+                start_time=time(0, 0),
+                lunch_out=time(11, 0),
+                lunch_in=time(11, 30),
+                end_time=time(23, 59),
+            )
+        spec = importlib.util.spec_from_file_location(
+            "kiosk_punch_client", Path(settings.BASE_DIR) / "scripts" / "kiosk_punch_client.py"
+        )
+        self.kiosk_client = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.kiosk_client)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.buffer = self.kiosk_client.PunchBuffer(str(Path(tmp.name) / "buffer.jsonl"))
+
+    def test_buffer_survives_outage_and_replays_without_double_punch(self):
+        scan = self.buffer.scan("6100", "clock_in")
+        out = StringIO()
+        down = self.kiosk_client.KioskSession("http://127.0.0.1:9", self.token, timeout=2)
+        self.assertEqual(self.kiosk_client.flush(self.buffer, down, out=out), [])
+        self.assertEqual(len(self.buffer.pending()), 1)
+
+        up = self.kiosk_client.KioskSession(self.live_server_url, self.token)
+        results = self.kiosk_client.flush(self.buffer, up, out=out)
+        self.assertEqual([r["status"] for r in results], ["recorded"])
+        self.assertEqual(self.buffer.pending(), [])
+
+        # Response lost after the server committed: the kiosk sends the same scan again.
+        self.buffer.replace([scan])
+        results = self.kiosk_client.flush(self.buffer, up, out=out)
+        self.assertTrue(results[0]["replayed"])
+        entry = TimeEntry.objects.get(user=self.user)
+        self.assertIsNotNone(entry.clock_in)
+        self.assertEqual(KioskPunchReceipt.objects.count(), 1)
@@ -0,0 +1,183 @@
+"""
+Payroll close CSV: streamed from grouped queries, byte-identical to the per-user export it
+replaced, and re-downloadable for finalized weeks.
+"""
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    PayrollPeriod,
+    RoleChoices,
+    WorkSchedule,
+)
+from attendance.views import _payroll_sort_key
+from timeclock.models import TimeEntry
+
+WEEK_ENDING = date(2025, 3, 8)
+WEEK_START = WEEK_ENDING - timedelta(days=6)
+
+
+def _legacy_payroll_csv(week_start, week_ending) -> bytes:
+    """Frozen copy of the per-user close CSV loop, used as the expected output."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    users = sorted(CustomUser.objects.filter(is_active=True, is_exempt=False), key=_payroll_sort_key)
+    total_worked_all = 0.0
+    total_overtime_all = 0.0
+    total_pto_all = 0.0
+    total_holiday_all = 0.0
+    for user in users:
+        total_worked_hours = 0
+        for e in TimeEntry.objects.filter(user=user, date__range=[week_start, week_ending]):
+            if e.clock_in and e.clock_out:
+                total_worked_hours += e.payroll_credited_hours()
+        pto_hours = sum(
+            o.pto_hours_applied
+            for o in Occurrence.objects.filter(
+                user=user, date__range=[week_start, week_ending], pto_applied=True
+            ).exclude(subtype=OccurrenceSubtype.HOLIDAY_PAID)
+        )
+        holiday_hours = sum(
+            o.duration_hours
+            for o in Occurrence.objects.filter(
+                user=user, date__range=[week_start, week_ending], subtype=OccurrenceSubtype.HOLIDAY_PAID
+            )
+        )
+        worked_hours_capped = min(total_worked_hours, 40)
+        overtime = max(total_worked_hours - 40, 0)
+        total_worked_all += worked_hours_capped
+        total_overtime_all += overtime
+        total_pto_all += pto_hours
+        total_holiday_all += holiday_hours
+        writer.writerow([
+            user.payroll_last_name_for_display() or "",
+            user.payroll_first_name_for_display() or "",
+            round(worked_hours_capped, 2),
+            round(overtime, 2),
+            round(pto_hours, 2),
+            round(holiday_hours, 2),
+        ])
+    writer.writerow([
+        "",
+        "",
+        round(total_worked_all, 2),
+        round(total_overtime_all, 2),
+        round(total_pto_all, 2),
+        round(total_holiday_all, 2),
+    ])
+    return buf.getvalue().encode()
+
+
+class TestPayrollCloseCsv(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = CustomUser.objects.create_user(
+            username="export_admin",
+            password="x",
+            is_staff=True,
+            is_exempt=True,
+            role=RoleChoices.EXECUTIVE,
+        )
+        self.client.force_login(self.admin)
+        tz = timezone.get_current_timezone()
+        for i, (last, days) in enumerate((("Adams", 5), ("Baker", 3), ("Cole", 0))):
+            user = CustomUser.objects.create_user(
+                username=f"export_{i}",
+                password="x",
+                payroll_lastname=last,
+                payroll_firstname="Pat",
+                hire_date=date(2020, 1, 1),
+            )
+            for weekday in range(5):
+                WorkSchedule.objects.create(
+                    user=user,
+                    day=weekday,
+                    start_time=time(7, 0),
+                    lunch_out=time(12, 0),
+                    lunch_in=time(12, 30),
+                    end_time=time(17, 30),
+                )
+            for offset in range(days):
+                d = WEEK_START + timedelta(days=1 + offset)
+                TimeEntry.objects.create(
+                    user=user,
+                    date=d,
+                    clock_in=timezone.make_aware(datetime.combine(d, time(7, 0)), tz),
+                    lunch_out=timezone.make_aware(datetime.combine(d, time(12, 0)), tz),
+                    lunch_in=timezone.make_aware(datetime.combine(d, time(12, 30)), tz),
+                    clock_out=timezone.make_aware(datetime.combine(d, time(17, 30)), tz),
+                )
+        Occurrence.objects.create(
+            user=CustomUser.objects.get(username="export_2"),
+            date=WEEK_START + timedelta(days=1),
+            occurrence_type=OccurrenceType.PLANNED,
+            subtype=OccurrenceSubtype.HOLIDAY_PAID,
+            duration_hours=10.0,
+        )
+
+    def _close(self):
+        return self.client.post(
+            reverse("attendance:close_payroll"),
+            {"week_ending": WEEK_ENDING.isoformat(), "approve_missing_overrides": "1"},
+        )
+
+    def test_close_streams_same_bytes_as_legacy_export(self):
+        response = self._close()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), _legacy_payroll_csv(WEEK_START, WEEK_ENDING))
+
+    def test_finalized_week_redownload(self):
+        self._close()
+        url = f"{reverse('attendance:payroll_close_csv_download')}?week_ending={WEEK_ENDING.isoformat()}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            'filename="payroll_week_ending_2025-03-08.csv"', response["Content-Disposition"]
+        )
+        self.assertEqual(b"".join(response.streaming_content), _legacy_payroll_csv(WEEK_START, WEEK_ENDING))
+
+        with CaptureQueriesContext(connection) as small:
+            b"".join(self.client.get(url).streaming_content)
+        for i in range(3):
+            CustomUser.objects.create_user(username=f"export_extra_{i}", password="x")
+        with CaptureQueriesContext(connection) as large:
+            b"".join(self.client.get(url).streaming_content)
+        self.assertEqual(len(large), len(small))
+
+    def test_redownload_keeps_employees_deactivated_since_close(self):
+        closed = b"".join(self._close().streaming_content)
+        CustomUser.objects.filter(username__in=["export_1", "export_2"]).update(is_active=False)
+        response = self.client.get(
+            f"{reverse('attendance:payroll_close_csv_download')}?week_ending={WEEK_ENDING.isoformat()}"
+        )
+        self.assertEqual(b"".join(response.streaming_content), closed)
+
+    def test_redownload_ignores_schedule_edits_after_close(self):
+        closed = b"".join(self._close().streaming_content)
+        self.assertIn(b"Adams,Pat,40,10.0,", closed)
+        for schedule in WorkSchedule.objects.filter(user__username="export_0"):
+            schedule.start_time, schedule.end_time = time(8, 0), time(15, 0)
+            schedule.save()
+        response = self.client.get(
+            f"{reverse('attendance:payroll_close_csv_download')}?week_ending={WEEK_ENDING.isoformat()}"
+        )
+        self.assertEqual(b"".join(response.streaming_content), closed)
+
+    def test_open_week_redownload_redirects(self):
+        PayrollPeriod.objects.create(week_ending=WEEK_ENDING, is_finalized=False)
+        response = self.client.get(
+            f"{reverse('attendance:payroll_close_csv_download')}?week_ending={WEEK_ENDING.isoformat()}"
+        )
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,255 @@
+"""
+Payroll week CSV template and import: the template is built from one entry query and can span
+weeks or be filtered; imports are validated up front, diffed against stored entries, written in
+bulk, and previewable as a dry run.
+"""
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import CustomUser, Occurrence, OccurrenceSubtype, RoleChoices, TardySyncJob, WorkSchedule
+from attendance.schedule_utils import suggested_punch_times_for_day
+from attendance.services.tardy_sync_queue import process_tardy_sync_jobs
+from attendance.views import _payroll_sort_key
+from timeclock.models import TimeEntry
+
+HEADER = "week_ending,payroll_lastname,payroll_firstname,work_date,clock_in,lunch_out,lunch_in,clock_out\n"
+WEEK_ENDING = date(2025, 3, 8)
+MONDAY = date(2025, 3, 3)
+TUESDAY = date(2025, 3, 4)
+WEDNESDAY = date(2025, 3, 5)
+
+
+def _aware(d, t):
+    return timezone.make_aware(datetime.combine(d, t), timezone.get_current_timezone())
+
+
+class TestPayrollCsvImport(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = CustomUser.objects.create_user(
+            username="import_admin",
+            password="x",
+            is_staff=True,
+            is_exempt=True,
+            role=RoleChoices.EXECUTIVE,
+        )
+        self.client.force_login(self.admin)
+        self.user = CustomUser.objects.create_user(
+            username="import_user",
+            password="x",
+            payroll_lastname="Rivera",
+            payroll_firstname="Sam",
+            hire_date=date(2020, 1, 1),
+        )
+        for weekday in range(5):
+            WorkSchedule.objects.create(
+                user=self.user,
+                day=weekday,
+                start_time=time(8, 0),
+                lunch_out=time(12, 0),
+                lunch_in=time(12, 30),
+                end_time=time(16, 30),
+            )
+        self.updated = TimeEntry.objects.create(
+            user=self.user,
+            date=TUESDAY,
+            clock_in=_aware(TUESDAY, time(8, 0)),
+            clock_out=_aware(TUESDAY, time(16, 30)),
+            clock_in_authorized_by=self.admin,
+        )
+        self.cleared = TimeEntry.objects.create(
+            user=self.user,
+            date=WEDNESDAY,
+            clock_in=_aware(WEDNESDAY, time(8, 10)),
+            clock_out=_aware(WEDNESDAY, time(16, 30)),
+        )
+        self.cleared.check_tardy()
+
+    def _csv(self):
+        return HEADER + (
+            "2025-03-08,Rivera,Sam,2025-03-03,08:10,,,16:30\n"
+            "2025-03-08,rivera,SAM,2025-03-04,08:00,12:00,12:45,16:30\n"
+            "2025-03-08,Rivera,Sam,2025-03-05,,,,\n"
+        )
+
+    def _upload(self, body, **extra):
+        data = {"time_entries_csv": SimpleUploadedFile("entries.csv", body.encode("utf-8"), content_type="text/csv")}
+        data.update(extra)
+        return self.client.post(reverse("attendance:payroll_schedule_csv_upload"), data)
+
+    def test_import_creates_updates_and_clears(self):
+        self.assertTrue(
+            Occurrence.objects.filter(user=self.user, date=WEDNESDAY, subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE).exists()
+        )
+        response = self._upload(self._csv())
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(TardySyncJob.objects.filter(user=self.user).values_list("date", flat=True)),
+            [MONDAY, TUESDAY, WEDNESDAY],
+        )
+        self.assertEqual(process_tardy_sync_jobs(), (3, 0))
+
+        created = TimeEntry.objects.get(user=self.user, date=MONDAY)
+        self.assertTrue(created.slug)
+        self.assertTrue(created.payroll_lunch_review_required)
+        self.assertEqual(created.lunch_out, _aware(MONDAY, time(12, 0)))
+        self.assertEqual(created.credited_hours, created.payroll_credited_hours())
+        self.assertTrue(
+            Occurrence.objects.filter(user=self.user, date=MONDAY, subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE).exists()
+        )
+
+        self.updated.refresh_from_db()
+        self.assertIsNone(self.updated.clock_in_authorized_by_id)
+        self.assertEqual(self.updated.lunch_in, _aware(TUESDAY, time(12, 45)))
+        self.assertEqual(self.updated.credited_hours, self.updated.payroll_credited_hours())
+
+        self.assertFalse(TimeEntry.objects.filter(pk=self.cleared.pk).exists())
+        self.assertFalse(Occurrence.objects.filter(user=self.user, date=WEDNESDAY).exists())
+
+    def test_reimport_of_same_file_writes_nothing(self):
+        self._upload(self._csv())
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._upload(self._csv())
+        self.assertEqual(response.status_code, 302)
+        writes = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE", "DELETE")) and "django_session" not in q["sql"]
+        ]
+        self.assertEqual(writes, [])
+
+    def test_dry_run_renders_diff_and_applies_from_review(self):
+        response = self._upload(self._csv(), dry_run="1")
+        self.assertEqual(response.status_code, 200)
+        plan = response.context["plan"]
+        self.assertEqual(
+            [(c.action, c.work_date) for c in plan.changes],
+            [("create", MONDAY), ("update", TUESDAY), ("delete", WEDNESDAY)],
+        )
+        self.assertFalse(TimeEntry.objects.filter(user=self.user, date=MONDAY).exists())
+        self.assertTrue(TimeEntry.objects.filter(pk=self.cleared.pk).exists())
+
+        response = self.client.post(
+            reverse("attendance:payroll_schedule_csv_upload"),
+            {"time_entries_csv_text": response.context["csv_text"]},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(TimeEntry.objects.filter(user=self.user, date=MONDAY).exists())
+        self.assertFalse(TimeEntry.objects.filter(pk=self.cleared.pk).exists())
+
+    def test_invalid_row_rejects_whole_file(self):
+        body = self._csv() + "2025-03-08,Nobody,Here,2025-03-06,08:00,,,16:30\n"
+        response = self._upload(body)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(TimeEntry.objects.filter(user=self.user, date=MONDAY).exists())
+        self.assertTrue(TimeEntry.objects.filter(pk=self.cleared.pk).exists())
+
+
+def _legacy_template_csv(week_ending) -> bytes:
+    """Frozen copy of the per-day template loop, used as the expected output."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(HEADER.strip().split(","))
+
+    def fmt_dt(dt):
+        return timezone.localtime(dt).strftime("%H:%M") if dt else ""
+
+    def fmt_t(t):
+        return t.strftime("%H:%M") if t else ""
+
+    users = sorted(CustomUser.objects.filter(is_active=True, is_exempt=False), key=_payroll_sort_key)
+    for u in users:
+        for i in range(7):
+            d = week_ending - timedelta(days=6 - i)
+            row = [week_ending.isoformat(), u.payroll_lastname, u.payroll_firstname, d.isoformat()]
+            e = TimeEntry.objects.filter(user=u, date=d).first()
+            if e:
+                row += [fmt_dt(e.clock_in), fmt_dt(e.lunch_out), fmt_dt(e.lunch_in), fmt_dt(e.clock_out)]
+            else:
+                sug = suggested_punch_times_for_day(u, d)
+                row += [fmt_t(sug["clock_in"]), fmt_t(sug["lunch_out"]), fmt_t(sug["lunch_in"]), fmt_t(sug["clock_out"])]
+            writer.writerow(row)
+    return buf.getvalue().encode()
+
+
+class TestPayrollTemplateCsv(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.admin = CustomUser.objects.create_user(
+            username="template_admin",
+            password="x",
+            is_staff=True,
+            is_exempt=True,
+            role=RoleChoices.EXECUTIVE,
+        )
+        self.client.force_login(self.admin)
+        self.lead = CustomUser.objects.create_user(username="template_lead", password="x", is_exempt=True)
+        for i, (last, dept) in enumerate((("Adams", "Ops"), ("Baker", "Ops"), ("Cole", "Sales"))):
+            user = CustomUser.objects.create_user(
+                username=f"template_{i}",
+                password="x",
+                payroll_lastname=last,
+                payroll_firstname="Pat",
+                department=dept,
+                supervisor=self.lead if i == 0 else None,
+            )
+            for weekday in range(4):
+                WorkSchedule.objects.create(
+                    user=user,
+                    day=weekday,
+                    start_time=time(7, 0),
+                    lunch_out=time(12, 0),
+                    lunch_in=time(12, 30),
+                    end_time=time(17, 30),
+                )
+            TimeEntry.objects.create(
+                user=user,
+                date=TUESDAY,
+                clock_in=_aware(TUESDAY, time(7, 5 + i)),
+                clock_out=_aware(TUESDAY, time(17, 30)),
+            )
+
+    def _get(self, **params):
+        response = self.client.get(reverse("attendance:payroll_schedule_csv_download"), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def _rows(self, response):
+        return list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+
+    def test_matches_per_day_export(self):
+        response = self._get(week_ending=WEEK_ENDING.isoformat())
+        self.assertIn('filename="payroll_time_entries_2025-03-08.csv"', response["Content-Disposition"])
+        self.assertEqual(b"".join(response.streaming_content), _legacy_template_csv(WEEK_ENDING))
+
+    def test_query_count_does_not_grow_with_employees(self):
+        self._get(week_ending=WEEK_ENDING.isoformat())  # first request also sets up the session
+        with CaptureQueriesContext(connection) as small:
+            b"".join(self._get(week_ending=WEEK_ENDING.isoformat()).streaming_content)
+        for i in range(3):
+            CustomUser.objects.create_user(username=f"template_extra_{i}", password="x")
+        with CaptureQueriesContext(connection) as large:
+            b"".join(self._get(week_ending=WEEK_ENDING.isoformat()).streaming_content)
+        self.assertEqual(len(large), len(small))
+
+    def test_multi_week_range_and_filters(self):
+        through = WEEK_ENDING + timedelta(days=21)
+        response = self._get(week_ending=WEEK_ENDING.isoformat(), through_week_ending=through.isoformat())
+        self.assertIn("2025-03-08_to_2025-03-29", response["Content-Disposition"])
+        rows = self._rows(response)
+        self.assertEqual(len(rows), 1 + 4 * 3 * 7)
+        self.assertEqual(rows[1][0], "2025-03-08")
+        self.assertEqual(rows[-1][0], "2025-03-29")
+
+        rows = self._rows(self._get(week_ending=WEEK_ENDING.isoformat(), department="Ops"))
+        self.assertEqual({r[1] for r in rows[1:]}, {"Adams", "Baker"})
+        rows = self._rows(self._get(week_ending=WEEK_ENDING.isoformat(), supervisor_slug=self.lead.public_slug))
+        self.assertEqual({r[1] for r in rows[1:]}, {"Adams"})
@@ -1,17 +1,28 @@
-"""Perfect Attendance: new-hire month window and disqualifying absence subtypes."""
-from datetime import date
+"""Perfect Attendance: new-hire month window, disqualifying absence subtypes, stored monthly results."""
+from datetime import date, datetime, time, timedelta
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from attendance.models import (
     CustomUser,
     Occurrence,
     OccurrenceSubtype,
     OccurrenceType,
+    PayrollPeriod,
+    PerfectAttendanceResult,
     first_full_month_start_after_hire,
     user_eligible_for_perfect_attendance_new_hire_month,
 )
-from attendance.views import _perfect_attendance_with_hours
+from attendance.services.perfect_attendance import (
+    finalize_perfect_attendance_for_week,
+    perfect_attendance_rows,
+    perfect_attendance_with_hours,
+    reopen_perfect_attendance_for_week,
+)
+from timeclock.models import TimeEntry
 
 
 class TestPerfectAttendanceNewHireMonth(TestCase):
@@ -59,7 +70,7 @@ class TestPerfectAttendanceFilters(TestCase):
             is_exempt=False,
         )
         qs = CustomUser.objects.filter(pk=u.pk)
-        rows = _perfect_attendance_with_hours(qs, date(2025, 6, 1), date(2025, 6, 30))
+        rows = perfect_attendance_with_hours(qs, date(2025, 6, 1), date(2025, 6, 30))
         self.assertEqual(len(rows), 0)
 
     def test_new_hire_included_from_first_full_month_if_clean(self):
@@ -70,7 +81,7 @@ class TestPerfectAttendanceFilters(TestCase):
             is_exempt=False,
         )
         qs = CustomUser.objects.filter(pk=u.pk)
-        rows = _perfect_attendance_with_hours(qs, self.period_first, self.period_end)
+        rows = perfect_attendance_with_hours(qs, self.period_first, self.period_end)
         self.assertEqual(len(rows), 1)
         self.assertEqual(rows[0]["user"].pk, u.pk)
 
@@ -89,7 +100,7 @@ class TestPerfectAttendanceFilters(TestCase):
             duration_hours=4.0,
         )
         qs = CustomUser.objects.filter(pk=u.pk)
-        rows = _perfect_attendance_with_hours(qs, self.period_first, self.period_end)
+        rows = perfect_attendance_with_hours(qs, self.period_first, self.period_end)
         self.assertEqual(len(rows), 0)
 
     def test_unplanned_absence_still_excludes(self):
@@ -107,7 +118,7 @@ class TestPerfectAttendanceFilters(TestCase):
             duration_hours=2.0,
         )
         qs = CustomUser.objects.filter(pk=u.pk)
-        rows = _perfect_attendance_with_hours(qs, self.period_first, self.period_end)
+        rows = perfect_attendance_with_hours(qs, self.period_first, self.period_end)
         self.assertEqual(len(rows), 0)
 
     def test_time_off_planned_does_not_disqualify_if_not_unplanned(self):
@@ -125,5 +136,87 @@ class TestPerfectAttendanceFilters(TestCase):
             duration_hours=8.0,
         )
         qs = CustomUser.objects.filter(pk=u.pk)
-        rows = _perfect_attendance_with_hours(qs, self.period_first, self.period_end)
+        rows = perfect_attendance_with_hours(qs, self.period_first, self.period_end)
         self.assertEqual(len(rows), 1)
+
+
+class TestPerfectAttendanceResults(TestCase):
+    def setUp(self):
+        tz = timezone.get_current_timezone()
+        self.clean = CustomUser.objects.create_user(
+            username="pa_clean", password="x", hire_date=date(2020, 1, 1), payroll_lastname="Able"
+        )
+        self.absent = CustomUser.objects.create_user(
+            username="pa_absent", password="x", hire_date=date(2020, 1, 1), payroll_lastname="Baker"
+        )
+        for d in (date(2025, 7, 1), date(2025, 7, 2), date(2025, 8, 1)):
+            TimeEntry.objects.create(
+                user=self.clean,
+                date=d,
+                clock_in=timezone.make_aware(datetime.combine(d, time(8, 0)), tz),
+                clock_out=timezone.make_aware(datetime.combine(d, time(16, 0)), tz),
+            )
+        TimeEntry.objects.create(
+            user=self.clean,
+            date=date(2025, 7, 3),
+            clock_in=timezone.make_aware(datetime.combine(date(2025, 7, 3), time(8, 0)), tz),
+        )
+        Occurrence.objects.create(
+            user=self.absent,
+            occurrence_type=OccurrenceType.UNPLANNED,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            date=date(2025, 7, 10),
+            duration_hours=2.0,
+        )
+
+    def test_rows_are_stored_and_reused(self):
+        rows = perfect_attendance_rows(date(2025, 7, 1), date(2025, 7, 31))
+        self.assertEqual([r["user"].pk for r in rows], [self.clean.pk])
+        expected = sum(
+            e.payroll_credited_hours()
+            for e in TimeEntry.objects.filter(user=self.clean, date__month=7, clock_out__isnull=False)
+        )
+        self.assertAlmostEqual(rows[0]["total_hours"], round(expected, 2), places=2)
+        self.assertEqual(PerfectAttendanceResult.objects.filter(month=date(2025, 7, 1)).count(), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            again = perfect_attendance_rows(date(2025, 7, 1), date(2025, 7, 31))
+        self.assertEqual(len(ctx), 1)
+        self.assertEqual(again, rows)
+
+    def test_finalized_month_is_not_recomputed_until_reopened(self):
+        finalize_perfect_attendance_for_week(date(2025, 7, 27), date(2025, 8, 2))
+        self.assertTrue(
+            PerfectAttendanceResult.objects.filter(month=date(2025, 7, 1), is_finalized=True).exists()
+        )
+        Occurrence.objects.create(
+            user=self.clean,
+            occurrence_type=OccurrenceType.UNPLANNED,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            date=date(2025, 7, 15),
+            duration_hours=1.0,
+        )
+        PerfectAttendanceResult.objects.update(computed_at=timezone.now() - timedelta(days=30))
+        rows = perfect_attendance_rows(date(2025, 7, 1), date(2025, 7, 31))
+        self.assertEqual([r["user"].pk for r in rows], [self.clean.pk])
+
+        reopen_perfect_attendance_for_week(date(2025, 7, 27), date(2025, 8, 2))
+        self.assertEqual(perfect_attendance_rows(date(2025, 7, 1), date(2025, 7, 31)), [])
+
+    def test_reopening_a_mid_month_week_recomputes_the_final_month(self):
+        finalize_perfect_attendance_for_week(date(2025, 7, 27), date(2025, 8, 2))
+        reopen_perfect_attendance_for_week(date(2025, 7, 6), date(2025, 7, 12))
+        self.assertFalse(PerfectAttendanceResult.objects.filter(month=date(2025, 7, 1)).exists())
+        Occurrence.objects.create(
+            user=self.clean,
+            occurrence_type=OccurrenceType.UNPLANNED,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            date=date(2025, 7, 7),
+            duration_hours=1.0,
+        )
+        PayrollPeriod.objects.create(week_ending=date(2025, 8, 2), is_finalized=True)
+        finalize_perfect_attendance_for_week(date(2025, 7, 6), date(2025, 7, 12))
+        self.assertTrue(
+            PerfectAttendanceResult.objects.filter(month=date(2025, 7, 1), is_finalized=True).exists()
+        )
+        self.assertEqual(perfect_attendance_rows(date(2025, 7, 1), date(2025, 7, 31)), [])
@@ -0,0 +1,153 @@
+"""
+PTO ledger: every balance change leaves a PTOBalanceHistory row, rows are append-only,
+balances can be read as of any moment, and reconciliation replays the ledger to flag drift.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    PTOBalanceHistory,
+    TimeOffRequest,
+    TimeOffRequestStatus,
+)
+from attendance.services.pto_ledger import (
+    balance_as_of,
+    balances_as_of,
+    book_corrections,
+    reconcile_ledger,
+    write_checkpoints,
+)
+
+
+def _aware(d, t=time(12, 0)):
+    return timezone.make_aware(datetime.combine(d, t), timezone.get_current_timezone())
+
+
+class TestPtoLedger(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username="ledger_user",
+            password="x",
+            service_date=date.today() - timedelta(days=400),
+            pto_balance=10.0,
+        )
+
+    def _ledger_total(self, balance_type):
+        total = PTOBalanceHistory.objects.filter(user=self.user, balance_type=balance_type).aggregate(
+            total=Sum("change")
+        )["total"]
+        return float(total or 0)
+
+    def test_every_balance_change_is_ledgered(self):
+        self.user.accrue_pto(45.0)
+        tor = TimeOffRequest.objects.create(
+            user=self.user,
+            start_date=date.today() - timedelta(days=2),
+            end_date=date.today() - timedelta(days=2),
+            status=TimeOffRequestStatus.APPROVED,
+        )
+        Occurrence.objects.create(
+            user=self.user,
+            date=date.today() - timedelta(days=2),
+            occurrence_type=OccurrenceType.PLANNED,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            duration_hours=16.0,
+            time_off_request=tor,
+        )
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.pto_balance, self.user.personal_time_balance), (0.0, 4.5))
+        tor.cancel()
+        self.user.refresh_from_db()
+        self.user.ledger_reason = "Manual admin edit by payroll"
+        self.user.personal_time_balance = 2.0
+        self.user.save()
+
+        self.assertEqual(self._ledger_total("pto"), self.user.pto_balance)
+        self.assertEqual(self._ledger_total("personal"), self.user.personal_time_balance)
+        reasons = list(PTOBalanceHistory.objects.filter(user=self.user).order_by("pk").values_list("reason", flat=True))
+        self.assertEqual(reasons[:2], ["Opening balance", "PTO accrual (45.00 hours worked)"])
+        self.assertIn("Time off request cancelled (refund)", reasons[-2])
+        self.assertEqual(reasons[-1], "Manual admin edit by payroll")
+        self.assertEqual(reconcile_ledger(full=True), [])
+
+    def test_saves_without_balance_changes_add_nothing(self):
+        before = PTOBalanceHistory.objects.count()
+        self.user.first_name = "Pat"
+        self.user.save()
+        self.user.pto_balance = 99.0
+        self.user.save(update_fields=["first_name"])
+        self.assertEqual(PTOBalanceHistory.objects.count(), before)
+
+    def test_rows_are_append_only(self):
+        row = PTOBalanceHistory.objects.filter(user=self.user).get()
+        row.reason = "edited"
+        with self.assertRaises(ValueError):
+            row.save()
+        with self.assertRaises(ValueError):
+            row.delete()
+
+    def test_balance_as_of(self):
+        for day in (date(2025, 1, 10), date(2025, 2, 10)):
+            with patch("django.utils.timezone.now", return_value=_aware(day)):
+                self.user.accrue_pto(30.0)
+        opening = PTOBalanceHistory.objects.filter(user=self.user).earliest("pk").timestamp
+
+        self.assertIsNone(balance_as_of(self.user, date(2025, 1, 9)))
+        self.assertEqual(balance_as_of(self.user, date(2025, 1, 10)), 11.0)
+        self.assertEqual(balance_as_of(self.user.pk, date(2025, 2, 9)), 11.0)
+        self.assertEqual(balance_as_of(self.user, opening), 10.0)
+        other = CustomUser.objects.create_user(username="ledger_other", password="x", personal_time_balance=3.0)
+        self.assertEqual(
+            balances_as_of([self.user, other], timezone.now()),
+            {self.user.pk: {"pto": 10.0, "personal": None}, other.pk: {"pto": None, "personal": 3.0}},
+        )
+
+    def test_reconcile_flags_and_corrects_drift(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(pto_balance=12.5)
+        [drift] = reconcile_ledger()
+        self.assertEqual((drift.user_id, drift.balance_type, drift.difference), (self.user.pk, "pto", Decimal("2.50")))
+
+        out = StringIO()
+        call_command("reconcile_pto_ledger", "--checkpoint", stdout=out)
+        self.assertIn("ledger_user pto: ledger 10.00, stored 12.50 (+2.50)", out.getvalue())
+        self.assertIn("Wrote 0 checkpoint rows", out.getvalue())
+
+        out = StringIO()
+        call_command("reconcile_pto_ledger", "--fix", "--checkpoint", stdout=out)
+        self.assertIn("adjusted", out.getvalue())
+        self.assertIn("Wrote 2 checkpoint rows", out.getvalue())
+        self.assertEqual(reconcile_ledger(full=True), [])
+        self.assertEqual(balance_as_of(self.user, timezone.now()), 12.5)
+
+    def test_write_checkpoints_skips_drifted_users(self):
+        other = CustomUser.objects.create_user(username="ledger_other", password="x", pto_balance=4.0)
+        CustomUser.objects.filter(pk=self.user.pk).update(pto_balance=12.5)
+        self.assertEqual(write_checkpoints(), 2)
+        self.assertEqual(
+            set(PTOBalanceHistory.objects.filter(is_checkpoint=True).values_list("user_id", flat=True)),
+            {other.pk},
+        )
+
+    def test_checkpoint_bounds_replay_and_full_replay_finds_breaks(self):
+        PTOBalanceHistory.objects.create(
+            user=self.user, change=Decimal("1.00"), reason="bad row", balance_after=Decimal("5.00")
+        )
+        CustomUser.objects.filter(pk=self.user.pk).update(pto_balance=11.0)
+        [drift] = reconcile_ledger(full=True)
+        self.assertEqual(drift.difference, 0)
+        self.assertEqual([b[1:] for b in drift.breaks], [(Decimal("5.00"), Decimal("11.00"))])
+
+        self.assertEqual(write_checkpoints([self.user.pk]), 2)
+        self.assertEqual(reconcile_ledger(), [])
+        self.assertEqual(book_corrections(), [])
@@ -0,0 +1,77 @@
+"""
+Report asset registry (attendance.report_assets): PDF images are resolved and transcoded once
+per process and re-encoded only when the file's checksum changes or a preferred file appears.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from attendance import report_assets
+from attendance.report_pdfs import report_logo_data_uri
+
+
+class TestReportAssets(SimpleTestCase):
+    def setUp(self):
+        static_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, static_dir, ignore_errors=True)
+        (static_dir / "img").mkdir()
+        self.img_dir = static_dir / "img"
+        settings_override = override_settings(STATICFILES_DIRS=[static_dir])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        report_assets.clear_report_assets()
+        self.addCleanup(report_assets.clear_report_assets)
+
+    def _write_logo(self, name, color):
+        path = self.img_dir / name
+        Image.new("RGB", (4, 4), color).save(path)
+        return path
+
+    def test_webp_is_transcoded_once(self):
+        self._write_logo("logo.webp", (10, 20, 30))
+        with patch("PIL.Image.open", wraps=Image.open) as image_open:
+            first = report_logo_data_uri()
+            self.assertEqual(report_logo_data_uri(), first)
+            self.assertEqual(report_assets.report_asset_data_uri("logo"), first)
+            self.assertEqual(image_open.call_count, 1)
+        self.assertTrue(first.startswith("data:image/png;base64,"))
+
+    def test_changed_file_is_reencoded_only_when_checksum_differs(self):
+        path = self._write_logo("logo.png", (10, 20, 30))
+        first = report_assets.report_asset("logo")
+        stat = path.stat()
+
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with patch.object(report_assets, "_encode") as encode:
+            touched = report_assets.report_asset("logo")
+            encode.assert_not_called()
+        self.assertEqual((touched.data_uri, touched.checksum), (first.data_uri, first.checksum))
+
+        self._write_logo("logo.png", (200, 20, 30))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        changed = report_assets.report_asset("logo")
+        self.assertNotEqual(changed.checksum, first.checksum)
+        self.assertNotEqual(changed.data_uri, first.data_uri)
+
+    def test_preference_order_and_missing_assets(self):
+        self.assertIsNone(report_logo_data_uri())
+        empty_checksum = report_assets.report_assets_checksum()
+        self._write_logo("logo.png", (1, 2, 3))
+        self.assertTrue(report_logo_data_uri().startswith("data:image/png;"))
+        self.assertNotEqual(report_assets.report_assets_checksum(), empty_checksum)
+
+        # A preferred file added later replaces the one in use; a less preferred one does not.
+        self._write_logo("pdfimage.jpg", (1, 2, 3))
+        self.assertTrue(report_logo_data_uri().startswith("data:image/jpeg;"))
+        with patch.object(report_assets, "_encode") as encode:
+            self._write_logo("logo.webp", (1, 2, 3))
+            self.assertTrue(report_logo_data_uri().startswith("data:image/jpeg;"))
+            encode.assert_not_called()
+
+        (self.img_dir / "pdfimage.jpg").unlink()
+        self.assertTrue(report_logo_data_uri().startswith("data:image/png;"))
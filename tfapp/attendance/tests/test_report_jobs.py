@@ -0,0 +1,165 @@
+"""
+PDF report jobs (attendance.services.report_jobs): report views queue a ReportJob, the worker
+renders it into MEDIA_ROOT, and repeat requests for unchanged data reuse the stored PDF.
+"""
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    ReportJob,
+    ReportJobStatus,
+    RoleChoices,
+)
+from attendance.services.report_jobs import (
+    MAX_ATTEMPTS,
+    process_report_jobs,
+    purge_report_jobs,
+    requeue_stale_report_jobs,
+)
+
+
+class TestReportJobs(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, REPORT_JOB_QUEUE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.executive = CustomUser.objects.create_user(
+            username="report_exec", password="x", role=RoleChoices.EXECUTIVE, department="Office"
+        )
+        self.employee = CustomUser.objects.create_user(
+            username="report_emp", password="x", department="Plant", payroll_lastname="Adams"
+        )
+        self.day = date.today() - timedelta(days=10)
+        self._occurrence()
+        self.client = Client()
+        self.client.force_login(self.executive)
+
+    def _occurrence(self, days_later=0):
+        return Occurrence.objects.create(
+            user=self.employee,
+            date=self.day + timedelta(days=days_later),
+            occurrence_type=OccurrenceType.UNPLANNED,
+            subtype=OccurrenceSubtype.TARDY_IN_GRACE,
+            duration_hours=0,
+        )
+
+    def _request_absence(self, **extra):
+        query = {
+            "user": self.employee.public_slug,
+            "start_date": (self.day - timedelta(days=5)).isoformat(),
+            "end_date": (self.day + timedelta(days=5)).isoformat(),
+            **extra,
+        }
+        response = self.client.get(reverse("attendance:generate_report_pdf"), query)
+        self.assertEqual(response.status_code, 302)
+        return ReportJob.objects.get(slug=response.url.rstrip("/").rsplit("/", 1)[-1])
+
+    def test_request_is_queued_then_rendered_by_worker(self):
+        job = self._request_absence()
+        self.assertEqual((job.kind, job.status), ("absence", ReportJobStatus.PENDING))
+        status_page = self.client.get(reverse("attendance:report_job", args=[job.slug]))
+        self.assertContains(status_page, "refreshes until the PDF is ready")
+
+        out = StringIO()
+        call_command("report_worker", "--once", stdout=out)
+        self.assertIn("Done: 1 rendered, 0 failed.", out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJobStatus.DONE)
+        self.assertTrue(job.pdf.name.startswith("reports/absence/"))
+
+        response = self.client.get(reverse("attendance:report_job_download", args=[job.slug]))
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn('filename="report_emp_report.pdf"', response["Content-Disposition"])
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+        other = Client()
+        other.force_login(self.employee)
+        self.assertEqual(other.get(reverse("attendance:report_job", args=[job.slug])).status_code, 404)
+        self.assertEqual(other.get(reverse("attendance:report_job_download", args=[job.slug])).status_code, 404)
+
+    def test_unchanged_data_reuses_the_stored_pdf(self):
+        first = self._request_absence()
+        process_report_jobs()
+        first.refresh_from_db()
+
+        with patch("attendance.services.report_jobs.render_report_pdf") as render:
+            repeat = self._request_absence()
+            self.assertEqual(repeat.status, ReportJobStatus.DONE)
+            self.assertEqual((repeat.pdf.name, repeat.filename), (first.pdf.name, first.filename))
+            render.assert_not_called()
+
+        # New data for the same parameters gets a new data version and a fresh render.
+        self._occurrence(days_later=1)
+        changed = self._request_absence()
+        self.assertEqual(changed.status, ReportJobStatus.PENDING)
+        self.assertEqual(changed.params_hash, first.params_hash)
+        self.assertNotEqual(changed.data_version, first.data_version)
+        # Different parameters hash differently.
+        self.assertNotEqual(self._request_absence(planned_filter="planned").params_hash, first.params_hash)
+
+    @override_settings(REPORT_JOB_QUEUE=False)
+    def test_group_and_perfect_attendance_render_inline_without_queue(self):
+        group = self._request_absence(report_mode="group", report_group_by="department")
+        self.assertEqual((group.kind, group.status), ("group_absence", ReportJobStatus.DONE))
+        self.assertEqual(group.params["user_ids"], sorted([self.executive.pk, self.employee.pk]))
+
+        response = self.client.get(reverse("attendance:perfect_attendance_pdf"))
+        job = ReportJob.objects.get(kind="perfect_attendance")
+        self.assertRedirects(response, reverse("attendance:report_job", args=[job.slug]))
+        self.assertEqual(job.status, ReportJobStatus.DONE, job.last_error)
+        self.assertTrue(job.params["show_hours"])
+        for finished in (group, job):
+            with default_storage.open(finished.pdf.name, "rb") as fh:
+                self.assertTrue(fh.read().startswith(b"%PDF"))
+
+    def test_failed_render_is_retried_then_failed(self):
+        job = self._request_absence()
+        with (
+            patch("attendance.services.report_jobs.render_report_pdf", side_effect=RuntimeError("boom")),
+            self.assertLogs("attendance.services.report_jobs", "ERROR"),
+        ):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                self.assertEqual(process_report_jobs(), (0, 1))
+                job.refresh_from_db()
+                self.assertEqual(job.attempts, attempt)
+        self.assertEqual(job.status, ReportJobStatus.FAILED)
+        self.assertEqual(job.last_error, "RuntimeError: boom")
+        self.assertEqual(process_report_jobs(), (0, 0))
+        self.assertContains(self.client.get(reverse("attendance:report_job", args=[job.slug])), "could not be generated")
+
+    def test_stale_running_job_is_requeued(self):
+        job = self._request_absence()
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJobStatus.RUNNING, started_at=timezone.now() - timedelta(hours=1), attempts=1
+        )
+        self.assertEqual(requeue_stale_report_jobs(), 1)
+        self.assertEqual(process_report_jobs(), (1, 0))
+
+    def test_purge_keeps_files_other_jobs_still_use(self):
+        old = self._request_absence()
+        process_report_jobs()
+        recent = self._request_absence()
+        old.refresh_from_db()
+        ReportJob.objects.filter(pk=old.pk).update(requested_at=timezone.now() - timedelta(days=30))
+
+        self.assertEqual(purge_report_jobs(timedelta(days=7)), (1, 0))
+        self.assertTrue(default_storage.exists(recent.pdf.name))
+        ReportJob.objects.filter(pk=recent.pk).update(requested_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(purge_report_jobs(timedelta(days=7)), (1, 1))
+        self.assertFalse(default_storage.exists(recent.pdf.name))
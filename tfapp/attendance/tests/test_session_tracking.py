@@ -0,0 +1,108 @@
+"""
+Session tracking (accounts.session_utils): tracked sessions are confirmed from the cache, new
+sessions are registered once, and MAX_SESSIONS_PER_USER trims the oldest sessions with the
+database and signed-cookie session backends.
+"""
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import UserSession
+from accounts.session_utils import TRACKING_ID_SESSION_KEY
+from attendance.models import CustomUser
+
+
+def _usersession_queries(ctx):
+    return [q["sql"] for q in ctx.captured_queries if "accounts_usersession" in q["sql"]]
+
+
+@override_settings(MAX_SESSIONS_PER_USER=3)
+class TestSessionTracking(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = CustomUser.objects.create_user(username="session_user", password="pw-12345")
+
+    def _login(self):
+        client = Client()
+        response = client.post(reverse("login"), {"username": "session_user", "password": "pw-12345"})
+        self.assertEqual(response.status_code, 302)
+        return client
+
+    def _authenticated(self, client):
+        return client.get(reverse("profile")).wsgi_request.user.is_authenticated
+
+    def test_tracked_session_skips_the_table(self):
+        client = self._login()
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self._authenticated(client))
+        self.assertEqual(_usersession_queries(ctx), [])
+
+        # A cache miss (other worker, expired entry) costs one read, then the cache is warm again.
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self._authenticated(client))
+        self.assertEqual(len(_usersession_queries(ctx)), 1)
+
+    def test_untracked_session_is_registered_once(self):
+        client = Client()
+        client.force_login(self.user)
+        self.assertTrue(self._authenticated(client))
+        self.assertTrue(self._authenticated(client))
+        row = UserSession.objects.get(user=self.user)
+        self.assertEqual(client.session[TRACKING_ID_SESSION_KEY], row.tracking_id)
+        self.assertEqual(row.session_key, client.session.session_key)
+
+    def test_oldest_sessions_are_trimmed_in_one_delete(self):
+        clients = [self._login() for _ in range(3)]
+        with CaptureQueriesContext(connection) as ctx:
+            clients.append(self._login())
+        deletes = [q for q in _usersession_queries(ctx) if q.startswith("DELETE")]
+        # Stale-row cleanup for the new session, then the trim itself.
+        self.assertLessEqual(len(deletes), 3)
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(self._authenticated(clients[0]))
+        self.assertTrue(all(self._authenticated(c) for c in clients[1:]))
+
+    def test_password_change_keeps_the_session(self):
+        client = self._login()
+        old_key = client.session.session_key
+        cache.clear()
+        response = client.post(
+            reverse("password_change"),
+            {"old_password": "pw-12345", "new_password1": "Fresh-pw-67890", "new_password2": "Fresh-pw-67890"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(client.session.session_key, old_key)
+
+        cache.clear()
+        self.assertTrue(self._authenticated(client))
+        row = UserSession.objects.get(user=self.user)
+        self.assertEqual(row.session_key, client.session.session_key)
+
+        # The rotated key is the one a later trim ends.
+        with override_settings(MAX_SESSIONS_PER_USER=1):
+            other = Client()
+            other.login(username="session_user", password="Fresh-pw-67890")
+            self.assertTrue(self._authenticated(other))
+        self.assertFalse(Session.objects.filter(session_key=row.session_key).exists())
+        self.assertFalse(self._authenticated(client))
+
+    def test_logout_frees_a_slot(self):
+        clients = [self._login() for _ in range(3)]
+        clients[0].post(reverse("logout"))
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 2)
+        clients.append(self._login())
+        self.assertTrue(all(self._authenticated(c) for c in clients[1:]))
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_sessions_keep_the_limit(self):
+        clients = [self._login() for _ in range(4)]
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(UserSession.objects.filter(session_key__isnull=False).exists())
+        self.assertFalse(self._authenticated(clients[0]))
+        self.assertTrue(all(self._authenticated(c) for c in clients[1:]))
@@ -0,0 +1,169 @@
+"""
+Tardy re-sync queue: requests coalesce per employee-day, the worker leases a batch, syncs and
+deletes jobs (keeping ones re-requested mid-sync), skips finalized weeks, backs off failed
+employees without blocking others, and reports depth/lag.
+"""
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    Occurrence,
+    OccurrenceSubtype,
+    PayrollPeriod,
+    TardySyncJob,
+    WorkSchedule,
+)
+from attendance.payroll_utils import week_ending_for_date
+from attendance.services.tardy_sync_queue import (
+    enqueue_tardy_sync,
+    enqueue_tardy_sync_for_entry,
+    process_tardy_sync_jobs,
+    tardy_sync_queue_stats,
+)
+from timeclock.models import TimeEntry
+
+MONDAY = date(2025, 3, 3)
+TUESDAY = date(2025, 3, 4)
+
+
+def _aware(d, t):
+    return timezone.make_aware(datetime.combine(d, t), timezone.get_current_timezone())
+
+
+class TestTardySyncQueue(TestCase):
+    def setUp(self):
+        # Finalized weeks are cached; PayrollPeriod signals clear it on commit, which tests never reach.
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.users = []
+        for i in range(2):
+            user = CustomUser.objects.create_user(username=f"tardy_q{i}", password="x", hire_date=date(2020, 1, 1))
+            for weekday in range(5):
+                WorkSchedule.objects.create(
+                    user=user,
+                    day=weekday,
+                    start_time=time(8, 0),
+                    lunch_out=time(12, 0),
+                    lunch_in=time(12, 30),
+                    end_time=time(16, 30),
+                )
+            self.users.append(user)
+        self.user = self.users[0]
+
+    def _late_entry(self, user, day):
+        return TimeEntry.objects.create(
+            user=user, date=day, clock_in=_aware(day, time(8, 20)), clock_out=_aware(day, time(16, 30))
+        )
+
+    def _tardies(self, user, day):
+        return Occurrence.objects.filter(user=user, date=day, subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE).count()
+
+    def test_repeated_requests_coalesce(self):
+        first = timezone.now()
+        enqueue_tardy_sync(self.user.pk, [MONDAY], now=first)
+        enqueue_tardy_sync(self.user.pk, [MONDAY, TUESDAY], now=first + timedelta(seconds=5))
+        jobs = {j.date: j for j in TardySyncJob.objects.filter(user=self.user)}
+        self.assertEqual(set(jobs), {MONDAY, TUESDAY})
+        self.assertEqual(jobs[MONDAY].first_requested_at, first)
+        self.assertEqual(jobs[MONDAY].requested_at, first + timedelta(seconds=5))
+
+    def test_worker_syncs_and_deletes_jobs(self):
+        entry = self._late_entry(self.user, MONDAY)
+        enqueue_tardy_sync_for_entry(entry)
+        enqueue_tardy_sync_for_entry(entry)
+        self.assertEqual(self._tardies(self.user, MONDAY), 0)
+        self.assertEqual(process_tardy_sync_jobs(), (1, 0))
+        self.assertEqual(self._tardies(self.user, MONDAY), 1)
+        self.assertFalse(TardySyncJob.objects.exists())
+
+        # Re-syncing a corrected entry reverts the earlier tardy.
+        entry.clock_in = _aware(MONDAY, time(8, 0))
+        entry.save()
+        enqueue_tardy_sync_for_entry(entry)
+        process_tardy_sync_jobs()
+        self.assertEqual(self._tardies(self.user, MONDAY), 0)
+
+    def test_finalized_week_jobs_are_dropped_unsynced(self):
+        self._late_entry(self.user, MONDAY)
+        PayrollPeriod.objects.create(week_ending=week_ending_for_date(MONDAY), is_finalized=True)
+        enqueue_tardy_sync(self.user.pk, [MONDAY])
+        self.assertEqual(process_tardy_sync_jobs(), (1, 0))
+        self.assertEqual(self._tardies(self.user, MONDAY), 0)
+        self.assertFalse(TardySyncJob.objects.exists())
+
+    def test_claimed_jobs_are_leased_and_re_requests_survive_the_sync(self):
+        for user in self.users:
+            self._late_entry(user, MONDAY)
+            enqueue_tardy_sync(user.pk, [MONDAY])
+        real_sync = TimeEntry.check_tardy
+        now = timezone.now()
+        seen = []
+
+        def during_sync(entry):
+            if not seen:
+                # Another worker finds nothing due; the user edits the first employee's day again.
+                seen.append(process_tardy_sync_jobs(now=now))
+                enqueue_tardy_sync(self.user.pk, [MONDAY], now=now + timedelta(seconds=1))
+            return real_sync(entry)
+
+        with patch.object(TimeEntry, "check_tardy", during_sync):
+            self.assertEqual(process_tardy_sync_jobs(now=now), (2, 0))
+        self.assertEqual(seen, [(0, 0)])
+        job = TardySyncJob.objects.get()
+        self.assertEqual((job.user_id, job.date), (self.user.pk, MONDAY))
+
+    def test_failure_backs_off_one_user_only(self):
+        for user in self.users:
+            self._late_entry(user, MONDAY)
+            enqueue_tardy_sync(user.pk, [MONDAY])
+        failing_pk = self.user.pk
+        real_sync = TimeEntry.check_tardy
+
+        def flaky(entry):
+            if entry.user_id == failing_pk:
+                raise RuntimeError("boom")
+            return real_sync(entry)
+
+        now = timezone.now()
+        with patch.object(TimeEntry, "check_tardy", flaky):
+            self.assertEqual(process_tardy_sync_jobs(now=now), (1, 1))
+        self.assertEqual(self._tardies(self.users[1], MONDAY), 1)
+        job = TardySyncJob.objects.get()
+        self.assertEqual((job.user_id, job.attempts), (failing_pk, 1))
+        self.assertIn("boom", job.last_error)
+        self.assertGreater(job.available_at, now)
+        self.assertEqual(process_tardy_sync_jobs(now=now), (0, 0))
+
+        stats = tardy_sync_queue_stats(now=now)
+        self.assertEqual((stats["depth"], stats["due"], stats["failing"]), (1, 0, 1))
+        self.assertEqual(process_tardy_sync_jobs(now=job.available_at), (1, 0))
+        self.assertEqual(self._tardies(self.user, MONDAY), 1)
+
+    def test_stats_and_worker_command(self):
+        self._late_entry(self.user, MONDAY)
+        requested = timezone.now() - timedelta(seconds=30)
+        enqueue_tardy_sync(self.user.pk, [MONDAY], now=requested)
+        stats = tardy_sync_queue_stats()
+        self.assertEqual(stats["depth"], 1)
+        self.assertGreaterEqual(stats["lag_seconds"], 30)
+
+        out = StringIO()
+        call_command("tardy_sync_worker", "--stats", stdout=out)
+        self.assertIn("depth=1", out.getvalue())
+        call_command("tardy_sync_worker", "--once", stdout=StringIO())
+        self.assertEqual(self._tardies(self.user, MONDAY), 1)
+        self.assertEqual(tardy_sync_queue_stats()["depth"], 0)
+
+    @override_settings(TARDY_SYNC_QUEUE=False)
+    def test_inline_mode_skips_the_queue(self):
+        self._late_entry(self.user, MONDAY)
+        enqueue_tardy_sync(self.user.pk, [MONDAY])
+        self.assertFalse(TardySyncJob.objects.exists())
+        self.assertEqual(self._tardies(self.user, MONDAY), 1)
@@ -0,0 +1,107 @@
+"""
+Approvals queue "who else is out": overlaps come from one interval query and match the
+per-request query they replaced; the team heatmap counts distinct team members per day.
+"""
+from datetime import date, timedelta
+
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from attendance.models import CustomUser, RoleChoices, TimeOffRequest, TimeOffRequestStatus
+from attendance.services.time_off_overlap import overlapping_requests, team_coverage
+
+MONDAY = date(2025, 3, 3)
+
+
+def _legacy_other_requests_display(req):
+    """Frozen copy of the per-request overlap query, used as the expected output."""
+    return [
+        f"{o.user.payroll_display_name()} ({o.start_date} - {o.end_date}) [{o.status.upper()}]"
+        for o in TimeOffRequest.objects.filter(
+            status__in=[TimeOffRequestStatus.APPROVED, TimeOffRequestStatus.PENDING],
+            start_date__lte=req.end_date,
+            end_date__gte=req.start_date,
+        )
+        .exclude(pk=req.pk)
+        .exclude(user=req.user)
+        .select_related("user")
+        .order_by("start_date", "user__last_name", "user__first_name")
+    ]
+
+
+class TestTimeOffOverlap(TestCase):
+    def setUp(self):
+        self.lead = CustomUser.objects.create_user(
+            username="ov_lead", password="x", role=RoleChoices.GROUP_LEAD
+        )
+        self.team = [
+            CustomUser.objects.create_user(
+                username=f"ov_team{i}", password="x", last_name=f"Team{i}", group_lead=self.lead
+            )
+            for i in range(3)
+        ]
+        self.outsider = CustomUser.objects.create_user(username="ov_out", password="x", last_name="Out")
+        self.client = Client()
+        self.client.force_login(self.lead)
+
+    def _tor(self, user, start_offset, days, status=TimeOffRequestStatus.PENDING):
+        start = MONDAY + timedelta(days=start_offset)
+        return TimeOffRequest.objects.create(
+            user=user, start_date=start, end_date=start + timedelta(days=days - 1), status=status
+        )
+
+    def _get(self):
+        return self.client.get(reverse("attendance:team_time_off_requests"))
+
+    def test_overlaps_match_per_request_query(self):
+        self._tor(self.team[0], 0, 3)
+        self._tor(self.team[0], 10, 1)
+        self._tor(self.team[1], 2, 2, TimeOffRequestStatus.APPROVED)
+        self._tor(self.team[1], 9, 5)
+        self._tor(self.team[2], 1, 1)
+        self._tor(self.team[2], 4, 1, TimeOffRequestStatus.DENIED)
+        self._tor(self.outsider, -5, 30, TimeOffRequestStatus.APPROVED)
+        self._tor(self.outsider, 20, 1)
+
+        pending = self._get().context["pending_requests"]
+        self.assertEqual(len(pending), 4)
+        for req in pending:
+            self.assertEqual(req.other_requests_display, _legacy_other_requests_display(req), req)
+
+    def test_query_count_does_not_grow_with_pending_requests(self):
+        self._tor(self.team[0], 0, 2)
+        self._get()
+        with CaptureQueriesContext(connection) as small:
+            self._get()
+        for i in range(6):
+            self._tor(self.team[i % 3], i, 2)
+        self._get()  # refill the cached pending counts the new requests invalidated
+        with CaptureQueriesContext(connection) as large:
+            self._get()
+        session_table = Session._meta.db_table
+
+        def count(ctx):
+            return len([q for q in ctx.captured_queries if session_table not in q["sql"]])
+
+        self.assertEqual(count(large), count(small))
+
+    def test_coverage_counts_distinct_team_members_per_day(self):
+        self._tor(self.team[0], 0, 3)
+        self._tor(self.team[0], 1, 1, TimeOffRequestStatus.APPROVED)
+        self._tor(self.team[1], 2, 2, TimeOffRequestStatus.APPROVED)
+        self._tor(self.outsider, 0, 5, TimeOffRequestStatus.APPROVED)
+
+        coverage = self._get().context["team_coverage"]
+        self.assertEqual([d.day for d in coverage], [MONDAY + timedelta(days=i) for i in range(3)])
+        self.assertEqual([(d.approved, d.pending) for d in coverage], [(0, 1), (1, 0), (1, 1)])
+        self.assertEqual([d.level for d in coverage], [2, 2, 4])
+
+    def test_coverage_window_is_capped(self):
+        self._tor(self.team[0], 0, 400)
+        candidates = overlapping_requests(MONDAY, MONDAY + timedelta(days=399))
+        coverage = team_coverage(self.lead, candidates, MONDAY, MONDAY + timedelta(days=399))
+        self.assertEqual(len(coverage), 62)
+        self.assertTrue(all(d.pending == 1 for d in coverage))
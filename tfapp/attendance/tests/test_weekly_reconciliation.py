@@ -0,0 +1,618 @@
+"""
+Parity tests for the set-based payroll week finalize engine.
+
+``_legacy_*`` below is the per-user/per-day implementation it replaced, frozen as the oracle:
+both run against the same fixtures and must leave identical balances, snapshots, occurrences,
+daily summaries and PTO history.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+from django.utils import timezone as django_tz
+
+from attendance.models import (
+    OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
+    CustomUser,
+    DailyAttendanceSummary,
+    HolidayWeekPlan,
+    HolidayWeekPlanDay,
+    HolidayWeekPlanTemplate,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    PayrollPeriod,
+    PayrollPeriodUserSnapshot,
+    PTOBalanceHistory,
+    TimeOffRequest,
+    TimeOffRequestStatus,
+    WorkSchedule,
+)
+from attendance.schedule_utils import scheduled_hours_for_range
+from attendance.services import weekly_reconciliation
+from attendance.services.attendance_engine import create_tardy_occurrences_for_week
+from attendance.services.holiday_plan_service import (
+    effective_scheduled_hours_for_range,
+    effective_work_hours_for_day,
+)
+from attendance.services.weekly_reconciliation import required_week_hours_for_policy
+from timeclock.models import TimeEntry
+
+WEEK_START = date(2025, 3, 2)
+WEEK_ENDING = date(2025, 3, 8)
+
+
+def _legacy_revert_orphan_time_off(
+    users,
+    week_start: date,
+    week_ending: date,
+):
+    """
+    Remove legacy/orphan TIME_OFF rows when an Exchange variance exists for the same user/date.
+    Keeps a single source of truth for schedule variance so PTO/personal isn't double-applied.
+    """
+    exchange_days = set(
+        Occurrence.objects.filter(
+            user__in=users,
+            date__range=[week_start, week_ending],
+            subtype=OccurrenceSubtype.EXCHANGE,
+            is_variance_to_schedule=True,
+        ).values_list("user_id", "date")
+    )
+    if not exchange_days:
+        return
+
+    for user_id, occ_date in sorted(exchange_days):
+        orphan_rows = Occurrence.objects.filter(
+            user_id=user_id,
+            date=occ_date,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            is_variance_to_schedule=False,
+            time_off_request__isnull=True,
+        )
+        if not orphan_rows.exists():
+            continue
+        user = CustomUser.objects.get(pk=user_id)
+        pto_refund = 0.0
+        personal_refund = 0.0
+        for occ in orphan_rows:
+            if occ.pto_applied:
+                pto_refund += float(occ.pto_hours_applied or 0.0)
+                personal_refund += float(occ.personal_hours_applied or 0.0)
+            occ.delete()
+        if pto_refund or personal_refund:
+            user.pto_balance = round(user.pto_balance + pto_refund, 2)
+            user.personal_time_balance = round(
+                max(0.0, user.personal_time_balance - personal_refund),
+                2,
+            )
+            user.ledger_reason = f"Exchange week cleanup: refund orphan time off ({occ_date})"
+            user.save(update_fields=["pto_balance", "personal_time_balance"])
+
+
+def _legacy_sync_daily_summaries(users, week_start: date, week_ending: date, payroll_period):
+    """
+    Persist interpreted per-day state after payroll logic has created/adjusted occurrences.
+    Only writes rows where there is scheduled time or reported worked time for that date.
+    """
+    for user in users:
+        current = week_start
+        while current <= week_ending:
+            scheduled = effective_work_hours_for_day(user, current)
+            entries_day = TimeEntry.objects.filter(user=user, date=current)
+            worked = 0.0
+            for e in entries_day:
+                if e.clock_in and e.clock_out:
+                    worked += e.payroll_credited_hours()
+            if scheduled <= 0 and worked <= 0:
+                current += timedelta(days=1)
+                continue
+            exchange_occ = (
+                Occurrence.objects.filter(
+                    user=user,
+                    date=current,
+                    is_variance_to_schedule=True,
+                    subtype=OccurrenceSubtype.EXCHANGE,
+                )
+                .order_by("id")
+                .first()
+            )
+            exchange_eligible = bool(exchange_occ and exchange_occ.duration_hours > 0)
+            DailyAttendanceSummary.objects.update_or_create(
+                user=user,
+                work_date=current,
+                defaults={
+                    "scheduled_hours": scheduled,
+                    "worked_hours": round(worked, 2),
+                    "rounded_hours": round(worked, 2),
+                    "lunch_deducted_hours": 0.0,
+                    "tardy_minutes": 0,
+                    "early_out_minutes": 0,
+                    "regular_hours": round(worked, 2),
+                    "overtime_hours": 0.0,
+                    "exchange_eligible": exchange_eligible,
+                    "status": DailyAttendanceSummary.Status.FINALIZED,
+                    "payroll_period": payroll_period,
+                },
+            )
+            current += timedelta(days=1)
+
+
+def _legacy_finalize_payroll_week(*, period, week_start: date, week_ending: date, finalized_by, users) -> None:
+    """
+    Core payroll close logic (occurrences, balances, accrual). Caller handles HTTP, overrides, holidays, CSV.
+    ``users`` must be the same sorted list used elsewhere for payroll (e.g. exempt-filtered).
+    """
+    if period.is_finalized:
+        return
+
+    # Build total worked (time entries only) and total scheduled per user for the week
+    user_total_worked = {}
+    user_total_scheduled = {}
+    for user in users:
+        entries = TimeEntry.objects.filter(user=user, date__range=[week_start, week_ending])
+        total_worked_hours = 0
+        for e in entries:
+            if e.clock_in and e.clock_out:
+                total_worked_hours += e.payroll_credited_hours()
+        user_total_worked[user.id] = total_worked_hours
+        user_total_scheduled[user.id] = effective_scheduled_hours_for_range(user, week_start, week_ending)
+
+    create_tardy_occurrences_for_week(week_start, week_ending, period=period)
+
+    # Variance occurrences: only when user has a schedule and reported total falls short.
+    approved_time_off_by_user_date = {}
+    for user in users:
+        approved_time_off_by_user_date[user.id] = {}
+        qs = Occurrence.objects.filter(
+            user=user,
+            date__range=[week_start, week_ending],
+            time_off_request__status=TimeOffRequestStatus.APPROVED,
+        )
+        for occ in qs.values("date", "duration_hours"):
+            d = occ["date"]
+            approved_time_off_by_user_date[user.id][d] = (
+                approved_time_off_by_user_date[user.id].get(d, 0) + occ["duration_hours"]
+            )
+
+    for user in users:
+        total_worked_hours = user_total_worked.get(user.id, 0)
+        total_scheduled = effective_scheduled_hours_for_range(user, week_start, week_ending)
+        if total_scheduled <= 0:
+            continue  # No schedule: do not create any variance
+        current = week_start
+        while current <= week_ending:
+            scheduled_day = effective_work_hours_for_day(user, current)
+            if scheduled_day <= 0:
+                current += timedelta(days=1)
+                continue
+            entries_day = TimeEntry.objects.filter(user=user, date=current)
+            worked_day = 0
+            for e in entries_day:
+                if e.clock_in and e.clock_out:
+                    worked_day += e.payroll_credited_hours()
+            approved_day = approved_time_off_by_user_date.get(user.id, {}).get(current, 0)
+            tardy_or_variance_hours = sum(
+                Occurrence.objects.filter(
+                    user=user,
+                    date=current,
+                )
+                .filter(
+                    Q(subtype__in=[OccurrenceSubtype.TARDY_IN_GRACE, OccurrenceSubtype.TARDY_OUT_OF_GRACE])
+                    | Q(is_variance_to_schedule=True)
+                )
+                .values_list("duration_hours", flat=True)
+            )
+            reported_day = worked_day + approved_day + tardy_or_variance_hours
+            shortfall_day = max(0, round(scheduled_day - reported_day, 2))
+            if shortfall_day > 0:
+                has_variance = Occurrence.objects.filter(
+                    user=user,
+                    date=current,
+                    is_variance_to_schedule=True,
+                ).exists()
+                if not has_variance:
+                    subtype = OccurrenceSubtype.EXCHANGE
+                    Occurrence.objects.create(
+                        user=user,
+                        occurrence_type=OccurrenceType.UNPLANNED,
+                        subtype=subtype,
+                        date=current,
+                        duration_hours=round(shortfall_day, 2),
+                        pto_applied=False,
+                        is_variance_to_schedule=True,
+                        payroll_period=period,
+                    )
+            current += timedelta(days=1)
+
+    # Exchange occurrences should represent only the remaining weekly shortfall
+    for user in users:
+        expected = user_total_scheduled.get(user.id, 0)
+        if expected <= 0:
+            continue
+        required_week_hours = required_week_hours_for_policy(expected)
+        worked = user_total_worked.get(user.id, 0)
+        approved_week = sum(approved_time_off_by_user_date.get(user.id, {}).values())
+        weekly_shortfall = max(0.0, round(required_week_hours - (worked + approved_week), 2))
+        remaining = weekly_shortfall
+        exchange_variances = list(
+            Occurrence.objects.filter(
+                user=user,
+                date__range=[week_start, week_ending],
+                is_variance_to_schedule=True,
+                subtype=OccurrenceSubtype.EXCHANGE,
+            ).order_by("date", "id")
+        )
+        for occ in exchange_variances:
+            new_duration = min(occ.duration_hours, remaining)
+            if round(occ.duration_hours, 2) != round(new_duration, 2):
+                occ.duration_hours = round(new_duration, 2)
+                occ.save(update_fields=["duration_hours"])
+            remaining = max(0.0, round(remaining - new_duration, 2))
+
+    _legacy_revert_orphan_time_off(
+        users,
+        week_start,
+        week_ending,
+    )
+
+    # If the user met or exceeded weekly scheduled hours, convert out-of-grace tardies
+    # to zero-hour Exchange rows so no PTO/personal is deducted.
+    for user in users:
+        expected = user_total_scheduled.get(user.id, 0)
+        if expected <= 0:
+            continue
+        required_week_hours = required_week_hours_for_policy(expected)
+        worked = user_total_worked.get(user.id, 0)
+        approved_week = sum(approved_time_off_by_user_date.get(user.id, {}).values())
+        if (worked + approved_week) < required_week_hours:
+            continue
+        tardy_out_rows = Occurrence.objects.filter(
+            user=user,
+            date__range=[week_start, week_ending],
+            subtype=OccurrenceSubtype.TARDY_OUT_OF_GRACE,
+        )
+        for occ in tardy_out_rows:
+            occ.subtype = OccurrenceSubtype.EXCHANGE
+            occ.duration_hours = 0.0
+            occ.is_variance_to_schedule = True
+            occ.pto_applied = False
+            occ.pto_hours_applied = 0.0
+            occ.personal_hours_applied = 0.0
+            occ.save(
+                update_fields=[
+                    "subtype",
+                    "duration_hours",
+                    "is_variance_to_schedule",
+                    "pto_applied",
+                    "pto_hours_applied",
+                    "personal_hours_applied",
+                ]
+            )
+
+    # Apply PTO before accrual (use current balance, not hours earned this week).
+    week_occurrences = list(
+        Occurrence.objects.filter(
+            date__range=[week_start, week_ending],
+            subtype__in=OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
+            pto_applied=False,
+        )
+        .exclude(subtype=OccurrenceSubtype.EXCHANGE)
+        .select_related("user")
+        .order_by("user_id", "date")
+    )
+    exchange_occurrences = list(
+        Occurrence.objects.filter(
+            date__range=[week_start, week_ending],
+            subtype=OccurrenceSubtype.EXCHANGE,
+            pto_applied=False,
+        ).select_related("user").order_by("user_id", "date")
+    )
+    for occ in exchange_occurrences:
+        worked = user_total_worked.get(occ.user_id, 0)
+        expected = user_total_scheduled.get(occ.user_id)
+        if expected is None:
+            expected = scheduled_hours_for_range(occ.user, week_start, week_ending)
+            user_total_scheduled[occ.user_id] = expected
+        required_week_hours = required_week_hours_for_policy(expected)
+        approved_week = sum(approved_time_off_by_user_date.get(occ.user_id, {}).values())
+        if (worked + approved_week) < required_week_hours and occ.duration_hours > 0:
+            week_occurrences.append(occ)
+    week_occurrences.sort(key=lambda o: (o.user_id, o.date))
+
+    absence_cap_by_user: dict[int, float] = {}
+    for user in users:
+        worked = user_total_worked.get(user.id, 0.0)
+        expected = user_total_scheduled.get(user.id, 0.0)
+        required = required_week_hours_for_policy(expected)
+        absence_cap_by_user[user.id] = max(0.0, round(required - worked, 2))
+
+    for occ in week_occurrences:
+        uid = occ.user_id
+        cap_remaining = absence_cap_by_user.get(uid, 0.0)
+        hours_to_charge = min(float(occ.duration_hours or 0.0), cap_remaining)
+        if hours_to_charge < 0.001:
+            occ.duration_hours = 0.0
+            occ.pto_applied = True
+            occ.pto_hours_applied = 0.0
+            occ.personal_hours_applied = 0.0
+            occ.save(
+                update_fields=[
+                    "duration_hours",
+                    "pto_applied",
+                    "pto_hours_applied",
+                    "personal_hours_applied",
+                ]
+            )
+            continue
+        occ.apply_pto(max_occurrence_hours=hours_to_charge)
+        charged = float(occ.pto_hours_applied or 0.0) + float(occ.personal_hours_applied or 0.0)
+        absence_cap_by_user[uid] = max(0.0, round(cap_remaining - charged, 2))
+
+    _legacy_sync_daily_summaries(users, week_start, week_ending, period)
+
+    # Accrue PTO for the week (after applying so balance used is pre-accrual).
+    for user in users:
+        total_worked_hours = user_total_worked.get(user.id, 0)
+        if total_worked_hours and (user.years_of_service() <= 2 or user.is_part_time):
+            user.refresh_from_db()
+            accrued = user.accrue_pto(total_worked_hours)
+            if accrued:
+                PayrollPeriodUserSnapshot.objects.update_or_create(
+                    period=period,
+                    user=user,
+                    defaults={"pto_accrued_hours": round(accrued, 2)},
+                )
+
+    period.is_finalized = True
+    period.finalized_at = django_tz.now()
+    period.finalized_by = finalized_by
+    period.save()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _ten_hour_schedule(user, days):
+    for day in days:
+        WorkSchedule.objects.create(
+            user=user,
+            day=day,
+            start_time=time(5, 0),
+            lunch_out=time(11, 0),
+            lunch_in=time(11, 30),
+            end_time=time(15, 30),
+        )
+
+
+def _entry(user, d, in_h, in_m, out_h, out_m):
+    tz = timezone.get_current_timezone()
+    return TimeEntry.objects.create(
+        user=user,
+        date=d,
+        clock_in=timezone.make_aware(datetime(d.year, d.month, d.day, in_h, in_m), tz),
+        clock_out=timezone.make_aware(datetime(d.year, d.month, d.day, out_h, out_m), tz),
+    )
+
+
+def _finalize_state(period) -> dict:
+    """Everything finalize writes, keyed by username so row ids do not matter."""
+    return {
+        "balances": list(
+            CustomUser.objects.order_by("username").values_list(
+                "username", "pto_balance", "personal_time_balance"
+            )
+        ),
+        "snapshots": list(
+            PayrollPeriodUserSnapshot.objects.filter(period=period)
+            .order_by("user__username")
+            .values_list("user__username", "pto_accrued_hours")
+        ),
+        "occurrences": sorted(
+            (
+                row[:-1] + (row[-1] is not None,)
+                for row in Occurrence.objects.values_list(
+                    "user__username",
+                    "date",
+                    "subtype",
+                    "occurrence_type",
+                    "duration_hours",
+                    "pto_applied",
+                    "pto_hours_applied",
+                    "personal_hours_applied",
+                    "probation_grace_hours_applied",
+                    "is_variance_to_schedule",
+                    "payroll_period_id",
+                )
+            ),
+            key=repr,
+        ),
+        "summaries": list(
+            DailyAttendanceSummary.objects.order_by("user__username", "work_date").values_list(
+                "user__username",
+                "work_date",
+                "scheduled_hours",
+                "worked_hours",
+                "rounded_hours",
+                "regular_hours",
+                "exchange_eligible",
+                "status",
+            )
+        ),
+        "history": sorted(
+            PTOBalanceHistory.objects.values_list(
+                "user__username", "change", "reason", "balance_after", "balance_type"
+            ),
+            key=repr,
+        ),
+    }
+
+
+class TestFinalizePayrollWeekParity(TestCase):
+    """Set-based finalize_payroll_week matches the per-user/per-day implementation."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(
+            username="parity_admin",
+            password="x",
+            is_staff=True,
+            is_exempt=True,
+        )
+        recent = date.today() - timedelta(days=365)
+        veteran = date.today() - timedelta(days=365 * 5)
+
+        # Mon-Thu 10h plus unscheduled Friday overtime; accrues PTO.
+        overtime = CustomUser.objects.create_user(
+            username="parity_overtime", password="x", service_date=recent, pto_balance=2.0
+        )
+        _ten_hour_schedule(overtime, [0, 1, 2, 3])
+        for day in range(3, 7):
+            _entry(overtime, date(2025, 3, day), 5, 0, 15, 30)
+        _entry(overtime, date(2025, 3, 7), 7, 0, 13, 0)
+
+        # Misses Tuesday, makes up 6h Thursday: partial exchange charged to PTO then personal.
+        short = CustomUser.objects.create_user(
+            username="parity_short", password="x", service_date=veteran, pto_balance=1.3
+        )
+        _ten_hour_schedule(short, [0, 1, 2])
+        _entry(short, date(2025, 3, 3), 5, 0, 15, 30)
+        _entry(short, date(2025, 3, 5), 5, 0, 15, 30)
+        _entry(short, date(2025, 3, 6), 7, 0, 13, 0)
+
+        # Out-of-grace tardy Monday, weekly hours met by Friday make-up.
+        tardy = CustomUser.objects.create_user(
+            username="parity_tardy", password="x", service_date=veteran, pto_balance=8.0
+        )
+        _ten_hour_schedule(tardy, [0, 1, 2, 3])
+        _entry(tardy, date(2025, 3, 3), 6, 0, 15, 30)
+        for day in (4, 5, 6):
+            _entry(tardy, date(2025, 3, day), 5, 0, 15, 30)
+        _entry(tardy, date(2025, 3, 7), 7, 0, 9, 0)
+
+        # Orphan TIME_OFF rows (already applied) replaced by exchange variances.
+        orphan = CustomUser.objects.create_user(
+            username="parity_orphan", password="x", service_date=veteran
+        )
+        _ten_hour_schedule(orphan, [0, 1, 2, 3])
+        for day in (3, 4):
+            Occurrence.objects.create(
+                user=orphan,
+                date=date(2025, 3, day),
+                occurrence_type=OccurrenceType.UNPLANNED,
+                subtype=OccurrenceSubtype.TIME_OFF,
+                duration_hours=10.0,
+            )
+        _entry(orphan, date(2025, 3, 5), 5, 0, 15, 30)
+        _entry(orphan, date(2025, 3, 6), 5, 0, 15, 30)
+        fri = _entry(orphan, date(2025, 3, 7), 7, 0, 11, 0)
+        fri.clock_in_authorized_by = self.admin
+        fri.save()
+
+        # Approved time off Wednesday, JSON weekly schedule, part-time accrual.
+        part_time = CustomUser.objects.create_user(
+            username="parity_part_time",
+            password="x",
+            is_part_time=True,
+            service_date=veteran,
+            pto_balance=Decimal("71.5"),
+            weekly_schedule={
+                day: {"start": "08:00", "end": "14:00"}
+                for day in ("monday", "tuesday", "wednesday", "thursday")
+            },
+        )
+        tor = TimeOffRequest.objects.create(
+            user=part_time,
+            start_date=date(2025, 3, 5),
+            end_date=date(2025, 3, 5),
+            status=TimeOffRequestStatus.APPROVED,
+        )
+        Occurrence.objects.create(
+            user=part_time,
+            date=date(2025, 3, 5),
+            occurrence_type=OccurrenceType.PLANNED,
+            subtype=OccurrenceSubtype.TIME_OFF,
+            duration_hours=6.0,
+            time_off_request=tor,
+        )
+        _entry(part_time, date(2025, 3, 3), 8, 0, 14, 0)
+        _entry(part_time, date(2025, 3, 4), 8, 0, 12, 0)
+        _entry(part_time, date(2025, 3, 6), 8, 0, 14, 0)
+
+        # No schedule at all: never gets a variance.
+        CustomUser.objects.create_user(username="parity_unscheduled", password="x")
+
+    def _finalize_and_capture(self, finalize) -> dict:
+        state = None
+        try:
+            with transaction.atomic():
+                period = PayrollPeriod.objects.create(week_ending=WEEK_ENDING)
+                users = list(
+                    CustomUser.objects.filter(is_active=True, is_exempt=False).order_by("username")
+                )
+                finalize(
+                    period=period,
+                    week_start=WEEK_START,
+                    week_ending=WEEK_ENDING,
+                    finalized_by=self.admin,
+                    users=users,
+                )
+                period.refresh_from_db()
+                self.assertTrue(period.is_finalized)
+                state = _finalize_state(period)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return state
+
+    def _assert_parity(self):
+        legacy = self._finalize_and_capture(_legacy_finalize_payroll_week)
+        current = self._finalize_and_capture(weekly_reconciliation.finalize_payroll_week)
+        for key in legacy:
+            self.assertEqual(current[key], legacy[key], key)
+        return current
+
+    def test_matches_legacy_engine(self):
+        """Exchange, tardy conversion, orphan cleanup, approved time off and accrual all match."""
+        state = self._assert_parity()
+        self.assertTrue(state["snapshots"])
+        self.assertTrue(any(row[2] == OccurrenceSubtype.EXCHANGE for row in state["occurrences"]))
+
+    def test_matches_legacy_engine_with_holiday_plan(self):
+        """Complete holiday week plans drive expected hours identically."""
+        plan = HolidayWeekPlan.objects.create(
+            year=2025,
+            holiday_key="parity_day",
+            name="Parity Day",
+            actual_holiday_date=date(2025, 3, 5),
+            week_start=WEEK_START,
+            week_ending=WEEK_ENDING,
+            is_complete=True,
+        )
+        for offset in range(7):
+            d = WEEK_START + timedelta(days=offset)
+            for template in (HolidayWeekPlanTemplate.FOUR_DAY, HolidayWeekPlanTemplate.FIVE_DAY):
+                HolidayWeekPlanDay.objects.create(
+                    plan=plan,
+                    the_date=d,
+                    template=template,
+                    work_hours=Decimal("0.00") if d == date(2025, 3, 5) else Decimal("10.00"),
+                    holiday_pay_hours=Decimal("10.00") if d == date(2025, 3, 5) else Decimal("0.00"),
+                )
+        self._assert_parity()
+
+    def test_refinalize_updates_existing_daily_summaries(self):
+        """Summaries left OPEN by unfinalize are reused rather than duplicated."""
+        period = PayrollPeriod.objects.create(week_ending=WEEK_ENDING)
+        users = list(CustomUser.objects.filter(is_exempt=False).order_by("username"))
+        kwargs = dict(week_start=WEEK_START, week_ending=WEEK_ENDING, finalized_by=self.admin)
+        weekly_reconciliation.finalize_payroll_week(period=period, users=users, **kwargs)
+        first = _finalize_state(period)
+        weekly_reconciliation.unfinalize_payroll_period(period)
+        period.is_finalized = False
+        period.save()
+        weekly_reconciliation.finalize_payroll_week(period=period, users=users, **kwargs)
+        self.assertEqual(_finalize_state(period)["summaries"], first["summaries"])
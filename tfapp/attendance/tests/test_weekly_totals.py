@@ -0,0 +1,118 @@
+"""
+WeeklyUserTotals rollup: built on first read, dropped by writes to its inputs, rebuilt by command.
+"""
+from datetime import date, datetime, time
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from attendance.models import (
+    CustomUser,
+    DailyAttendanceSummary,
+    Occurrence,
+    OccurrenceSubtype,
+    OccurrenceType,
+    WeeklyUserTotals,
+    WorkSchedule,
+)
+from attendance.services.daily_summaries import ensure_daily_summaries
+from attendance.services.weekly_totals import weekly_user_totals
+from timeclock.models import TimeEntry
+
+WEEK_ENDING = date(2025, 3, 8)
+MONDAY = date(2025, 3, 3)
+TUESDAY = date(2025, 3, 4)
+
+
+def _entry(user, d, start=time(8, 0), end=time(16, 30)):
+    tz = timezone.get_current_timezone()
+    return TimeEntry.objects.create(
+        user=user,
+        date=d,
+        clock_in=timezone.make_aware(datetime.combine(d, start), tz),
+        lunch_out=timezone.make_aware(datetime.combine(d, time(12, 0)), tz),
+        lunch_in=timezone.make_aware(datetime.combine(d, time(12, 30)), tz),
+        clock_out=timezone.make_aware(datetime.combine(d, end), tz),
+    )
+
+
+class TestWeeklyUserTotals(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="wk_totals", password="x")
+        for weekday in range(5):
+            WorkSchedule.objects.create(
+                user=self.user,
+                day=weekday,
+                start_time=time(8, 0),
+                lunch_out=time(12, 0),
+                lunch_in=time(12, 30),
+                end_time=time(16, 30),
+            )
+        _entry(self.user, MONDAY)
+
+    def _totals(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        return weekly_user_totals([user], WEEK_ENDING)[user.pk]
+
+    def test_first_read_builds_row_and_second_read_is_one_query(self):
+        row = self._totals()
+        self.assertAlmostEqual(row.reported_hours, 8.0, places=2)
+        self.assertAlmostEqual(row.scheduled_hours, 40.0, places=2)
+        self.assertEqual(WeeklyUserTotals.objects.count(), 1)
+        with self.assertNumQueries(1):
+            weekly_user_totals([self.user], WEEK_ENDING)
+
+    def test_time_entry_and_occurrence_writes_refresh_row(self):
+        self._totals()
+        _entry(self.user, TUESDAY)
+        self.assertAlmostEqual(self._totals().reported_hours, 16.0, places=2)
+
+        occ = Occurrence.objects.create(
+            user=self.user,
+            date=TUESDAY,
+            occurrence_type=OccurrenceType.UNPLANNED,
+            subtype=OccurrenceSubtype.TARDY_IN_GRACE,
+            duration_hours=0.0,
+        )
+        self.assertFalse(WeeklyUserTotals.objects.exists())
+        self._totals()
+        Occurrence.objects.filter(pk=occ.pk).delete()
+        self.assertFalse(WeeklyUserTotals.objects.exists())
+
+    def test_rows_rebuilt_before_the_writer_commits_are_dropped_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            _entry(self.user, TUESDAY)
+            # A concurrent reader, not seeing the uncommitted entry, stores last week's view.
+            WeeklyUserTotals.objects.create(user=self.user, week_ending=WEEK_ENDING, reported_hours=8.0)
+            ensure_daily_summaries([self.user], MONDAY, WEEK_ENDING)
+        self.assertTrue(callbacks)
+        self.assertFalse(WeeklyUserTotals.objects.exists())
+        self.assertEqual(DailyAttendanceSummary.objects.filter(is_stale=False).count(), 0)
+        self.assertAlmostEqual(self._totals().reported_hours, 16.0, places=2)
+
+    def test_schedule_change_drops_rows(self):
+        self._totals()
+        WorkSchedule.objects.filter(user=self.user, day=4).first().delete()
+        self.assertAlmostEqual(self._totals().scheduled_hours, 32.0, places=2)
+
+    def test_rebuild_command_overwrites_stale_rows(self):
+        WeeklyUserTotals.objects.create(user=self.user, week_ending=WEEK_ENDING, reported_hours=99.0)
+        out = StringIO()
+        call_command(
+            "rebuild_weekly_totals",
+            "--start",
+            MONDAY.isoformat(),
+            "--end",
+            WEEK_ENDING.isoformat(),
+            "--user",
+            str(self.user.pk),
+            stdout=out,
+        )
+        self.assertIn("Rebuilt 1", out.getvalue())
+        self.assertAlmostEqual(
+            WeeklyUserTotals.objects.get(user=self.user, week_ending=WEEK_ENDING).reported_hours,
+            8.0,
+            places=2,
+        )
@@ -34,8 +34,11 @@ urlpatterns = [
         views.perfect_attendance_pdf,
         name="perfect_attendance_pdf",
     ),
+    path("reports/jobs/<slug:slug>/", views.report_job, name="report_job"),
+    path("reports/jobs/<slug:slug>/download/", views.report_job_download, name="report_job_download"),
     path("close-payroll/", views.close_payroll, name="close_payroll"),
     path("unfinalize-payroll/", views.unfinalize_payroll, name="unfinalize_payroll"),
+    path("payroll/close.csv", views.payroll_close_csv_download, name="payroll_close_csv_download"),
     path(
         "payroll/schedule-template.csv",
         views.payroll_schedule_csv_download,
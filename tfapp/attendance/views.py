@@ -1,5 +1,4 @@
 import hashlib
-import io
 import logging
 from collections import defaultdict
 
@@ -16,77 +15,82 @@ from timeclock.tardy_sync import sync_tardy_occurrences_for_time_entry
 from django.db import transaction
 from django.db.models import Sum, Q
 import csv
-import re
 from calendar import month_name, monthrange
-from datetime import time, timedelta, date, datetime, timezone
-from typing import Optional
+from datetime import timedelta, date, timezone
 from django.conf import settings as django_settings
 from django.core.cache import cache
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.http import JsonResponse
-from django.template.loader import get_template, render_to_string
+from django.template.loader import render_to_string
 
 from accounts.models import UserProfile
-from xhtml2pdf import pisa
 from .models import (
     CustomUser,
     Occurrence,
     OccurrenceType,
     OCCURRENCE_SUBTYPES_USING_PTO_OR_PERSONAL,
-    PERFECT_ATTENDANCE_DISQUALIFYING_SUBTYPES,
     PayrollPeriod,
     RoleChoices,
     TimeOffRequest,
     TimeOffRequestStatus,
     WorkThroughLunchRequest,
     AdjustPunchRequest,
-    AdjustPunchField,
-    revert_tardy_occurrences_for_adjust_punch,
-    apply_past_due_occurrences,
     ensure_holiday_occurrences_for_range,
-    OccurrenceSubtype,
-    user_eligible_for_perfect_attendance_new_hire_month,
-    ABSENCE_REPORT_FMLA_SUBTYPE,
-    ABSENCE_REPORT_LEAVE_AND_NO_PERSONAL_SUBTYPES,
+    ReportJob,
+    ReportJobKind,
+    ReportJobStatus,
 )
 from . import approval_emails
+from .services import approvals
+from .services.approvals import can_approve_time_off
+from .services import time_off_overlap
+from .services.tardy_sync_queue import enqueue_tardy_sync_for_entry
 from .group_report_charts import (
     build_group_analytics_chart_uris,
-    group_report_pie_pair_uris,
 )
 from .group_analytics import compute_group_analytics
+from .report_pdfs import (
+    aggregate_group_absence_report_rows,
+    filter_occurrences_for_report,
+)
 from .forms import ReportFilterForm, TimeOffRequestForm, WorkThroughLunchRequestForm, AdjustPunchRequestForm
 from .payroll_utils import (
+    payroll_sort_key as _payroll_sort_key,
     week_ending_for_date as _week_ending_for_date,
     is_payroll_week_finalized as _is_payroll_week_finalized,
 )
 from .services import holiday_plan_service
-from .services.holiday_plan_service import (
-    effective_scheduled_hours_for_range,
-    missing_holiday_plans_for_payroll_week,
+from .services.holiday_plan_service import missing_holiday_plans_for_payroll_week
+from .services.daily_summaries import scheduled_hours_by_day
+from .services.weekly_totals import (
+    invalidate_weekly_user_totals,
+    invalidate_weekly_user_totals_for_dates,
+    weekly_user_totals,
 )
 from .services import attendance_engine
+from .services import payroll_export
+from .services import payroll_import
+from .services import perfect_attendance
+from .services import report_jobs
+from .services.payroll_import import (
+    clock_out_calendar_date as _clock_out_calendar_date,
+    format_csv_time as _fmt_csv_time,
+    make_aware_on_date as _make_aware_on_date,
+    parse_csv_time_cell as _parse_csv_time_cell,
+)
 from .services import weekly_reconciliation
 from .schedule_utils import (
     crosses_midnight_for_day,
     earliest_clock_in_allowed,
     clock_in_at_or_after_scheduled_lunch_in,
     entry_requires_payroll_lunch_import_review,
-    get_scheduled_lunch_in_for_day,
-    get_scheduled_lunch_out_for_day,
     get_scheduled_shift_end_datetime,
     get_scheduled_start_for_day,
-    scheduled_duration_hours_for_day,
     scheduled_hours_for_range,
     scheduled_lunch_datetimes_for_entry,
-    suggested_punch_times_for_day,
 )
 from django.views.decorators.http import require_POST
-from django.conf import settings
-from pathlib import Path
-import base64
 import json
-from io import BytesIO
 
 def home(request):
     from pages.views import index
@@ -111,68 +115,12 @@ def get_recent_saturdays(count=12):
     )
 
 
-def can_approve_time_off(approver: CustomUser, target: CustomUser) -> bool:
-    """
-    Only allow approvals by the user's own group lead, supervisor,
-    manager (same department), or any executive.
-    """
-    if not approver.is_authenticated:
-        return False
-
-    if approver.role == RoleChoices.EXECUTIVE:
-        return True
-
-    if target.group_lead_id and approver.id == target.group_lead_id:
-        return True
-    if target.supervisor_id and approver.id == target.supervisor_id:
-        return True
-
-    if (
-        approver.role == RoleChoices.MANAGER
-        and approver.department
-        and approver.department == target.department
-    ):
-        return True
-
-    return False
-
-
 def get_pending_approval_counts_for_user(approver: CustomUser):
     """
     Count PENDING requests this user is allowed to approve (time off, work-through-lunch, adjust punch).
     Same rules as team_time_off_requests.
     """
-    if approver.role not in [
-        RoleChoices.GROUP_LEAD,
-        RoleChoices.SUPERVISOR,
-        RoleChoices.MANAGER,
-        RoleChoices.EXECUTIVE,
-    ]:
-        return {"time_off": 0, "work_through_lunch": 0, "adjust_punch": 0, "total": 0}
-
-    pending_to = TimeOffRequest.objects.filter(status=TimeOffRequestStatus.PENDING)
-    n_to = sum(1 for r in pending_to if can_approve_time_off(approver, r.user))
-
-    pending_wtl = WorkThroughLunchRequest.objects.filter(status=TimeOffRequestStatus.PENDING)
-    n_wtl = sum(1 for r in pending_wtl if can_approve_time_off(approver, r.user))
-
-    pending_adj = AdjustPunchRequest.objects.filter(status=TimeOffRequestStatus.PENDING)
-    n_adj = sum(1 for r in pending_adj if can_approve_time_off(approver, r.user))
-
-    return {
-        "time_off": n_to,
-        "work_through_lunch": n_wtl,
-        "adjust_punch": n_adj,
-        "total": n_to + n_wtl + n_adj,
-    }
-
-
-def _payroll_sort_key(user: CustomUser):
-    return (
-        (user.payroll_lastname or user.last_name or user.username or "").strip().lower(),
-        (user.payroll_firstname or user.first_name or "").strip().lower(),
-        (user.username or "").strip().lower(),
-    )
+    return approvals.get_pending_approval_counts(approver)
 
 
 def _last_day_of_month(year: int, month: int) -> date:
@@ -212,64 +160,6 @@ def _scheduled_but_not_clocked_in(visible_users, on_date: date, *, at_time=None)
     return out
 
 
-def _perfect_attendance_with_hours(visible_users, first: date, period_end: date):
-    """
-    Non-exempt users only: zero UNPLANNED absences in [first, period_end]; no disqualifying
-    occurrence subtypes in that range; new hires (hire or service date) only from their first
-    full calendar month after hire onward.
-
-    total_hours is the sum of payroll_credited_hours on completed time entries in that range
-    (0.00 if none); PTO / absence hours are not included.
-    """
-    rows = []
-    for u in visible_users.filter(is_exempt=False):
-        anchor = u.hire_date or u.service_date
-        if not user_eligible_for_perfect_attendance_new_hire_month(anchor, first):
-            continue
-        has_unplanned = Occurrence.objects.filter(
-            user=u,
-            occurrence_type=OccurrenceType.UNPLANNED,
-            date__gte=first,
-            date__lte=period_end,
-        ).exists()
-        if has_unplanned:
-            continue
-        if Occurrence.objects.filter(
-            user=u,
-            subtype__in=PERFECT_ATTENDANCE_DISQUALIFYING_SUBTYPES,
-            date__gte=first,
-            date__lte=period_end,
-        ).exists():
-            continue
-        completed = TimeEntry.objects.filter(
-            user=u,
-            date__gte=first,
-            date__lte=period_end,
-            clock_in__isnull=False,
-            clock_out__isnull=False,
-        )
-        total_hours = 0.0
-        for e in completed:
-            total_hours += e.payroll_credited_hours()
-        rows.append({"user": u, "total_hours": round(total_hours, 2)})
-    rows.sort(key=lambda r: _payroll_sort_key(r["user"]))
-    return rows
-
-
-def _perfect_attendance_candidate_users():
-    """
-    Active employees considered for Perfect Attendance lists. Same queryset for every role so
-    all users see the full qualifying list; only reported hours are restricted to executives.
-    """
-    return CustomUser.objects.filter(is_active=True).order_by(
-        "payroll_lastname",
-        "payroll_firstname",
-        "last_name",
-        "first_name",
-        "username",
-    )
-
-
 def _first_day_of_quarter(year: int, quarter: int) -> date:
     return date(year, [1, 4, 7, 10][quarter - 1], 1)
 
@@ -296,9 +186,11 @@ def _scheduled_and_unplanned_prefixes(
 ) -> tuple[list[float], list[float], dict[date, int]]:
     """
     One pass over [span_start, span_end]:
-    - Scheduled: sum hours across users per day (Python; unavoidable without storing per-day rosters).
+    - Scheduled: daily totals across ``users`` from stored daily facts, falling back to
+      compiled schedules for users whose rows are missing (nothing is built here).
     - Unplanned: one DB query for daily totals, then prefix sums for fast range lookups.
     """
+    daily_scheduled = scheduled_hours_by_day(users, span_start, span_end)
     daily_unplanned = {
         row["date"]: float(row["total"] or 0.0)
         for row in Occurrence.objects.filter(
@@ -316,7 +208,7 @@ def _scheduled_and_unplanned_prefixes(
     idx = 0
     d = span_start
     while d <= span_end:
-        day_sched = sum(scheduled_duration_hours_for_day(u, d) for u in users)
+        day_sched = daily_scheduled.get(d, 0.0)
         day_unpl = daily_unplanned.get(d, 0.0)
         sched_prefix.append(sched_prefix[-1] + day_sched)
         unplan_prefix.append(unplan_prefix[-1] + day_unpl)
@@ -463,18 +355,6 @@ def _user_ids_signature(user_ids: list[int]) -> str:
     ).hexdigest()[:16]
 
 
-def _invalidate_payroll_weekly_totals_cache(week_ending: date) -> None:
-    """Drop cached payroll table totals so uploads/edits show immediately (see payroll_view wk_key)."""
-    week_start = week_ending - timedelta(days=6)
-    ne_payroll_users = sorted(
-        CustomUser.objects.filter(is_active=True, is_exempt=False),
-        key=_payroll_sort_key,
-    )
-    ne_payroll_ids = [u.id for u in ne_payroll_users]
-    wk_key = f"wt_pay_v1:{week_start}:{week_ending}:{_user_ids_signature(ne_payroll_ids)}"
-    cache.delete(wk_key)
-
-
 @login_required
 def absenteeism_chart_api(request):
     """Heavy chart series for the dashboard; loaded via fetch so the dashboard page returns quickly."""
@@ -525,7 +405,7 @@ def _build_group_report_analytics_html(form: ReportFilterForm, visible_users: li
         user__in=visible_users,
         date__range=(start_date, end_date),
     )
-    occ_qs = _filter_occurrences_for_report(
+    occ_qs = filter_occurrences_for_report(
         occ_qs, subtype_filters=subtype_filters, planned_filter=planned_filter
     )
     occ_list = list(occ_qs)
@@ -612,9 +492,6 @@ def dashboard(request):
     else:
         selected_user = user
 
-    # Apply any past-due occurrences so balance is current (future requests only deduct when date passes).
-    apply_past_due_occurrences(selected_user)
-
     anniversary = selected_user.service_date.replace(year=today.year) if selected_user.service_date else today
     if today < anniversary:
         anniversary = anniversary.replace(year=today.year - 1)
@@ -657,66 +534,18 @@ def dashboard(request):
 
     start_of_week = today - timedelta(days=(today.weekday() + 1) % 7)
     end_of_week = start_of_week + timedelta(days=6)
-    ne_users = list(visible_users.filter(is_exempt=False).prefetch_related("schedules"))
-    ne_ids = [u.id for u in ne_users]
-    wk_ttl = getattr(django_settings, "WEEKLY_TOTALS_CACHE_SECONDS", 90)
-    wk_key = f"wt_v1:{start_of_week}:{end_of_week}:{_user_ids_signature(ne_ids)}"
-    cached_wt = cache.get(wk_key)
-    if cached_wt is not None:
-        bulk_ids = [r["user_id"] for r in cached_wt]
-        um = CustomUser.objects.in_bulk(bulk_ids)
-        weekly_totals = []
-        for row in cached_wt:
-            u = um.get(row["user_id"])
-            if u is not None:
-                weekly_totals.append(
-                    (
-                        u,
-                        row["actual"],
-                        row["reported"],
-                        row["scheduled"],
-                        row["delta"],
-                    )
-                )
-    else:
-        entries_by_user = defaultdict(list)
-        if ne_ids:
-            for e in TimeEntry.objects.filter(
-                user_id__in=ne_ids, date__range=[start_of_week, end_of_week]
-            ):
-                entries_by_user[e.user_id].append(e)
-
-        weekly_totals = []
-        for u in ne_users:
-            total_actual = 0
-            total_reported = 0
-            for entry in entries_by_user[u.id]:
-                if entry.clock_in and entry.clock_out:
-                    total_actual += entry.actual_worked_hours()
-                    total_reported += entry.payroll_credited_hours()
-            total_scheduled = effective_scheduled_hours_for_range(u, start_of_week, end_of_week)
-            delta = round(total_reported - total_scheduled, 2)
-            weekly_totals.append((
-                u,
-                round(total_actual, 2),
-                round(total_reported, 2),
-                round(total_scheduled, 2),
-                delta,
-            ))
-        cache.set(
-            wk_key,
-            [
-                {
-                    "user_id": row[0].id,
-                    "actual": row[1],
-                    "reported": row[2],
-                    "scheduled": row[3],
-                    "delta": row[4],
-                }
-                for row in weekly_totals
-            ],
-            wk_ttl,
-        )
+    ne_users = list(visible_users.filter(is_exempt=False))
+    totals_by_uid = weekly_user_totals(ne_users, end_of_week)
+    weekly_totals = []
+    for u in ne_users:
+        row = totals_by_uid[u.id]
+        weekly_totals.append((
+            u,
+            row.actual_hours,
+            row.reported_hours,
+            row.scheduled_hours,
+            round(row.reported_hours - row.scheduled_hours, 2),
+        ))
 
     alerts = []
     if user.is_staff:
@@ -756,17 +585,17 @@ def dashboard(request):
                 user__in=visible_users,
                 date__range=(report_start_date, report_end_date),
             ).select_related("user", "user__supervisor", "user__group_lead")
-            occ_qs = _filter_occurrences_for_report(
+            occ_qs = filter_occurrences_for_report(
                 occ_qs, subtype_filters=subtype_filters, planned_filter=planned_filter
             )
-            report_group_summary = _aggregate_group_absence_report_rows(list(occ_qs), group_by)
+            report_group_summary = aggregate_group_absence_report_rows(list(occ_qs), group_by)
         elif report_mode == ReportFilterForm.REPORT_MODE_INDIVIDUAL and report_form.cleaned_data.get("user"):
             report_selected_user = report_form.cleaned_data["user"]
             if report_start_date and report_end_date:
                 report_occurrences = Occurrence.objects.filter(
                     user=report_selected_user, date__range=(report_start_date, report_end_date)
                 ).order_by("date")
-                report_occurrences = _filter_occurrences_for_report(
+                report_occurrences = filter_occurrences_for_report(
                     report_occurrences,
                     subtype_filters=subtype_filters,
                     planned_filter=planned_filter,
@@ -829,35 +658,8 @@ def dashboard(request):
             )
         else:
             pa_period_description = f"{pa_first:%B %Y}"
-        pa_cache_key = f"pa_rows_v1:{pa_year}:{pa_month}:{pa_period_end.isoformat()}"
-        pa_cache_ttl = getattr(
-            django_settings, "PERFECT_ATTENDANCE_CACHE_SECONDS", 10 * 60
-        )
-        pa_cached = cache.get(pa_cache_key)
-        if pa_cached is not None:
-            pa_user_ids = [r["user_id"] for r in pa_cached]
-            users_by_id = CustomUser.objects.in_bulk(pa_user_ids)
-            perfect_attendance_rows = []
-            for r in pa_cached:
-                u = users_by_id.get(r["user_id"])
-                if u is not None:
-                    perfect_attendance_rows.append(
-                        {"user": u, "total_hours": r["total_hours"]}
-                    )
-            pa_hours_total = sum(x["total_hours"] for x in perfect_attendance_rows)
-        else:
-            perfect_attendance_rows = _perfect_attendance_with_hours(
-                _perfect_attendance_candidate_users(), pa_first, pa_period_end
-            )
-            pa_hours_total = sum(r["total_hours"] for r in perfect_attendance_rows)
-            cache.set(
-                pa_cache_key,
-                [
-                    {"user_id": r["user"].id, "total_hours": r["total_hours"]}
-                    for r in perfect_attendance_rows
-                ],
-                pa_cache_ttl,
-            )
+        perfect_attendance_rows = perfect_attendance.perfect_attendance_rows(pa_first, pa_period_end)
+        pa_hours_total = sum(r["total_hours"] for r in perfect_attendance_rows)
 
     scheduled_not_clocked = _scheduled_but_not_clocked_in(visible_users, today)
 
@@ -923,8 +725,6 @@ def attendance_list(request, filter_by="today"):
 
     visible_user = user
 
-    apply_past_due_occurrences(visible_user)
-
     if visible_user.service_date:
         anniversary = visible_user.service_date.replace(year=today.year)
         if today < anniversary:
@@ -1000,179 +800,6 @@ def _users_visible_for_attendance_viewer(viewer: CustomUser):
     )
 
 
-def _user_row_sort_key(u: CustomUser | None) -> tuple:
-    if not u:
-        return ("", "", "")
-    return (
-        (u.payroll_lastname or u.last_name or u.username or "").lower(),
-        (u.payroll_firstname or u.first_name or "").lower(),
-        (u.username or "").lower(),
-    )
-
-
-def _planned_filter_label(planned_filter: str) -> str:
-    return dict(ReportFilterForm.PLANNED_FILTER_CHOICES).get(
-        planned_filter or ReportFilterForm.PLANNED_FILTER_ALL,
-        "All (planned and unplanned)",
-    )
-
-
-def _report_filter_note(subtype_filters, subtype_filter_label: str, planned_filter: str) -> str | None:
-    parts = []
-    if subtype_filters:
-        parts.append(f"Filtered to subtype(s): {subtype_filter_label}")
-    if planned_filter and planned_filter != ReportFilterForm.PLANNED_FILTER_ALL:
-        parts.append(f"Filtered to: {_planned_filter_label(planned_filter)}")
-    return "; ".join(parts) if parts else None
-
-
-def _filter_occurrences_for_report(qs, *, subtype_filters, planned_filter):
-    if subtype_filters:
-        qs = qs.filter(subtype__in=subtype_filters)
-    if planned_filter == ReportFilterForm.PLANNED_FILTER_PLANNED:
-        qs = qs.filter(occurrence_type=OccurrenceType.PLANNED)
-    elif planned_filter == ReportFilterForm.PLANNED_FILTER_UNPLANNED:
-        qs = qs.filter(occurrence_type=OccurrenceType.UNPLANNED)
-    return qs
-
-
-def _aggregate_group_absence_report_rows(occurrences, group_by: str) -> list:
-    """Summarize occurrences by department, supervisor, or group lead, with per-user detail rows."""
-    groups = defaultdict(
-        lambda: {
-            "user_ids": set(),
-            "occurrence_count": 0,
-            "total_hours": 0.0,
-            "pto_applied": 0.0,
-            "personal_applied": 0.0,
-            "by_subtype": defaultdict(lambda: {"count": 0, "hours": 0.0}),
-            "by_user": defaultdict(
-                lambda: {
-                    "occurrence_count": 0,
-                    "total_hours": 0.0,
-                    "pto_applied": 0.0,
-                    "personal_applied": 0.0,
-                    "_user": None,
-                }
-            ),
-        }
-    )
-    for o in occurrences:
-        u = o.user
-        if group_by == "department":
-            key = (u.department or "").strip() or "(No department)"
-        elif group_by == "supervisor":
-            key = (
-                u.supervisor.payroll_display_name()
-                if getattr(u, "supervisor_id", None)
-                else "(No supervisor)"
-            )
-        elif group_by == "group_lead":
-            key = (
-                u.group_lead.payroll_display_name()
-                if getattr(u, "group_lead_id", None)
-                else "(No group lead)"
-            )
-        else:
-            key = (u.department or "").strip() or "(No department)"
-        row = groups[key]
-        row["user_ids"].add(u.pk)
-        row["occurrence_count"] += 1
-        row["total_hours"] += float(o.duration_hours or 0)
-        row["pto_applied"] += float(o.pto_hours_applied or 0)
-        row["personal_applied"] += float(o.personal_hours_applied or 0)
-        sub_label = o.get_subtype_display()
-        row["by_subtype"][sub_label]["count"] += 1
-        row["by_subtype"][sub_label]["hours"] += float(o.duration_hours or 0)
-
-        bu = row["by_user"][u.pk]
-        bu["_user"] = u
-        bu["occurrence_count"] += 1
-        bu["total_hours"] += float(o.duration_hours or 0)
-        bu["pto_applied"] += float(o.pto_hours_applied or 0)
-        bu["personal_applied"] += float(o.personal_hours_applied or 0)
-
-    result = []
-    for label in sorted(groups.keys(), key=lambda s: (s or "").lower()):
-        g = groups[label]
-        by_sub = sorted(
-            (
-                {"subtype": k, "count": v["count"], "hours": v["hours"]}
-                for k, v in g["by_subtype"].items()
-            ),
-            key=lambda r: (-r["hours"], r["subtype"].lower()),
-        )
-        users_detail = []
-        for _uid, stat in sorted(
-            g["by_user"].items(),
-            key=lambda item: _user_row_sort_key(item[1].get("_user")),
-        ):
-            u = stat["_user"]
-            users_detail.append(
-                {
-                    "payroll_name": u.payroll_display_name() if u else "",
-                    "username": u.username if u else "",
-                    "department": (u.department or "—") if u else "—",
-                    "supervisor": (
-                        u.supervisor.payroll_display_name()
-                        if u and getattr(u, "supervisor_id", None)
-                        else "—"
-                    ),
-                    "group_lead": (
-                        u.group_lead.payroll_display_name()
-                        if u and getattr(u, "group_lead_id", None)
-                        else "—"
-                    ),
-                    "occurrence_count": stat["occurrence_count"],
-                    "total_hours": stat["total_hours"],
-                    "pto_applied": stat["pto_applied"],
-                    "personal_applied": stat["personal_applied"],
-                }
-            )
-        result.append(
-            {
-                "group_label": label,
-                "unique_employees": len(g["user_ids"]),
-                "occurrence_count": g["occurrence_count"],
-                "total_hours": g["total_hours"],
-                "pto_applied": g["pto_applied"],
-                "personal_applied": g["personal_applied"],
-                "by_subtype": by_sub,
-                "users_detail": users_detail,
-            }
-        )
-    return result
-
-
-def _report_logo_data_uri():
-    """Branded header image for PDF reports (same lookup order as other report views)."""
-    static_dirs = getattr(settings, "STATICFILES_DIRS", []) or []
-    static_root = Path(static_dirs[0]) if static_dirs else Path(settings.BASE_DIR) / "static"
-    img_dir = static_root / "img"
-    for name in ("pdfimage.jpg", "logo.webp", "logo.png"):
-        logo_path = img_dir / name
-        if not logo_path.exists():
-            continue
-        try:
-            raw = logo_path.read_bytes()
-            if name.endswith(".webp"):
-                from PIL import Image
-
-                img = Image.open(BytesIO(raw))
-                buf = BytesIO()
-                img.save(buf, format="PNG")
-                raw = buf.getvalue()
-                mime = "image/png"
-            elif name.endswith(".jpg") or name.endswith(".jpeg"):
-                mime = "image/jpeg"
-            else:
-                mime = "image/png"
-            return f"data:{mime};base64,{base64.b64encode(raw).decode('ascii')}"
-        except Exception:
-            pass
-    return None
-
-
 def user_can_view_payroll(user):
     return user.role == RoleChoices.EXECUTIVE
 
@@ -1216,92 +843,21 @@ def payroll_view(request):
         start_of_week = end_of_week - timedelta(days=6)
 
     ne_payroll_users = sorted(
-        visible_users.filter(is_exempt=False).prefetch_related("schedules"),
+        visible_users.filter(is_exempt=False),
         key=_payroll_sort_key,
     )
-    ne_payroll_ids = [u.id for u in ne_payroll_users]
-    wk_ttl = getattr(django_settings, "WEEKLY_TOTALS_CACHE_SECONDS", 90)
-    wk_key = f"wt_pay_v1:{start_of_week}:{end_of_week}:{_user_ids_signature(ne_payroll_ids)}"
-    cached_pay = cache.get(wk_key)
-    if cached_pay is not None:
-        bulk_ids = [r["user_id"] for r in cached_pay]
-        um = CustomUser.objects.in_bulk(bulk_ids)
-        weekly_totals = []
-        for row in cached_pay:
-            u = um.get(row["user_id"])
-            if u is not None:
-                weekly_totals.append(
-                    (
-                        u,
-                        row["actual"],
-                        row["reported"],
-                        row["scheduled"],
-                        row["pto"],
-                        row["personal"],
-                    )
-                )
-    else:
-        entries_by_uid = defaultdict(list)
-        if ne_payroll_ids:
-            for e in TimeEntry.objects.filter(
-                user_id__in=ne_payroll_ids,
-                date__range=[start_of_week, end_of_week],
-            ):
-                entries_by_uid[e.user_id].append(e)
-
-        pto_by_uid = {}
-        if ne_payroll_ids:
-            for row in (
-                Occurrence.objects.filter(
-                    user_id__in=ne_payroll_ids,
-                    date__range=[start_of_week, end_of_week],
-                    pto_applied=True,
-                )
-                .exclude(subtype=OccurrenceSubtype.HOLIDAY_PAID)
-                .values("user_id")
-                .annotate(
-                    pto_sum=Sum("pto_hours_applied"),
-                    per_sum=Sum("personal_hours_applied"),
-                )
-            ):
-                pto_by_uid[row["user_id"]] = (
-                    float(row["pto_sum"] or 0),
-                    float(row["per_sum"] or 0),
-                )
-
-        weekly_totals = []
-        for u in ne_payroll_users:
-            total_actual = 0
-            total_reported = 0
-            for entry in entries_by_uid[u.id]:
-                if entry.clock_in and entry.clock_out:
-                    total_actual += entry.actual_worked_hours()
-                    total_reported += entry.payroll_credited_hours()
-            total_scheduled = effective_scheduled_hours_for_range(u, start_of_week, end_of_week)
-            pto_applied, personal_applied = pto_by_uid.get(u.id, (0.0, 0.0))
-            weekly_totals.append((
-                u,
-                round(total_actual, 2),
-                round(total_reported, 2),
-                round(total_scheduled, 2),
-                round(pto_applied, 2),
-                round(personal_applied, 2),
-            ))
-        cache.set(
-            wk_key,
-            [
-                {
-                    "user_id": row[0].id,
-                    "actual": row[1],
-                    "reported": row[2],
-                    "scheduled": row[3],
-                    "pto": row[4],
-                    "personal": row[5],
-                }
-                for row in weekly_totals
-            ],
-            wk_ttl,
-        )
+    totals_by_uid = weekly_user_totals(ne_payroll_users, end_of_week)
+    weekly_totals = []
+    for u in ne_payroll_users:
+        row = totals_by_uid[u.id]
+        weekly_totals.append((
+            u,
+            row.actual_hours,
+            row.reported_hours,
+            row.scheduled_hours,
+            row.pto_hours,
+            row.personal_hours,
+        ))
 
     alerts = []
     if user.role in [
@@ -1432,66 +988,6 @@ def payroll_user_breakdown(request):
     )
 
 
-def _fmt_csv_time(dt):
-    if not dt:
-        return ""
-    return django_tz.localtime(dt).strftime("%H:%M")
-
-
-def _fmt_time_only(t):
-    if not t:
-        return ""
-    return t.strftime("%H:%M")
-
-
-def _normalize_payroll_csv_row(row, n=8):
-    """Pad with empty strings or trim so spreadsheets that drop trailing empty columns still parse."""
-    out = []
-    for c in row:
-        if c is None:
-            cell = ""
-        else:
-            cell = str(c).strip().strip("\ufeff").strip()
-        out.append(cell)
-    if len(out) < n:
-        out.extend([""] * (n - len(out)))
-    elif len(out) > n:
-        out = out[:n]
-    return out
-
-
-def _parse_payroll_csv_date(value: str) -> Optional[date]:
-    """
-    Accept ISO YYYY-MM-DD (from our download) or US M/D/YYYY and M/D/YY (typical Excel CSV).
-    Strips Excel datetime suffix (e.g. '4/11/2026 12:00:00').
-    """
-    s = (value or "").strip().strip("\ufeff")
-    if not s:
-        return None
-    if " " in s:
-        s = s.split()[0]
-    try:
-        return date.fromisoformat(s)
-    except ValueError:
-        pass
-    m = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{4})$", s)
-    if m:
-        month, day, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
-        try:
-            return date(year, month, day)
-        except ValueError:
-            return None
-    m = re.match(r"^(\d{1,2})/(\d{1,2})/(\d{2})$", s)
-    if m:
-        month, day, y2 = int(m.group(1)), int(m.group(2)), int(m.group(3))
-        year = 2000 + y2 if y2 < 50 else 1900 + y2
-        try:
-            return date(year, month, day)
-        except ValueError:
-            return None
-    return None
-
-
 def _payroll_redirect_after_csv_upload(request, week_ending_date=None):
     """Keep the week the user was viewing when upload fails; on success pass the imported week."""
     base = reverse("attendance:payroll")
@@ -1509,45 +1005,15 @@ def _payroll_redirect_after_csv_upload(request, week_ending_date=None):
     return redirect(base)
 
 
-def _parse_csv_time_cell(value: str):
-    if value is None or not str(value).strip():
-        return None
-    s = str(value).strip()
-    for fmt in ("%H:%M", "%H:%M:%S", "%I:%M %p", "%I:%M:%S %p"):
-        try:
-            return datetime.strptime(s, fmt).time()
-        except ValueError:
-            continue
-    return None
-
-
-def _make_aware_on_date(d: date, t: time) -> datetime:
-    naive = datetime.combine(d, t)
-    return django_tz.make_aware(naive, django_tz.get_current_timezone())
-
+class _Echo:
+    """File-like object whose write() returns the line, for csv.writer over a streaming response."""
 
-def _clock_out_calendar_date(user, work_date: date, clock_in_t: Optional[time], clock_out_t: Optional[time]) -> date:
-    """
-    Calendar date for clock_out when importing HH:MM punches anchored on ``work_date``.
-
-    If the out time is at or before the in time on a 24h clock, the punch is the next calendar
-    morning (overnight shift). This must not depend on ``crosses_midnight`` being set correctly
-    on the user's schedule, or CSV imports store clock_out on the wrong day and both
-    ``actual_worked_hours`` and ``reported_worked_hours`` collapse to zero.
-    """
-    _ = user  # reserved for future schedule-aware import rules
-    if clock_out_t is None or clock_in_t is None:
-        return work_date
-    if clock_out_t <= clock_in_t:
-        return work_date + timedelta(days=1)
-    return work_date
+    def write(self, value):
+        return value
 
 
-def _delete_time_entry_payroll_import(user, work_date):
-    with transaction.atomic():
-        u = CustomUser.objects.select_for_update().get(pk=user.pk)
-        revert_tardy_occurrences_for_adjust_punch(u, work_date)
-    TimeEntry.objects.filter(user=user, date=work_date).delete()
+# Longest range the payroll template export accepts (a month plus a partial week either side).
+PAYROLL_TEMPLATE_MAX_WEEKS = 6
 
 
 @login_required
@@ -1556,6 +1022,9 @@ def payroll_schedule_csv_download(request):
     CSV: one row per employee per day — week_ending, payroll names, work_date,
     clock_in, lunch_out, lunch_in, clock_out (local HH:MM). Filled from existing
     TimeEntry or from default schedule when no entry exists.
+
+    Optional filters: ``through_week_ending`` (export every week from ``week_ending``
+    through that Saturday), ``department``, and ``supervisor_slug`` / ``supervisor_id``.
     """
     if not request.user.is_staff:
         return redirect("attendance:dashboard")
@@ -1570,50 +1039,46 @@ def payroll_schedule_csv_download(request):
         payroll_weeks_list = get_recent_saturdays(12)
         week_ending = payroll_weeks_list[0] if payroll_weeks_list else _week_ending_for_date(localdate())
 
-    week_start = week_ending - timedelta(days=6)
-    dates = [week_start + timedelta(days=i) for i in range(7)]
-
-    response = HttpResponse(content_type="text/csv; charset=utf-8")
-    response["Content-Disposition"] = (
-        f'attachment; filename="payroll_time_entries_{week_ending.isoformat()}.csv"'
-    )
-    writer = csv.writer(response)
-    writer.writerow(
-        [
-            "week_ending",
-            "payroll_lastname",
-            "payroll_firstname",
-            "work_date",
-            "clock_in",
-            "lunch_out",
-            "lunch_in",
-            "clock_out",
-        ]
-    )
-    users = sorted(
-        CustomUser.objects.filter(is_active=True, is_exempt=False),
-        key=_payroll_sort_key,
+    through_param = request.GET.get("through_week_ending")
+    through = week_ending
+    if through_param:
+        try:
+            through = date.fromisoformat(through_param)
+        except ValueError:
+            messages.error(request, "Invalid week for payroll.")
+            return redirect("attendance:payroll")
+        if through < week_ending:
+            messages.error(request, "The last week must not be before the first week.")
+            return _payroll_redirect_after_csv_upload(request, week_ending)
+    week_endings = []
+    we = week_ending
+    while we <= through:
+        week_endings.append(we)
+        we += timedelta(days=7)
+    if len(week_endings) > PAYROLL_TEMPLATE_MAX_WEEKS:
+        messages.error(request, f"Download at most {PAYROLL_TEMPLATE_MAX_WEEKS} weeks at a time.")
+        return _payroll_redirect_after_csv_upload(request, week_ending)
+
+    users_qs = CustomUser.objects.filter(is_active=True, is_exempt=False).prefetch_related("schedules")
+    department = (request.GET.get("department") or "").strip()
+    if department:
+        users_qs = users_qs.filter(department=department)
+    supervisor_slug = request.GET.get("supervisor_slug")
+    supervisor_id = request.GET.get("supervisor_id")
+    if supervisor_slug:
+        users_qs = users_qs.filter(supervisor=get_object_or_404(CustomUser, public_slug=supervisor_slug))
+    elif supervisor_id and supervisor_id.isdigit():
+        users_qs = users_qs.filter(supervisor_id=int(supervisor_id))
+    users = sorted(users_qs, key=_payroll_sort_key)
+
+    writer = csv.writer(_Echo())
+    rows = payroll_import.payroll_template_rows(users, week_endings)
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows),
+        content_type="text/csv; charset=utf-8",
     )
-    for u in users:
-        for d in dates:
-            row = [week_ending.isoformat(), u.payroll_lastname, u.payroll_firstname, d.isoformat()]
-            e = TimeEntry.objects.filter(user=u, date=d).first()
-            if e:
-                row += [
-                    _fmt_csv_time(e.clock_in),
-                    _fmt_csv_time(e.lunch_out),
-                    _fmt_csv_time(e.lunch_in),
-                    _fmt_csv_time(e.clock_out),
-                ]
-            else:
-                sug = suggested_punch_times_for_day(u, d)
-                row += [
-                    _fmt_time_only(sug["clock_in"]),
-                    _fmt_time_only(sug["lunch_out"]),
-                    _fmt_time_only(sug["lunch_in"]),
-                    _fmt_time_only(sug["clock_out"]),
-                ]
-            writer.writerow(row)
+    filename = payroll_import.payroll_template_filename(week_endings)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -1622,176 +1087,44 @@ def payroll_schedule_csv_download(request):
 def payroll_schedule_csv_upload(request):
     """
     Upload edited CSV: updates TimeEntry rows; empty punch times clears that day’s entry.
+    With ``dry_run`` the changes are listed for review instead of applied; the review page
+    posts the same CSV text back to apply it.
     """
     if not request.user.is_staff:
         return redirect("attendance:dashboard")
     f = request.FILES.get("time_entries_csv") or request.FILES.get("schedule_csv")
-    if not f:
-        messages.error(request, "Choose a CSV file to upload.")
-        return _payroll_redirect_after_csv_upload(request)
+    if f:
+        try:
+            raw = f.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            messages.error(request, "File must be UTF-8.")
+            return _payroll_redirect_after_csv_upload(request)
+    else:
+        raw = request.POST.get("time_entries_csv_text") or ""
+        if not raw.strip():
+            messages.error(request, "Choose a CSV file to upload.")
+            return _payroll_redirect_after_csv_upload(request)
 
     try:
-        raw = f.read().decode("utf-8-sig")
-    except UnicodeDecodeError:
-        messages.error(request, "File must be UTF-8.")
-        return _payroll_redirect_after_csv_upload(request)
-
-    reader = csv.reader(io.StringIO(raw))
-    rows = [r for r in reader if any((c or "").strip() for c in r)]
-    if len(rows) < 2:
-        messages.error(request, "CSV must include a header row and at least one data row.")
-        return _payroll_redirect_after_csv_upload(request)
-
-    header = [c.strip().lower().strip("\ufeff") for c in _normalize_payroll_csv_row(rows[0], 8)]
-    expected = [
-        "week_ending",
-        "payroll_lastname",
-        "payroll_firstname",
-        "work_date",
-        "clock_in",
-        "lunch_out",
-        "lunch_in",
-        "clock_out",
-    ]
-    if header != expected:
-        messages.error(
-            request,
-            "Header must be: week_ending, payroll_lastname, payroll_firstname, work_date, "
-            "clock_in, lunch_out, lunch_in, clock_out",
-        )
-        return _payroll_redirect_after_csv_upload(request)
-
-    week_peek = None
-    for row in rows[1:]:
-        if len(row) >= 1:
-            parsed = _parse_payroll_csv_date(row[0])
-            if parsed is not None:
-                week_peek = parsed
-                break
-    if week_peek and _is_payroll_week_finalized(week_peek):
-        messages.error(
+        parsed = payroll_import.parse_payroll_csv(raw)
+    except payroll_import.PayrollImportError as exc:
+        messages.error(request, exc.message)
+        return _payroll_redirect_after_csv_upload(request, exc.week_ending)
+
+    if request.POST.get("dry_run"):
+        plan = payroll_import.build_payroll_import_plan(parsed)
+        return render(
             request,
-            "That payroll week is finalized. Unfinalize before importing time entries.",
+            "attendance/payroll_import_preview.html",
+            {"plan": plan, "csv_text": raw, "week_ending": parsed.week_ending},
         )
-        return _payroll_redirect_after_csv_upload(request, week_peek)
-
-    users_list = list(CustomUser.objects.filter(is_active=True, is_exempt=False))
-
-    def _match_user(ln: str, fn: str):
-        ln_k = (ln or "").strip().casefold()
-        fn_k = (fn or "").strip().casefold()
-        matches = []
-        for u in users_list:
-            u_ln = (u.payroll_lastname or u.last_name or "").strip().casefold()
-            u_fn = (u.payroll_firstname or u.first_name or "").strip().casefold()
-            if u_ln == ln_k and u_fn == fn_k:
-                matches.append(u)
-        return matches
-
-    week_ending_ref = None
-    applied = 0
-    deleted = 0
-
-    with transaction.atomic():
-        for row in rows[1:]:
-            row = _normalize_payroll_csv_row(row, 8)
-            we = _parse_payroll_csv_date(row[0])
-            wd = _parse_payroll_csv_date(row[3])
-            if we is None or wd is None:
-                messages.error(
-                    request,
-                    "Invalid date in row; use YYYY-MM-DD or M/D/YYYY as exported from Excel. "
-                    f"Got week_ending={row[0]!r}, work_date={row[3]!r}",
-                )
-                transaction.set_rollback(True)
-                return _payroll_redirect_after_csv_upload(request)
-
-            if week_ending_ref is None:
-                week_ending_ref = we
-            elif we != week_ending_ref:
-                messages.error(request, "All rows must use the same week_ending.")
-                transaction.set_rollback(True)
-                return _payroll_redirect_after_csv_upload(request)
-
-            if wd < week_ending_ref - timedelta(days=6) or wd > week_ending_ref:
-                messages.error(
-                    request,
-                    f"work_date {wd} is outside the week ending {week_ending_ref}.",
-                )
-                transaction.set_rollback(True)
-                return _payroll_redirect_after_csv_upload(request)
-
-            matches = _match_user(row[1], row[2])
-            if len(matches) != 1:
-                messages.error(
-                    request,
-                    f"No unique active employee for payroll name {row[1]!r}, {row[2]!r}.",
-                )
-                transaction.set_rollback(True)
-                return _payroll_redirect_after_csv_upload(request)
-            u = matches[0]
-
-            ci = _parse_csv_time_cell(row[4])
-            lo = _parse_csv_time_cell(row[5])
-            li = _parse_csv_time_cell(row[6])
-            co = _parse_csv_time_cell(row[7])
-
-            if not any([ci, lo, li, co]):
-                if TimeEntry.objects.filter(user=u, date=wd).exists():
-                    _delete_time_entry_payroll_import(u, wd)
-                    deleted += 1
-                continue
-
-            if not ci or not co:
-                messages.error(
-                    request,
-                    f"clock_in and clock_out are required when entering any punches on {wd} "
-                    f"for {u.payroll_display_name()}.",
-                )
-                transaction.set_rollback(True)
-                return _payroll_redirect_after_csv_upload(request)
-
-            cin = _make_aware_on_date(wd, ci)
-            lo_a = _make_aware_on_date(wd, lo) if lo else None
-            li_a = _make_aware_on_date(wd, li) if li else None
-            co_date = _clock_out_calendar_date(u, wd, ci, co)
-            cout = _make_aware_on_date(co_date, co)
-            # Belt-and-suspenders: if out still not after in (DST / edge / stale schedule), bump one day.
-            if cout <= cin:
-                cout = cout + timedelta(days=1)
-
-            entry, _ = TimeEntry.objects.get_or_create(user=u, date=wd, defaults={})
-            entry.clock_in = cin
-            entry.lunch_out = lo_a
-            entry.lunch_in = li_a
-            entry.clock_out = cout
-            entry.clock_in_override_denied = False
-            entry.clock_in_early_override_denied = False
-            entry.clock_in_authorized_by = None
-            entry.clock_in_early_authorized_by = None
-            entry.payroll_lunch_review_required = False
-            if lo is None and li is None:
-                if (
-                    get_scheduled_lunch_out_for_day(u, wd)
-                    and get_scheduled_lunch_in_for_day(u, wd)
-                    and not clock_in_at_or_after_scheduled_lunch_in(u, wd, cin)
-                ):
-                    entry.payroll_lunch_review_required = True
-            entry.save()
-            sync_tardy_occurrences_for_time_entry(entry)
-            applied += 1
-
-    if week_ending_ref is None:
-        messages.error(request, "No data rows.")
-        return _payroll_redirect_after_csv_upload(request)
 
+    plan = payroll_import.apply_payroll_import(parsed)
     messages.success(
         request,
-        f"Imported time entries for week ending {week_ending_ref}: {applied} row(s) saved, "
-        f"{deleted} day(s) cleared.",
+        f"Imported time entries for week ending {parsed.week_ending}: {plan.summary()}.",
     )
-    _invalidate_payroll_weekly_totals_cache(week_ending_ref)
-    return _payroll_redirect_after_csv_upload(request, week_ending_ref)
+    return _payroll_redirect_after_csv_upload(request, parsed.week_ending)
 
 
 def _clear_stale_payroll_lunch_review_flags(week_start: date, week_ending: date) -> None:
@@ -1810,7 +1143,9 @@ def _clear_stale_payroll_lunch_review_flags(week_start: date, week_ending: date)
                 payroll_lunch_review_required=False,
                 lunch_out=None,
                 lunch_in=None,
+                calc_version=0,
             )
+            invalidate_weekly_user_totals_for_dates(entry.user_id, [entry.date])
 
 
 def _apply_payroll_lunch_disposition(entry, disp: str, approver) -> None:
@@ -1845,7 +1180,9 @@ def _apply_payroll_lunch_disposition(entry, disp: str, approver) -> None:
             lunch_out=None,
             lunch_in=None,
             payroll_lunch_review_required=False,
+            calc_version=0,
         )
+        invalidate_weekly_user_totals_for_dates(entry.user_id, [entry.date])
         entry.refresh_from_db()
         sync_tardy_occurrences_for_time_entry(entry)
 
@@ -2067,22 +1404,27 @@ def close_payroll(request):
             TimeEntry.objects.filter(id__in=approve_unscheduled_ids).update(
                 clock_in_authorized_by=request.user,
                 clock_in_override_denied=False,
+                calc_version=0,
             )
         if approve_early_ids:
             TimeEntry.objects.filter(id__in=approve_early_ids).update(
                 clock_in_early_authorized_by=request.user,
                 clock_in_early_override_denied=False,
+                calc_version=0,
             )
         if deny_unscheduled_ids:
             TimeEntry.objects.filter(id__in=deny_unscheduled_ids).update(
                 clock_in_authorized_by=None,
                 clock_in_override_denied=True,
+                calc_version=0,
             )
         if deny_early_ids:
             TimeEntry.objects.filter(id__in=deny_early_ids).update(
                 clock_in_early_authorized_by=None,
                 clock_in_early_override_denied=True,
+                calc_version=0,
             )
+        invalidate_weekly_user_totals(week_endings=[week_ending])
         remaining = attendance_engine.entries_requiring_clock_in_override(week_start, week_ending)
         if remaining:
             messages.error(
@@ -2159,69 +1501,35 @@ def close_payroll(request):
     else:
         messages.info(request, "This payroll period is already finalized. CSV exported for records.")
 
-    response = HttpResponse(content_type='text/csv')
-    filename = f"payroll_week_ending_{week_ending.strftime('%Y-%m-%d')}.csv"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return _payroll_close_csv_response(week_ending)
 
-    writer = csv.writer(response)
-    users = sorted(
-        CustomUser.objects.filter(is_active=True, is_exempt=False),
-        key=_payroll_sort_key,
-    )
-    total_worked_all = 0.0
-    total_overtime_all = 0.0
-    total_pto_all = 0.0
-    total_holiday_all = 0.0
-    for user in users:
-        entries = TimeEntry.objects.filter(user=user, date__range=[week_start, week_ending])
-        total_worked_hours = 0
-        for e in entries:
-            if e.clock_in and e.clock_out:
-                total_worked_hours += e.payroll_credited_hours()
-
-        pto_occurrences = Occurrence.objects.filter(
-            user=user,
-            date__range=[week_start, week_ending],
-            pto_applied=True,
-        ).exclude(subtype=OccurrenceSubtype.HOLIDAY_PAID)
-        # "Applied PTO" should only include PTO deducted, not total occurrence hours.
-        pto_hours = sum(o.pto_hours_applied for o in pto_occurrences)
 
-        holiday_occurrences = Occurrence.objects.filter(
-            user=user,
-            date__range=[week_start, week_ending],
-            subtype=OccurrenceSubtype.HOLIDAY_PAID,
-        )
-        holiday_hours = sum(o.duration_hours for o in holiday_occurrences)
-
-        worked_hours_capped = min(total_worked_hours, 40)
-        overtime = max(total_worked_hours - 40, 0)
-        total_worked_all += worked_hours_capped
-        total_overtime_all += overtime
-        total_pto_all += pto_hours
-        total_holiday_all += holiday_hours
-        writer.writerow(
-            [
-                user.payroll_last_name_for_display() or "",
-                user.payroll_first_name_for_display() or "",
-                round(worked_hours_capped, 2),
-                round(overtime, 2),
-                round(pto_hours, 2),
-                round(holiday_hours, 2),
-            ]
-        )
+@login_required
+def payroll_close_csv_download(request):
+    """Re-download the close CSV for a finalized payroll week without re-running close."""
+    if not request.user.is_staff:
+        return redirect("attendance:dashboard")
+    try:
+        week_ending = date.fromisoformat(request.GET.get("week_ending"))
+    except (TypeError, ValueError):
+        messages.error(request, "Invalid week selected.")
+        return redirect("attendance:payroll")
+    period = get_object_or_404(PayrollPeriod, week_ending=week_ending)
+    if not period.is_finalized:
+        messages.info(request, "That payroll period is not finalized.")
+        return redirect(f"{reverse('attendance:payroll')}?week_ending={week_ending.isoformat()}")
+    return _payroll_close_csv_response(week_ending)
 
-    writer.writerow(
-        [
-            "",
-            "",
-            round(total_worked_all, 2),
-            round(total_overtime_all, 2),
-            round(total_pto_all, 2),
-            round(total_holiday_all, 2),
-        ]
-    )
 
+def _payroll_close_csv_response(week_ending: date):
+    writer = csv.writer(_Echo())
+    rows = payroll_export.payroll_csv_rows(payroll_export.payroll_csv_users(week_ending), week_ending)
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows),
+        content_type="text/csv",
+    )
+    filename = payroll_export.payroll_csv_filename(week_ending)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -2280,9 +1588,7 @@ def edit_entry(request, slug):
         if form.is_valid():
             entry = form.save()
             if not _is_payroll_week_finalized(week_ending):
-                from timeclock.tardy_sync import sync_tardy_occurrences_for_time_entry
-
-                sync_tardy_occurrences_for_time_entry(entry)
+                enqueue_tardy_sync_for_entry(entry)
             return redirect("attendance:payroll" if _payroll_ok else "attendance:dashboard")
     else:
         form = TimeEntryForm(instance=entry)
@@ -2295,6 +1601,7 @@ def edit_entry(request, slug):
 
 @login_required
 def generate_report_pdf(request):
+    """Queue the individual or group absence PDF and send the user to its status page."""
     if not user_can_view_reports(request.user):
         return redirect("attendance:dashboard")
 
@@ -2306,153 +1613,26 @@ def generate_report_pdf(request):
 
     start_date = form.cleaned_data["start_date"]
     end_date = form.cleaned_data["end_date"]
-    subtype_filters = form.cleaned_data.get("subtype_filter") or []
-    planned_filter = form.cleaned_data.get("planned_filter") or ReportFilterForm.PLANNED_FILTER_ALL
+    params = {
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "subtype_filters": sorted(form.cleaned_data.get("subtype_filter") or []),
+        "planned_filter": form.cleaned_data.get("planned_filter") or ReportFilterForm.PLANNED_FILTER_ALL,
+    }
     report_mode = form.cleaned_data.get("report_mode") or ReportFilterForm.REPORT_MODE_INDIVIDUAL
-    logo_uri = _report_logo_data_uri()
-    _subtype_labels = dict(OccurrenceSubtype.choices)
-    subtype_filter_label = (
-        "All absence types"
-        if not subtype_filters
-        else ", ".join(_subtype_labels.get(s, s) for s in subtype_filters)
-    )
-    planned_filter_label = _planned_filter_label(planned_filter)
 
     if report_mode == ReportFilterForm.REPORT_MODE_GROUP:
-        group_by = form.cleaned_data.get("report_group_by") or "department"
-        group_by_label = dict(ReportFilterForm.REPORT_GROUP_BY_CHOICES).get(group_by, group_by)
-        occ_qs = Occurrence.objects.filter(
-            user__in=visible_users,
-            date__range=(start_date, end_date),
-        ).select_related("user", "user__supervisor", "user__group_lead")
-        occ_qs = _filter_occurrences_for_report(
-            occ_qs, subtype_filters=subtype_filters, planned_filter=planned_filter
-        )
-        group_rows = _aggregate_group_absence_report_rows(list(occ_qs), group_by)
-        pie_hours_uri, pie_records_uri = group_report_pie_pair_uris(group_rows, profile="pdf")
-        distinct_user_ids = set(occ_qs.values_list("user_id", flat=True))
-        grand = {
-            "occurrence_count": sum(r["occurrence_count"] for r in group_rows),
-            "unique_employees": len(distinct_user_ids),
-            "total_hours": sum(r["total_hours"] for r in group_rows),
-            "pto_applied": sum(r["pto_applied"] for r in group_rows),
-            "personal_applied": sum(r["personal_applied"] for r in group_rows),
-        }
-
-        template = get_template("attendance/report_group_pdf_template.html")
-        html = template.render(
-            {
-                "start": start_date,
-                "end": end_date,
-                "logo_uri": logo_uri,
-                "group_by_label": group_by_label,
-                "subtype_filter_label": subtype_filter_label,
-                "planned_filter_label": planned_filter_label,
-                "group_rows": group_rows,
-                "grand": grand,
-                "pie_hours_uri": pie_hours_uri,
-                "pie_records_uri": pie_records_uri,
-            }
-        )
-        response = HttpResponse(content_type="application/pdf")
-        fname = f"group_absence_{start_date.isoformat()}_{end_date.isoformat()}.pdf"
-        response["Content-Disposition"] = f'attachment; filename="{fname}"'
-        pisa.CreatePDF(html, dest=response)
-        return response
+        params["group_by"] = form.cleaned_data.get("report_group_by") or "department"
+        params["user_ids"] = sorted(visible_users.values_list("pk", flat=True))
+        job = report_jobs.submit_report(ReportJobKind.GROUP_ABSENCE, params, request.user)
+        return redirect("attendance:report_job", slug=job.slug)
 
     user = form.cleaned_data["user"]
     if not visible_users.filter(pk=user.pk).exists():
         return redirect("attendance:dashboard")
-
-    occurrences = Occurrence.objects.filter(
-        user=user, date__range=(start_date, end_date)
-    ).order_by("date")
-    occurrences = _filter_occurrences_for_report(
-        occurrences, subtype_filters=subtype_filters, planned_filter=planned_filter
-    )
-
-    # Ensure current balance reflects any occurrences that became due.
-    apply_past_due_occurrences(user)
-    user.refresh_from_db()
-
-    fmla_st = ABSENCE_REPORT_FMLA_SUBTYPE
-    leave_no_personal = ABSENCE_REPORT_LEAVE_AND_NO_PERSONAL_SUBTYPES
-
-    occurrences_fmla = occurrences.filter(subtype=fmla_st)
-    occurrences_leave_group = occurrences.filter(subtype__in=leave_no_personal)
-    occurrences_main = occurrences.exclude(subtype=fmla_st).exclude(subtype__in=leave_no_personal)
-
-    # PTO/Personal used (headline): main bucket only — excludes FMLA and leave/no-personal subtypes
-    pto_using_main = Occurrence.objects.filter(
-        user=user,
-        date__range=(start_date, end_date),
-        pto_applied=True,
-    ).exclude(subtype=OccurrenceSubtype.HOLIDAY_PAID).exclude(subtype=fmla_st).exclude(
-        subtype__in=leave_no_personal
-    )
-    pto_using_main = _filter_occurrences_for_report(
-        pto_using_main, subtype_filters=subtype_filters, planned_filter=planned_filter
-    )
-    pto_used = sum(o.pto_hours_applied for o in pto_using_main)
-    personal_used = sum(o.personal_hours_applied for o in pto_using_main)
-    legacy_hours = sum(
-        o.duration_hours
-        for o in pto_using_main
-        if o.pto_hours_applied == 0 and o.personal_hours_applied == 0 and o.duration_hours
-    )
-    if legacy_hours and pto_used == 0 and personal_used == 0:
-        pto_used = legacy_hours
-
-    grace_pg = occurrences_main.aggregate(t=Sum("probation_grace_hours_applied"))["t"] or 0
-    if grace_pg:
-        grace_time_used = float(grace_pg)
-    else:
-        grace_time_used = float(
-            occurrences_main.filter(subtype=OccurrenceSubtype.GRACE_TIME).aggregate(
-                t=Sum("duration_hours")
-            )["t"]
-            or 0
-        )
-
-    fmla_hours_agg = occurrences_fmla.aggregate(t=Sum("duration_hours"))
-    fmla_used_hours = float(fmla_hours_agg["t"] or 0)
-    fmla_pto_agg = occurrences_fmla.filter(pto_applied=True).aggregate(t=Sum("pto_hours_applied"))
-    fmla_pto_applied_total = float(fmla_pto_agg["t"] or 0)
-
-    leave_group_hours_agg = occurrences_leave_group.aggregate(t=Sum("duration_hours"))
-    leave_group_total_hours = float(leave_group_hours_agg["t"] or 0)
-    leave_group_pto_agg = occurrences_leave_group.filter(pto_applied=True).aggregate(
-        t=Sum("pto_hours_applied")
-    )
-    leave_group_pto_applied_total = float(leave_group_pto_agg["t"] or 0)
-
-    template = get_template("attendance/report_pdf_template.html")
-    html = template.render(
-        {
-            "user": user,
-            "occurrences_main": occurrences_main,
-            "occurrences_fmla": occurrences_fmla,
-            "occurrences_leave_group": occurrences_leave_group,
-            "start": start_date,
-            "end": end_date,
-            "logo_uri": logo_uri,
-            "pto_used": pto_used,
-            "personal_used": personal_used,
-            "pto_remaining": user.pto_balance,
-            "fmla_used_hours": fmla_used_hours,
-            "fmla_pto_applied_total": fmla_pto_applied_total,
-            "grace_time_used": grace_time_used,
-            "leave_group_total_hours": leave_group_total_hours,
-            "leave_group_pto_applied_total": leave_group_pto_applied_total,
-            "has_fmla_rows": occurrences_fmla.exists(),
-            "has_leave_group_rows": occurrences_leave_group.exists(),
-            "subtype_filter_note": _report_filter_note(subtype_filters, subtype_filter_label, planned_filter),
-        }
-    )
-    response = HttpResponse(content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename="{user.username}_report.pdf"'
-    pisa.CreatePDF(html, dest=response)
-    return response
+    params["user_id"] = user.pk
+    job = report_jobs.submit_report(ReportJobKind.ABSENCE, params, request.user)
+    return redirect("attendance:report_job", slug=job.slug)
 
 
 @login_required
@@ -2488,63 +1668,33 @@ def perfect_attendance_pdf(request):
         return redirect("attendance:dashboard")
 
     pa_period_end = min(pa_last, today)
-    if pa_period_end < pa_last:
-        pa_period_description = (
-            f"{pa_first:%B %d} – {pa_period_end:%B %d, %Y} (month to date)"
-        )
-    else:
-        pa_period_description = f"{pa_first:%B %Y}"
+    params = {
+        "year": pa_year,
+        "month": pa_month,
+        "period_end": pa_period_end.isoformat(),
+        "month_to_date": pa_period_end < pa_last,
+        "generated_on": today.isoformat(),
+        "show_hours": request_user.role == RoleChoices.EXECUTIVE,
+    }
+    job = report_jobs.submit_report(ReportJobKind.PERFECT_ATTENDANCE, params, request_user)
+    return redirect("attendance:report_job", slug=job.slug)
 
-    perfect_attendance_rows = _perfect_attendance_with_hours(
-        _perfect_attendance_candidate_users(), pa_first, pa_period_end
-    )
-    pa_hours_total = sum(r["total_hours"] for r in perfect_attendance_rows)
-
-    static_dirs = getattr(settings, "STATICFILES_DIRS", []) or []
-    static_root = Path(static_dirs[0]) if static_dirs else Path(settings.BASE_DIR) / "static"
-    img_dir = static_root / "img"
-    logo_uri = None
-    for name in ("pdfimage.jpg", "logo.webp", "logo.png"):
-        logo_path = img_dir / name
-        if not logo_path.exists():
-            continue
-        try:
-            raw = logo_path.read_bytes()
-            if name.endswith(".webp"):
-                from PIL import Image
-
-                img = Image.open(BytesIO(raw))
-                buf = BytesIO()
-                img.save(buf, format="PNG")
-                raw = buf.getvalue()
-                mime = "image/png"
-            elif name.endswith(".jpg") or name.endswith(".jpeg"):
-                mime = "image/jpeg"
-            else:
-                mime = "image/png"
-            b64 = base64.b64encode(raw).decode("ascii")
-            logo_uri = f"data:{mime};base64,{b64}"
-        except Exception:
-            logo_uri = None
-        break
-
-    template = get_template("attendance/perfect_attendance_pdf.html")
-    show_pa_hours = request_user.role == RoleChoices.EXECUTIVE
-    html = template.render(
-        {
-            "logo_uri": logo_uri,
-            "period_description": pa_period_description,
-            "rows": perfect_attendance_rows,
-            "pa_hours_total": pa_hours_total,
-            "generated_at": today,
-            "show_perfect_attendance_hours": show_pa_hours,
-        }
-    )
-    response = HttpResponse(content_type="application/pdf")
-    fname = f"perfect_attendance_{pa_year}_{pa_month:02d}.pdf"
-    response["Content-Disposition"] = f'attachment; filename="{fname}"'
-    pisa.CreatePDF(html, dest=response)
-    return response
+
+@login_required
+def report_job(request, slug):
+    """Status page for a queued PDF report; reloads itself until the PDF is ready."""
+    job = get_object_or_404(ReportJob, slug=slug, requested_by=request.user)
+    return render(request, "attendance/report_job.html", {"job": job})
+
+
+@login_required
+def report_job_download(request, slug):
+    job = get_object_or_404(ReportJob, slug=slug, requested_by=request.user, status=ReportJobStatus.DONE)
+    try:
+        fh = job.pdf.open("rb")
+    except FileNotFoundError:
+        raise Http404("This report is no longer stored; request it again.")
+    return FileResponse(fh, as_attachment=True, filename=job.filename, content_type="application/pdf")
 
 
 @login_required
@@ -2597,51 +1747,25 @@ def team_time_off_requests(request):
     """
     approver = request.user
 
-    if approver.role not in [
-        RoleChoices.GROUP_LEAD,
-        RoleChoices.SUPERVISOR,
-        RoleChoices.MANAGER,
-        RoleChoices.EXECUTIVE,
-    ]:
+    if approver.role not in approvals.APPROVER_ROLES:
         return redirect("attendance:dashboard")
 
-    pending = TimeOffRequest.objects.filter(status=TimeOffRequestStatus.PENDING)
-    # Filter to only those the current user can approve
-    manageable = [r.id for r in pending if can_approve_time_off(approver, r.user)]
-    pending = pending.filter(id__in=manageable)
-
-    pending_wtl = WorkThroughLunchRequest.objects.filter(status=TimeOffRequestStatus.PENDING)
-    manageable_wtl = [r.id for r in pending_wtl if can_approve_time_off(approver, r.user)]
-    pending_wtl = pending_wtl.filter(id__in=manageable_wtl).select_related("user")
-
-    pending_adjust = AdjustPunchRequest.objects.filter(status=TimeOffRequestStatus.PENDING)
-    manageable_adj = [r.id for r in pending_adjust if can_approve_time_off(approver, r.user)]
-    pending_adjust = pending_adjust.filter(id__in=manageable_adj).select_related("user", "time_entry")
-
-    # For each pending request, surface overlapping approved requests so approvers
-    # can see who else is already out in the same timeframe.
-    for req in pending:
-        overlapping_other = (
-            TimeOffRequest.objects.filter(
-                status__in=[TimeOffRequestStatus.APPROVED, TimeOffRequestStatus.PENDING],
-                start_date__lte=req.end_date,
-                end_date__gte=req.start_date,
-            )
-            .exclude(pk=req.pk)
-            .exclude(user=req.user)
-            .select_related("user")
-            .order_by("start_date", "user__last_name", "user__first_name")
-        )
-        req.other_requests_display = [
-            f"{o.user.payroll_display_name()} ({o.start_date} - {o.end_date}) [{o.status.upper()}]"
-            for o in overlapping_other
-        ]
+    pending = approvals.pending_for_approver(TimeOffRequest, approver).select_related("user")
+    pending_wtl = approvals.pending_for_approver(WorkThroughLunchRequest, approver).select_related("user")
+    pending_adjust = approvals.pending_for_approver(AdjustPunchRequest, approver).select_related(
+        "user", "time_entry"
+    )
+
+    # Surface overlapping approved/pending requests so approvers can see who else is already
+    # out in the same timeframe, plus a per-day out count for their team.
+    pending, coverage = time_off_overlap.pending_time_off_with_overlaps(approver, pending)
 
     return render(
         request,
         "attendance/team_time_off_requests.html",
         {
             "pending_requests": pending,
+            "team_coverage": coverage,
             "pending_work_through_lunch": pending_wtl,
             "pending_adjust_punch": pending_adjust,
         },
@@ -2928,13 +2052,10 @@ def approve_adjust_punch(request, slug):
 
     try:
         with transaction.atomic():
-            u = CustomUser.objects.select_for_update().get(pk=apr.user_id)
-            revert_tardy_occurrences_for_adjust_punch(u, apr.time_entry.date)
             entry = TimeEntry.objects.select_for_update().get(pk=apr.time_entry_id)
             setattr(entry, apr.punch_field, apr.requested_at)
             entry.save()
-            if apr.punch_field == AdjustPunchField.CLOCK_IN:
-                entry.check_tardy()
+            enqueue_tardy_sync_for_entry(entry)
             apr.approver = approver
             apr.status = TimeOffRequestStatus.APPROVED
             apr.save()
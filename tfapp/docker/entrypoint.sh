@@ -29,7 +29,10 @@ else:
 PY
 fi
 
-echo "Running migrations..."
-python manage.py migrate --noinput
+# Only the web container migrates; workers set DJANGO_SKIP_MIGRATIONS=1 so they never race it.
+if [ "${DJANGO_SKIP_MIGRATIONS:-0}" != "1" ]; then
+  echo "Running migrations..."
+  python manage.py migrate --noinput
+fi
 
 exec "$@"
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Stand-in kiosk client for the batch punch API (/timeclock/api/punches/).
+
+Each scan is appended to a local buffer (JSON lines) with an idempotency key and the kiosk's
+scan time, then the buffer is flushed in batches. Anything the server did not answer stays
+buffered and is sent again on the next flush. Replays are safe because the server keys
+every punch. Standard library only, so it runs on a bare Raspberry Pi image.
+
+Usage:
+    kiosk_punch_client.py --url https://tf.example.com --token <kiosk token> scan 1234 clock_in
+    kiosk_punch_client.py --url https://tf.example.com --token <kiosk token> flush
+    kiosk_punch_client.py --buffer kiosk_buffer.jsonl status
+    kiosk_punch_client.py --url ... --token ... run      # read "<login> <action>" lines from stdin
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+
+ACTIONS = ("clock_in", "lunch_out", "lunch_in", "clock_out")
+PAGE_PATH = "/timeclock/"
+BATCH_PATH = "/timeclock/api/punches/"
+
+
+class PunchBuffer:
+    """Append-only local spool of scans not yet answered by the server."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def pending(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def scan(self, login, action, at=None):
+        if action not in ACTIONS:
+            raise ValueError(f"action must be one of {', '.join(ACTIONS)}")
+        punch = {
+            "key": uuid.uuid4().hex,
+            "login": login,
+            "action": action,
+            "at": (at or datetime.now(timezone.utc)).isoformat(),
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(punch) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return punch
+
+    def replace(self, punches):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for p in punches:
+                f.write(json.dumps(p) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class KioskSession:
+    """Cookie-holding HTTP session: kiosk cookie from ?kiosk=<token>, CSRF cookie from the page."""
+
+    def __init__(self, base_url, token=None, timeout=10.0):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+        self._csrf = None
+
+    def _connect(self):
+        url = self.base_url + PAGE_PATH
+        if self.token:
+            url += "?" + urllib.parse.urlencode({"kiosk": self.token})
+        self.opener.open(url, timeout=self.timeout).read()
+        self._csrf = next((c.value for c in self.cookies if c.name == "csrftoken"), "")
+
+    def post_batch(self, punches):
+        if self._csrf is None:
+            self._connect()
+        request = urllib.request.Request(
+            self.base_url + BATCH_PATH,
+            data=json.dumps({"punches": punches}).encode(),
+            headers={
+                "Content-Type": "application/json",
+                "X-CSRFToken": self._csrf,
+                "Referer": self.base_url + PAGE_PATH,
+            },
+            method="POST",
+        )
+        with self.opener.open(request, timeout=self.timeout) as response:
+            return json.loads(response.read())["results"]
+
+
+def flush(buffer, session, batch_size=100, out=sys.stdout):
+    """
+    Send buffered punches oldest first. Answered punches (recorded or rejected) leave the
+    buffer; on a network or server error the rest stay for the next flush. Returns the results.
+    """
+    pending = buffer.pending()
+    answered = []
+    try:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start : start + batch_size]
+            results = session.post_batch(batch)
+            answered.extend(results)
+            buffer.replace(pending[start + len(batch) :])
+    except (urllib.error.URLError, OSError, ValueError, KeyError) as exc:
+        print(f"Server unavailable ({exc}); {len(buffer.pending())} punches kept for retry.", file=out)
+    for r in answered:
+        note = " (replayed)" if r["replayed"] else ""
+        detail = f": {r['message']}" if r["status"] != "recorded" else ""
+        print(f"{r['key']} {r['status']}{note}{detail}", file=out)
+    return answered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of the timeclock server.")
+    parser.add_argument("--token", help="Kiosk token (omit when this kiosk is registered by IP).")
+    parser.add_argument("--buffer", default="kiosk_buffer.jsonl", help="Local punch buffer file.")
+    parser.add_argument("--batch-size", type=int, default=100)
+    sub = parser.add_subparsers(dest="command", required=True)
+    scan = sub.add_parser("scan", help="Buffer one scan, then try to flush.")
+    scan.add_argument("login")
+    scan.add_argument("action", choices=ACTIONS)
+    sub.add_parser("flush", help="Send everything buffered.")
+    sub.add_parser("status", help="Show how many punches are buffered.")
+    sub.add_parser("run", help='Read "<login> <action>" lines from stdin; flush after each.')
+    args = parser.parse_args(argv)
+
+    buffer = PunchBuffer(args.buffer)
+    if args.command == "status":
+        print(f"{len(buffer.pending())} punches buffered in {args.buffer}.")
+        return 0
+    if not args.url:
+        parser.error("--url is required to send punches")
+    session = KioskSession(args.url, args.token)
+    if args.command == "scan":
+        buffer.scan(args.login, args.action)
+    elif args.command == "run":
+        for line in sys.stdin:
+            parts = line.split()
+            if len(parts) != 2 or parts[1] not in ACTIONS:
+                print(f"Expected '<login> <action>', got {line.strip()!r}", file=sys.stderr)
+                continue
+            buffer.scan(*parts)
+            flush(buffer, session, args.batch_size)
+        return 0
+    flush(buffer, session, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
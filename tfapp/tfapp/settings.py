@@ -69,7 +69,9 @@ if os.environ.get("DJANGO_SECURE_PROXY_SSL_HEADER", "").lower() in ("1", "true",
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
 # --- Sessions: 1.5 hours of inactivity (sliding expiry on each request) ---
-SESSION_ENGINE = "django.contrib.sessions.backends.db"
+# DJANGO_SESSION_ENGINE may be ...cached_db (reads from CACHES) or ...signed_cookies (no session
+# table); MAX_SESSIONS_PER_USER holds for all of them (accounts.session_utils).
+SESSION_ENGINE = os.environ.get("DJANGO_SESSION_ENGINE", "django.contrib.sessions.backends.db")
 SESSION_COOKIE_AGE = int(os.environ.get("SESSION_COOKIE_AGE", str(90 * 60)))
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = "Lax"
@@ -77,6 +79,9 @@ SESSION_COOKIE_SAMESITE = "Lax"
 SESSION_SAVE_EVERY_REQUEST = _env_bool("DJANGO_SESSION_SAVE_EVERY_REQUEST", True)
 # Max simultaneous browser sessions per user (oldest invalidated when exceeded).
 MAX_SESSIONS_PER_USER = int(os.environ.get("DJANGO_MAX_SESSIONS_PER_USER", "3"))
+# Sessions already tracked are confirmed from CACHES for this long instead of a UserSession query.
+# A trimmed session stays usable in other workers at most this long (with a per-process cache).
+SESSION_TRACKING_CACHE_SECONDS = int(os.environ.get("DJANGO_SESSION_TRACKING_CACHE_SECONDS", "300"))
 
 CACHES = {
     "default": {
@@ -92,13 +97,46 @@ ABSENTEEISM_CHART_CACHE_SECONDS = int(
     os.environ.get("DJANGO_ABSENTEEISM_CHART_CACHE_SECONDS", str(60 * 60))
 )
 
-# Perfect Attendance table on dashboard (expensive); cache serialized rows per month/period.
+# Perfect Attendance results for an open month (PerfectAttendanceResult rows) are recomputed on
+# read once older than this. Finalized months are never recomputed.
 PERFECT_ATTENDANCE_CACHE_SECONDS = int(
     os.environ.get("DJANGO_PERFECT_ATTENDANCE_CACHE_SECONDS", str(10 * 60))
 )
 
-# Dashboard + payroll weekly summary row (same computation); short TTL keeps punches fresh.
-WEEKLY_TOTALS_CACHE_SECONDS = int(os.environ.get("DJANGO_WEEKLY_TOTALS_CACHE_SECONDS", "90"))
+# Pending-approval badge counts per approver. Request saves/deletes invalidate them; this TTL
+# only bounds staleness after org-chart edits made outside the user admin.
+PENDING_APPROVAL_COUNTS_CACHE_SECONDS = int(
+    os.environ.get("DJANGO_PENDING_APPROVAL_COUNTS_CACHE_SECONDS", "300")
+)
+
+# Kiosk punch hot path. Active kiosk IPs/tokens are cached per process and finalized payroll
+# weeks in CACHES; local saves clear both, these TTLs bound staleness in other workers.
+TIMECLOCK_KIOSK_CACHE_SECONDS = int(os.environ.get("DJANGO_TIMECLOCK_KIOSK_CACHE_SECONDS", "60"))
+FINALIZED_WEEKS_CACHE_SECONDS = int(os.environ.get("DJANGO_FINALIZED_WEEKS_CACHE_SECONDS", "60"))
+# Buffered kiosk scans older than this are refused (badge punches carry no PIN); long enough
+# to cover a weekend outage. Older punches go through adjust-punch requests.
+TIMECLOCK_KIOSK_MAX_SCAN_AGE_HOURS = int(os.environ.get("DJANGO_TIMECLOCK_KIOSK_MAX_SCAN_AGE_HOURS", "72"))
+
+# Punch writes (CSV import, entry edits, adjust-punch approval, kiosk punches) queue tardy
+# re-syncs in TardySyncJob for `manage.py tardy_sync_worker` instead of syncing in the request.
+# Set to 0 to sync inline (no worker needed, e.g. small installs and local dev).
+TARDY_SYNC_QUEUE = os.environ.get("DJANGO_TARDY_SYNC_QUEUE", "1").lower() in ("1", "true", "yes")
+
+# PDF reports (absence, group absence, Perfect Attendance) are queued as ReportJob rows and
+# rendered by `manage.py report_worker` into MEDIA_ROOT/reports/. Set to 0 to render in the
+# request (no worker needed). A job rendering longer than the timeout is assumed lost and retried.
+REPORT_JOB_QUEUE = os.environ.get("DJANGO_REPORT_JOB_QUEUE", "1").lower() in ("1", "true", "yes")
+REPORT_JOB_TIMEOUT_SECONDS = int(os.environ.get("DJANGO_REPORT_JOB_TIMEOUT_SECONDS", "600"))
+# `manage.py report_worker --purge` deletes finished jobs (and unreferenced PDFs) older than this.
+REPORT_JOB_RETENTION_DAYS = int(os.environ.get("DJANGO_REPORT_JOB_RETENTION_DAYS", "7"))
+
+# Group report charts (attendance.group_report_charts) are cached by content: this many data URIs
+# per process, plus PNG files in CHART_CACHE_DIR shared by web and report workers (default
+# MEDIA_ROOT/chart_cache; set DJANGO_CHART_CACHE_DIR to an empty string to turn the disk cache off).
+# Each write keeps the directory to CHART_CACHE_MAX_FILES PNGs, dropping the least recently used.
+CHART_CACHE_MAX_ENTRIES = int(os.environ.get("DJANGO_CHART_CACHE_MAX_ENTRIES", "256"))
+CHART_CACHE_DIR = os.environ.get("DJANGO_CHART_CACHE_DIR")
+CHART_CACHE_MAX_FILES = int(os.environ.get("DJANGO_CHART_CACHE_MAX_FILES", "2000"))
 
 # Absenteeism chart: how many completed calendar years to show as bars (1–3). Lower = faster.
 ABSENTEEISM_CHART_YEAR_BARS = int(os.environ.get("DJANGO_ABSENTEEISM_CHART_YEAR_BARS", "1"))
@@ -5,9 +5,9 @@ from django.db import transaction
 
 from attendance.models import CustomUser, revert_tardy_occurrences_for_adjust_punch
 from attendance.payroll_utils import week_ending_for_date, is_payroll_week_finalized
+from attendance.services.tardy_sync_queue import enqueue_tardy_sync_for_entry
 
-from .models import MAX_TIMECLOCK_KIOSKS, TimeclockKioskIP, TimeclockKioskToken, TimeEntry
-from .tardy_sync import sync_tardy_occurrences_for_time_entry
+from .models import MAX_TIMECLOCK_KIOSKS, KioskPunchReceipt, TimeclockKioskIP, TimeclockKioskToken, TimeEntry
 
 
 class TimeclockKioskIPAdminForm(forms.ModelForm):
@@ -132,7 +132,7 @@ class TimeEntryAdmin(admin.ModelAdmin):
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
-        sync_tardy_occurrences_for_time_entry(obj)
+        enqueue_tardy_sync_for_entry(obj)
 
     def delete_model(self, request, obj):
         if is_payroll_week_finalized(week_ending_for_date(obj.date)):
@@ -164,3 +164,19 @@ class TimeEntryAdmin(admin.ModelAdmin):
                 u = CustomUser.objects.select_for_update().get(pk=obj.user_id)
                 revert_tardy_occurrences_for_adjust_punch(u, obj.date)
         allowed.delete()
+
+
+@admin.register(KioskPunchReceipt)
+class KioskPunchReceiptAdmin(admin.ModelAdmin):
+    """Read-only log of batch-ingested kiosk punches (one row per idempotency key)."""
+
+    list_display = ("created_at", "login", "user", "action", "punched_at", "error", "client_ip")
+    list_filter = ("action", "error")
+    search_fields = ("idempotency_key", "login", "user__username")
+    date_hierarchy = "created_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TimeclockConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'timeclock'
+
+    def ready(self):
+        from .kiosk import connect_kiosk_signals
+
+        connect_kiosk_signals()
@@ -3,8 +3,11 @@
 from __future__ import annotations
 
 import os
+import threading
+import time
 
 from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 from django.http import HttpRequest, HttpResponse
 
 from .models import TimeclockKioskIP, TimeclockKioskToken
@@ -39,11 +42,48 @@ def get_client_ip(request: HttpRequest) -> str | None:
     return remote or None
 
 
+# Active kiosk IPs and tokens, held per process: every punch checks them, and there are at
+# most MAX_TIMECLOCK_KIOSKS of each. Saves/deletes in this process clear it immediately;
+# TIMECLOCK_KIOSK_CACHE_SECONDS bounds how long another worker keeps a deactivated kiosk.
+_credentials_lock = threading.Lock()
+_credentials: tuple[float, frozenset[str], frozenset[str]] | None = None
+
+
+def active_kiosk_credentials() -> tuple[frozenset[str], frozenset[str]]:
+    """(active kiosk IPs, active kiosk tokens), loaded at most once per TTL."""
+    global _credentials
+    cached = _credentials
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1], cached[2]
+    with _credentials_lock:
+        ips = frozenset(TimeclockKioskIP.objects.filter(is_active=True).values_list("ip_address", flat=True))
+        tokens = frozenset(TimeclockKioskToken.objects.filter(is_active=True).values_list("token", flat=True))
+        ttl = getattr(settings, "TIMECLOCK_KIOSK_CACHE_SECONDS", 60)
+        _credentials = (time.monotonic() + ttl, ips, tokens)
+    return ips, tokens
+
+
+def invalidate_kiosk_credentials() -> None:
+    global _credentials
+    _credentials = None
+
+
+def _on_kiosk_change(sender, instance, **kwargs):
+    invalidate_kiosk_credentials()
+
+
+def connect_kiosk_signals() -> None:
+    """Called from TimeclockConfig.ready()."""
+    for model in (TimeclockKioskIP, TimeclockKioskToken):
+        post_save.connect(_on_kiosk_change, sender=model, dispatch_uid=f"kiosk_credentials_save_{model.__name__}")
+        post_delete.connect(_on_kiosk_change, sender=model, dispatch_uid=f"kiosk_credentials_delete_{model.__name__}")
+
+
 def _active_token_value(raw: str | None) -> str | None:
     token = (raw or "").strip()
     if not token:
         return None
-    if TimeclockKioskToken.objects.filter(token=token, is_active=True).exists():
+    if token in active_kiosk_credentials()[1]:
         return token
     return None
 
@@ -62,7 +102,7 @@ def is_kiosk_ip(request: HttpRequest) -> bool:
     ip = get_client_ip(request)
     if not ip:
         return False
-    return TimeclockKioskIP.objects.filter(ip_address=ip, is_active=True).exists()
+    return ip in active_kiosk_credentials()[0]
 
 
 def is_timeclock_kiosk(request: HttpRequest) -> bool:
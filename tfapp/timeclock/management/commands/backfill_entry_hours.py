@@ -0,0 +1,77 @@
+"""
+Fill or check TimeEntry stored hours (actual_hours / reported_hours / credited_hours).
+
+Backfill (default) recomputes every entry in range and writes rows that are stale
+(calc_version behind HOURS_CALC_VERSION) or whose stored values drift from the live rules.
+--verify only reports those rows.
+
+Usage:
+    python manage.py backfill_entry_hours
+    python manage.py backfill_entry_hours --start 2026-01-01 --end 2026-06-30 --verify
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from timeclock.models import HOURS_CALC_VERSION, TimeEntry
+
+_HOURS = ("actual_hours", "reported_hours", "credited_hours")
+
+
+class Command(BaseCommand):
+    help = "Backfill stored TimeEntry hours, or with --verify report rows that drift from the live computation."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", help="First entry date (YYYY-MM-DD). Default: earliest.")
+        parser.add_argument("--end", help="Last entry date (YYYY-MM-DD). Default: latest.")
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report stale or drifting rows; do not write.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        qs = TimeEntry.objects.select_related("user").prefetch_related("user__schedules").order_by("pk")
+        try:
+            if options["start"]:
+                qs = qs.filter(date__gte=date.fromisoformat(options["start"]))
+            if options["end"]:
+                qs = qs.filter(date__lte=date.fromisoformat(options["end"]))
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}")
+        verify = options["verify"]
+        batch_size = options["batch_size"]
+
+        checked = stale = drifted = 0
+        pending = []
+        for entry in qs.iterator(chunk_size=batch_size):
+            checked += 1
+            stored = tuple(getattr(entry, f) for f in _HOURS)
+            was_current = entry.calc_version == HOURS_CALC_VERSION
+            entry.store_computed_hours()
+            live = tuple(getattr(entry, f) for f in _HOURS)
+            if not was_current:
+                stale += 1
+            elif stored != live:
+                drifted += 1
+                self.stdout.write(
+                    f"  Drift: entry {entry.pk} {entry.user.username} on {entry.date}: "
+                    f"stored {stored} live {live}"
+                )
+            else:
+                continue
+            if not verify:
+                pending.append(entry)
+                if len(pending) >= batch_size:
+                    TimeEntry.objects.bulk_update(pending, TimeEntry.HOURS_FIELDS)
+                    pending = []
+        if pending:
+            TimeEntry.objects.bulk_update(pending, TimeEntry.HOURS_FIELDS)
+
+        summary = f"Checked {checked} entr{'y' if checked == 1 else 'ies'}: {stale} stale, {drifted} drifted."
+        if verify:
+            style = self.style.WARNING if (stale or drifted) else self.style.SUCCESS
+            self.stdout.write(style(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{summary} Wrote {stale + drifted}."))
@@ -6,17 +6,70 @@ Nightly job (e.g. 2:30 AM):
    within the actual clock_in–clock_out window). This matches payroll logic that assumes
    a lunch deduction without requiring manual lunch punches.
 
-2) Remaining incomplete entries are flagged and admins may be emailed.
+2) Remaining incomplete entries are flagged (stale flags cleared) and admins may be emailed.
+
+Runs are incremental: the start of the last completed run is kept as a JobWatermark, and the
+next run only examines entries dated since then or in payroll weeks that were not finalized
+before it (entries in finalized weeks cannot be edited). The first run, and --full, examine
+all history. Entries are examined in one pass with schedules and work-through-lunch approvals
+loaded in bulk, and changes are written with bulk_update.
 
 Run via cron, e.g.:
   30 2 * * * cd /path/to/project && python manage.py flag_missing_punches
+  python manage.py flag_missing_punches --since 2026-01-01   # re-examine from a date
+  python manage.py flag_missing_punches --full
 """
-from django.core.management.base import BaseCommand
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.core import mail
 from django.conf import settings
-from attendance.schedule_utils import scheduled_lunch_datetimes_for_entry, work_through_lunch_approved_for_day
-from timeclock.models import TimeEntry
+from attendance.models import CustomUser, PayrollPeriod, TimeOffRequestStatus, WorkThroughLunchRequest
+from attendance.payroll_utils import week_ending_for_date
+from attendance.schedule_utils import scheduled_lunch_datetimes_for_entry
+from attendance.services.weekly_totals import invalidate_weekly_user_totals
+from timeclock.models import JobWatermark, TimeEntry
+
+WATERMARK_NAME = "flag_missing_punches"
+
+_FLAG_FIELDS = ["missing_punch_flagged", "missing_punch_flagged_at"]
+
+
+def _scope_filter(since: datetime):
+    """
+    Entries that may have changed since ``since``: dated on or after it, or outside every payroll
+    week finalized before it. None when no week is settled (nothing to skip).
+    """
+    settled = sorted(
+        PayrollPeriod.objects.filter(is_finalized=True)
+        .filter(Q(finalized_at__isnull=True) | Q(finalized_at__lt=since))
+        .values_list("week_ending", flat=True)
+    )
+    if not settled:
+        return None
+    # Consecutive settled weeks collapse into one date range.
+    ranges = []
+    for week_ending in settled:
+        if ranges and week_ending - ranges[-1][1] == timedelta(days=7):
+            ranges[-1][1] = week_ending
+        else:
+            ranges.append([week_ending - timedelta(days=6), week_ending])
+    in_settled = Q()
+    for first, last in ranges:
+        in_settled |= Q(date__range=(first, last))
+    return Q(date__gte=since.date()) | ~in_settled
+
+
+def _name(entry):
+    return entry.user.get_full_name() or entry.user.username
+
+
+def _plural(n):
+    return f"entr{'y' if n == 1 else 'ies'}"
 
 
 class Command(BaseCommand):
@@ -35,120 +88,140 @@ class Command(BaseCommand):
             action="store_true",
             help="Flag entries but do not send email to admins.",
         )
+        parser.add_argument(
+            "--since",
+            help="Examine entries from this date (YYYY-MM-DD) plus open payroll weeks, instead of the watermark.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Examine every past entry, ignoring the watermark.",
+        )
 
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
         no_email = options["no_email"]
         now = timezone.now()
         today = now.date()
+        timings = {}
+        started = time.perf_counter()
 
-        candidates = (
-            TimeEntry.objects.filter(
-                date__lt=today,
-                clock_in__isnull=False,
-                clock_out__isnull=False,
-                lunch_out__isnull=True,
-                lunch_in__isnull=True,
-            )
-            .select_related("user")
-        )
+        if options["full"] and options["since"]:
+            raise CommandError("Use either --full or --since, not both.")
+        if options["since"]:
+            try:
+                since_day = date.fromisoformat(options["since"])
+            except ValueError as exc:
+                raise CommandError(f"Invalid --since date: {exc}")
+            since = timezone.make_aware(datetime.combine(since_day, datetime.min.time()))
+        elif options["full"]:
+            since = None
+        else:
+            since = JobWatermark.objects.filter(name=WATERMARK_NAME).values_list("last_run_at", flat=True).first()
 
-        filled = []
-        for entry in candidates:
-            if work_through_lunch_approved_for_day(entry.user, entry.date):
-                continue
-            times = scheduled_lunch_datetimes_for_entry(entry)
-            if times is None:
-                continue
-            lunch_out_dt, lunch_in_dt = times
-            if dry_run:
-                filled.append(entry)
-                self.stdout.write(
-                    f"  Would apply scheduled lunch: {entry.user.get_full_name() or entry.user.username} "
-                    f"on {entry.date} (lunch {lunch_out_dt} – {lunch_in_dt})"
-                )
-                continue
-            entry.lunch_out = lunch_out_dt
-            entry.lunch_in = lunch_in_dt
-            entry.missing_punch_flagged = False
-            entry.missing_punch_flagged_at = None
-            entry.save(
-                update_fields=[
-                    "lunch_out",
-                    "lunch_in",
-                    "missing_punch_flagged",
-                    "missing_punch_flagged_at",
-                ]
-            )
-            filled.append(entry)
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"  Applied scheduled lunch: {entry.user.get_full_name() or entry.user.username} on {entry.date}"
-                )
-            )
+        entries_qs = TimeEntry.objects.filter(date__lt=today)
+        scope = _scope_filter(since) if since is not None else None
+        if scope is not None:
+            entries_qs = entries_qs.filter(scope)
+            self.stdout.write(f"Examining entries changed since {timezone.localtime(since):%Y-%m-%d %H:%M} and open payroll weeks.")
+        else:
+            self.stdout.write("Examining all past entries.")
 
-        if filled and not dry_run:
-            self.stdout.write(self.style.SUCCESS(f"Filled scheduled lunch on {len(filled)} entr{'y' if len(filled) == 1 else 'ies'}."))
-        elif dry_run and filled:
-            self.stdout.write(f"Would fill scheduled lunch on {len(filled)} entr{'y' if len(filled) == 1 else 'ies'}.")
-
-        # Clear stale missing_punch flags (e.g. work-through lunch approved after a prior night's flag)
-        stale_flagged = TimeEntry.objects.filter(
-            date__lt=today, missing_punch_flagged=True
-        ).select_related("user")
-        cleared_stale = 0
-        for entry in stale_flagged:
-            if entry.is_incomplete():
-                continue
-            if dry_run:
-                self.stdout.write(
-                    f"  Would clear stale missing-punch flag: "
-                    f"{entry.user.get_full_name() or entry.user.username} on {entry.date}"
-                )
-                cleared_stale += 1
-                continue
-            entry.missing_punch_flagged = False
-            entry.missing_punch_flagged_at = None
-            entry.save(update_fields=["missing_punch_flagged", "missing_punch_flagged_at"])
-            cleared_stale += 1
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"  Cleared stale missing-punch flag: "
-                    f"{entry.user.get_full_name() or entry.user.username} on {entry.date}"
-                )
+        entries = list(entries_qs.order_by("date", "user_id"))
+        # One user instance per employee so each compiled schedule is built once.
+        users = CustomUser.objects.prefetch_related("schedules").in_bulk({e.user_id for e in entries})
+        for entry in entries:
+            entry.user = users[entry.user_id]
+        work_through_lunch = set()
+        if entries:
+            work_through_lunch = set(
+                WorkThroughLunchRequest.objects.filter(
+                    user_id__in=list(users),
+                    work_date__range=(entries[0].date, entries[-1].date),
+                    status=TimeOffRequestStatus.APPROVED,
+                ).values_list("user_id", "work_date")
             )
-        if cleared_stale and not dry_run:
-            self.stdout.write(self.style.SUCCESS(f"Cleared {cleared_stale} stale missing-punch flag(s)."))
-
-        # Entries that have at least one punch but not all (incomplete)
-        incomplete = TimeEntry.objects.filter(date__lt=today).exclude(
-            clock_in=None,
-            lunch_out=None,
-            lunch_in=None,
-            clock_out=None,
-        )
-        to_flag = [e for e in incomplete if e.is_incomplete() and not e.missing_punch_flagged]
+        timings["load"] = time.perf_counter() - started
 
-        if not to_flag:
-            self.stdout.write(self.style.SUCCESS("No incomplete entries to flag."))
-            if not filled:
-                return
-            return
+        started = time.perf_counter()
+        filled, cleared_stale, to_flag = [], [], []
+        for entry in entries:
+            approved = (entry.user_id, entry.date) in work_through_lunch
+            if (
+                entry.clock_in
+                and entry.clock_out
+                and entry.lunch_out is None
+                and entry.lunch_in is None
+                and not approved
+            ):
+                times = scheduled_lunch_datetimes_for_entry(entry)
+                if times is not None:
+                    lunch_out_dt, lunch_in_dt = times
+                    if dry_run:
+                        self.stdout.write(
+                            f"  Would apply scheduled lunch: {_name(entry)} "
+                            f"on {entry.date} (lunch {lunch_out_dt} – {lunch_in_dt})"
+                        )
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f"  Applied scheduled lunch: {_name(entry)} on {entry.date}"))
+                    entry.lunch_out = lunch_out_dt
+                    entry.lunch_in = lunch_in_dt
+                    entry.missing_punch_flagged = False
+                    entry.missing_punch_flagged_at = None
+                    entry.store_computed_hours()
+                    filled.append(entry)
+                    continue
+            incomplete = entry.is_incomplete(work_through_lunch=approved)
+            if entry.missing_punch_flagged and not incomplete:
+                # e.g. work-through lunch approved after a prior night's flag
+                verb = "Would clear" if dry_run else "Cleared"
+                self.stdout.write(f"  {verb} stale missing-punch flag: {_name(entry)} on {entry.date}")
+                entry.missing_punch_flagged = False
+                entry.missing_punch_flagged_at = None
+                cleared_stale.append(entry)
+            elif incomplete and not entry.missing_punch_flagged:
+                to_flag.append(entry)
+        timings["check"] = time.perf_counter() - started
 
-        self.stdout.write(f"Found {len(to_flag)} incomplete entr{'y' if len(to_flag) == 1 else 'ies'} to flag.")
+        if filled:
+            verb = "Would fill" if dry_run else "Filled"
+            self.stdout.write(self.style.SUCCESS(f"{verb} scheduled lunch on {len(filled)} {_plural(len(filled))}."))
+        if cleared_stale and not dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Cleared {len(cleared_stale)} stale missing-punch flag(s)."))
+        if to_flag:
+            self.stdout.write(f"Found {len(to_flag)} incomplete {_plural(len(to_flag))} to flag.")
+        else:
+            self.stdout.write(self.style.SUCCESS("No incomplete entries to flag."))
 
         if dry_run:
             for e in to_flag:
-                self.stdout.write(
-                    f"  Would flag: {e.user.get_full_name() or e.user.username} on {e.date} (id={e.pk})"
-                )
+                self.stdout.write(f"  Would flag: {_name(e)} on {e.date} (id={e.pk})")
+            self._write_timings(len(entries), timings)
             return
 
+        started = time.perf_counter()
         for e in to_flag:
             e.missing_punch_flagged = True
             e.missing_punch_flagged_at = now
-            e.save(update_fields=["missing_punch_flagged", "missing_punch_flagged_at"])
-            self.stdout.write(f"  Flagged: {e.user.get_full_name() or e.user.username} on {e.date}")
+            self.stdout.write(f"  Flagged: {_name(e)} on {e.date}")
+        with transaction.atomic():
+            if filled:
+                TimeEntry.objects.bulk_update(
+                    filled, ["lunch_out", "lunch_in", *_FLAG_FIELDS, *TimeEntry.HOURS_FIELDS], batch_size=500
+                )
+                # Bulk writes skip the TimeEntry signals that keep the weekly rollups current.
+                invalidate_weekly_user_totals(
+                    user_ids={e.user_id for e in filled},
+                    week_endings={week_ending_for_date(e.date) for e in filled},
+                )
+            if cleared_stale or to_flag:
+                TimeEntry.objects.bulk_update([*cleared_stale, *to_flag], _FLAG_FIELDS, batch_size=500)
+            JobWatermark.objects.update_or_create(name=WATERMARK_NAME, defaults={"last_run_at": now})
+        timings["write"] = time.perf_counter() - started
+        self._write_timings(len(entries), timings)
+
+        if not to_flag:
+            return
 
         if no_email:
             self.stdout.write(self.style.SUCCESS("Flagged; no email sent (--no-email)."))
@@ -205,3 +278,8 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f"Email sent to {len(recipient_list)} admin(s)."))
         except Exception as exc:
             self.stdout.write(self.style.WARNING(f"Email failed: {exc}"))
+
+    def _write_timings(self, examined, timings):
+        total = sum(timings.values())
+        parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+        self.stdout.write(f"Examined {examined} {_plural(examined)} in {total:.2f}s ({parts}).")
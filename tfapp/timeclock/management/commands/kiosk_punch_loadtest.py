@@ -0,0 +1,193 @@
+"""
+Simulate a shift change against the kiosk punch API (timeclock:kiosk_punch_api) of a running
+server: --kiosks threads, each with its own kiosk session, drain one shared line of
+--employees badges as fast as the server answers, then print latency percentiles and a
+breakdown of responses.
+
+--setup creates the load-test employees (usernames loadtest_<login>, badge logins counting up
+from --login-start, scheduled every day 00:00-23:59 so clock-in needs no override) in the
+database this command is configured for, which must be the server's. --teardown deletes them
+with their entries and occurrences. Both refuse to run with DEBUG off unless --force is given.
+
+Usage:
+    python manage.py kiosk_punch_loadtest --setup --employees 200
+    python manage.py kiosk_punch_loadtest --url http://127.0.0.1:8000 --token <kiosk token>
+    python manage.py kiosk_punch_loadtest --url http://127.0.0.1:8000 --token <kiosk token> --action clock_out
+    python manage.py kiosk_punch_loadtest --teardown
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import time as time_of_day
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from attendance.models import CustomUser, WorkSchedule
+from timeclock.punch import PUNCH_ACTIONS
+
+USERNAME_PREFIX = "loadtest_"
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+class Command(BaseCommand):
+    help = "Load-test the kiosk punch API with a simulated shift change (N employees across K kiosks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Base URL of the running server, e.g. http://127.0.0.1:8000.")
+        parser.add_argument("--token", help="Active kiosk token. Omit when this machine's IP is a kiosk IP.")
+        parser.add_argument("--employees", type=int, default=200)
+        parser.add_argument("--kiosks", type=int, default=5)
+        parser.add_argument("--action", choices=PUNCH_ACTIONS, default="clock_in")
+        parser.add_argument("--login-start", type=int, default=9000, help="First 4-digit badge login.")
+        parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout in seconds.")
+        parser.add_argument("--setup", action="store_true", help="Create the load-test employees first.")
+        parser.add_argument("--teardown", action="store_true", help="Delete the load-test employees afterwards.")
+        parser.add_argument("--force", action="store_true", help="Allow --setup/--teardown with DEBUG off.")
+
+    def handle(self, *args, **options):
+        n = options["employees"]
+        if n < 1 or options["kiosks"] < 1:
+            raise CommandError("--employees and --kiosks must be at least 1.")
+        if options["login_start"] < 0 or options["login_start"] + n > 10000:
+            raise CommandError("Badge logins must stay within 0000-9999.")
+        if (options["setup"] or options["teardown"]) and not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to create or delete load-test employees with DEBUG off (use --force).")
+        logins = [f"{options['login_start'] + i:04d}" for i in range(n)]
+
+        if options["setup"]:
+            self._setup(logins)
+        if options["url"]:
+            self._run(options, logins)
+        elif not (options["setup"] or options["teardown"]):
+            raise CommandError("Pass --url to run the load test (or --setup / --teardown).")
+        if options["teardown"]:
+            deleted, _ = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            self.stdout.write(f"Teardown: deleted {deleted} rows.")
+
+    def _setup(self, logins):
+        existing = set(
+            CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).values_list("timeclock_login", flat=True)
+        )
+        taken = set(
+            CustomUser.objects.filter(timeclock_login__in=logins)
+            .exclude(username__startswith=USERNAME_PREFIX)
+            .values_list("timeclock_login", flat=True)
+        )
+        if taken:
+            raise CommandError(f"Badge logins already used by real employees: {', '.join(sorted(taken))}.")
+        users = CustomUser.objects.bulk_create(
+            [
+                CustomUser(
+                    username=f"{USERNAME_PREFIX}{login}",
+                    first_name="Load",
+                    last_name=f"Test {login}",
+                    timeclock_login=login,
+                    is_exempt=True,
+                )
+                for login in logins
+                if login not in existing
+            ]
+        )
+        WorkSchedule.objects.bulk_create(
+            [
+                WorkSchedule(
+                    user=u,
+                    day=day,
+                    start_time=time_of_day(0, 0),
+                    lunch_out=time_of_day(11, 0),
+                    lunch_in=time_of_day(11, 30),
+                    end_time=time_of_day(23, 59),
+                )
+                for u in users
+                for day in range(7)
+            ]
+        )
+        self.stdout.write(f"Setup: created {len(users)} load-test employees ({len(existing)} already present).")
+
+    def _run(self, options, logins):
+        base = options["url"].rstrip("/")
+        page_url = base + reverse("timeclock:timeclock_home")
+        api_url = base + reverse("timeclock:kiosk_punch_api")
+        line = queue.Queue()
+        for login in logins:
+            line.put(login)
+
+        results = []  # (seconds, status, error code)
+        results_lock = threading.Lock()
+        kiosk_errors = []
+        start_gate = threading.Barrier(options["kiosks"] + 1)
+
+        def kiosk():
+            session = requests.Session()
+            headers = {}
+            try:
+                # The page sets the kiosk cookie (from ?kiosk=) and the CSRF cookie the API checks.
+                params = {"kiosk": options["token"]} if options["token"] else None
+                session.get(page_url, params=params, timeout=options["timeout"]).raise_for_status()
+                headers = {"X-CSRFToken": session.cookies.get("csrftoken", ""), "Referer": page_url}
+            except requests.RequestException as exc:
+                kiosk_errors.append(str(exc))
+            start_gate.wait()
+            if not headers:
+                return
+            while True:
+                try:
+                    login = line.get_nowait()
+                except queue.Empty:
+                    return
+                began = time.perf_counter()
+                try:
+                    r = session.post(
+                        api_url,
+                        json={"login": login, "action": options["action"]},
+                        headers=headers,
+                        timeout=options["timeout"],
+                    )
+                    status, code = r.status_code, ""
+                    if not r.ok and "json" in r.headers.get("Content-Type", ""):
+                        code = r.json().get("error", "")
+                except requests.RequestException as exc:
+                    status, code = 0, type(exc).__name__
+                elapsed = time.perf_counter() - began
+                with results_lock:
+                    results.append((elapsed, status, code))
+
+        threads = [threading.Thread(target=kiosk, daemon=True) for _ in range(options["kiosks"])]
+        for t in threads:
+            t.start()
+        start_gate.wait()
+        began = time.perf_counter()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - began
+
+        for err in kiosk_errors:
+            self.stderr.write(f"Kiosk session failed: {err}")
+        if not results:
+            raise CommandError("No punches were sent.")
+        latencies = sorted(r[0] * 1000 for r in results)
+        outcomes = Counter(f"{status} {code}".strip() for _, status, code in results)
+        self.stdout.write(
+            f"{len(results)} {options['action']} punches from {options['kiosks']} kiosks in {wall:.2f}s "
+            f"({len(results) / wall if wall else 0:.1f}/s)"
+        )
+        self.stdout.write(
+            "Latency ms: p50 {:.0f}, p90 {:.0f}, p99 {:.0f}, max {:.0f}".format(
+                _percentile(latencies, 50), _percentile(latencies, 90), _percentile(latencies, 99), latencies[-1]
+            )
+        )
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f"  {outcome}: {count}")
+        ok = outcomes.get("201", 0)
+        style = self.style.SUCCESS if ok == len(results) else self.style.WARNING
+        self.stdout.write(style(f"{ok} of {len(results)} punches recorded."))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeclock', '0010_timeclockkiosktoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timeentry',
+            name='actual_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='calc_version',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='credited_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='timeentry',
+            name='reported_hours',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-18 15:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timeclock', '0011_timeentry_stored_hours'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KioskPunchReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('login', models.CharField(blank=True, max_length=16)),
+                ('action', models.CharField(blank=True, max_length=16)),
+                ('punched_at', models.DateTimeField(blank=True, help_text='Kiosk-side scan time.', null=True)),
+                ('error', models.CharField(blank=True, help_text='Empty when the punch was recorded.', max_length=32)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('client_ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('time_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='kiosk_receipts', to='timeclock.timeentry')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='timeclock_k_created_524828_idx')],
+            },
+        ),
+    ]
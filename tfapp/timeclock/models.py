@@ -20,6 +20,10 @@ from attendance.schedule_utils import (
 # Raspberry Pi barcode kiosks: up to this many IPs and this many tokens.
 MAX_TIMECLOCK_KIOSKS = 5
 
+# Bump when actual/reported/credited hour rules change; rows stored under an older
+# version are recomputed on read (attendance.services.entry_hours) or by backfill_entry_hours.
+HOURS_CALC_VERSION = 1
+
 
 def _generate_kiosk_token() -> str:
     return secrets.token_urlsafe(24)
@@ -158,6 +162,12 @@ class TimeEntry(models.Model):
         help_text="Payroll CSV omitted lunch on a scheduled-lunch day; confirm scheduled lunch or "
         "work-through at finalize before closing payroll.",
     )
+    # Denormalized results of actual_worked_hours / reported_worked_hours / payroll_credited_hours,
+    # written on save. calc_version 0 (or older than HOURS_CALC_VERSION) marks them stale.
+    actual_hours = models.FloatField(default=0.0)
+    reported_hours = models.FloatField(default=0.0)
+    credited_hours = models.FloatField(default=0.0)
+    calc_version = models.PositiveSmallIntegerField(default=0)
 
     class Meta:
         constraints = [
@@ -168,8 +178,20 @@ class TimeEntry(models.Model):
             models.Index(fields=["date"]),
         ]
 
-    def is_incomplete(self):
-        """Return True if the entry has only some but not all timestamps filled in."""
+    HOURS_FIELDS = ("actual_hours", "reported_hours", "credited_hours", "calc_version")
+
+    def store_computed_hours(self):
+        """Fill the denormalized hours columns from the live rules (does not save)."""
+        self.actual_hours = self.actual_worked_hours()
+        self.reported_hours = self.reported_worked_hours()
+        self.credited_hours = self.payroll_credited_hours()
+        self.calc_version = HOURS_CALC_VERSION
+
+    def is_incomplete(self, work_through_lunch=None):
+        """
+        Return True if the entry has only some but not all timestamps filled in. Pass
+        ``work_through_lunch`` when it is already known to skip the per-entry lookup.
+        """
         fields = [self.clock_in, self.lunch_out, self.lunch_in, self.clock_out]
         if not any(fields):
             return False
@@ -180,7 +202,11 @@ class TimeEntry(models.Model):
             and self.clock_out
             and self.lunch_out is None
             and self.lunch_in is None
-            and work_through_lunch_approved_for_day(self.user, self.date)
+            and (
+                work_through_lunch
+                if work_through_lunch is not None
+                else work_through_lunch_approved_for_day(self.user, self.date)
+            )
         ):
             return False
         if (
@@ -564,9 +590,12 @@ class TimeEntry(models.Model):
         """
         return
 
-    def save(self, *args, **kwargs):
-        if not self.slug:
-            ensure_unique_slug(self, "slug", max_length=48)
+    def apply_save_rules(self, work_through_lunch=None):
+        """
+        Normalize override flags, fill scheduled lunch punches and clear a fixed missing-punch
+        flag, as save() does before writing. Bulk writers call this themselves; pass
+        ``work_through_lunch`` when it is already known to skip the per-entry lookup.
+        """
         if self.clock_in_authorized_by_id:
             self.clock_in_override_denied = False
         if self.clock_in_early_authorized_by_id:
@@ -580,15 +609,69 @@ class TimeEntry(models.Model):
             and self.clock_out
             and self.lunch_out is None
             and self.lunch_in is None
-            and not work_through_lunch_approved_for_day(self.user, self.date)
         ):
-            scheduled = scheduled_lunch_datetimes_for_entry(self)
-            if scheduled:
-                self.lunch_out, self.lunch_in = scheduled
-        if not self.is_incomplete() and self.missing_punch_flagged:
+            if work_through_lunch is None:
+                work_through_lunch = work_through_lunch_approved_for_day(self.user, self.date)
+            if not work_through_lunch:
+                scheduled = scheduled_lunch_datetimes_for_entry(self)
+                if scheduled:
+                    self.lunch_out, self.lunch_in = scheduled
+        if self.missing_punch_flagged and not self.is_incomplete(work_through_lunch):
             self.missing_punch_flagged = False
             self.missing_punch_flagged_at = None
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            ensure_unique_slug(self, "slug", max_length=48)
+        self.apply_save_rules()
+        self.store_computed_hours()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *self.HOURS_FIELDS}
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.date}"
+
+
+class KioskPunchReceipt(models.Model):
+    """
+    Outcome of one batch-ingested kiosk punch, keyed by the kiosk's idempotency key. A kiosk
+    replaying its buffer after an outage gets the stored outcome back instead of a second punch.
+    """
+
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    login = models.CharField(max_length=16, blank=True)
+    action = models.CharField(max_length=16, blank=True)
+    punched_at = models.DateTimeField(null=True, blank=True, help_text="Kiosk-side scan time.")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    time_entry = models.ForeignKey(
+        TimeEntry, null=True, blank=True, on_delete=models.SET_NULL, related_name="kiosk_receipts"
+    )
+    error = models.CharField(max_length=32, blank=True, help_text="Empty when the punch was recorded.")
+    message = models.CharField(max_length=255, blank=True)
+    client_ip = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"{self.idempotency_key} {self.action} ({self.error or 'recorded'})"
+
+
+class JobWatermark(models.Model):
+    """
+    Start time of the last completed run of an incremental maintenance command, keyed by
+    command name (e.g. flag_missing_punches). The next run only looks at what may have
+    changed since then.
+    """
+
+    name = models.CharField(max_length=64, unique=True)
+    last_run_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_run_at}"
@@ -0,0 +1,138 @@
+"""
+Record one timeclock punch. Shared by the timeclock page and the kiosk JSON API.
+
+The write path is one locked read of today's entry and one INSERT or UPDATE. The finalized-week
+check reads the cached set (attendance.payroll_utils.finalized_week_endings). The clock-in tardy
+check is the caller's choice: the page runs it inline, the kiosk API queues it with
+defer_tardy_check (attendance.services.tardy_sync_queue) so a shift-change queue is not held up
+by occurrence writes.
+"""
+from __future__ import annotations
+
+from datetime import timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from attendance.models import CustomUser, RoleChoices
+from attendance.payroll_utils import finalized_week_endings, week_ending_for_date
+from attendance.schedule_utils import clock_in_requires_approver
+from attendance.services.tardy_sync_queue import enqueue_tardy_sync_for_entry
+
+from .models import TimeEntry
+
+PUNCH_ACTIONS = ("clock_in", "lunch_out", "lunch_in", "clock_out")
+
+CLOCK_IN_APPROVER_ROLES = (
+    RoleChoices.EXECUTIVE,
+    RoleChoices.MANAGER,
+    RoleChoices.SUPERVISOR,
+    RoleChoices.GROUP_LEAD,
+)
+
+ALREADY_RECORDED_MESSAGES = {
+    "clock_in": "You are already clocked in for today.",
+    "lunch_out": "Lunch out already recorded for today.",
+    "lunch_in": "Lunch in already recorded for today.",
+    "clock_out": "You are already clocked out for today.",
+}
+
+
+class PunchError(Exception):
+    """
+    A punch that was not recorded. ``code`` is stable for API clients; ``message`` is the
+    text the timeclock page shows. ``reason`` is set for approver_required
+    ('unscheduled' / 'early').
+    """
+
+    def __init__(self, code: str, message: str, reason: str | None = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.reason = reason
+
+
+def is_valid_clock_in_approver(u: CustomUser) -> bool:
+    if not u or not u.is_active:
+        return False
+    return u.role in CLOCK_IN_APPROVER_ROLES
+
+
+def resolve_clock_in_approver(user, now, today, approver_id, approvers_by_id=None):
+    """
+    The approver to store on a clock-in at ``now``: None when no override is needed,
+    otherwise the valid approver named by ``approver_id`` (looked up in ``approvers_by_id``
+    when given). Raises PunchError when an override is needed and not satisfied.
+    """
+    requires_approver, reason = clock_in_requires_approver(user, now, today)
+    if not requires_approver:
+        return None
+    approver_id = str(approver_id or "").strip()
+    if not approver_id:
+        raise PunchError(
+            "approver_required",
+            "You are not scheduled today or are more than 15 minutes before your "
+            "scheduled start. Select an approving executive, manager, supervisor, or "
+            "group lead, then try Clock In again.",
+            reason=reason,
+        )
+    approver = None
+    if approver_id.isdigit():
+        if approvers_by_id is not None:
+            approver = approvers_by_id.get(int(approver_id))
+        else:
+            approver = CustomUser.objects.filter(pk=approver_id).first()
+    if approver is None:
+        raise PunchError("invalid_approver", "Invalid approver selected.")
+    if not is_valid_clock_in_approver(approver):
+        raise PunchError("approver_not_allowed", "The selected user cannot approve this clock-in.")
+    return approver
+
+
+def punch_date(at):
+    """Entry date a punch at ``at`` belongs to (the date of the UTC instant, as live punches use)."""
+    return at.astimezone(dt_timezone.utc).date()
+
+
+def record_punch(user: CustomUser, action: str, now=None, approver_id=None) -> TimeEntry:
+    """
+    Record ``action`` for ``user`` at ``now`` (default: current time) on today's entry.
+    Raises PunchError when the punch is refused. Does not evaluate tardiness.
+    """
+    if action not in PUNCH_ACTIONS:
+        raise PunchError("invalid_action", "Unknown punch action.")
+    now = now or timezone.now()
+    today = punch_date(now)
+
+    if week_ending_for_date(today) in finalized_week_endings():
+        raise PunchError(
+            "week_finalized",
+            "This payroll week is finalized. Punches cannot be recorded until payroll is unfinalized for this week.",
+        )
+
+    try:
+        with transaction.atomic():
+            entry = TimeEntry.objects.select_for_update().filter(user=user, date=today).first()
+            if entry is None:
+                # Inserted below together with the punch; the unique (user, date) constraint
+                # turns a concurrent first punch into IntegrityError.
+                entry = TimeEntry(user=user, date=today)
+
+            if getattr(entry, action) is not None:
+                raise PunchError("already_recorded", ALREADY_RECORDED_MESSAGES[action])
+
+            if action == "clock_in":
+                entry.clock_in_authorized_by = resolve_clock_in_approver(user, now, today, approver_id)
+
+            setattr(entry, action, now)
+            entry.save()
+    except IntegrityError:
+        raise PunchError(
+            "duplicate", "This punch was already recorded (duplicate). Please refresh and try again."
+        )
+    return entry
+
+
+def defer_tardy_check(entry: TimeEntry) -> None:
+    """Queue the clock-in tardy sync for ``entry`` for the tardy worker (or sync inline, see TARDY_SYNC_QUEUE)."""
+    enqueue_tardy_sync_for_entry(entry)
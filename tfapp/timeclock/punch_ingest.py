@@ -0,0 +1,287 @@
+"""
+Batch ingest of buffered kiosk punches (timeclock:kiosk_punch_batch_api).
+
+A kiosk buffers each badge scan locally with an idempotency key and its own scan time, then
+posts the buffer. Punches are applied in the order given with the same rules as a live punch
+(timeclock.punch.record_punch). The writes are one locked read of the affected entries, then
+bulk INSERT/UPDATE of entries and receipts. Every outcome is stored as a KioskPunchReceipt, so
+replaying a batch whose response was lost returns the stored outcomes and never punches twice.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from attendance.models import CustomUser
+from attendance.payroll_utils import finalized_week_endings, week_ending_for_date
+from attendance.services.weekly_totals import invalidate_weekly_user_totals
+from attendance.slug_utils import assign_unique_slugs
+
+from .models import KioskPunchReceipt, TimeEntry
+from .punch import (
+    ALREADY_RECORDED_MESSAGES,
+    PUNCH_ACTIONS,
+    PunchError,
+    defer_tardy_check,
+    punch_date,
+    resolve_clock_in_approver,
+)
+
+MAX_BATCH_SIZE = 500
+
+# Kiosk clocks drift; a scan stamped further ahead of the server than this is refused.
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+_MAX_KEY_LENGTH = KioskPunchReceipt._meta.get_field("idempotency_key").max_length
+
+# Fields a punch (plus save rules and stored hours) can change on an existing entry.
+_UPDATE_FIELDS = [
+    *PUNCH_ACTIONS,
+    "clock_in_authorized_by",
+    "clock_in_early_authorized_by",
+    "clock_in_override_denied",
+    "clock_in_early_override_denied",
+    "missing_punch_flagged",
+    "missing_punch_flagged_at",
+    *TimeEntry.HOURS_FIELDS,
+]
+
+
+class PunchBatchError(Exception):
+    """The batch as a whole is malformed (nothing was applied)."""
+
+
+@dataclass
+class PunchResult:
+    key: str
+    error: str = ""
+    message: str = ""
+    entry_date: date | None = None
+    replayed: bool = False
+
+    @property
+    def recorded(self) -> bool:
+        return not self.error
+
+    def as_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "status": "recorded" if self.recorded else "rejected",
+            "error": self.error,
+            "message": self.message,
+            "entry_date": self.entry_date.isoformat() if self.entry_date else None,
+            "replayed": self.replayed,
+        }
+
+    @classmethod
+    def from_receipt(cls, receipt: KioskPunchReceipt) -> PunchResult:
+        return cls(
+            key=receipt.idempotency_key,
+            error=receipt.error,
+            message=receipt.message,
+            entry_date=receipt.time_entry.date if receipt.time_entry_id else None,
+            replayed=True,
+        )
+
+
+def parse_punch_batch(payload) -> list[dict]:
+    """The ``punches`` list of a batch request body; raises PunchBatchError when malformed."""
+    punches = payload.get("punches") if isinstance(payload, dict) else None
+    if not isinstance(punches, list) or not all(isinstance(p, dict) for p in punches):
+        raise PunchBatchError('Expected {"punches": [{...}, ...]}.')
+    if len(punches) > MAX_BATCH_SIZE:
+        raise PunchBatchError(f"At most {MAX_BATCH_SIZE} punches per batch.")
+    return punches
+
+
+def max_scan_age() -> timedelta:
+    """Oldest buffered scan accepted (TIMECLOCK_KIOSK_MAX_SCAN_AGE_HOURS); older ones are refused."""
+    return timedelta(hours=getattr(settings, "TIMECLOCK_KIOSK_MAX_SCAN_AGE_HOURS", 72))
+
+
+def _punch_time(raw, now):
+    """
+    Aware scan time from the kiosk's ISO 8601 value (server time when omitted). Scans ahead of
+    the server clock or older than the buffer may hold are refused: a badge punch carries no
+    PIN, so the kiosk credential alone must not be able to back-date one into any open week.
+    """
+    if raw in (None, ""):
+        return now
+    at = parse_datetime(raw) if isinstance(raw, str) else None
+    if at is None:
+        raise PunchError("invalid_timestamp", "Scan time is not an ISO 8601 date-time.")
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    if at > now + MAX_CLOCK_SKEW:
+        raise PunchError("future_timestamp", "Scan time is ahead of the server clock.")
+    if at < now - max_scan_age():
+        raise PunchError("stale_timestamp", "Scan is older than the kiosk buffer allows; enter it as a punch adjustment.")
+    return at
+
+
+def ingest_punches(punches: list[dict], client_ip: str | None = None, now=None) -> list[PunchResult]:
+    """
+    Apply ``punches`` (dicts with key, login, action, optional at / clock_in_approver) in order
+    and return one PunchResult per punch. Retried once when a concurrent writer (another batch
+    with the same keys, or a live punch creating the same entry) wins a unique constraint.
+    """
+    now = now or timezone.now()
+    try:
+        return _ingest(punches, client_ip, now)
+    except IntegrityError:
+        return _ingest(punches, client_ip, now)
+
+
+def _ingest(punches, client_ip, now) -> list[PunchResult]:
+    results: list[PunchResult | None] = [None] * len(punches)
+    first_index_by_key: dict[str, int] = {}
+    for i, p in enumerate(punches):
+        key = p.get("key")
+        if not isinstance(key, str) or not key.strip() or len(key.strip()) > _MAX_KEY_LENGTH:
+            results[i] = PunchResult(
+                key=str(key or ""),
+                error="invalid_key",
+                message=f"Each punch needs a key of 1-{_MAX_KEY_LENGTH} characters.",
+            )
+        else:
+            first_index_by_key.setdefault(key.strip(), i)
+
+    with transaction.atomic():
+        receipts = {
+            r.idempotency_key: r
+            for r in KioskPunchReceipt.objects.filter(
+                idempotency_key__in=list(first_index_by_key)
+            ).select_related("time_entry")
+        }
+        new = [i for key, i in first_index_by_key.items() if key not in receipts]
+        logins = {str(punches[i].get("login") or "").strip() for i in new} - {""}
+        users_by_login: dict[str, list[CustomUser]] = {}
+        for u in CustomUser.objects.filter(timeclock_login__in=logins, is_active=True):
+            users_by_login.setdefault(u.timeclock_login, []).append(u)
+        approver_ids = {
+            int(punches[i]["clock_in_approver"])
+            for i in new
+            if str(punches[i].get("clock_in_approver") or "").isdigit()
+        }
+        approvers_by_id = CustomUser.objects.in_bulk(approver_ids)
+        finalized = finalized_week_endings()
+
+        # Validate and resolve each new punch before touching entries.
+        staged = []  # (index, user, action, at, day)
+        scan_at: dict[int, object] = {}
+        user_for_index: dict[int, CustomUser] = {}
+        for i in new:
+            p = punches[i]
+            key = p["key"].strip()
+            try:
+                login = str(p.get("login") or "").strip()
+                matches = users_by_login.get(login, [])
+                if not login:
+                    raise PunchError("missing_credentials", "Badge login is required.")
+                if not matches:
+                    raise PunchError("invalid_credentials", "Invalid badge / login.")
+                if len(matches) > 1:
+                    raise PunchError("ambiguous_login", "Multiple employees share this login. Contact a supervisor.")
+                user_for_index[i] = matches[0]
+                action = p.get("action")
+                if action not in PUNCH_ACTIONS:
+                    raise PunchError("invalid_action", "Unknown punch action.")
+                at = scan_at[i] = _punch_time(p.get("at"), now)
+                day = punch_date(at)
+                if week_ending_for_date(day) in finalized:
+                    raise PunchError(
+                        "week_finalized",
+                        "This payroll week is finalized. Punches cannot be recorded until payroll is unfinalized for this week.",
+                    )
+            except PunchError as exc:
+                results[i] = PunchResult(key=key, error=exc.code, message=exc.message)
+                continue
+            staged.append((i, matches[0], action, at, day))
+
+        entries = {}
+        if staged:
+            for e in TimeEntry.objects.select_for_update().filter(
+                user_id__in={s[1].pk for s in staged}, date__in={s[4] for s in staged}
+            ):
+                entries[(e.user_id, e.date)] = e
+        created: dict[tuple, TimeEntry] = {}
+        changed: dict[tuple, TimeEntry] = {}
+        entry_for_index: dict[int, TimeEntry] = {}
+        clocked_in = []
+        for i, user, action, at, day in staged:
+            key = punches[i]["key"].strip()
+            entry = entries.get((user.pk, day))
+            if entry is None:
+                entry = entries[(user.pk, day)] = created[(user.pk, day)] = TimeEntry(user=user, date=day)
+            try:
+                if getattr(entry, action) is not None:
+                    raise PunchError("already_recorded", ALREADY_RECORDED_MESSAGES[action])
+                if action == "clock_in":
+                    entry.clock_in_authorized_by = resolve_clock_in_approver(
+                        user, at, day, punches[i].get("clock_in_approver"), approvers_by_id=approvers_by_id
+                    )
+            except PunchError as exc:
+                results[i] = PunchResult(key=key, error=exc.code, message=exc.message, entry_date=day)
+                continue
+            setattr(entry, action, at)
+            if (user.pk, day) not in created:
+                changed[(user.pk, day)] = entry
+            if action == "clock_in":
+                clocked_in.append(entry)
+            entry_for_index[i] = entry
+            results[i] = PunchResult(key=key, entry_date=day)
+
+        # Entries created only for punches that were then refused are not written.
+        new_entries = [e for e in created.values() if any(getattr(e, a) for a in PUNCH_ACTIONS)]
+        for entry in [*new_entries, *changed.values()]:
+            entry.apply_save_rules()
+            entry.store_computed_hours()
+        if new_entries:
+            assign_unique_slugs(new_entries, "slug", max_length=48)
+            TimeEntry.objects.bulk_create(new_entries)
+        if changed:
+            TimeEntry.objects.bulk_update(list(changed.values()), _UPDATE_FIELDS)
+
+        KioskPunchReceipt.objects.bulk_create(
+            [
+                KioskPunchReceipt(
+                    idempotency_key=results[i].key,
+                    login=str(punches[i].get("login") or "")[:16],
+                    action=str(punches[i].get("action") or "")[:16],
+                    punched_at=scan_at.get(i),
+                    user=user_for_index.get(i),
+                    time_entry=entry_for_index.get(i),
+                    error=results[i].error,
+                    message=results[i].message[:255],
+                    client_ip=client_ip,
+                )
+                for i in new
+            ]
+        )
+
+        touched = [*new_entries, *changed.values()]
+        if touched:
+            # Bulk writes skip the TimeEntry signals that keep the weekly rollups current.
+            invalidate_weekly_user_totals(
+                user_ids={e.user_id for e in touched},
+                week_endings={week_ending_for_date(e.date) for e in touched},
+            )
+        for entry in clocked_in:
+            defer_tardy_check(entry)
+
+    for key, i in first_index_by_key.items():
+        if key in receipts:
+            results[i] = PunchResult.from_receipt(receipts[key])
+    for i, p in enumerate(punches):
+        if results[i] is None:
+            # A repeat of a key earlier in this batch: same outcome, marked as a replay.
+            first = results[first_index_by_key[p["key"].strip()]]
+            results[i] = PunchResult(
+                key=first.key, error=first.error, message=first.message, entry_date=first.entry_date, replayed=True
+            )
+    return results
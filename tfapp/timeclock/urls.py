@@ -6,5 +6,7 @@ app_name = "timeclock"
 urlpatterns = [
     path('', views.timeclock_home, name='timeclock_home'),
     path("check-clock-in/", views.check_clock_in, name="check_clock_in"),
+    path("api/punch/", views.kiosk_punch_api, name="kiosk_punch_api"),
+    path("api/punches/", views.kiosk_punch_batch_api, name="kiosk_punch_batch_api"),
     path("edit/<slug:slug>/", views.edit_entry, name="edit_entry"),
 ]
\ No newline at end of file
@@ -1,6 +1,7 @@
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db import transaction, IntegrityError
 from .models import TimeEntry
 from .forms import TimeEntryForm
 from .kiosk import (
@@ -12,8 +13,10 @@ from .kiosk import (
 )
 from attendance.models import CustomUser, RoleChoices
 from attendance.payroll_utils import week_ending_for_date, is_payroll_week_finalized
-from .tardy_sync import sync_tardy_occurrences_for_time_entry
+from .punch import PunchError, defer_tardy_check, record_punch
+from .punch_ingest import PunchBatchError, ingest_punches, parse_punch_batch
 from attendance.schedule_utils import clock_in_requires_approver
+from attendance.services.tardy_sync_queue import enqueue_tardy_sync_for_entry
 from django.utils import timezone
 from django.utils.timezone import localtime
 from django.contrib.auth.decorators import login_required
@@ -39,17 +42,6 @@ def _clock_in_approver_queryset():
     )
 
 
-def _is_valid_clock_in_approver(u: CustomUser) -> bool:
-    if not u or not u.is_active:
-        return False
-    return u.role in (
-        RoleChoices.EXECUTIVE,
-        RoleChoices.MANAGER,
-        RoleChoices.SUPERVISOR,
-        RoleChoices.GROUP_LEAD,
-    )
-
-
 def _resolve_timeclock_user(request, login, pin, *, is_kiosk: bool):
     """
     Resolve employee for a punch.
@@ -110,6 +102,83 @@ def check_clock_in(request):
     )
 
 
+# HTTP status per PunchError code for the kiosk API; anything else is a conflict (409).
+_PUNCH_ERROR_STATUS = {
+    "invalid_action": 400,
+    "approver_required": 422,
+    "invalid_approver": 422,
+    "approver_not_allowed": 422,
+}
+
+
+@require_POST
+def kiosk_punch_api(request):
+    """
+    JSON punch endpoint for barcode kiosks (registered IP or kiosk token). Body:
+    {"login": "<badge>", "action": "clock_in|lunch_out|lunch_in|clock_out",
+    "clock_in_approver": <user id, only when clock-in needs an override>}.
+
+    Skips the page render and redirect; the clock-in tardy check is queued for the tardy
+    worker (defer_tardy_check). CSRF-protected like the page, so kiosk clients send X-CSRFToken.
+    """
+    if not is_timeclock_kiosk(request):
+        return JsonResponse({"error": "not_a_kiosk"}, status=403)
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "invalid_json"}, status=400)
+
+    user, err = _resolve_timeclock_user(request, payload.get("login"), None, is_kiosk=True)
+    if err == "missing_credentials":
+        return JsonResponse({"error": err}, status=400)
+    if err:
+        return JsonResponse(
+            {"error": err, "message": _credential_error_message(err, is_kiosk=True)}, status=401
+        )
+
+    action = payload.get("action")
+    try:
+        entry = record_punch(user, action, approver_id=payload.get("clock_in_approver"))
+    except PunchError as exc:
+        body = {"error": exc.code, "message": exc.message}
+        if exc.reason:
+            body["reason"] = exc.reason
+        return JsonResponse(body, status=_PUNCH_ERROR_STATUS.get(exc.code, 409))
+
+    if action == "clock_in":
+        defer_tardy_check(entry)
+    return JsonResponse(
+        {
+            "ok": True,
+            "action": action,
+            "employee": user.get_full_name() or user.username,
+            "date": entry.date.isoformat(),
+            "time": localtime(getattr(entry, action)).strftime("%I:%M %p").lstrip("0"),
+        },
+        status=201,
+    )
+
+
+@require_POST
+def kiosk_punch_batch_api(request):
+    """
+    Idempotent batch ingest for a kiosk's buffered punches. Body: {"punches": [{"key": ...,
+    "login": ..., "action": ..., "at": "<ISO 8601 scan time>", "clock_in_approver": ...}]}.
+    Answers 200 with one result per punch, in order; replayed keys return their stored result.
+    """
+    if not is_timeclock_kiosk(request):
+        return JsonResponse({"error": "not_a_kiosk"}, status=403)
+    try:
+        punches = parse_punch_batch(json.loads(request.body or b"{}"))
+    except (ValueError, PunchBatchError) as exc:
+        message = str(exc) if isinstance(exc, PunchBatchError) else "Body is not valid JSON."
+        return JsonResponse({"error": "invalid_batch", "message": message}, status=400)
+    results = ingest_punches(punches, client_ip=get_client_ip(request))
+    return JsonResponse({"results": [r.as_dict() for r in results]})
+
+
 def timeclock_home(request):
     clock_in_approvers = _clock_in_approver_queryset()
 
@@ -141,73 +210,17 @@ def timeclock_home(request):
             return redirect("timeclock:timeclock_home")
 
         now = timezone.now()
-        today = now.date()
         timestamp_str = localtime(now).strftime("%I:%M %p").lstrip("0")
 
-        if is_payroll_week_finalized(week_ending_for_date(today)):
-            messages.error(
-                request,
-                "This payroll week is finalized. Punches cannot be recorded until payroll is unfinalized for this week.",
-            )
-            return redirect("timeclock:timeclock_home")
-
         try:
-            with transaction.atomic():
-                entry = TimeEntry.objects.select_for_update().filter(
-                    user=user, date=today
-                ).first()
-                if entry is None:
-                    entry = TimeEntry(user=user, date=today)
-                    entry.save()
-
-                # Guard: prevent duplicate punches for the same action on the same day
-                if action == "clock_in" and entry.clock_in is not None:
-                    messages.warning(request, "You are already clocked in for today.")
-                    return redirect("timeclock:timeclock_home")
-                if action == "lunch_out" and entry.lunch_out is not None:
-                    messages.warning(request, "Lunch out already recorded for today.")
-                    return redirect("timeclock:timeclock_home")
-                if action == "lunch_in" and entry.lunch_in is not None:
-                    messages.warning(request, "Lunch in already recorded for today.")
-                    return redirect("timeclock:timeclock_home")
-                if action == "clock_out" and entry.clock_out is not None:
-                    messages.warning(request, "You are already clocked out for today.")
-                    return redirect("timeclock:timeclock_home")
-
-                if action == "clock_in":
-                    requires_approver, _reason = clock_in_requires_approver(user, now, today)
-                    approver_id = (request.POST.get("clock_in_approver") or "").strip()
-                    if requires_approver:
-                        if not approver_id:
-                            messages.error(
-                                request,
-                                "You are not scheduled today or are more than 15 minutes before your "
-                                "scheduled start. Select an approving executive, manager, supervisor, or "
-                                "group lead, then try Clock In again.",
-                            )
-                            return redirect("timeclock:timeclock_home")
-                        try:
-                            approver = CustomUser.objects.get(pk=approver_id)
-                        except CustomUser.DoesNotExist:
-                            messages.error(request, "Invalid approver selected.")
-                            return redirect("timeclock:timeclock_home")
-                        if not _is_valid_clock_in_approver(approver):
-                            messages.error(request, "The selected user cannot approve this clock-in.")
-                            return redirect("timeclock:timeclock_home")
-                        entry.clock_in_authorized_by = approver
-                    else:
-                        entry.clock_in_authorized_by = None
-                    entry.clock_in = now
-                elif action == "lunch_out":
-                    entry.lunch_out = now
-                elif action == "lunch_in":
-                    entry.lunch_in = now
-                elif action == "clock_out":
-                    entry.clock_out = now
-
-                entry.save()
-        except IntegrityError:
-            messages.error(request, "This punch was already recorded (duplicate). Please refresh and try again.")
+            entry = record_punch(
+                user, action, now, approver_id=request.POST.get("clock_in_approver")
+            )
+        except PunchError as exc:
+            if exc.code == "already_recorded":
+                messages.warning(request, exc.message)
+            else:
+                messages.error(request, exc.message)
             return redirect("timeclock:timeclock_home")
         except Exception:
             messages.error(request, "Could not record punch. Please try again.")
@@ -277,7 +290,7 @@ def edit_entry(request, slug):
         if form.is_valid():
             entry = form.save()
             if not is_payroll_week_finalized(week_ending):
-                sync_tardy_occurrences_for_time_entry(entry)
+                enqueue_tardy_sync_for_entry(entry)
             messages.success(request, "Time entry updated successfully.")
             if request.user.role == RoleChoices.EXECUTIVE:
                 return redirect("attendance:payroll")